@@ -5,32 +5,59 @@ asks an LLM (gpt-4o) for a plan in a constrained JSON format, executes
 registered tools in order, streams tool execution to stdout, and finally
 asks the LLM for a final answer.
 
+The loop itself is async (`AgentRunner.arun`) so one process can serve many
+conversations on a single event loop; `AgentRunner.run` is a thin sync
+wrapper around it.
+
 The implementation intentionally avoids any dependency on the main
 project and is designed for reading and learning.
 """
 from __future__ import annotations
 
+import asyncio
+import contextvars
+import functools
+import inspect
 import json
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
-from typing import Any, Dict, Optional, Protocol
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Protocol, Tuple
 
+import metrics
+from context import AgentContext, estimate_tokens
 from llm import OpenAIGPT4o
+from streaming import PlanStreamParser
+from tracing import Console, Json, Tracer, get_console, get_tracer
 
-# --- MCP Dynamic Tool Integration ---
-from tools.mcp_proxy_tool import MCPProxyTool
-from mcp import ClientSession
-from mcp.client.streamable_http import streamablehttp_client
-import asyncio
-import sys
-try:
-    from dotenv import load_dotenv
-    load_dotenv()
-except ImportError:
-    pass
+from tools.cache import MISSING, ToolResultCache
+from tools.catalog import ToolCatalog
+
+if TYPE_CHECKING:
+    # the MCP client stack is only imported when MCP tools are discovered
+    from tools.mcp_discovery import MCPToolDiscovery
+    from tools.mcp_pool import MCPSessionPool
+    from memory import AgentMemory
+    from conversations import ConversationStore
+    from speculation import Speculation, Speculator
 
 logger = logging.getLogger(__name__)
 
+_RUNS = metrics.counter("agent_runs_total", "Agent runs by outcome (ok, error)", ["outcome"])
+_RUN_SECONDS = metrics.histogram("agent_run_seconds", "Agent run latency")
+_RUNS_IN_FLIGHT = metrics.gauge("agent_runs_in_flight", "Agent runs in progress")
+_ITERATIONS = metrics.histogram(
+    "agent_run_iterations", "LLM round trips per agent run", buckets=(1, 2, 3, 4, 5, 10, 20)
+)
+_TOOL_CALLS = metrics.counter(
+    "agent_tool_calls_total", "Tool calls by tool and outcome (ok, error)", ["tool", "outcome"]
+)
+_TOOL_SECONDS = metrics.histogram("agent_tool_seconds", "Tool call latency, cache hits included", ["tool"])
+_TOOL_CACHE = metrics.counter(
+    "agent_tool_cache_lookups_total", "Tool result cache lookups by tool and result (hit, miss)", ["tool", "result"]
+)
+
 
 class Tool(Protocol):
     name: str
@@ -40,6 +67,13 @@ class Tool(Protocol):
         ...
 
 
+class AsyncTool(Tool, Protocol):
+    """A tool that can also be awaited; sync-only tools are run in a thread pool."""
+
+    async def arun(self, input: Any) -> Dict[str, Any]:
+        ...
+
+
 @dataclass
 class AgentConfig:
     name: str = "me-agent"
@@ -56,11 +90,39 @@ class AgentConfig:
         "  \"final\": boolean,\n"
         "  \"thought\": string,\n"
         "  \"action\": { \"tool\": string, \"input\": object } | null,\n"
+        "  \"actions\": [ { \"tool\": string, \"input\": object } ] | null,\n"
         "  \"answer\": string | null\n"
         "}\n"
+        "Use \"actions\" instead of \"action\" to request several independent tool "
+        "calls at once; they run in parallel.\n"
         "If \"final\" is true, include the \"answer\" field and set \"action\" to null."
     )
     user_prompt_template: Optional[str] = None
+    # independent actions from one plan run concurrently on up to this many threads
+    max_parallel_tools: int = 4
+    # seconds a single tool call may take before its observation becomes an error
+    tool_timeout: float = 60.0
+    # threads shared by every conversation for tools without an async `arun` (and a sync LLM);
+    # stopped by `AgentRunner.close()`
+    tool_threads: int = 32
+    # stream plans (SSE) and start tools / answer tokens before the plan is complete
+    stream: bool = False
+    # estimated prompt tokens allowed before earlier steps are compacted (see context.py)
+    context_budget_tokens: int = 12000
+    # observations larger than this are cut when they are recorded
+    max_observation_tokens: int = 1500
+    # how earlier steps are compacted: "summarize", "truncate" or "drop"
+    context_strategy: str = "summarize"
+
+
+@dataclass
+class RunStats:
+    """What one `arun` call did; pass an instance to `arun(..., stats=...)` to collect it."""
+
+    iterations: int = 0
+    # {"tool", "input", "ok"} for every tool call, in execution order
+    tool_calls: List[Dict[str, Any]] = field(default_factory=list)
+    prompt_tokens: List[int] = field(default_factory=list)
 
 
 @dataclass
@@ -68,12 +130,35 @@ class AgentRunner:
     llm: OpenAIGPT4o
     tools: Dict[str, Tool]
     config: AgentConfig = field(default_factory=AgentConfig)
+    # called with each piece of the final answer while it streams (config.stream)
+    on_answer_token: Optional[Callable[[str], None]] = None
+    # optional result cache in front of every tool call (see tools/cache.py)
+    cache: Optional[ToolResultCache] = None
+    # optional long-term memory; every answered query is stored in it (see memory.py)
+    memory: Optional["AgentMemory"] = None
+    # where `run(..., conversation_id=...)` keeps conversations (see conversations.py)
+    conversations: Optional["ConversationStore"] = None
+    # optional: start the predicted first tool call together with the first LLM call (see speculation.py)
+    speculator: Optional["Speculator"] = None
+    # spans for runs, iterations, LLM and tool calls (see tracing.py); defaults to tracing.get_tracer()
+    tracer: Optional[Tracer] = None
+    # progress output; defaults to tracing.get_console()
+    console: Optional[Console] = None
+    # estimated prompt tokens of each iteration of the most recent run
+    last_prompt_tokens: List[int] = field(default_factory=list, init=False)
+    _executor: Optional[ThreadPoolExecutor] = field(default=None, init=False, repr=False)
+
+    def __post_init__(self):
+        if not isinstance(self.tools, ToolCatalog):
+            # cached prompt/schema views; mutate `runner.tools` (not the original dict) afterwards
+            self.tools = ToolCatalog(self.tools or {})
+        self._executor = ThreadPoolExecutor(max_workers=self.config.tool_threads, thread_name_prefix="agent-tool")
+        self.tracer = self.tracer or get_tracer()
+        self.console = self.console or get_console()
 
     def _parse_llm_plan(self, content: str) -> Dict[str, Any]:
         """Parse LLM output trying to recover JSON. Falls back to first JSON found."""
-        print("\n--- BEGIN PLAN RAW LLM OUTPUT ---", file=sys.stderr)
-        print(content, file=sys.stderr)
-        print("--- END PLAN RAW LLM OUTPUT ---\n", file=sys.stderr)
+        self.console.debug("\n--- BEGIN PLAN RAW LLM OUTPUT ---\n%s\n--- END PLAN RAW LLM OUTPUT ---\n", content)
         try:
             return json.loads(content)
         except Exception:
@@ -87,192 +172,498 @@ class AgentRunner:
                     pass
         raise ValueError("LLM did not return valid JSON plan")
 
-    def run(self, user_query: str) -> str:
+    @staticmethod
+    def _plan_actions(plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Return the actions of a plan, accepting both `action` and `actions`."""
+        actions = plan.get("actions")
+        if isinstance(actions, list):
+            return [a for a in actions if isinstance(a, dict) and a.get("tool")]
+        action = plan.get("action")
+        return [action] if isinstance(action, dict) and action.get("tool") else []
+
+    async def _arun_tool(self, tool_name: str, tool_input: Any) -> Any:
+        started = time.perf_counter()
+        with self.tracer.span("tool.call", tool=tool_name) as span:
+            result = await self._acached_tool(tool_name, tool_input, span)
+            failed = isinstance(result, dict) and "error" in result
+            if span.recording:
+                span.set(
+                    input_chars=len(json.dumps(tool_input, default=str)),
+                    output_chars=len(json.dumps(result, default=str)),
+                )
+                if failed:
+                    span.fail(result["error"])
+        # names the LLM made up share one label value
+        label = tool_name if tool_name in self.tools else "(unknown)"
+        _TOOL_CALLS.labels(label, "error" if failed else "ok").inc()
+        _TOOL_SECONDS.labels(label).observe(time.perf_counter() - started)
+        return result
+
+    async def _acached_tool(self, tool_name: str, tool_input: Any, span) -> Any:
+        if tool_name not in self.tools:
+            return {"error": f"Tool '{tool_name}' not found"}
+        tool = self.tools[tool_name]
+        ttl = self.cache.ttl_for(tool_name, tool) if self.cache is not None else 0
+        if ttl <= 0:
+            return await self._ainvoke_tool(tool_name, tool, tool_input)
+        if self._keyed(tool):
+            # the tool's own cache_key may do I/O, or import a LazyTool: not on the event loop
+            loop = asyncio.get_running_loop()
+            key = await loop.run_in_executor(self._executor, self.cache.key, tool_name, tool, tool_input)
+        else:
+            key = self.cache.key(tool_name, tool, tool_input)
+        cached = self.cache.get(key, tool_name)
+        span.set(cache_hit=cached is not MISSING)
+        _TOOL_CACHE.labels(tool_name, "miss" if cached is MISSING else "hit").inc()
+        if cached is not MISSING:
+            return cached
+        result = await self._ainvoke_tool(tool_name, tool, tool_input)
+        self.cache.put(key, tool_name, result, ttl)
+        return result
+
+    @staticmethod
+    def _keyed(tool: Tool) -> bool:
+        """Whether `tool` has its own `cache_key` (declared by a LazyTool, so it is not imported to find out)."""
+        keyed = getattr(tool, "keyed", None)
+        return keyed if keyed is not None else hasattr(type(tool), "cache_key")
+
+    async def _ainvoke_tool(self, tool_name: str, tool: Tool, tool_input: Any) -> Any:
+        timeout = getattr(tool, "timeout", None) or self.config.tool_timeout
+        try:
+            # looked up on the class so a not-yet-imported LazyTool is loaded in the executor, not here
+            if inspect.iscoroutinefunction(getattr(type(tool), "arun", None)):
+                return await asyncio.wait_for(tool.arun(tool_input), timeout)
+            # sync tools (GraphTool, FileTool, ...) must not block the event loop; the context
+            # carries the current span, so MCP round trips made by the tool nest under it
+            loop = asyncio.get_running_loop()
+            call = functools.partial(contextvars.copy_context().run, tool.run, tool_input)
+            return await asyncio.wait_for(loop.run_in_executor(self._executor, call), timeout)
+        except asyncio.TimeoutError:
+            return {"error": f"Tool '{tool_name}' timed out after {timeout}s"}
+        except Exception as e:
+            return {"error": str(e)}
+
+    @staticmethod
+    def _action_key(action: Dict[str, Any]) -> Tuple[str, str]:
+        return action.get("tool"), json.dumps(action.get("input"), sort_keys=True)
+
+    async def _abounded_tool(self, action: Dict[str, Any], limit: asyncio.Semaphore) -> Any:
+        async with limit:
+            return await self._arun_tool(action.get("tool"), action.get("input"))
+
+    def _speculate(
+        self, user_query: str, limit: asyncio.Semaphore, started: Dict[Tuple[str, str], "asyncio.Future"]
+    ) -> Optional["Speculation"]:
+        """Start the predicted first action (if any) into `started`, where the plan's actions look for it."""
+        from speculation import Speculation
+
+        action = self.speculator.predict(user_query, self.tools)
+        if action is None:
+            return None
+        self.console.debug(">>> Speculatively invoking tool '%s' with input: %s", action["tool"], Json(action["input"]))
+        speculation = Speculation(action)
+        task = asyncio.ensure_future(self._abounded_tool(action, limit))
+        task.add_done_callback(speculation.done)
+        started[self._action_key(action)] = task
+        return speculation
+
+    def _settle_speculation(
+        self, user_query: str, speculation: Optional["Speculation"], actions: List[Dict[str, Any]], span
+    ):
+        """Teach the speculator the first plan's actions and count its guess as a hit or a miss."""
+        self.speculator.observe(user_query, actions)
+        if speculation is None:
+            return
+        key = self._action_key(speculation.action)
+        hit = any(self._action_key(a) == key for a in actions)
+        saved = self.speculator.settle(speculation, hit)
+        if span.recording:
+            span.set(speculated=speculation.action["tool"], speculation_hit=hit, speculation_saved_ms=saved * 1e3)
+
+    async def _aexecute_actions(
+        self,
+        actions: List[Dict[str, Any]],
+        limit: asyncio.Semaphore,
+        started: Optional[Dict[Tuple[str, str], "asyncio.Future"]] = None,
+    ) -> List[Any]:
+        """Run independent actions concurrently; observations keep the actions' order.
+
+        Actions already dispatched while the plan was streaming are awaited
+        from `started` instead of being run twice.
+        """
+        started = started if started is not None else {}
+        for action in actions:
+            self.console.info(">>> Invoking tool '%s' with input: %s", action.get("tool"), Json(action.get("input")))
+        tasks = [
+            started.pop(self._action_key(a), None) or asyncio.ensure_future(self._abounded_tool(a, limit))
+            for a in actions
+        ]
+        self._cancel(started)
+        observations = await asyncio.gather(*tasks)
+        for action, observation in zip(actions, observations):
+            self.console.info("<<< Tool '%s' returned: %s\n", action.get("tool"), Json(observation))
+        return list(observations)
+
+    @staticmethod
+    def _cancel(started: Dict[Tuple[str, str], "asyncio.Future"]):
+        for task in started.values():
+            task.cancel()
+        started.clear()
+
+    @staticmethod
+    def _function_call_action(fc: Dict[str, Any]) -> Dict[str, Any]:
+        fc_args = fc.get("arguments")
+        try:
+            tool_input = json.loads(fc_args) if isinstance(fc_args, str) else fc_args or {}
+        except Exception:
+            tool_input = {}
+        return {"tool": fc.get("name"), "input": tool_input}
+
+    async def _astream_plan(
+        self, prompt: List[Dict[str, Any]], functions: list, dispatch: Callable[[Dict[str, Any]], None]
+    ) -> Dict[str, Any]:
+        """Stream one plan, calling `dispatch` for each action as soon as it is complete.
+
+        Returns the same normalized dict as `llm.chat`.
+        """
+        parser = PlanStreamParser()
+        calls: Dict[int, Dict[str, str]] = {}
+        requested = time.monotonic()
+        first_action = first_token = None
+
+        def _dispatch(action):
+            nonlocal first_action
+            first_action = first_action or time.monotonic()
+            dispatch(action)
+
+        async for delta in self.llm.astream(
+            prompt, functions=functions, parallel=self.config.max_parallel_tools > 1
+        ):
+            if "content" in delta:
+                for kind, value in parser.feed(delta["content"]):
+                    if kind == "action":
+                        _dispatch(value)
+                    elif kind == "answer" and self.on_answer_token is not None:
+                        first_token = first_token or time.monotonic()
+                        self.on_answer_token(value)
+            elif "tool_call" in delta:
+                tc = delta["tool_call"]
+                if tc["index"] not in calls:
+                    # a new function call begins, so the previous one is complete
+                    if calls:
+                        _dispatch(self._function_call_action(calls[max(calls)]))
+                    calls[tc["index"]] = {"name": tc.get("name") or "", "arguments": ""}
+                elif tc.get("name"):
+                    calls[tc["index"]]["name"] += tc["name"]
+                calls[tc["index"]]["arguments"] += tc.get("arguments") or ""
+        if calls:
+            _dispatch(self._function_call_action(calls[max(calls)]))
+
+        if first_action is not None:
+            logger.info("Streamed plan: first action after %.3fs", first_action - requested)
+        if first_token is not None:
+            logger.info("Streamed plan: first answer token after %.3fs", first_token - requested)
+        if calls:
+            return {"function_calls": [calls[i] for i in sorted(calls)]}
+        return {"content": parser.text}
+
+    async def _achat(self, prompt: List[Dict[str, Any]], functions: list) -> Any:
+        kwargs = {"functions": functions, "parallel": self.config.max_parallel_tools > 1}
+        if inspect.iscoroutinefunction(getattr(self.llm, "achat", None)):
+            return await self.llm.achat(prompt, **kwargs)
+        loop = asyncio.get_running_loop()
+        call = functools.partial(contextvars.copy_context().run, self.llm.chat, prompt, **kwargs)
+        return await loop.run_in_executor(self._executor, call)
+
+    def close(self, wait: bool = True):
+        """Stop the runner's threads (after running calls finish, with `wait`); it cannot run tools afterwards."""
+        self._executor.shutdown(wait=wait)
+
+    async def aclose(self):
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    def __enter__(self) -> "AgentRunner":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    async def __aenter__(self) -> "AgentRunner":
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    def run(self, user_query: str, conversation_id: Optional[str] = None) -> str:
+        """Sync entry point; inside a running event loop use `await arun(...)` instead."""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self._run_once(user_query, conversation_id))
+        raise RuntimeError("AgentRunner.run() cannot be called from a running event loop; use arun()")
+
+    async def _run_once(self, user_query: str, conversation_id: Optional[str] = None) -> str:
+        try:
+            return await self.arun(user_query, conversation_id=conversation_id)
+        finally:
+            # connections opened on this throwaway loop cannot outlive it
+            if inspect.iscoroutinefunction(getattr(self.llm, "aclose", None)):
+                await self.llm.aclose()
+
+    async def _aremember(self, user_query: str, answer: str, steps: List[Dict[str, Any]]):
+        if self.memory is None or not answer:
+            return
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self._executor, self.memory.remember, user_query, answer, steps)
+        except Exception as e:
+            logger.warning("Could not store the run in memory: %s", e)
+
+    async def arun(
+        self, user_query: str, stats: Optional[RunStats] = None, conversation_id: Optional[str] = None
+    ) -> str:
+        """Answer `user_query`; with `conversation_id`, earlier turns are in the prompt and this one is saved."""
+        stats = stats if stats is not None else RunStats()
+        started = time.perf_counter()
+        _RUNS_IN_FLIGHT.inc()
+        try:
+            answer = await self._atraced_run(user_query, stats, conversation_id)
+        except BaseException:
+            _RUNS.labels("error").inc()
+            raise
+        finally:
+            _RUNS_IN_FLIGHT.dec()
+            _RUN_SECONDS.observe(time.perf_counter() - started)
+        _RUNS.labels("ok").inc()
+        _ITERATIONS.observe(stats.iterations)
+        return answer
+
+    async def _atraced_run(self, user_query: str, stats: RunStats, conversation_id: Optional[str]) -> str:
+        with self.tracer.span("agent.run", query_chars=len(user_query)) as span:
+            if conversation_id is None:
+                answer = await self._aloop(user_query, stats, [])
+            else:
+                if self.conversations is None:
+                    raise ValueError("conversation_id needs AgentRunner(conversations=ConversationStore(...))")
+                span.set(conversation_id=conversation_id)
+                loop = asyncio.get_running_loop()
+                history = await loop.run_in_executor(self._executor, self.conversations.messages, conversation_id)
+                answer = await self._aloop(user_query, stats, history)
+                await loop.run_in_executor(
+                    self._executor, self.conversations.append, conversation_id, user_query, answer
+                )
+            span.set(answer_chars=len(answer))
+            return answer
+
+    async def _aloop(self, user_query: str, stats: Optional[RunStats], history: List[Dict[str, str]]) -> str:
         iteration = 0
-        scratchpad = []
-        observation = None
+        # tool observations of this run, kept with the answer in `memory`
+        steps: List[Dict[str, Any]] = []
+        context = AgentContext(
+            budget=self.config.context_budget_tokens,
+            max_observation_tokens=self.config.max_observation_tokens,
+            strategy=self.config.context_strategy,
+        )
+        self.last_prompt_tokens = context.prompt_tokens
+        if stats is not None:
+            stats.prompt_tokens = context.prompt_tokens
         seen_action_obs = set()
+        # observation each (tool, input) produced in the previous iteration
+        last_obs: Dict[Tuple[str, str], str] = {}
+
+        def is_repeat(action: Dict[str, Any]) -> bool:
+            key = self._action_key(action)
+            return key + (last_obs.get(key),) in seen_action_obs
 
         while iteration < self.config.max_iterations:
             iteration += 1
-            prompt = [
-                {"role": "system", "content": self.config.system_prompt},
-            ]
-
-            # include brief tools description so the LLM knows what it can call
-            tools_description = []
-            for tname, tobj in (self.tools or {}).items():
-                try:
-                    desc = getattr(tobj, "description", "")
-                except Exception:
-                    desc = ""
-                tools_description.append({"name": tname, "description": desc})
-
-            try:
-                prompt.append({
-                    "role": "system",
-                    "content": f"Available tools: {json.dumps(tools_description)}"
-                })
-            except Exception:
-                prompt.append({
-                    "role": "system",
-                    "content": f"Available tools: {tools_description}"
-                })
-
-            # finally add the interactive user query
-            prompt.append({"role": "user", "content": user_query})
-
-            # include scratchpad
-            if scratchpad:
-                prompt.append({"role": "assistant", "content": json.dumps(scratchpad)})
-
-            if observation is not None:
-                prompt.append({
-                    "role": "user",
-                    "content": f"Observation: {json.dumps(observation)}"
-                })
-
-            logger.info("Requesting plan from LLM (iteration=%d)", iteration)
-
-            # build functions schema for OpenAI function-calling (best-effort)
-            functions = []
-            for tname, tobj in (self.tools or {}).items():
-                try:
-                    desc = getattr(tobj, "description", "")
-                except Exception:
-                    desc = ""
-                functions.append({
-                    "name": tname,
-                    "description": desc,
-                    "parameters": {"type": "object", "properties": {}}
-                })
-
-            response = self.llm.chat(prompt, functions=functions)
-
-            # If the LLM asked for a function call (OpenAI style), execute it now and
-            # inject the observation back into the next loop iteration.
-            if isinstance(response, dict) and response.get("function_call"):
-                fc = response["function_call"]
-                fc_name = fc.get("name")
-                fc_args = fc.get("arguments")
-                try:
-                    tool_input = json.loads(fc_args) if isinstance(fc_args, str) else fc_args or {}
-                except Exception:
-                    tool_input = {}
-
-                if fc_name not in self.tools:
-                    observation = {"error": f"Tool '{fc_name}' not found"}
-                else:
-                    tool = self.tools[fc_name]
-                    try:
-                        observation = tool.run(tool_input)
-                    except Exception as e:
-                        observation = {"error": str(e)}
-
-                print(
-                    f">>> Invoking tool '{fc_name}' with input: "
-                    f"{json.dumps(tool_input)}"
-                )
-                print(
-                    f"<<< Tool '{fc_name}' returned: "
-                    f"{json.dumps(observation)}\n"
+            with self.tracer.span("agent.iteration", iteration=iteration) as iteration_span:
+                if stats is not None:
+                    stats.iterations = iteration
+                context.set_head([
+                    {"role": "system", "content": self.config.system_prompt},
+                    # include brief tools description so the LLM knows what it can call
+                    self.tools.prompt_message,
+                    # summary and last turns of the conversation, if any
+                    *history,
+                    # finally add the interactive user query
+                    {"role": "user", "content": user_query},
+                ])
+                # earlier steps are appended once and compacted to the token budget
+                prompt = context.messages()
+
+                logger.info(
+                    "Requesting plan from LLM (iteration=%d, ~%d prompt tokens)", iteration, context.prompt_tokens[-1]
                 )
 
-                scratchpad.append({
-                    "thought": f"function_call:{fc_name}",
-                    "action": {"tool": fc_name, "input": tool_input},
-                    "observation": observation
-                })
-                # continue to next iteration so the LLM can see the observation
-                continue
-
-            # otherwise assume we received a textual plan
-            if isinstance(response, dict) and response.get("content") is not None:
-                plan = self._parse_llm_plan(response.get("content"))
-            elif isinstance(response, str):
-                plan = self._parse_llm_plan(response)
-            else:
-                raise ValueError("Unexpected LLM response format")
-
-            thought = plan.get("thought")
-            action = plan.get("action")
-            final = plan.get("final")
-            answer = plan.get("answer")
-
-            print(f"\n[Iteration {iteration}] Thought: {thought}")
-
-            if final:
-                print("Agent indicated final answer.\n")
-                return answer or ""
-
-            if not action:
-                print("No action proposed by LLM; stopping.")
-                return answer or ""
-
-            tool_name = action.get("tool")
-            tool_input = action.get("input")
-            # detect simple loops: same action + same observation
-            action_obs_key = (
-                tool_name,
-                json.dumps(tool_input, sort_keys=True),
-                json.dumps(observation, sort_keys=True)
-                if observation is not None else None
-            )
-            if action_obs_key in seen_action_obs:
-                print(
-                    "Detected repeated action/observation -> "
-                    "stopping to avoid loop."
+                # functions schema for OpenAI function-calling, rebuilt only when tools change
+                functions = self.tools.functions
+
+                limit = asyncio.Semaphore(max(1, self.config.max_parallel_tools))
+                streamed = self.config.stream and hasattr(self.llm, "astream")
+                # tool calls started before the plan is complete: the speculative one, streamed actions
+                started: Dict[Tuple[str, str], "asyncio.Future"] = {}
+                speculation = None
+                if iteration == 1 and self.speculator is not None:
+                    speculation = self._speculate(user_query, limit, started)
+                with self.tracer.span("llm.call", streamed=bool(streamed)) as llm_span:
+                    if llm_span.recording:
+                        llm_span.set(
+                            prompt_messages=len(prompt),
+                            prompt_chars=sum(len(m.get("content") or "") for m in prompt),
+                            prompt_tokens_estimate=context.prompt_tokens[-1],
+                        )
+                    try:
+                        if streamed:
+
+                            def dispatch(action: Dict[str, Any]):
+                                key = self._action_key(action)
+                                if action.get("tool") in self.tools and key not in started and not is_repeat(action):
+                                    started[key] = asyncio.ensure_future(self._abounded_tool(action, limit))
+
+                            response = await self._astream_plan(prompt, functions, dispatch)
+                        else:
+                            response = await self._achat(prompt, functions)
+                    except BaseException:
+                        self._cancel(started)
+                        raise
+                    if llm_span.recording:
+                        text = _response_text(response)
+                        llm_span.set(response_chars=len(text), response_tokens_estimate=estimate_tokens(text))
+
+                thought = None
+                answer = None
+                # If the LLM asked for function calls (OpenAI style), execute them now and
+                # inject the observations back into the next loop iteration.
+                if isinstance(response, dict) and (
+                    response.get("function_calls") or response.get("function_call")
+                ):
+                    actions = [
+                        self._function_call_action(fc)
+                        for fc in response.get("function_calls") or [response["function_call"]]
+                    ]
+                    thought = "function_call:" + ",".join(a["tool"] or "" for a in actions)
+                    if iteration == 1 and self.speculator is not None:
+                        self._settle_speculation(user_query, speculation, actions, iteration_span)
+                else:
+                    # otherwise assume we received a textual plan
+                    if isinstance(response, dict) and response.get("content") is not None:
+                        plan = self._parse_llm_plan(response.get("content"))
+                    elif isinstance(response, str):
+                        plan = self._parse_llm_plan(response)
+                    else:
+                        raise ValueError("Unexpected LLM response format")
+
+                    thought = plan.get("thought")
+                    final = plan.get("final")
+                    answer = plan.get("answer")
+                    actions = self._plan_actions(plan)
+                    if iteration == 1 and self.speculator is not None:
+                        self._settle_speculation(user_query, speculation, [] if final else actions, iteration_span)
+
+                    self.console.info("\n[Iteration %d] Thought: %s", iteration, thought)
+
+                    if final:
+                        self._cancel(started)
+                        self.console.info("Agent indicated final answer.\n")
+                        await self._aremember(user_query, answer, steps)
+                        return answer or ""
+
+                    if not actions:
+                        self._cancel(started)
+                        self.console.info("No action proposed by LLM; stopping.")
+                        await self._aremember(user_query, answer, steps)
+                        return answer or ""
+
+                # detect simple loops per action: same action + same observation
+                fresh = []
+                for action in actions:
+                    if is_repeat(action):
+                        self.console.info(
+                            "Detected repeated action/observation for '%s' -> skipping to avoid loop.",
+                            action.get("tool"),
+                        )
+                        continue
+                    fresh.append(action)
+                if not fresh:
+                    self._cancel(started)
+                    self.console.info("Detected repeated action/observation -> stopping to avoid loop.")
+                    return answer or "Agent stopped due to repeated tool loop"
+
+                observations = await self._aexecute_actions(fresh, limit, started)
+                if stats is not None:
+                    stats.tool_calls.extend(
+                        {
+                            "tool": a.get("tool"),
+                            "input": a.get("input"),
+                            "ok": not (isinstance(o, dict) and "error" in o),
+                        }
+                        for a, o in zip(fresh, observations)
+                    )
+
+                context.add_step(thought, fresh, observations)
+                steps.extend(
+                    # recalled memories are not stored again
+                    {"tool": a.get("tool"), "input": a.get("input"), "observation": o}
+                    for a, o in zip(fresh, observations)
+                    if a.get("tool") != "memory_search"
                 )
-                return answer or "Agent stopped due to repeated tool loop"
-            if tool_name not in self.tools:
-                observation = {"error": f"Tool '{tool_name}' not found"}
-                scratchpad.append({
-                    "thought": thought,
-                    "action": action,
-                    "observation": observation
-                })
-                continue
-
-            tool = self.tools[tool_name]
-            print(
-                f">>> Invoking tool '{tool_name}' with input: "
-                f"{json.dumps(tool_input)}"
-            )
-            try:
-                observation = tool.run(tool_input)
-            except Exception as e:
-                observation = {"error": str(e)}
-
-            print(
-                f"<<< Tool '{tool_name}' returned: "
-                f"{json.dumps(observation)}\n"
-            )
-
-            scratchpad.append({
-                "thought": thought,
-                "action": action,
-                "observation": observation
-            })
-            seen_action_obs.add((
-                tool_name,
-                json.dumps(tool_input, sort_keys=True),
-                json.dumps(observation, sort_keys=True)
-            ))
+                last_obs = {}
+                for action, obs in zip(fresh, observations):
+                    if action.get("tool") not in self.tools:
+                        continue
+                    key = self._action_key(action)
+                    last_obs[key] = json.dumps(obs, sort_keys=True)
+                    seen_action_obs.add(key + (last_obs[key],))
 
         return "Agent reached max iterations without final answer"
 
 
-def discover_and_register_mcp_tools(mcp_url: str, tools_dict: dict):
-    async def _list():
-        async with streamablehttp_client(mcp_url) as (read, write, _):
-            async with ClientSession(read, write) as session:
-                await session.initialize()
-                tools_response = await session.list_tools()
-                return tools_response.tools
-    tools_info = asyncio.run(_list())
-    for tool in tools_info:
-        tool_name = tool.name
-        desc = getattr(tool, "description", "")
-        tools_dict[tool_name] = MCPProxyTool(mcp_url, tool_name, desc)
+def _response_text(response: Any) -> str:
+    """The text an LLM response carries (plan content or function-call arguments), for span sizes."""
+    if isinstance(response, str):
+        return response
+    if not isinstance(response, dict):
+        return ""
+    if response.get("content") is not None:
+        return response["content"]
+    calls = response.get("function_calls") or ([response["function_call"]] if response.get("function_call") else [])
+    return "".join((c.get("name") or "") + (c.get("arguments") or "") for c in calls if isinstance(c, dict))
+
+
+# --- MCP Dynamic Tool Integration ---
+def discover_and_register_mcp_tools(
+    mcp_url: str,
+    tools_dict: dict,
+    pool: Optional["MCPSessionPool"] = None,
+    snapshot_path: Optional[str] = None,
+    refresh_interval: Optional[float] = None,
+) -> "MCPToolDiscovery":
+    """Register an `MCPProxyTool` per remote tool of `mcp_url` into `tools_dict`.
+
+    Without `snapshot_path` this blocks on `list_tools()` and raises if the
+    server is unreachable. With it, the tools of the last discovery are
+    registered at once and refreshed in the background; only the very first
+    run (no snapshot yet) waits for the server, and failures are logged.
+    `refresh_interval` keeps refreshing (and follows `tools/list_changed`).
+    """
+    from tools.mcp_discovery import MCPToolDiscovery
+
+    # the discovery session stays open in the pool and is reused by the proxies
+    discovery = MCPToolDiscovery(mcp_url, tools_dict, pool=pool, snapshot_path=snapshot_path)
+    if snapshot_path is None:
+        discovery.refresh()
+        warm = False
+    else:
+        warm = discovery.load_snapshot()
+        if not warm:
+            try:
+                discovery.refresh()
+            except Exception as e:
+                logger.warning("MCP discovery at %s failed, starting without its tools: %s", mcp_url, e)
+    if refresh_interval or warm:
+        # a warm start catches up with the server right away, in the background
+        discovery.start(refresh_interval, immediately=warm)
+    return discovery
 
 # Uso: tools = get_tools(); discover_and_register_mcp_tools(url, tools)
@@ -0,0 +1,218 @@
+"""Offline batch mode: run a JSONL file of queries through `AgentRunner`.
+
+Each input line is either a JSON object (`{"id": ..., "query": ...}`;
+`request_id` / `prompt` / `body` are accepted too) or a bare query string,
+which gets its line number as id. Queries are read lazily, so the input
+can be a 100k-line file or stdin, and run by `workers` concurrent
+conversations on one event loop. Every result is written as one JSON line,
+in completion order:
+
+    {"id", "query", "status": "ok" | "error", "answer" | "error",
+     "latency", "iterations", "tool_calls"}
+
+With a `Checkpoint`, the id of every successful query is appended to a file
+after its result has been written, and ids already listed there are skipped
+on the next run. A crashed job therefore restarts where it left off (a query
+whose result was written just before the crash may appear twice); failed
+queries are retried.
+
+`RateLimitedLLM` puts a global requests-per-second limit in front of the
+LLM client, shared by all workers. It goes inside a `CachedLLM`
+(`CachedLLM(RateLimitedLLM(llm, limiter))`), so cache hits take no token.
+"""
+from __future__ import annotations
+
+import asyncio
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from typing import IO, Any, AsyncIterator, Dict, Iterator, Optional, Set, Tuple
+
+from agent import AgentRunner, RunStats
+
+logger = logging.getLogger(__name__)
+
+ID_FIELDS = ("id", "request_id")
+QUERY_FIELDS = ("query", "prompt", "body")
+
+
+def parse_query_line(line: str, line_number: int) -> Optional[Tuple[str, str]]:
+    """(id, query) of one input line, or None for blank lines."""
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        item = json.loads(line)
+    except ValueError:
+        item = line
+    if not isinstance(item, dict):
+        return str(line_number), item if isinstance(item, str) else line
+    qid = next((item[f] for f in ID_FIELDS if item.get(f) is not None), line_number)
+    query = next((item[f] for f in QUERY_FIELDS if item.get(f)), None)
+    if query is None:
+        raise ValueError(f"line {line_number}: no query field (expected one of {QUERY_FIELDS})")
+    return str(qid), str(query)
+
+
+def read_queries(stream: IO[str]) -> Iterator[Tuple[str, str]]:
+    """(id, query) pairs of a JSONL stream; lines without a query are logged and skipped."""
+    for number, line in enumerate(stream, 1):
+        try:
+            parsed = parse_query_line(line, number)
+        except ValueError as e:
+            logger.warning("Skipping input %s", e)
+            continue
+        if parsed is not None:
+            yield parsed
+
+
+class Checkpoint:
+    """Append-only file of completed query ids."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: Set[str] = set()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.done = {line.rstrip("\n") for line in f if line.strip()}
+        self._file = open(path, "a", encoding="utf-8")
+
+    def __contains__(self, qid: str) -> bool:
+        return qid in self.done
+
+    def mark(self, qid: str):
+        self.done.add(qid)
+        self._file.write(qid + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+class RateLimiter:
+    """Token bucket of `rate` requests per second (bursts up to `burst`), thread-safe."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token, returning how long the caller must wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self):
+        delay = self._reserve()
+        if delay:
+            time.sleep(delay)
+
+    async def aacquire(self):
+        delay = self._reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+
+class RateLimitedLLM:
+    """Wraps an LLM client so every request first takes a token from `limiter`."""
+
+    def __init__(self, llm: Any, limiter: RateLimiter):
+        self.llm = llm
+        self.limiter = limiter
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+    def chat(self, messages, **kwargs) -> dict:
+        self.limiter.acquire()
+        return self.llm.chat(messages, **kwargs)
+
+    async def achat(self, messages, **kwargs) -> dict:
+        await self.limiter.aacquire()
+        if inspect.iscoroutinefunction(getattr(self.llm, "achat", None)):
+            return await self.llm.achat(messages, **kwargs)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: self.llm.chat(messages, **kwargs))
+
+    async def astream(self, messages, **kwargs) -> AsyncIterator[dict]:
+        await self.limiter.aacquire()
+        async for delta in self.llm.astream(messages, **kwargs):
+            yield delta
+
+
+async def arun_batch(
+    runner: AgentRunner,
+    queries: Iterator[Tuple[str, str]],
+    out: IO[str],
+    workers: int = 4,
+    checkpoint: Optional[Checkpoint] = None,
+) -> Dict[str, int]:
+    """Run `queries` on `workers` concurrent conversations; returns ok/error/skipped counts."""
+    counts = {"ok": 0, "error": 0, "skipped": 0}
+    queries = iter(queries)
+    workers = max(1, workers)
+    loop = asyncio.get_running_loop()
+    # bounded, so a huge input is never read far ahead of the workers
+    queue: "asyncio.Queue[Optional[Tuple[str, str]]]" = asyncio.Queue(maxsize=workers * 2)
+
+    async def produce():
+        while True:
+            # reading may block (stdin), so it happens off the loop
+            item = await loop.run_in_executor(None, next, queries, None)
+            if item is None:
+                break
+            if checkpoint is not None and item[0] in checkpoint:
+                counts["skipped"] += 1
+                continue
+            await queue.put(item)
+        for _ in range(workers):
+            await queue.put(None)
+
+    async def work():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            qid, query = item
+            stats = RunStats()
+            started = time.monotonic()
+            record: Dict[str, Any] = {"id": qid, "query": query}
+            try:
+                record["answer"] = await runner.arun(query, stats=stats)
+                record["status"] = "ok"
+            except Exception as e:
+                record["status"] = "error"
+                record["error"] = f"{type(e).__name__}: {e}"
+            record["latency"] = round(time.monotonic() - started, 3)
+            record["iterations"] = stats.iterations
+            record["tool_calls"] = stats.tool_calls
+            out.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            out.flush()
+            counts[record["status"]] += 1
+            if checkpoint is not None and record["status"] == "ok":
+                checkpoint.mark(qid)
+
+    producer = asyncio.ensure_future(produce())
+    try:
+        await asyncio.gather(producer, *(work() for _ in range(workers)))
+    finally:
+        producer.cancel()
+        if inspect.iscoroutinefunction(getattr(runner.llm, "aclose", None)):
+            await runner.llm.aclose()
+    return counts
+
+
+def run_batch(runner: AgentRunner, queries, out, workers: int = 4, checkpoint: Optional[Checkpoint] = None):
+    return asyncio.run(arun_batch(runner, queries, out, workers=workers, checkpoint=checkpoint))
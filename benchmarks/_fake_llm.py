@@ -0,0 +1,165 @@
+"""A local stand-in for the OpenAI chat completions endpoint.
+
+`FakeLLMServer` runs an asyncio HTTP/1.1 server on a background thread so it
+can hold hundreds of concurrent (keep-alive) connections. By default it plays
+a two-step agent: the first call asks for `echo`, and once an observation is
+in the prompt it returns a final answer. Pass `responder` to script anything
+else; it gets the decoded request payload and returns the assistant message.
+Append to `faults` to make the next requests fail or stall, e.g.
+`{"status": 429, "headers": {"Retry-After": "0"}}` or `{"delay": 2.0}`.
+Requests with `"stream": true` get a chunked SSE response that emits the
+content `stream_chunk` characters at a time, `stream_delay` seconds apart;
+`{"unterminated": True}` ends it after the last delta, without `[DONE]` or
+the blank line that closes an event.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+
+def default_responder(payload: Dict[str, Any]) -> Dict[str, Any]:
+    messages = payload.get("messages") or []
+    if any(str(m.get("content", "")).startswith("Observation:") for m in messages):
+        plan = {"final": True, "thought": "done", "action": None, "answer": "ok"}
+    else:
+        plan = {"final": False, "thought": "echo it", "action": {"tool": "echo", "input": {"text": "hi"}},
+                "answer": None}
+    return {"role": "assistant", "content": json.dumps(plan)}
+
+
+class FakeLLMServer:
+    def __init__(
+        self,
+        latency: float = 0.0,
+        responder: Optional[Callable[[dict], dict]] = None,
+        stream_chunk: int = 8,
+        stream_delay: float = 0.0,
+    ):
+        self.latency = latency
+        self.stream_chunk = stream_chunk
+        self.stream_delay = stream_delay
+        self.responder = responder or default_responder
+        self.requests = 0
+        self.connections = 0
+        self.faults: List[Dict[str, Any]] = []
+        self._handlers: set = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server = None
+        self._thread: Optional[threading.Thread] = None
+        self.port: Optional[int] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    def start(self) -> "FakeLLMServer":
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="fake-llm", daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+        return self
+
+    async def _start(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0, backlog=1024)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    def stop(self):
+        async def _stop():
+            self._server.close()
+            # keep-alive clients may still hold connections open
+            for task in list(self._handlers):
+                task.cancel()
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+            await self._server.wait_closed()
+        asyncio.run_coroutine_threadsafe(_stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def respond(self, payload: Dict[str, Any]):
+        """Return (status, headers, body bytes) for one request; override to inject faults."""
+        message = self.responder(payload)
+        body = json.dumps({"choices": [{"index": 0, "message": message, "finish_reason": "stop"}]})
+        return 200, {"Content-Type": "application/json"}, body.encode("utf-8")
+
+    async def _write_stream(self, writer: asyncio.StreamWriter, payload: Dict[str, Any], unterminated: bool = False):
+        message = self.responder(payload)
+        deltas = []
+        content = message.get("content") or ""
+        for i in range(0, len(content), self.stream_chunk):
+            deltas.append({"content": content[i:i + self.stream_chunk]})
+        for index, call in enumerate(message.get("tool_calls") or []):
+            fn = call["function"]
+            deltas.append({"tool_calls": [{"index": index, "type": "function",
+                                           "function": {"name": fn["name"], "arguments": ""}}]})
+            args = fn.get("arguments") or ""
+            for i in range(0, len(args), self.stream_chunk):
+                piece = args[i:i + self.stream_chunk]
+                deltas.append({"tool_calls": [{"index": index, "function": {"arguments": piece}}]})
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nTransfer-Encoding: chunked\r\n\r\n")
+        events = [json.dumps({"choices": [{"index": 0, "delta": d}]}) for d in deltas]
+        if not unterminated:
+            events.append("[DONE]")
+        for n, event in enumerate(events, 1):
+            data = f"data: {event}\n" if unterminated and n == len(events) else f"data: {event}\n\n"
+            data = data.encode("utf-8")
+            writer.write(f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n")
+            await writer.drain()
+            if self.stream_delay:
+                await asyncio.sleep(self.stream_delay)
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    k, _, v = line.decode("latin-1").partition(":")
+                    headers[k.strip().lower()] = v.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                self.requests += 1
+                fault = self.faults.pop(0) if self.faults else {}
+                delay = self.latency + fault.get("delay", 0.0)
+                if delay:
+                    await asyncio.sleep(delay)
+                request = json.loads(body or b"{}")
+                if request.get("stream") and "status" not in fault:
+                    await self._write_stream(writer, request, fault.get("unterminated", False))
+                    continue
+                if "status" in fault:
+                    status, resp_headers = fault["status"], fault.get("headers", {})
+                    resp_body = json.dumps({"error": {"message": "injected fault"}}).encode("utf-8")
+                else:
+                    status, resp_headers, resp_body = self.respond(request)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                head = [f"HTTP/1.1 {status} X", f"Content-Length: {len(resp_body)}",
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+                head += [f"{k}: {v}" for k, v in resp_headers.items()]
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + resp_body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            self._handlers.discard(task)
+            writer.close()
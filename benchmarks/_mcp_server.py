@@ -0,0 +1,53 @@
+"""Start the local FastMCP server (`mcp/server.py`) in a subprocess for benchmarks."""
+from __future__ import annotations
+
+import contextlib
+import os
+import socket
+import subprocess
+import sys
+import time
+
+MCP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mcp")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextlib.contextmanager
+def local_mcp_server(port: int | None = None, api_key: str = "bench-key", extra_args=(), env=None):
+    """Yield the `/mcp` URL of a freshly started local server.
+
+    The server runs from inside `mcp/` (like `server.py` itself expects) so its
+    `tools` package is the MCP one, not the agent's. `env` adds settings such
+    as the `MCP_*` serving options of `mcp/serving.py`.
+    """
+    port = port or free_port()
+    env = dict(os.environ, MCP_API_KEY=api_key, **(env or {}))
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning", *extra_args],
+        cwd=MCP_DIR,
+        env=env,
+    )
+    try:
+        deadline = time.monotonic() + 20
+        while time.monotonic() < deadline:
+            if proc.poll() is not None:
+                raise RuntimeError("local MCP server exited during startup")
+            with socket.socket() as s:
+                if s.connect_ex(("127.0.0.1", port)) == 0:
+                    break
+            time.sleep(0.1)
+        else:
+            raise RuntimeError("local MCP server did not start in time")
+        yield f"http://127.0.0.1:{port}/mcp"
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
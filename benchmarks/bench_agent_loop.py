@@ -0,0 +1,199 @@
+"""End-to-end agent loop, replayed from a recorded transcript.
+
+Usage: `python -m benchmarks.bench_agent_loop [--rounds 30] [--concurrency 8] [--json FILE]
+[--compare BASELINE.json --max-regression 0.25]`
+
+Replays the sample workloads (`benchmarks/workloads/`, see
+`benchmarks.record_workloads`, or any `--queries` / `--cassette` pair
+recorded with `cli.py --record`) through the real `AgentRunner`, with the
+LLM and the tools answered by `replay.py`. Reports:
+
+- framework overhead: microseconds of agent work per iteration (prompt
+  building, plan parsing, tool dispatch, context bookkeeping), with the LLM
+  and tools answering instantly and the replay lookups subtracted; min,
+  median, mean and stddev over `--rounds` rounds of every workload;
+- prompt bytes per LLM call (deterministic: changes come from the prompt,
+  the tool specs or the context policy);
+- tool latency distribution, from the latencies in the transcript;
+- throughput in queries per second, sequential and `--concurrency` at a
+  time, with instant replies and with the recorded latencies.
+
+`--json` saves the results; `--compare` checks them against saved ones and
+exits with status 1 if overhead per iteration or mean prompt bytes grew by
+more than `--max-regression` (a fraction), for CI.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Any, Dict, List
+
+from agent import AgentRunner, RunStats
+from replay import Cassette, ReplayLLM, replay_tools
+from tracing import QUIET, Console, Tracer
+
+WORKLOADS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "workloads")
+
+# compared by --compare; all of them are "lower is better"
+GATED = ("overhead_us_per_iteration", "prompt_bytes_mean")
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def load_queries(path: str) -> List[Dict[str, str]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def make_runner(cassette: Cassette, latency_scale: float = 0.0) -> AgentRunner:
+    return AgentRunner(
+        llm=ReplayLLM(cassette, latency_scale),
+        tools=replay_tools(cassette, latency_scale),
+        tracer=Tracer(),
+        console=Console(QUIET),
+    )
+
+
+async def replay_round(runner: AgentRunner, queries: List[Dict[str, str]]) -> int:
+    """Run every query once, in order; returns the number of iterations."""
+    iterations = 0
+    for q in queries:
+        stats = RunStats()
+        await runner.arun(q["query"], stats=stats)
+        iterations += stats.iterations
+    return iterations
+
+
+async def throughput(runner: AgentRunner, queries: List[Dict[str, str]], total: int, concurrency: int) -> float:
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with limit:
+            await runner.arun(queries[i % len(queries)]["query"])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return total / (time.perf_counter() - start)
+
+
+async def measure(queries: List[Dict[str, str]], cassette: Cassette, rounds: int, concurrency: int) -> Dict[str, Any]:
+    runner = make_runner(cassette)
+    # warm up: lazy imports, first-call caches
+    await replay_round(runner, queries)
+
+    per_iteration = []
+    for _ in range(rounds):
+        cassette.rewind()
+        start = time.perf_counter()
+        iterations = await replay_round(runner, queries)
+        elapsed = time.perf_counter() - start - cassette.lookup_seconds
+        per_iteration.append(elapsed / iterations * 1e6)
+
+    cassette.rewind()
+    llm = ReplayLLM(cassette)
+    runner = AgentRunner(llm=llm, tools=replay_tools(cassette), tracer=Tracer(), console=Console(QUIET))
+    iterations = await replay_round(runner, queries)
+    prompt_bytes = llm.prompt_bytes
+
+    tool_latency = {}
+    for name, tool in runner.tools.items():
+        if tool.latencies:
+            ms = [s * 1e3 for s in tool.latencies]
+            tool_latency[name] = {
+                "calls": len(ms),
+                "p50_ms": percentile(ms, 0.5),
+                "p90_ms": percentile(ms, 0.9),
+                "p99_ms": percentile(ms, 0.99),
+            }
+
+    total = len(queries) * max(1, rounds // 2)
+    recorded = make_runner(cassette, latency_scale=1.0)
+    return {
+        "queries": len(queries),
+        "iterations": iterations,
+        "llm_calls": llm.calls,
+        "rounds": rounds,
+        "overhead_us_per_iteration": statistics.median(per_iteration),
+        "overhead_us_min": min(per_iteration),
+        "overhead_us_mean": statistics.fmean(per_iteration),
+        "overhead_us_stddev": statistics.pstdev(per_iteration),
+        "prompt_bytes_mean": statistics.fmean(prompt_bytes),
+        "prompt_bytes_p50": percentile(prompt_bytes, 0.5),
+        "prompt_bytes_max": max(prompt_bytes),
+        "tool_latency": tool_latency,
+        "qps_sequential": await throughput(make_runner(cassette), queries, total, 1),
+        "qps_concurrent": await throughput(make_runner(cassette), queries, total, concurrency),
+        "qps_recorded_latency": await throughput(recorded, queries, len(queries), concurrency),
+        "concurrency": concurrency,
+    }
+
+
+def report(r: Dict[str, Any]):
+    print(f"{r['queries']} queries, {r['iterations']} iterations, {r['llm_calls']} LLM calls per round")
+    print(
+        f"framework overhead  {r['overhead_us_per_iteration']:>9,.0f} us/iteration (median of {r['rounds']}; "
+        f"min {r['overhead_us_min']:,.0f}, mean {r['overhead_us_mean']:,.0f} ± {r['overhead_us_stddev']:,.0f})"
+    )
+    print(
+        f"prompt size         {r['prompt_bytes_mean']:>9,.0f} bytes/LLM call (p50 {r['prompt_bytes_p50']:,}, "
+        f"max {r['prompt_bytes_max']:,})"
+    )
+    print(f"throughput          {r['qps_sequential']:>9,.0f} queries/s sequential, instant replies")
+    print(f"                    {r['qps_concurrent']:>9,.0f} queries/s, {r['concurrency']} at a time, instant replies")
+    print(
+        f"                    {r['qps_recorded_latency']:>9,.1f} queries/s, {r['concurrency']} at a time, "
+        "recorded latency"
+    )
+    print("tool latency (recorded)")
+    for name, t in sorted(r["tool_latency"].items()):
+        print(
+            f"  {name:<16} {t['calls']:>4} calls  p50 {t['p50_ms']:>8.2f} ms  p90 {t['p90_ms']:>8.2f} ms  "
+            f"p99 {t['p99_ms']:>8.2f} ms"
+        )
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """The gated metrics that regressed by more than `max_regression` against `baseline`."""
+    failures = []
+    for key in GATED:
+        before, after = baseline.get(key), results[key]
+        if before and after > before * (1 + max_regression):
+            failures.append(f"{key}: {before:,.1f} -> {after:,.1f} (+{after / before - 1:.0%})")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", default=os.path.join(WORKLOADS, "queries.jsonl"))
+    parser.add_argument("--cassette", default=os.path.join(WORKLOADS, "agent_loop.jsonl"))
+    parser.add_argument("--rounds", type=int, default=30)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--json", metavar="FILE", help="Save the results to FILE")
+    parser.add_argument("--compare", metavar="FILE", help="Results saved with --json to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(measure(load_queries(args.queries), Cassette(args.cassette), args.rounds, args.concurrency))
+    report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            failures = compare(results, json.load(f), args.max_regression)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        if failures:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Load test: hundreds of concurrent agent sessions on one event loop.
+
+Usage: `python -m benchmarks.bench_async_sessions [-n 300] [--latency 0.2]`
+
+Runs `AgentRunner.arun` for `n` conversations at once against a local fake
+LLM (`benchmarks/_fake_llm.py`) that answers each request after `latency`
+seconds. Every conversation costs two LLM calls and one `echo` tool call, so
+with real concurrency the wall time stays close to `2 * latency` instead of
+growing with `n`. The client may open one connection per session
+(`pool_size`); with fewer, sessions wait for a free connection.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+
+from agent import AgentConfig, AgentRunner
+from benchmarks._fake_llm import FakeLLMServer
+from llm import OpenAIGPT4o
+from tools.echo_tool import EchoTool
+
+
+async def _run_sessions(runner: AgentRunner, n: int):
+    start = time.perf_counter()
+    try:
+        answers = await asyncio.gather(*(runner.arun(f"query {i}") for i in range(n)))
+    finally:
+        await runner.llm.aclose()
+    return time.perf_counter() - start, answers
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--sessions", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.2, help="fake LLM latency per call (s)")
+    args = parser.parse_args(argv)
+
+    with FakeLLMServer(latency=args.latency) as server:
+        llm = OpenAIGPT4o(api_key="bench", base_url=server.base_url, pool_size=args.sessions)
+        runner = AgentRunner(llm=llm, tools={"echo": EchoTool()}, config=AgentConfig())
+        # the runner narrates every step on stdout/stderr; keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            elapsed, answers = asyncio.run(_run_sessions(runner, args.sessions))
+
+    ok = sum(1 for a in answers if a == "ok")
+    sequential = args.sessions * 2 * args.latency
+    print(f"sessions:           {args.sessions} ({ok} completed)")
+    print(f"LLM requests:       {server.requests}")
+    print(f"wall time:          {elapsed:.2f}s (sequential would be ~{sequential:.0f}s)")
+    print(f"throughput:         {args.sessions / elapsed:.1f} sessions/s")
+
+
+if __name__ == "__main__":
+    main()
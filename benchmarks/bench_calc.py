@@ -0,0 +1,62 @@
+"""`calc` throughput: compiled, whitelisted expressions vs. the old raw `eval`.
+
+Usage: `python -m benchmarks.bench_calc [--n 20000] [--elements 100000]`
+
+Rows, in expressions per second:
+
+- repeated: the same few expressions over and over, as an agent re-asking
+  does (the compiled-expression LRU hits);
+- distinct: every expression new (parse + validate + compile each time);
+- vectorized: one expression over `--elements` variable bindings, as one
+  `vars` call vs. one old-style `eval` per binding.
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+
+from tools.calc_tool import CalcTool
+
+EXPRESSIONS = ["2 + 3 * 4", "(17 - 5) / 3 ** 2", "1234 * 5678 // 7", "(1 + 2) * (3 + 4) - 5 % 3"]
+
+
+def old_eval(expr: str, variables=None):
+    return eval(expr, {"__builtins__": {}}, dict(variables or {}))
+
+
+def rate(fn, items) -> float:
+    start = time.perf_counter()
+    for item in items:
+        fn(item)
+    return len(items) / (time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=20000)
+    parser.add_argument("--elements", type=int, default=100_000)
+    args = parser.parse_args(argv)
+    tool = CalcTool()
+
+    repeated = [EXPRESSIONS[i % len(EXPRESSIONS)] for i in range(args.n)]
+    distinct = [f"{i} * 3 + {i % 97} ** 2 - {i} / 7" for i in range(args.n)]
+    print(f"{'':<12} {'calc':>14} {'old eval':>14}")
+    for label, items in (("repeated", repeated), ("distinct", distinct)):
+        new = rate(lambda e: tool.run({"expr": e}), items)
+        old = rate(old_eval, items)
+        print(f"{label:<12} {new:>12,.0f}/s {old:>12,.0f}/s")
+
+    xs = np.linspace(0, 10, args.elements).tolist()
+    expr = "sqrt(x) * 2 + x ** 2 / 3"
+    start = time.perf_counter()
+    tool.run({"expr": expr, "vars": {"x": xs}})
+    new = args.elements / (time.perf_counter() - start)
+    old_expr = "x ** 0.5 * 2 + x ** 2 / 3"  # the old path has no sqrt
+    old = rate(lambda x: old_eval(old_expr, {"x": x}), xs)
+    print(f"{'vectorized':<12} {new:>12,.0f}/s {old:>12,.0f}/s   ({args.elements} bindings)")
+
+
+if __name__ == "__main__":
+    main()
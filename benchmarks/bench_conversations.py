@@ -0,0 +1,99 @@
+"""Resume latency of long conversations (default 200 conversations x 1000 turns).
+
+Usage: `python -m benchmarks.bench_conversations [--conversations 200] [--turns 1000]`
+
+Turns are written round-robin by `--threads` threads, as concurrent
+sessions would. Then, on a freshly opened store, reported:
+
+- the first load of each shard (its record index is built from the log);
+- resume (`messages(id)`) of conversations not in the hot cache, and of hot ones;
+- the naive alternative: one JSON file per conversation with its whole
+  history, loaded and sliced to the same tail.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+
+from conversations import ConversationStore
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    pick = lambda p: ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]  # noqa: E731
+    return "p50 {:.3f}  p99 {:.3f}  max {:.3f} ms".format(1000 * pick(50), 1000 * pick(99), 1000 * ordered[-1])
+
+
+def turn(i: int):
+    return f"question {i}: what is the p99 latency of service-{i % 17} today?", f"answer {i}: " + "ok " * 60
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--conversations", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=1000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--shards", type=int, default=16)
+    args = parser.parse_args(argv)
+    ids = [f"conv-{n}" for n in range(args.conversations)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ConversationStore(os.path.join(tmp, "log"), shards=args.shards)
+
+        def write(mine):
+            for i in range(args.turns):
+                for cid in mine:
+                    store.append(cid, *turn(i))
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=write, args=(ids[t::args.threads],)) for t in range(args.threads)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        store.close()
+        total = args.conversations * args.turns
+        size = sum(os.path.getsize(os.path.join(d, f)) for d, _, fs in os.walk(os.path.join(tmp, "log")) for f in fs)
+        print(f"wrote {total} turns in {elapsed:.1f}s ({total / elapsed:,.0f}/s), {size / 2 ** 20:.0f} MiB of log")
+
+        store = ConversationStore(os.path.join(tmp, "log"), shards=args.shards, hot=args.conversations)
+        first, cold = [], []
+        seen_shards = set()
+        for cid in ids:
+            shard = store._shard(cid)
+            start = time.perf_counter()
+            store.messages(cid)
+            (cold if id(shard) in seen_shards else first).append(time.perf_counter() - start)
+            seen_shards.add(id(shard))
+        hot = []
+        for cid in ids:
+            start = time.perf_counter()
+            store.messages(cid)
+            hot.append(time.perf_counter() - start)
+        print(f"first load of a shard (index scan): {percentiles(first)}")
+        print(f"resume, not cached:                 {percentiles(cold)}")
+        print(f"resume, hot:                        {percentiles(hot)}")
+        store.close()
+
+        naive_dir = os.path.join(tmp, "json")
+        os.makedirs(naive_dir)
+        history = [dict(zip(("query", "answer"), turn(i))) for i in range(args.turns)]
+        for cid in ids[:20]:
+            with open(os.path.join(naive_dir, cid + ".json"), "w", encoding="utf-8") as f:
+                json.dump(history, f)
+        naive = []
+        for cid in ids[:20]:
+            start = time.perf_counter()
+            with open(os.path.join(naive_dir, cid + ".json"), encoding="utf-8") as f:
+                json.load(f)[-6:]
+            naive.append(time.perf_counter() - start)
+        print(f"whole-history JSON file (naive):    {percentiles(naive)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""`read_file` on a large generated log: mmap access vs. reading line by line.
+
+Usage: `python -m benchmarks.bench_file_tool [--size-mb 1024] [--path big.log]`
+
+Generates a log of `--size-mb` MiB (kept at `--path` if given, so later runs
+skip generation) where one line in 100000 is an ERROR. Each operation is
+timed through `FileTool.run`; "baseline" is what the same answer costs when
+the file is decoded line by line from the start, as the tool used to do.
+"""
+from __future__ import annotations
+
+import argparse
+import collections
+import os
+import re
+import tempfile
+import time
+
+from tools import file_tool
+from tools.file_tool import FileTool
+
+
+def generate(path: str, size_mb: int):
+    line = 0
+    target = size_mb << 20
+    with open(path, "w", encoding="utf-8") as f:
+        written = 0
+        while written < target:
+            chunk = []
+            for _ in range(10000):
+                line += 1
+                level = "ERROR" if line % 100000 == 0 else "INFO "
+                chunk.append(f"2024-05-01T12:00:00.{line % 1000:03d}Z {level} worker-{line % 7} request {line} done\n")
+            data = "".join(chunk)
+            f.write(data)
+            written += len(data)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def baseline_tail(path: str, n: int):
+    with open(path, "r", encoding="utf-8") as f:
+        return list(collections.deque(f, maxlen=n))
+
+
+def baseline_line(path: str, number: int):
+    with open(path, "r", encoding="utf-8") as f:
+        for i, line in enumerate(f, 1):
+            if i == number:
+                return line
+
+
+def baseline_grep(path: str, pattern: str, limit: int):
+    regex = re.compile(pattern)
+    found = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if regex.search(line):
+                found.append(line)
+                if len(found) >= limit:
+                    break
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=1024)
+    parser.add_argument("--path", help="generated file to (re)use")
+    parser.add_argument("--no-baseline", action="store_true", help="skip the line-by-line baseline")
+    args = parser.parse_args(argv)
+
+    tmp = None
+    path = args.path
+    if path is None:
+        tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(tmp.name, "big.log")
+    try:
+        if not os.path.exists(path):
+            elapsed, _ = timed(lambda: generate(path, args.size_mb))
+            print(f"generated {os.path.getsize(path) >> 20} MiB in {elapsed:.1f}s")
+        tool = FileTool()
+        total = tool.run({"path": path, "start_line": 1, "end_line": 1})["total_lines"]
+        file_tool._indexes.clear()
+        middle = total // 2
+
+        cases = [
+            ("head 20", {"lines": 20}, None),
+            ("tail 50", {"tail": 50}, lambda: baseline_tail(path, 50)),
+            ("byte range @ middle", {"offset": os.path.getsize(path) // 2, "length": 4096}, None),
+            ("line @ middle (builds index)", {"start_line": middle, "end_line": middle},
+             lambda: baseline_line(path, middle)),
+            ("line @ middle (cached index)", {"start_line": middle, "end_line": middle}, None),
+            ("grep ERROR, 10 matches", {"grep": "ERROR", "max_matches": 10}, lambda: baseline_grep(path, "ERROR", 10)),
+            ("grep, no match (full scan)", {"grep": "FATAL", "max_matches": 10},
+             lambda: baseline_grep(path, "FATAL", 10)),
+        ]
+        print(f"file: {os.path.getsize(path) >> 20} MiB, {total} lines")
+        print(f"{'operation':<30} {'read_file':>10} {'baseline':>10}")
+        for label, params, baseline in cases:
+            elapsed, result = timed(lambda: tool.run(dict(params, path=path)))
+            if "error" in result:
+                raise RuntimeError(result["error"])
+            if baseline is None or args.no_baseline:
+                base = "-"
+            else:
+                base = f"{timed(baseline)[0] * 1000:8.0f}ms"
+            print(f"{label:<30} {elapsed * 1000:8.1f}ms {base:>10}")
+    finally:
+        if tmp is not None:
+            tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Chart throughput: GraphTool's worker pool vs. pyplot in the calling thread.
+
+Usage: `python -m benchmarks.bench_graph [--charts 200] [--workers 4] [--threads 8]`
+
+Every chart is distinct (so nothing is served from the content-hash cache)
+except in the "repeated" row. Reported in charts per second:
+
+- the old way: `pyplot.subplots` + `savefig` in one thread (pyplot's global
+  state cannot be shared between threads);
+- GraphTool with `--workers` processes, driven by `--threads` threads as
+  concurrent agent tool calls would, for PNG and SVG;
+- GraphTool on charts it has already rendered.
+
+The pool rows exclude worker start-up (paid once per process, in the
+background of the first chart); it is printed separately.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from tools import graph_tool
+from tools.graph_tool import GraphTool
+
+
+def chart(i: int, formato: str = "png"):
+    tipo = ("barra", "linear", "pizza")[i % 3]
+    return {"tipo": tipo, "dados": [(i * 7 + k) % 13 + 1 for k in range(8)], "titulo": f"chart {i}", "formato": formato}
+
+
+def pyplot_rate(n: int, out_dir: str) -> float:
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    start = time.perf_counter()
+    for i in range(n):
+        spec = chart(i)
+        fig, ax = plt.subplots()
+        if spec["tipo"] == "pizza":
+            ax.pie(spec["dados"], labels=[str(k) for k in range(8)], autopct="%1.1f%%")
+        elif spec["tipo"] == "barra":
+            ax.bar([str(k) for k in range(8)], spec["dados"])
+        else:
+            ax.plot([str(k) for k in range(8)], spec["dados"], marker="o")
+        ax.set_title(spec["titulo"])
+        plt.tight_layout()
+        fig.savefig(os.path.join(out_dir, f"old_{i}.png"))
+        plt.close(fig)
+    return n / (time.perf_counter() - start)
+
+
+def tool_rate(tool: GraphTool, requests, threads: int) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as ex:
+        for result in ex.map(tool.run, requests):
+            if "error" in result:
+                raise RuntimeError(result["error"])
+    return len(requests) / (time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--charts", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tool = GraphTool(out_dir=tmp, workers=args.workers)
+        start = time.perf_counter()
+        pool = graph_tool._get_pool(args.workers)
+        list(pool.map(abs, range(args.workers)))
+        print(f"{args.workers} workers started and warmed up in {time.perf_counter() - start:.1f}s "
+              f"({os.cpu_count()} CPUs)")
+
+        n = args.charts
+        print(f"{'pyplot, 1 thread (old)':<34} {pyplot_rate(n, tmp):7.1f} charts/s")
+        png = [chart(i) for i in range(n)]
+        print(f"{'GraphTool pool, png':<34} {tool_rate(tool, png, args.threads):7.1f} charts/s")
+        svg = [chart(i, "svg") for i in range(n)]
+        print(f"{'GraphTool pool, svg':<34} {tool_rate(tool, svg, args.threads):7.1f} charts/s")
+        print(f"{'GraphTool, repeated (cache hits)':<34} {tool_rate(tool, png, args.threads):7.1f} charts/s")
+
+
+if __name__ == "__main__":
+    main()
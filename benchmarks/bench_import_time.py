@@ -0,0 +1,83 @@
+"""Cold-start benchmark: import time of the agent and its tools.
+
+Usage: `python -m benchmarks.bench_import_time [-n 5] [--top 10]`
+
+Each scenario runs in a fresh interpreter under `python -X importtime`, so
+nothing is cached in `sys.modules`. The report shows the median wall time
+per scenario, whether heavy modules (matplotlib, mcp, dotenv) were imported,
+and the slowest imports of the last run (cumulative microseconds as printed
+by `-X importtime`).
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ("matplotlib", "mcp", "dotenv")
+
+_PROBE = "import sys; print(' '.join(m for m in {heavy!r} if m in sys.modules), file=sys.stderr)"
+
+SCENARIOS: Dict[str, str] = {
+    "import agent": "import agent",
+    "catalog (get_tools + functions)": "import agent, tools; tools.get_tools().functions",
+    "run echo": "import agent, tools; tools.get_tools()['echo'].run({'text': 'hi'})",
+    "run calc": "import agent, tools; tools.get_tools()['calc'].run({'expr': '1+2'})",
+    "load graph": "import agent, tools; tools.get_tools()['graph'].load()",
+}
+
+
+def _parse_importtime(stderr: str) -> List[Tuple[int, str]]:
+    """(cumulative us, module) for every line printed by `-X importtime`."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        rows.append((int(cumulative), name.strip()))
+    return rows
+
+
+def run_scenario(code: str) -> Tuple[float, List[Tuple[int, str]], str]:
+    probe = _PROBE.format(heavy=HEAVY)
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"{code}\n{probe}"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"scenario failed: {code}\n{proc.stderr[-2000:]}")
+    # the probe prints the heavy modules that got imported as the last stderr line
+    last = proc.stderr.rstrip().splitlines()[-1:] or [""]
+    heavy = "" if last[0].startswith("import time:") else last[0]
+    return elapsed, _parse_importtime(proc.stderr), heavy
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--repeat", type=int, default=5, help="fresh interpreters per scenario")
+    parser.add_argument("--top", type=int, default=8, help="slowest imports to list per scenario")
+    args = parser.parse_args(argv)
+
+    baseline = statistics.median(run_scenario("pass")[0] for _ in range(args.repeat))
+    print(f"bare interpreter: {baseline * 1000:.0f} ms\n")
+    for label, code in SCENARIOS.items():
+        times = []
+        for _ in range(args.repeat):
+            elapsed, rows, heavy = run_scenario(code)
+            times.append(elapsed)
+        median = statistics.median(times)
+        print(f"{label}: {median * 1000:.0f} ms (+{(median - baseline) * 1000:.0f} ms), heavy: {heavy or 'none'}")
+        for cumulative, name in sorted(rows, reverse=True)[: args.top]:
+            print(f"    {cumulative / 1000:8.1f} ms  {name}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
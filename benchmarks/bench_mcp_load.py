@@ -0,0 +1,120 @@
+"""Load generator: `call_tool` at a fixed rate, reporting latency percentiles.
+
+Usage:
+    python -m benchmarks.bench_mcp_load [--qps 500] [--duration 10] [--server-workers 4]
+    python -m benchmarks.bench_mcp_load --url http://127.0.0.1:8000/mcp --qps 200
+
+Without `--url` a local `mcp/server.py` is started with the given serving
+options (`mcp/serving.py`). Calls are sent open-loop: call i is due at
+`i / qps` seconds whatever happened to earlier calls, and its latency is
+measured from that due time, so a server falling behind shows up in the
+percentiles instead of silently lowering the rate. Rejections (429) are
+counted separately and not retried.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+from typing import List
+
+from benchmarks._mcp_server import local_mcp_server
+from tools.mcp_pool import MCPSessionPool, _overloaded_retry_after
+from tools.mcp_proxy_tool import _normalize_result
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def drive(pools: List[MCPSessionPool], url: str, tool: str, args: dict, qps: float, duration: float):
+    loop = asyncio.get_running_loop()
+    latencies: List[float] = []
+    outcome = {"ok": 0, "rejected": 0, "error": 0}
+    total = int(qps * duration)
+
+    async def one(i: int, due: float):
+        try:
+            result = await pools[i % len(pools)].acall_tool(url, tool, args)
+            status = "error" if "error" in _normalize_result(result) or getattr(result, "isError", False) else "ok"
+        except Exception as e:
+            status = "rejected" if _overloaded_retry_after(e) is not None else "error"
+        outcome[status] += 1
+        if status == "ok":
+            latencies.append(loop.time() - due)
+
+    start = loop.time()
+    tasks = []
+    for i in range(total):
+        due = start + i / qps
+        delay = due - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.ensure_future(one(i, due)))
+    await asyncio.gather(*tasks)
+    return loop.time() - start, latencies, outcome
+
+
+def report(elapsed: float, latencies: List[float], outcome: dict, qps: float):
+    sent = sum(outcome.values())
+    print(f"target rate:   {qps:.0f} calls/s")
+    print(f"sent:          {sent} in {elapsed:.2f}s ({sent / elapsed:.0f} calls/s)")
+    print(f"ok / 429 / errors: {outcome['ok']} / {outcome['rejected']} / {outcome['error']}")
+    if latencies:
+        print(
+            "latency ms:    p50 {:.1f}  p90 {:.1f}  p99 {:.1f}  max {:.1f}".format(
+                *(1000 * _percentile(latencies, p) for p in (50, 90, 99, 100))
+            )
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="existing MCP server; by default a local one is started")
+    parser.add_argument("--qps", type=float, default=500)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--tool", default="weather_now")
+    parser.add_argument("--args", default='{"city": "Recife"}', help="tool arguments, JSON")
+    parser.add_argument("--sessions", type=int, default=4, help="client sessions the calls are spread over")
+    parser.add_argument("--server-workers", type=int, default=1)
+    parser.add_argument("--tool-concurrency", type=int, default=16)
+    parser.add_argument("--queue-timeout", type=float, default=0.5)
+    args = parser.parse_args(argv)
+
+    api_key = os.getenv("MCP_API_KEY", "bench-key")
+    tool_args = dict(json.loads(args.args), token=api_key)
+    # one background loop per session; no client-side cap, the server does the limiting
+    pools = [MCPSessionPool(max_concurrency=100_000, retries=0) for _ in range(args.sessions)]
+
+    def run(url: str):
+        # open the sessions first so the handshakes are not measured
+        for pool in pools:
+            pool.list_tools(url)
+        elapsed, latencies, outcome = asyncio.run(drive(pools, url, args.tool, tool_args, args.qps, args.duration))
+        report(elapsed, latencies, outcome, args.qps)
+
+    try:
+        if args.url:
+            run(args.url)
+        else:
+            env = {
+                "MCP_WORKERS": str(args.server_workers),
+                "MCP_TOOL_CONCURRENCY": str(args.tool_concurrency),
+                "MCP_QUEUE_TIMEOUT": str(args.queue_timeout),
+            }
+            extra = ["--workers", str(args.server_workers)]
+            with local_mcp_server(api_key=api_key, extra_args=extra, env=env) as url:
+                print(f"local server: {args.server_workers} worker(s), {args.tool_concurrency} calls/tool/worker")
+                run(url)
+    finally:
+        for pool in pools:
+            pool.close()
+
+
+if __name__ == "__main__":
+    main()
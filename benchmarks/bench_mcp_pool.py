@@ -0,0 +1,67 @@
+"""Calls per second: pooled MCP sessions vs. opening a session per call.
+
+Usage: `python -m benchmarks.bench_mcp_pool [-n 200] [-c 8]`
+
+Starts `mcp/server.py` locally and calls `weather_now` through
+`MCPProxyTool`, first with the old open-per-call behaviour and then through
+the shared `MCPSessionPool`.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from mcp import ClientSession
+from mcp.client.streamable_http import streamablehttp_client
+
+from benchmarks._mcp_server import local_mcp_server
+from tools.mcp_pool import MCPSessionPool
+from tools.mcp_proxy_tool import MCPProxyTool, _normalize_result
+
+
+def _open_per_call(url: str, tool_name: str, args: dict):
+    """The pre-pool `MCPProxyTool.run`: new loop, connection and handshake each call."""
+    async def _call():
+        async with streamablehttp_client(url) as (read, write, _):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                return _normalize_result(await session.call_tool(tool_name, args))
+    return asyncio.run(_call())
+
+
+def _measure(label: str, fn, n: int, concurrency: int):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        results = list(ex.map(lambda i: fn(), range(n)))
+    elapsed = time.perf_counter() - start
+    errors = sum(1 for r in results if "error" in r)
+    print(f"{label:<16} {n / elapsed:10.1f} calls/s  ({n} calls, {concurrency} threads, {errors} errors)")
+    return n / elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--calls", type=int, default=200)
+    parser.add_argument("-c", "--concurrency", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    api_key = "bench-key"
+    os.environ["MCP_API_KEY"] = api_key
+    with local_mcp_server(api_key=api_key) as url:
+        tool_args = {"city": "Recife", "token": api_key}
+        baseline = _measure(
+            "open-per-call", lambda: _open_per_call(url, "weather_now", tool_args), args.calls, args.concurrency
+        )
+        pool = MCPSessionPool(max_concurrency=args.concurrency)
+        proxy = MCPProxyTool(url, "weather_now", pool=pool)
+        proxy.run({"city": "Recife"})  # warm up the session
+        pooled = _measure("pooled", lambda: proxy.run({"city": "Recife"}), args.calls, args.concurrency)
+        pool.close()
+    print(f"speedup: {pooled / baseline:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Startup time with and without the MCP tool snapshot.
+
+Usage: `python -m benchmarks.bench_mcp_startup [-n 5]`
+
+Starts `mcp/server.py` locally and measures, in fresh interpreters, the time
+from process start until the agent's tool catalog (built-ins + MCP tools)
+is ready:
+
+- cold: no snapshot, so startup waits for `list_tools()` (this is also what
+  every startup cost before snapshots existed);
+- warm: tools come from the snapshot, the refresh runs in the background;
+- warm, server down: same, with an unreachable `MCP_URL`.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks._mcp_server import free_port, local_mcp_server
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_STARTUP = """
+import time
+started = time.perf_counter()
+import agent, tools
+catalog = tools.get_tools()
+agent.discover_and_register_mcp_tools({url!r}, catalog, snapshot_path={snapshot!r})
+catalog.functions
+print(time.perf_counter() - started, len(catalog))
+"""
+
+
+def _startup(url: str, snapshot) -> tuple:
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-c", _STARTUP.format(url=url, snapshot=snapshot)],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+    ready, n_tools = proc.stdout.split()
+    return wall, float(ready), int(n_tools)
+
+
+def _report(label: str, runs):
+    wall = statistics.median(r[0] for r in runs)
+    ready = statistics.median(r[1] for r in runs)
+    print(f"{label:<24} process {wall * 1000:6.0f} ms   catalog ready {ready * 1000:6.0f} ms   tools {runs[-1][2]}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp, local_mcp_server() as url:
+        snapshot = os.path.join(tmp, "mcp_snapshot.json")
+        _report("cold (no snapshot)", [_startup(url, None) for _ in range(args.repeat)])
+        _startup(url, snapshot)  # writes the snapshot
+        _report("warm snapshot", [_startup(url, snapshot) for _ in range(args.repeat)])
+
+        down_url = f"http://127.0.0.1:{free_port()}/mcp"
+        down_snapshot = os.path.join(tmp, "down.json")
+        with open(snapshot, encoding="utf-8") as f:
+            data = f.read().replace(url, down_url)
+        with open(down_snapshot, "w", encoding="utf-8") as f:
+            f.write(data)
+        _report("warm, server down", [_startup(down_url, down_snapshot) for _ in range(args.repeat)])
+
+
+if __name__ == "__main__":
+    main()
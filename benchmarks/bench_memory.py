@@ -0,0 +1,85 @@
+"""Vector memory search latency vs. store size, brute force and IVF.
+
+Usage: `python -m benchmarks.bench_memory [--sizes 10000,100000,300000] [--dim 384]`
+
+Vectors are drawn around `--clusters` random centers (real embeddings are
+clustered too; uniform random vectors would be a worst case for IVF) and
+written straight to a `VectorStore`. For each size, reported:
+
+- brute-force latency for one query and per query in a batch of 32;
+- IVF build time, latency at a few `n_probe` values and recall@10 against
+  the exact brute-force results;
+- the time to embed one query with `HashingEmbedder`.
+"""
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from memory import HashingEmbedder, VectorStore
+
+
+def timed(fn, repeat: int):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return 1000 * float(np.median(times)), result
+
+
+def recall(exact: np.ndarray, approx: np.ndarray) -> float:
+    return float(np.mean([len(set(e) & set(a)) / len(e) for e, a in zip(exact, approx)]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,100000,300000")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=32)
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(3)
+    centers = rng.standard_normal((args.clusters, args.dim)).astype(np.float32)
+    embedder = HashingEmbedder(args.dim)
+    ms, _ = timed(lambda: embedder.embed(["how do I fix a full postgres disk on the replica?"]), 100)
+    print(f"embed one query: {ms:.2f} ms")
+    print(f"{'vectors':>8} {'search':<18} {'1 query':>9} {'per query (x32)':>16} {'recall@10':>10}")
+
+    for size in (int(s) for s in args.sizes.split(",")):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = VectorStore(tmp, args.dim)
+            for lo in range(0, size, 50_000):
+                n = min(50_000, size - lo)
+                vectors = centers[rng.integers(0, args.clusters, n)] + 0.5 * rng.standard_normal((n, args.dim))
+                store.add([f"v{lo + i}" for i in range(n)], vectors.astype(np.float32))
+            stored = np.asarray(store._rows()[rng.integers(0, size, args.queries)])
+            queries = stored + 0.1 * rng.standard_normal(stored.shape).astype(np.float32)
+
+            one, _ = timed(lambda: store.search(queries[:1], args.k), 5)
+            batch, (_, exact) = timed(lambda: store.search(queries, args.k), 3)
+            print(f"{size:>8} {'brute force':<18} {one:>7.1f}ms {batch / len(queries):>14.2f}ms {'1.000':>10}")
+
+            start = time.perf_counter()
+            store.build_ivf()
+            built = time.perf_counter() - start
+            lists = len(store._ivf["centroids"])
+            for n_probe in (4, 16, 64):
+                one, _ = timed(lambda: store.search(queries[:1], args.k, n_probe=n_probe), 5)
+                batch, (_, approx) = timed(lambda: store.search(queries, args.k, n_probe=n_probe), 3)
+                label = f"ivf {n_probe}/{lists}"
+                print(
+                    f"{size:>8} {label:<18} {one:>7.1f}ms {batch / len(queries):>14.2f}ms "
+                    f"{recall(exact, approx):>10.3f}"
+                )
+            print(f"{size:>8} ivf build: {built:.1f}s")
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
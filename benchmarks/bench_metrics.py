@@ -0,0 +1,96 @@
+"""Cost of one metric update on the hot path (the budget is one microsecond).
+
+Usage: `python -m benchmarks.bench_metrics [--n 1000000] [--threads 4]`
+
+Prints nanoseconds per update, loop overhead subtracted, for the updates the
+call sites make (a labelled counter, a histogram observation, an in-flight
+gauge) and, for comparison, a counter behind a `threading.Lock`. The last
+rows repeat the counter with `--threads` threads updating at once. Exits
+with status 1 if an update takes a microsecond or more.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import threading
+import time
+
+import metrics
+
+
+class LockedCounter:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+
+def ns_per_call(fn, n: int) -> float:
+    def loop(f):
+        start = time.perf_counter()
+        for _ in range(n):
+            f()
+        return time.perf_counter() - start
+
+    base = min(loop(lambda: None) for _ in range(3))
+    return max(0.0, min(loop(fn) for _ in range(3)) - base) / n * 1e9
+
+
+def threaded_ns(fn, n: int, threads: int) -> float:
+    """Wall time per update with `threads` threads doing `n // threads` updates each."""
+    per_thread = n // threads
+
+    def work():
+        for _ in range(per_thread):
+            fn()
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return (time.perf_counter() - start) / (per_thread * threads) * 1e9
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=1_000_000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    registry = metrics.Registry()
+    counter = registry.counter("bench_total", "Bench", ["tool", "outcome"])
+    histogram = registry.histogram("bench_seconds", "Bench", ["tool"])
+    gauge = registry.gauge("bench_in_flight", "Bench")
+    child = counter.labels("calc", "ok")
+    locked = LockedCounter()
+
+    rows = [
+        ("counter.labels(...).inc()", lambda: counter.labels("calc", "ok").inc()),
+        ("counter child .inc()", child.inc),
+        ("histogram.labels(...).observe()", lambda: histogram.labels("calc").observe(0.0123)),
+        ("gauge.inc() + gauge.dec()", lambda: (gauge.inc(), gauge.dec())),
+        ("locked counter .inc()", locked.inc),
+    ]
+    worst = 0.0
+    print(f"{'update':<34} {'ns':>8}")
+    for label, fn in rows:
+        ns = ns_per_call(fn, args.n)
+        if not label.startswith("locked"):
+            # the gauge row is two updates
+            worst = max(worst, ns / 2 if label.startswith("gauge") else ns)
+        print(f"{label:<34} {ns:>8.0f}")
+    for label, fn in (("counter child .inc()", child.inc), ("locked counter .inc()", locked.inc)):
+        print(f"{label + f', {args.threads} threads':<34} {threaded_ns(fn, args.n, args.threads):>8.0f}  (wall)")
+    if child.value < args.n:
+        raise AssertionError("lost increments")
+    print(f"slowest update: {worst:.0f} ns ({'within' if worst < 1000 else 'over'} the 1 us budget)")
+    return 0 if worst < 1000 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""BM25 query latency on a generated corpus (default 100k documents).
+
+Usage: `python -m benchmarks.bench_search [--docs 100000] [--queries 500]`
+
+Documents are ~`--doc-words` words drawn from a Zipf-distributed vocabulary,
+so there are very common and very rare terms, like in real runbooks. The
+index is built in `--batches` adds (one segment each, as incremental syncs
+would), then merged. Reported:
+
+- build / merge time and index size;
+- open time: a fresh `SearchIndex` on the directory plus its first query;
+- query latency percentiles for 1-3 term queries, before and after the merge;
+- the old approach (substring scan over every document) for comparison.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from tools.search_index import SearchIndex
+
+
+def make_vocabulary(size: int, rng: np.random.Generator):
+    letters = np.array(list("abcdefghijklmnopqrstuvwxyz"))
+    return ["".join(rng.choice(letters, rng.integers(3, 10))) for _ in range(size)]
+
+
+def make_docs(n: int, words: int, vocabulary, rng: np.random.Generator):
+    ranks = np.minimum(rng.zipf(1.2, size=n * words), len(vocabulary)) - 1
+    for i in range(n):
+        chunk = ranks[i * words:(i + 1) * words]
+        yield f"doc{i}", f"Runbook {i}\n" + " ".join(vocabulary[r] for r in chunk)
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    pick = lambda p: ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]  # noqa: E731
+    return "p50 {:.2f}  p90 {:.2f}  p99 {:.2f}  max {:.2f} ms".format(
+        *(1000 * pick(p) for p in (50, 90, 99)), 1000 * ordered[-1]
+    )
+
+
+def run_queries(index: SearchIndex, queries, k: int):
+    times = []
+    for q in queries:
+        start = time.perf_counter()
+        index.search(q, k)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--doc-words", type=int, default=150)
+    parser.add_argument("--vocabulary", type=int, default=50_000)
+    parser.add_argument("--batches", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(7)
+    vocabulary = make_vocabulary(args.vocabulary, rng)
+    docs = list(make_docs(args.docs, args.doc_words, vocabulary, rng))
+    queries = [
+        " ".join(vocabulary[int(r)] for r in rng.integers(0, min(5000, len(vocabulary)), rng.integers(1, 4)))
+        for _ in range(args.queries)
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = SearchIndex(tmp, max_segments=args.batches)
+        start = time.perf_counter()
+        per_batch = -(-len(docs) // args.batches)
+        for i in range(0, len(docs), per_batch):
+            index.add(docs[i:i + per_batch])
+        build = time.perf_counter() - start
+        size = sum(os.path.getsize(os.path.join(tmp, n)) for n in os.listdir(tmp))
+        print(f"{len(docs)} docs, {args.batches} segments: built in {build:.1f}s, {size / 2 ** 20:.0f} MiB on disk")
+        print(f"queries ({args.batches} segments):   {percentiles(run_queries(index, queries, args.k))}")
+
+        start = time.perf_counter()
+        index.merge()
+        print(f"merge: {time.perf_counter() - start:.1f}s")
+        index.close()
+
+        start = time.perf_counter()
+        index = SearchIndex(tmp)
+        opened = time.perf_counter() - start
+        start = time.perf_counter()
+        index.search(queries[0], args.k)
+        print(f"open: {opened * 1000:.1f} ms, first query {1000 * (time.perf_counter() - start):.1f} ms")
+        print(f"queries (1 segment):    {percentiles(run_queries(index, queries, args.k))}")
+        index.close()
+
+    texts = [text for _, text in docs]
+    scan = []
+    for q in queries[:10]:
+        start = time.perf_counter()
+        words = q.lower().split()
+        [t for t in texts if any(w in t.lower() for w in words)]
+        scan.append(time.perf_counter() - start)
+    print(f"substring scan (old):   median {statistics.median(scan) * 1000:.0f} ms per query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Query latency with and without speculative first tool calls.
+
+Usage: `python -m benchmarks.bench_speculation [--queries 80] [--llm-latency 0.2] [--tool-latency 0.15]`
+
+Runs a mix of queries through the real client against `FakeLLMServer`
+(`--llm-latency` per completion), 8 at a time, with read-only tools that take
+`--tool-latency`:
+
+- "weather in <city>" and "what time is it": predicted by the rules;
+- "open incidents for <team>": learned online by the n-gram model after a
+  few runs;
+- "weather for tomorrow in <city>": the rules guess `weather_now`, the plan
+  asks for `weather_forecast` (a miss);
+- arithmetic: `calc` is never run speculatively.
+
+Prints mean and p90 query latency without and with a `Speculator`, its hit
+rate and the tool latency it hid behind the first LLM call.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+
+from agent import AgentRunner
+from benchmarks._fake_llm import FakeLLMServer
+from llm import OpenAIGPT4o
+from speculation import Speculator
+from tracing import QUIET, Console, Tracer
+
+CITIES = ["Paris", "Recife", "Lisboa", "Tokyo", "Nairobi"]
+TEAMS = ["payments", "search", "api", "mobile"]
+
+
+class SlowTool:
+    def __init__(self, name: str, latency: float, speculative: bool):
+        self.name = name
+        self.description = f"Read-only {name}"
+        self.latency = latency
+        self.speculative = speculative
+
+    async def arun(self, input):
+        await asyncio.sleep(self.latency)
+        return {"tool": self.name, "input": input}
+
+
+def first_action(query: str):
+    if query.startswith("weather for tomorrow in "):
+        return {"tool": "weather_forecast", "input": {"city": query.rsplit(" ", 1)[1], "days": 1}}
+    if query.startswith("weather in "):
+        return {"tool": "weather_now", "input": {"city": query[len("weather in "):]}}
+    if query == "what time is it?":
+        return {"tool": "current_time", "input": {}}
+    if query.startswith("open incidents for "):
+        return {"tool": "search", "input": {"q": "open incidents"}}
+    return {"tool": "calc", "input": {"expr": query.split(" is ", 1)[1]}}
+
+
+def responder(payload):
+    messages = payload["messages"]
+    if messages[-1]["content"].startswith("Observation:"):
+        plan = {"final": True, "thought": "done", "action": None, "answer": "ok"}
+    else:
+        plan = {"final": False, "thought": "look it up", "action": first_action(messages[-1]["content"])}
+    return {"role": "assistant", "content": json.dumps(plan)}
+
+
+def workload(n: int, seed: int = 7):
+    rnd = random.Random(seed)
+    makers = [
+        lambda: f"weather in {rnd.choice(CITIES)}",
+        lambda: "what time is it?",
+        lambda: f"open incidents for {rnd.choice(TEAMS)}",
+        lambda: f"weather for tomorrow in {rnd.choice(CITIES)}",
+        lambda: f"what is {rnd.randint(1, 99)} + {rnd.randint(1, 99)}",
+    ]
+    return [rnd.choice(makers)() for _ in range(n)]
+
+
+async def run_all(runner: AgentRunner, queries, concurrency: int = 8):
+    limit = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(query):
+        async with limit:
+            start = time.perf_counter()
+            await runner.arun(query)
+            latencies.append(time.perf_counter() - start)
+
+    # one at a time until the model has seen a few runs, as in a live session
+    for query in queries[:concurrency]:
+        await one(query)
+    await asyncio.gather(*(one(q) for q in queries[concurrency:]))
+    return latencies
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=80)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--tool-latency", type=float, default=0.15)
+    args = parser.parse_args(argv)
+    queries = workload(args.queries)
+    tools = {
+        "weather_now": SlowTool("weather_now", args.tool_latency, False),
+        "weather_forecast": SlowTool("weather_forecast", args.tool_latency, False),
+        "current_time": SlowTool("current_time", args.tool_latency, True),
+        "search": SlowTool("search", args.tool_latency, True),
+        "calc": SlowTool("calc", args.tool_latency, False),
+    }
+    print(
+        f"{len(queries)} queries, LLM {args.llm_latency * 1e3:.0f} ms per plan, "
+        f"tools {args.tool_latency * 1e3:.0f} ms"
+    )
+    with FakeLLMServer(latency=args.llm_latency, responder=responder) as server:
+        for label, speculator in (("no speculation", None), ("speculation", Speculator())):
+            runner = AgentRunner(
+                llm=OpenAIGPT4o(api_key="bench", base_url=server.base_url, pool_size=8), tools=tools,
+                speculator=speculator, tracer=Tracer(), console=Console(QUIET),
+            )
+            latencies = sorted(asyncio.run(run_all(runner, queries)))
+            line = (
+                f"{label:<15} mean {statistics.fmean(latencies) * 1e3:6.0f} ms  "
+                f"p90 {latencies[int(0.9 * len(latencies))] * 1e3:6.0f} ms"
+            )
+            if speculator is not None:
+                s = speculator.stats
+                line += (
+                    f"  | {s.hits} hits, {s.misses} misses ({s.hit_rate:.0%}), "
+                    f"{s.saved_seconds:.1f}s saved ({s.saved_seconds / len(queries) * 1e3:.0f} ms/query)"
+                )
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
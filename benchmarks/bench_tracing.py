@@ -0,0 +1,114 @@
+"""Cost of the agent's observability on the hot path.
+
+Usage: `python -m benchmarks.bench_tracing [--runs 300] [--plan-kb 64]`
+
+Runs the agent loop against a scripted in-process LLM (two iterations, two
+echo tool calls each run) so nothing but the agent's own work is timed, and
+prints microseconds per run for:
+
+- quiet / info / debug console, tracing off;
+- tracing into the in-memory ring buffer and into a JSONL file;
+- the old print-based output (every plan dumped raw to stderr).
+
+`--plan-kb` pads each plan's thought, as a long LLM output would be. Console
+output goes to a temporary file (a terminal is slower still); each row is
+the best of three rounds.
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import os
+import tempfile
+import time
+
+from agent import AgentRunner
+from tracing import DEBUG, INFO, QUIET, Console, JSONLExporter, RingBufferExporter, Tracer
+
+
+class EchoTool:
+    name = "echo"
+    description = "Return the input"
+
+    async def arun(self, input):
+        return {"echo": input}
+
+    def run(self, input):
+        return {"echo": input}
+
+
+class ScriptedLLM:
+    def __init__(self, thought: str):
+        self.plans = [
+            json.dumps({"final": False, "thought": thought, "answer": None, "actions": [
+                {"tool": "echo", "input": {"i": 1}}, {"tool": "echo", "input": {"i": 2}},
+            ]}),
+            json.dumps({"final": True, "thought": thought, "action": None, "answer": "ok"}),
+        ]
+        self.calls = 0
+
+    async def achat(self, messages, functions=None, **kwargs):
+        self.calls += 1
+        return {"content": self.plans[(self.calls - 1) % 2]}
+
+
+def per_run_us(runner: AgentRunner, runs: int) -> float:
+    async def loop():
+        for _ in range(runs):
+            await runner.arun("go")
+
+    import asyncio
+
+    start = time.perf_counter()
+    asyncio.run(loop())
+    return (time.perf_counter() - start) / runs * 1e6
+
+
+def old_print_runner(llm, tools) -> AgentRunner:
+    """The previous behaviour: prints, and the raw plan dumped to stderr on every iteration."""
+    import sys
+
+    class PrintConsole(Console):
+        def info(self, message, *args):
+            print(message % args if args else message)
+
+        def debug(self, message, *args):
+            print(message % args if args else message, file=sys.stderr)
+
+    return AgentRunner(llm=llm, tools=tools, tracer=Tracer(), console=PrintConsole())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=300)
+    parser.add_argument("--plan-kb", type=int, default=64)
+    args = parser.parse_args(argv)
+    llm = ScriptedLLM("x" * (args.plan_kb * 1024))
+    tools = {"echo": EchoTool()}
+
+    with tempfile.TemporaryDirectory() as d, open(os.path.join(d, "console.txt"), "w") as sink:
+        jsonl = JSONLExporter(os.path.join(d, "trace.jsonl"))
+        rows = [
+            ("quiet, tracing off", AgentRunner(llm=llm, tools=tools, tracer=Tracer(), console=Console(QUIET))),
+            ("info, tracing off", AgentRunner(llm=llm, tools=tools, tracer=Tracer(), console=Console(INFO))),
+            ("debug, tracing off", AgentRunner(llm=llm, tools=tools, tracer=Tracer(), console=Console(DEBUG))),
+            ("quiet, ring buffer", AgentRunner(
+                llm=llm, tools=tools, tracer=Tracer([RingBufferExporter()]), console=Console(QUIET)
+            )),
+            ("quiet, JSONL file", AgentRunner(llm=llm, tools=tools, tracer=Tracer([jsonl]), console=Console(QUIET))),
+            ("old prints (raw plan dump)", old_print_runner(llm, tools)),
+        ]
+        print(f"{args.runs} runs, 2 iterations and 2 tool calls each, {args.plan_kb} KiB plans")
+        for label, runner in rows:
+            # the console's rate limit would hide the cost of formatting; lift it here
+            runner.console.rate = None
+            with contextlib.redirect_stdout(sink), contextlib.redirect_stderr(sink):
+                per_run_us(runner, 5)
+                us = min(per_run_us(runner, args.runs) for _ in range(3))
+            print(f"{label:<28} {us:>10,.0f} us/run")
+        jsonl.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Regenerate the sample workloads replayed by `benchmarks.bench_agent_loop`.
+
+Usage: `python -m benchmarks.record_workloads [--llm-latency 0.3]` (from the repository root)
+
+Writes `benchmarks/workloads/queries.jsonl` (batch format, `{"id", "query"}`)
+and `benchmarks/workloads/agent_loop.jsonl`, a cassette recorded through the
+real `OpenAIGPT4o` client and the real built-in tools. The LLM is
+`FakeLLMServer` playing the plans below, so the file can be regenerated
+offline whenever the prompt or the tools change (the replay would miss
+otherwise); `--llm-latency` is the completion latency it records. A
+cassette of real traffic comes from `python cli.py --record FILE`.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+from typing import Any, Dict, List
+
+from agent import AgentRunner
+from benchmarks._fake_llm import FakeLLMServer
+from llm import OpenAIGPT4o
+from replay import Cassette, RecordingLLM, record_tools
+from tools import get_tools
+from tracing import QUIET, Console, Tracer
+
+HERE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "workloads")
+QUERIES = os.path.join(HERE, "queries.jsonl")
+CASSETTE = os.path.join(HERE, "agent_loop.jsonl")
+
+
+def plan(thought: str, *actions: Dict[str, Any], answer: str = None) -> Dict[str, Any]:
+    if answer is not None:
+        return {"final": True, "thought": thought, "action": None, "answer": answer}
+    return {"final": False, "thought": thought, "actions": list(actions), "answer": None}
+
+
+def act(tool: str, **input: Any) -> Dict[str, Any]:
+    return {"tool": tool, "input": input}
+
+
+# id -> (query, the plan returned at each iteration)
+WORKLOADS: Dict[str, tuple] = {
+    "calc": ("Quanto é 17 * 23 + 4?", [
+        plan("Vou calcular a expressão.", act("calc", expr="17 * 23 + 4")),
+        plan("Tenho o resultado.", answer="17 × 23 + 4 = 395."),
+    ]),
+    "echo": ("Repita exatamente: olá, mundo", [
+        plan("Uso a ferramenta echo.", act("echo", text="olá, mundo")),
+        plan("Pronto.", answer="olá, mundo"),
+    ]),
+    "time": ("Que horas são em São Paulo e em Tóquio?", [
+        plan(
+            "Consulto os dois fusos em paralelo.",
+            act("current_time", timezone="America/Sao_Paulo", format="HH:mm"),
+            act("current_time", timezone="Asia/Tokyo", format="HH:mm"),
+        ),
+        plan("Tenho os dois horários.", answer="Veja os horários consultados acima para São Paulo e Tóquio."),
+    ]),
+    "hypotenuse": ("Calcule as hipotenusas dos triângulos 3-4, 5-12 e 8-15 e some-as.", [
+        plan(
+            "Calculo as três hipotenusas de uma vez.",
+            act("calc", expr="sqrt(a**2 + b**2)", vars={"a": [3, 5, 8], "b": [4, 12, 15]}),
+        ),
+        plan("Agora a soma.", act("calc", expr="5 + 13 + 17")),
+        plan("Tenho tudo.", answer="As hipotenusas são 5, 13 e 17; a soma é 35."),
+    ]),
+    "dependencies": ("Quais dependências este projeto declara?", [
+        plan("Leio o requirements.txt.", act("read_file", path="requirements.txt")),
+        plan("Listo as dependências.", answer="As dependências estão listadas no requirements.txt."),
+    ]),
+    "readme": ("Resuma a seção de benchmarks do README.", [
+        plan("Procuro a seção no README.", act("read_file", path="README.md", grep="bench", max_matches=40)),
+        plan("Leio o começo do README também.", act("read_file", path="README.md", lines=120)),
+        plan("Resumo.", answer="O README descreve um benchmark por componente, executado com python -m benchmarks.*."),
+    ]),
+    "error": ("Quanto é 1 dividido por 0?", [
+        plan("Tento calcular.", act("calc", expr="1 / 0")),
+        plan("A divisão não é definida.", answer="Divisão por zero não é definida."),
+    ]),
+    "power": ("Quanto é 2 elevado a 10, e repita o resultado.", [
+        plan("Calculo e repito em paralelo.", act("calc", expr="2 ** 10"), act("echo", text="1024")),
+        plan("Pronto.", answer="2¹⁰ = 1024."),
+    ]),
+}
+
+
+def responder(payload: Dict[str, Any]) -> Dict[str, Any]:
+    messages: List[Dict[str, Any]] = payload.get("messages") or []
+    user = [str(m.get("content", "")) for m in messages if m.get("role") == "user"]
+    query = next(c for c in user if not c.startswith("Observation:"))
+    step = sum(1 for c in user if c.startswith("Observation:"))
+    plans = next(plans for q, plans in WORKLOADS.values() if q == query)
+    return {"role": "assistant", "content": json.dumps(plans[min(step, len(plans) - 1)], ensure_ascii=False)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Seconds the fake LLM takes per completion")
+    args = parser.parse_args(argv)
+    os.makedirs(HERE, exist_ok=True)
+    with open(QUERIES, "w", encoding="utf-8") as f:
+        for qid, (query, _) in WORKLOADS.items():
+            f.write(json.dumps({"id": qid, "query": query}, ensure_ascii=False) + "\n")
+    if os.path.exists(CASSETTE):
+        os.remove(CASSETTE)
+    cassette = Cassette(CASSETTE)
+    with FakeLLMServer(latency=args.llm_latency, responder=responder) as server:
+        llm = RecordingLLM(OpenAIGPT4o(api_key="recording", base_url=server.base_url), cassette)
+        runner = AgentRunner(
+            llm=llm, tools=record_tools(get_tools(), cassette), tracer=Tracer(), console=Console(QUIET)
+        )
+        for qid, (query, _) in WORKLOADS.items():
+            print(f"{qid}: {runner.run(query)}")
+    cassette.close()
+    print(f"{len(cassette)} calls recorded to {os.path.relpath(CASSETTE)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,13 +5,22 @@ Usage: run `python -m me.cli` and follow prompts.
 from __future__ import annotations
 
 import argparse
+import atexit
+import contextlib
 import sys
 import os
+import uuid
 from dotenv import load_dotenv
 
 from llm import OpenAIGPT4o
+from llm_cache import CachedLLM
 from agent import AgentRunner, AgentConfig, discover_and_register_mcp_tools
+from conversations import ConversationStore
+from batch import Checkpoint, RateLimitedLLM, RateLimiter, read_queries, run_batch
 from tools import get_tools
+from tools.memory_tool import MemorySearchTool
+from tools.cache import MemoryCacheBackend, SQLiteCacheBackend, ToolResultCache
+from tracing import DEBUG, INFO, QUIET, Console, JSONLExporter, OTLPExporter, Tracer, set_console, set_tracer
 
 load_dotenv()
 
@@ -20,11 +29,104 @@ def main(argv=None):
     parser = argparse.ArgumentParser()
     parser.add_argument("-k", "--api-key", help="OpenAI API key (optional, otherwise uses env OPENAI_API_KEY)")
     parser.add_argument("-p", "--prompt-file", help="Path to prompt file (overrides default me/prompt.txt)")
+    parser.add_argument("-s", "--stream", action="store_true", help="Stream plans and print the answer as it arrives")
+    parser.add_argument("--cache-db", help="SQLite file for the tool result cache (default: in memory)")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the tool result cache")
+    parser.add_argument("--llm-cache", action="store_true", help="Cache LLM responses to repeated prompts")
+    parser.add_argument("--llm-cache-db", help="SQLite file for the LLM response cache (implies --llm-cache)")
+    parser.add_argument(
+        "--llm-similarity", type=float, metavar="THRESHOLD",
+        help="Also serve first prompts whose query is this similar (0-1) to a cached one",
+    )
+    parser.add_argument(
+        "--memory", metavar="DIR", default=os.getenv("AGENT_MEMORY"),
+        help="Remember answered queries in this directory and let the agent recall them (default: $AGENT_MEMORY)",
+    )
+    parser.add_argument("-c", "--conversation", help="Resume this conversation id (default: start a new one)")
+    parser.add_argument(
+        "--conversations-dir", default=".conversations",
+        help="Directory of the conversation log ('' to keep nothing between queries)",
+    )
+    parser.add_argument("--batch", metavar="FILE", help="Run the queries of a JSONL file ('-' for stdin) and exit")
+    parser.add_argument("-o", "--output", default="-", help="Batch results file, JSONL (default: stdout)")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent queries in batch mode")
+    parser.add_argument(
+        "--checkpoint",
+        help="File of completed query ids, skipped when the batch is re-run (default: OUTPUT.done)",
+    )
+    parser.add_argument("--llm-rate", type=float, help="Max LLM requests per second, across all workers")
+    parser.add_argument("--llm-burst", type=int, default=1, help="Requests allowed at once above --llm-rate")
+    parser.add_argument(
+        "--mcp-snapshot", default=".mcp_snapshot.json",
+        help="File caching the MCP tool list between runs ('' to always discover at startup)",
+    )
+    parser.add_argument(
+        "--mcp-refresh", type=float, default=300.0, help="Seconds between background MCP tool refreshes (0: never)"
+    )
+    parser.add_argument("--trace", metavar="FILE", help="Append a JSONL span per run, iteration, LLM and tool call")
+    parser.add_argument(
+        "--otlp-endpoint", metavar="URL",
+        help="Send spans to an OpenTelemetry collector (OTLP/HTTP JSON), e.g. http://localhost:4318/v1/traces",
+    )
+    parser.add_argument(
+        "--metrics-port", type=int, help="Serve Prometheus metrics on http://127.0.0.1:PORT/metrics while running"
+    )
+    parser.add_argument(
+        "--speculate", action="store_true",
+        help="Start the likely first tool call (read-only tools only) while the LLM plans it",
+    )
+    parser.add_argument(
+        "--speculation-model", metavar="FILE",
+        help="First-action model learned from earlier runs, updated on exit (implies --speculate)",
+    )
+    transcript = parser.add_mutually_exclusive_group()
+    transcript.add_argument(
+        "--record", metavar="CASSETTE", help="Append every LLM and tool call to this JSONL file (see replay.py)"
+    )
+    transcript.add_argument(
+        "--replay", metavar="CASSETTE", help="Answer LLM and tool calls from a recorded file; no API key needed"
+    )
+    verbosity = parser.add_mutually_exclusive_group()
+    verbosity.add_argument("-v", "--verbose", action="store_true", help="Also print the raw LLM output")
+    verbosity.add_argument("-q", "--quiet", action="store_true", help="Print only the answers")
     args = parser.parse_args(argv)
+    set_console(Console(DEBUG if args.verbose else QUIET if args.quiet else INFO))
+    exporters = []
+    if args.trace:
+        exporters.append(JSONLExporter(args.trace))
+    if args.otlp_endpoint:
+        exporters.append(OTLPExporter(args.otlp_endpoint))
+    if exporters:
+        tracer = Tracer(exporters)
+        set_tracer(tracer)
+        atexit.register(tracer.close)
+    if args.metrics_port:
+        import metrics
+
+        metrics.serve(args.metrics_port)
     # load tools
     tools = get_tools()
     MCP_URL = os.getenv("MCP_URL")
-    discover_and_register_mcp_tools(MCP_URL, tools)
+    if MCP_URL and not args.replay:
+        # starts from the snapshot when there is one; the server is queried in the background
+        discover_and_register_mcp_tools(
+            MCP_URL, tools, snapshot_path=args.mcp_snapshot or None, refresh_interval=args.mcp_refresh or None
+        )
+
+    memory = None
+    if args.memory:
+        from memory import AgentMemory
+
+        memory = AgentMemory(args.memory)
+        tools["memory_search"] = MemorySearchTool(memory)
+
+    cassette = None
+    if args.record or args.replay:
+        from replay import Cassette, record_tools, replay_tools
+
+        cassette = Cassette(args.record or args.replay)
+        atexit.register(cassette.close)
+        tools = record_tools(tools, cassette) if args.record else replay_tools(cassette)
 
     # load prompt file if provided or present in package
     prompt_text = None
@@ -44,7 +146,7 @@ def main(argv=None):
                 prompt_text = f.read().strip()
 
     # create agent config (split system vs user prompt if marker present)
-    agent_config = AgentConfig()
+    agent_config = AgentConfig(stream=args.stream)
     if prompt_text:
         marker = "---USER_PROMPT---"
         if marker in prompt_text:
@@ -54,16 +156,67 @@ def main(argv=None):
         else:
             agent_config.system_prompt = prompt_text
 
-    try:
-        llm = OpenAIGPT4o(api_key=args.api_key)
-    except Exception as e:
-        print(f"Error initializing OpenAI LLM: {e}")
-        print("If you want to test offline, re-run with --mock")
-        sys.exit(1)
+    if args.replay:
+        from replay import ReplayLLM
+
+        llm = ReplayLLM(cassette)
+    else:
+        try:
+            # one connection per batch worker, so workers don't queue for a connection
+            llm = OpenAIGPT4o(api_key=args.api_key, pool_size=max(4, args.workers))
+        except Exception as e:
+            print(f"Error initializing OpenAI LLM: {e}")
+            print("If you want to test offline, re-run with --replay CASSETTE")
+            sys.exit(1)
+    if args.record:
+        from replay import RecordingLLM
+
+        # the client itself: LLM cache hits and rate-limit waits are not part of the transcript
+        llm = RecordingLLM(llm, cassette)
+    if args.llm_rate:
+        llm = RateLimitedLLM(llm, RateLimiter(args.llm_rate, burst=args.llm_burst))
+    if args.llm_cache or args.llm_cache_db or args.llm_similarity is not None:
+        backend = SQLiteCacheBackend(args.llm_cache_db, table="llm_cache") if args.llm_cache_db else None
+        # outside the rate limiter: cache hits never reach the API, so they take no token
+        llm = CachedLLM(llm, backend=backend, similarity_threshold=args.llm_similarity)
+
+    streamed = []
+
+    def print_token(token):
+        if not streamed:
+            print("\n=== Final Answer ===")
+        streamed.append(token)
+        print(token, end="", flush=True)
+
+    cache = None
+    if not args.no_cache:
+        cache = ToolResultCache(SQLiteCacheBackend(args.cache_db) if args.cache_db else MemoryCacheBackend())
+
+    speculator = None
+    if args.speculate or args.speculation_model:
+        from speculation import NGramModel, Speculator
 
-    runner = AgentRunner(llm=llm, tools=tools, config=agent_config)
+        speculator = Speculator(NGramModel.load(args.speculation_model) if args.speculation_model else None)
+        if args.speculation_model:
+            atexit.register(speculator.model.save, args.speculation_model)
+
+    if args.batch:
+        with AgentRunner(
+            llm=llm, tools=tools, config=agent_config, cache=cache, memory=memory, speculator=speculator
+        ) as runner:
+            status = batch_main(runner, args)
+        sys.exit(status)
+
+    conversations = ConversationStore(args.conversations_dir) if args.conversations_dir else None
+    conversation_id = (args.conversation or uuid.uuid4().hex[:12]) if conversations is not None else None
+    runner = AgentRunner(
+        llm=llm, tools=tools, config=agent_config, on_answer_token=print_token, cache=cache, memory=memory,
+        conversations=conversations, speculator=speculator,
+    )
 
     print("Standalone Agent CLI — type your query and press Enter. Ctrl+C to quit.")
+    if conversation_id is not None:
+        print(f"Conversation: {conversation_id} (resume with --conversation {conversation_id})")
     if prompt_text:
         print("\n[Loaded agent system prompt]\n")
         print(prompt_text)
@@ -73,14 +226,66 @@ def main(argv=None):
             query = input("Query> ")
             if not query.strip():
                 continue
-            result = runner.run(query)
+            streamed.clear()
+            result = runner.run(query, conversation_id=conversation_id)
+            if streamed:
+                print("\n====================\n")
+                continue
             print("\n=== Final Answer ===")
             print(result)
             print("====================\n")
     except KeyboardInterrupt:
+        if conversations is not None:
+            conversations.close()
+        if cache is not None:
+            stats = cache.stats()
+            print(f"\nTool cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%})")
+        if isinstance(llm, CachedLLM):
+            s = llm.cache_stats
+            print(
+                f"LLM cache: {s.exact_hits} exact + {s.similar_hits} similar hits, {s.misses} misses, "
+                f"{s.bypassed} bypassed ({s.hit_rate:.0%}), ~{s.latency_saved:.1f}s saved"
+            )
+        if speculator is not None:
+            print(speculation_summary(speculator))
         print("\nExiting")
+        # a tool interrupted by Ctrl+C may still be running; don't wait for it
+        runner.close(wait=False)
         sys.exit(0)
 
 
+def speculation_summary(speculator) -> str:
+    s = speculator.stats
+    return (
+        f"Speculation: {s.hits} hits, {s.misses} misses ({s.hit_rate:.0%}), "
+        f"{s.saved_seconds:.1f}s of tool latency saved"
+    )
+
+
+def batch_main(runner, args) -> int:
+    checkpoint_path = args.checkpoint or (f"{args.output}.done" if args.output != "-" else None)
+    checkpoint = Checkpoint(checkpoint_path) if checkpoint_path else None
+    source = sys.stdin if args.batch == "-" else open(args.batch, "r", encoding="utf-8")
+    out = sys.stdout if args.output == "-" else open(args.output, "a", encoding="utf-8")
+    try:
+        # the agent's progress output goes to stderr so stdout only carries results
+        with contextlib.redirect_stdout(sys.stderr):
+            counts = run_batch(runner, read_queries(source), out, workers=args.workers, checkpoint=checkpoint)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+        if checkpoint is not None:
+            checkpoint.close()
+    print(
+        f"Batch done: {counts['ok']} ok, {counts['error']} failed, {counts['skipped']} already done",
+        file=sys.stderr,
+    )
+    if runner.speculator is not None:
+        print(speculation_summary(runner.speculator), file=sys.stderr)
+    return 1 if counts["error"] else 0
+
+
 if __name__ == "__main__":
     main()
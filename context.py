@@ -0,0 +1,135 @@
+"""Token-budgeted prompt context for the agent loop.
+
+`AgentContext` replaces the "re-serialize the whole scratchpad every
+iteration" approach: each step (the plan's action(s) and the observation)
+is serialized once into its own pair of messages when it happens, with a
+cached token estimate. When the prompt grows past `budget` tokens the
+oldest steps are compacted with one of the strategies below; the most
+recent step is always kept verbatim so the LLM sees its latest observation.
+
+- "truncate": shorten old observations to `compact_observation_tokens`;
+- "summarize": collapse an old step into one line (tool, input, preview);
+- "drop": remove old steps, leaving a note with how many were omitted.
+
+Observations bigger than `max_observation_tokens` are cut (head and tail
+kept) as soon as they are added, whatever the strategy.
+"""
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+STRATEGIES = ("truncate", "summarize", "drop")
+# per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap local token estimate (~4 characters per token for GPT-style BPE)."""
+    return (len(text) + 3) // 4
+
+
+def _dumps(value: Any) -> str:
+    try:
+        return json.dumps(value, ensure_ascii=False)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def _clip(text: str, max_chars: int) -> str:
+    """Keep the head and tail of `text` within roughly `max_chars` characters."""
+    if len(text) <= max_chars:
+        return text
+    head = max_chars * 2 // 3
+    tail = max_chars - head
+    return f"{text[:head]} …[truncated {len(text) - max_chars} chars]… {text[len(text) - tail:]}"
+
+
+@dataclass
+class _Step:
+    actions: List[Dict[str, Any]]
+    messages: List[Dict[str, str]]
+    observation_text: str
+    tokens: int = 0
+    compacted: bool = False
+
+
+@dataclass
+class AgentContext:
+    budget: int = 12000
+    max_observation_tokens: int = 1500
+    compact_observation_tokens: int = 200
+    strategy: str = "summarize"
+    tokenizer: Callable[[str], int] = estimate_tokens
+    head: List[Dict[str, str]] = field(default_factory=list)
+    steps: List[_Step] = field(default_factory=list)
+    dropped: int = 0
+    # estimated prompt tokens of every `messages()` call, in order
+    prompt_tokens: List[int] = field(default_factory=list)
+
+    def __post_init__(self):
+        if self.strategy not in STRATEGIES:
+            raise ValueError(f"Unknown compaction strategy '{self.strategy}', use one of {STRATEGIES}")
+
+    def _count(self, messages: List[Dict[str, str]]) -> int:
+        return sum(self.tokenizer(m.get("content") or "") + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+    def set_head(self, messages: List[Dict[str, str]]):
+        """System prompt, tool list and user query: sent first on every iteration."""
+        self.head = list(messages)
+
+    def add_step(self, thought: Optional[str], actions: List[Dict[str, Any]], observations: List[Any]):
+        """Append the actions of one iteration and what they observed."""
+        if len(actions) == 1:
+            plan = {"thought": thought, "action": actions[0]}
+            observation: Any = observations[0]
+        else:
+            plan = {"thought": thought, "actions": actions}
+            observation = [
+                {"tool": a.get("tool"), "input": a.get("input"), "observation": o}
+                for a, o in zip(actions, observations)
+            ]
+        observation_text = _clip(_dumps(observation), self.max_observation_tokens * 4)
+        messages = [
+            {"role": "assistant", "content": _dumps(plan)},
+            {"role": "user", "content": f"Observation: {observation_text}"},
+        ]
+        self.steps.append(_Step(actions, messages, observation_text, self._count(messages)))
+
+    @property
+    def step_tokens(self) -> int:
+        return sum(step.tokens for step in self.steps)
+
+    def _compact(self, step: _Step):
+        if self.strategy == "truncate":
+            text = _clip(step.observation_text, self.compact_observation_tokens * 4)
+            step.messages = [step.messages[0], {"role": "user", "content": f"Observation: {text}"}]
+        else:
+            calls = ", ".join(f"{a.get('tool')}({_clip(_dumps(a.get('input')), 80)})" for a in step.actions)
+            preview = _clip(step.observation_text, self.compact_observation_tokens * 4)
+            step.messages = [{"role": "assistant", "content": f"Earlier step: {calls} -> {preview}"}]
+        step.tokens = self._count(step.messages)
+        step.compacted = True
+
+    def _fit(self, head_tokens: int):
+        while head_tokens + self.step_tokens > self.budget and len(self.steps) > 1:
+            older = self.steps[:-1]
+            pending = next((s for s in older if not s.compacted), None)
+            if pending is not None and self.strategy != "drop":
+                self._compact(pending)
+                continue
+            self.steps.pop(0)
+            self.dropped += 1
+
+    def messages(self) -> List[Dict[str, str]]:
+        """The prompt for the next LLM call, compacted to fit the budget."""
+        head_tokens = self._count(self.head)
+        self._fit(head_tokens)
+        prompt = list(self.head)
+        if self.dropped:
+            prompt.append({"role": "assistant", "content": f"[{self.dropped} earlier step(s) omitted]"})
+        for step in self.steps:
+            prompt.extend(step.messages)
+        self.prompt_tokens.append(self._count(prompt))
+        return prompt
@@ -0,0 +1,263 @@
+"""Conversation persistence: an append-only, segmented log of turns.
+
+`AgentRunner.run(query, conversation_id=...)` loads the conversation from a
+`ConversationStore`, puts it in the prompt and appends the new turn.
+
+Layout: conversations are hashed to one of `shards` shards, each a
+directory of log segments (`000001.log`, ...) rolled at `segment_bytes`.
+A shard has its own lock, its own record index and its own LRU of hot
+conversations, so conversations in different shards are written and loaded
+in parallel and there is no store-wide lock.
+
+A record is a header (crc32, kind, id length, payload length), the
+conversation id and a JSON payload. The index (record locations per
+conversation) is rebuilt the first time a shard is used by reading only
+the headers and ids; a torn record at the end of a segment (crash during
+an append) is cut off.
+
+Turns are never rewritten. Once a conversation has more than `max_tail`
+turns past its latest summary, all but the last `tail` of them are folded
+into a new summary record (by `summarizer`, a local one-line-per-turn digest
+by default), so loading a conversation reads one summary and at most
+`max_tail` turns, however long it is.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# crc32 of id + payload, kind, id length, payload length
+_HEADER = struct.Struct("<IBHI")
+TURN, SUMMARY = 0, 1
+_SEGMENT_RE = re.compile(r"^(\d{6})\.log$")
+
+
+def _clip(text: str, max_chars: int) -> str:
+    text = " ".join(str(text).split())
+    return text if len(text) <= max_chars else text[:max_chars] + "…"
+
+
+def summarize_turns(previous: str, turns: List[Dict[str, Any]], max_chars: int = 2000) -> str:
+    """Fold `turns` into the `previous` summary: one line per turn, oldest lines dropped past `max_chars`."""
+    lines = previous.splitlines() if previous else []
+    lines += [f"- Q: {_clip(t.get('query', ''), 150)} -> A: {_clip(t.get('answer', ''), 250)}" for t in turns]
+    while len(lines) > 1 and sum(len(line) + 1 for line in lines) > max_chars:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+@dataclass
+class Conversation:
+    id: str
+    # digest of the first `summarized` turns
+    summary: str = ""
+    summarized: int = 0
+    # turns after the summary (at most the store's `max_tail`), oldest first
+    turns: List[Dict[str, Any]] = field(default_factory=list)
+
+    @property
+    def total(self) -> int:
+        return self.summarized + len(self.turns)
+
+    def messages(self, tail: int) -> List[Dict[str, str]]:
+        """The summary and the last `tail` turns as chat messages."""
+        messages = []
+        older = self.turns[:-tail] if tail else self.turns
+        summary = summarize_turns(self.summary, older) if older else self.summary
+        if summary:
+            messages.append({"role": "system", "content": f"Earlier in this conversation:\n{summary}"})
+        for turn in self.turns[-tail:] if tail else []:
+            messages.append({"role": "user", "content": turn.get("query", "")})
+            messages.append({"role": "assistant", "content": turn.get("answer", "")})
+        return messages
+
+
+@dataclass
+class _Index:
+    # (segment, offset, length) of every turn, and of the latest summary
+    turns: List[Tuple[int, int, int]] = field(default_factory=list)
+    summary: Optional[Tuple[int, int, int]] = None
+
+
+class _Shard:
+    def __init__(self, path: str, segment_bytes: int, hot: int, sync: bool):
+        self.path = path
+        self.segment_bytes = segment_bytes
+        self.hot = hot
+        self.sync = sync
+        self.lock = threading.Lock()
+        self.index: Optional[Dict[str, _Index]] = None
+        self.cache: "OrderedDict[str, Conversation]" = OrderedDict()
+        self._readers: Dict[int, int] = {}
+        self._segment = 0
+        self._fd: Optional[int] = None
+        self._size = 0
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.path, f"{segment:06d}.log")
+
+    def _reader(self, segment: int) -> int:
+        fd = self._readers.get(segment)
+        if fd is None:
+            fd = self._readers[segment] = os.open(self._segment_path(segment), os.O_RDONLY)
+        return fd
+
+    def load_index(self):
+        """Scan the record headers of every segment (once, under `lock`)."""
+        if self.index is not None:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        index: Dict[str, _Index] = {}
+        segments = sorted(int(m.group(1)) for m in map(_SEGMENT_RE.match, os.listdir(self.path)) if m)
+        for segment in segments:
+            self._scan(segment, index)
+        self.index = index
+        self._segment = segments[-1] if segments else 1
+        self._fd = os.open(self._segment_path(self._segment), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self._size = os.fstat(self._fd).st_size
+
+    def _scan(self, segment: int, index: Dict[str, _Index]):
+        path = self._segment_path(segment)
+        size = os.path.getsize(path)
+        valid = 0
+        with open(path, "rb") as f:
+            while valid + _HEADER.size <= size:
+                crc, kind, id_len, payload_len = _HEADER.unpack(f.read(_HEADER.size))
+                end = valid + _HEADER.size + id_len + payload_len
+                if end > size:
+                    break
+                raw_id = f.read(id_len)
+                if end == size:
+                    # only the last record can be torn; check it fully
+                    if zlib.crc32(raw_id + f.read(payload_len)) != crc:
+                        break
+                else:
+                    f.seek(payload_len, os.SEEK_CUR)
+                entry = index.setdefault(raw_id.decode("utf-8"), _Index())
+                location = (segment, valid, end - valid)
+                if kind == SUMMARY:
+                    entry.summary = location
+                else:
+                    entry.turns.append(location)
+                valid = end
+        if valid < size:
+            with open(path, "r+b") as f:
+                f.truncate(valid)
+
+    def read(self, location: Tuple[int, int, int]) -> Dict[str, Any]:
+        segment, offset, length = location
+        raw = os.pread(self._reader(segment), length, offset)
+        _, _, id_len, _ = _HEADER.unpack_from(raw)
+        return json.loads(raw[_HEADER.size + id_len:])
+
+    def append(self, conversation_id: str, kind: int, payload: Dict[str, Any]) -> Tuple[int, int, int]:
+        if self._size >= self.segment_bytes:
+            os.close(self._fd)
+            self._segment += 1
+            self._fd = os.open(self._segment_path(self._segment), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            self._size = 0
+        raw_id = conversation_id.encode("utf-8")
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        record = _HEADER.pack(zlib.crc32(raw_id + body), kind, len(raw_id), len(body)) + raw_id + body
+        os.write(self._fd, record)
+        if self.sync:
+            os.fsync(self._fd)
+        location = (self._segment, self._size, len(record))
+        self._size += len(record)
+        return location
+
+    def close(self):
+        for fd in list(self._readers.values()) + ([self._fd] if self._fd is not None else []):
+            os.close(fd)
+        self._readers.clear()
+        self._fd = None
+
+
+class ConversationStore:
+    def __init__(
+        self,
+        path: str,
+        shards: int = 16,
+        tail: int = 6,
+        max_tail: int = 12,
+        hot: int = 256,
+        segment_bytes: int = 16 << 20,
+        summarizer: Callable[[str, List[Dict[str, Any]]], str] = summarize_turns,
+        sync: bool = False,
+    ):
+        if not 0 < tail <= max_tail:
+            raise ValueError("need 0 < tail <= max_tail")
+        self.path = path
+        self.tail = tail
+        self.max_tail = max_tail
+        self.summarizer = summarizer
+        # `hot` conversations are cached in total, split across the shards
+        per_shard = max(1, -(-hot // shards))
+        self._shards = [
+            _Shard(os.path.join(path, f"shard-{i:02d}"), segment_bytes, per_shard, sync) for i in range(shards)
+        ]
+
+    def _shard(self, conversation_id: str) -> _Shard:
+        return self._shards[zlib.crc32(conversation_id.encode("utf-8")) % len(self._shards)]
+
+    def _get(self, shard: _Shard, conversation_id: str) -> Conversation:
+        """The conversation, from the hot cache or the log; call with `shard.lock` held."""
+        conversation = shard.cache.get(conversation_id)
+        if conversation is not None:
+            shard.cache.move_to_end(conversation_id)
+            return conversation
+        shard.load_index()
+        conversation = Conversation(conversation_id)
+        entry = shard.index.get(conversation_id)
+        if entry is not None:
+            if entry.summary is not None:
+                record = shard.read(entry.summary)
+                conversation.summary, conversation.summarized = record["summary"], record["turns"]
+            conversation.turns = [shard.read(loc) for loc in entry.turns[conversation.summarized:]]
+        shard.cache[conversation_id] = conversation
+        while len(shard.cache) > shard.hot:
+            shard.cache.popitem(last=False)
+        return conversation
+
+    def load(self, conversation_id: str) -> Conversation:
+        """A snapshot of the conversation (empty if it does not exist yet)."""
+        shard = self._shard(conversation_id)
+        with shard.lock:
+            c = self._get(shard, conversation_id)
+            return Conversation(c.id, c.summary, c.summarized, list(c.turns))
+
+    def messages(self, conversation_id: str) -> List[Dict[str, str]]:
+        return self.load(conversation_id).messages(self.tail)
+
+    def append(self, conversation_id: str, query: str, answer: str, **extra: Any) -> int:
+        """Log one turn; returns the number of turns of the conversation."""
+        turn = dict(extra, query=query, answer=answer)
+        shard = self._shard(conversation_id)
+        with shard.lock:
+            conversation = self._get(shard, conversation_id)
+            shard.index.setdefault(conversation_id, _Index()).turns.append(shard.append(conversation_id, TURN, turn))
+            conversation.turns.append(turn)
+            if len(conversation.turns) > self.max_tail:
+                self._summarize(shard, conversation)
+            return conversation.total
+
+    def _summarize(self, shard: _Shard, conversation: Conversation):
+        older = conversation.turns[:-self.tail]
+        summary = self.summarizer(conversation.summary, older)
+        covered = conversation.summarized + len(older)
+        location = shard.append(conversation.id, SUMMARY, {"summary": summary, "turns": covered})
+        shard.index[conversation.id].summary = location
+        conversation.summary, conversation.summarized = summary, covered
+        conversation.turns = conversation.turns[-self.tail:]
+
+    def close(self):
+        for shard in self._shards:
+            with shard.lock:
+                shard.close()
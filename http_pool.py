@@ -0,0 +1,304 @@
+"""Keep-alive HTTP connection pools used by the LLM client.
+
+`urllib.request.urlopen` opens (and TLS-handshakes) a new connection per
+request. These pools keep idle connections to one origin around and reuse
+them, with separate connect and read timeouts:
+
+- `HTTPConnectionPool` is thread-safe and built on `http.client`;
+- `AsyncHTTPConnectionPool` speaks HTTP/1.1 over asyncio streams and belongs
+  to the event loop it was first used on. At most `maxsize` connections are
+  open at once; further requests wait for one to be returned.
+
+Only the standard library is used.
+"""
+from __future__ import annotations
+
+import asyncio
+import http.client
+import queue
+import ssl
+import threading
+import urllib.parse
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+# raised when a server silently dropped an idle keep-alive connection
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    ConnectionResetError,
+    BrokenPipeError,
+    asyncio.IncompleteReadError,
+)
+
+
+@dataclass
+class HTTPResponse:
+    status: int
+    headers: Dict[str, str] = field(default_factory=dict)  # lower-cased names
+    body: bytes = b""
+
+
+def _split_origin(base_url: str) -> Tuple[str, str, int, str]:
+    parts = urllib.parse.urlsplit(base_url)
+    https = parts.scheme == "https"
+    return parts.scheme, parts.hostname, parts.port or (443 if https else 80), parts.netloc
+
+
+class HTTPConnectionPool:
+    def __init__(
+        self,
+        base_url: str,
+        maxsize: int = 4,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 60.0,
+    ):
+        self.scheme, self.host, self.port, self.netloc = _split_origin(base_url)
+        self.maxsize = maxsize
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.connections_opened = 0
+        self._idle: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue(maxsize)
+        self._lock = threading.Lock()
+        self._ssl = ssl.create_default_context() if self.scheme == "https" else None
+
+    def _connect(self) -> http.client.HTTPConnection:
+        if self._ssl is not None:
+            conn = http.client.HTTPSConnection(
+                self.host, self.port, timeout=self.connect_timeout, context=self._ssl
+            )
+        else:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.connect_timeout)
+        conn.connect()
+        conn.sock.settimeout(self.read_timeout)
+        with self._lock:
+            self.connections_opened += 1
+        return conn
+
+    def _get(self) -> Tuple[http.client.HTTPConnection, bool]:
+        try:
+            return self._idle.get_nowait(), True
+        except queue.Empty:
+            return self._connect(), False
+
+    def _put(self, conn: http.client.HTTPConnection):
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def request(self, method: str, path: str, body: bytes = b"", headers: Optional[Dict[str, str]] = None
+                ) -> HTTPResponse:
+        conn, reused = self._get()
+        while True:
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+                resp = conn.getresponse()
+                data = resp.read()
+                break
+            except STALE_CONNECTION_ERRORS:
+                conn.close()
+                if not reused:
+                    raise
+                # the idle connection was closed by the server; retry on a fresh one
+                conn, reused = self._connect(), False
+            except BaseException:
+                conn.close()
+                raise
+        if resp.will_close:
+            conn.close()
+        else:
+            self._put(conn)
+        return HTTPResponse(resp.status, {k.lower(): v for k, v in resp.getheaders()}, data)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class AsyncHTTPConnectionPool:
+    def __init__(
+        self,
+        base_url: str,
+        maxsize: int = 4,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 60.0,
+    ):
+        self.scheme, self.host, self.port, self.netloc = _split_origin(base_url)
+        self.maxsize = maxsize
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.connections_opened = 0
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        # one per checked-out connection; released when it is returned to the pool or closed
+        self._slots = asyncio.Semaphore(maxsize)
+        self._ssl = ssl.create_default_context() if self.scheme == "https" else None
+
+    async def _connect(self):
+        conn = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=self._ssl), self.connect_timeout
+        )
+        self.connections_opened += 1
+        return conn
+
+    async def _get(self):
+        while self._idle:
+            reader, writer = self._idle.pop()
+            if not reader.at_eof() and not writer.is_closing():
+                return (reader, writer), True
+            writer.close()
+        return await self._connect(), False
+
+    def _checkin(self, conn, reuse: bool):
+        """Return a checked-out connection: kept for reuse if `reuse`, closed otherwise."""
+        if reuse and len(self._idle) < self.maxsize:
+            self._idle.append(conn)
+        else:
+            conn[1].close()
+        self._slots.release()
+
+    @staticmethod
+    async def _read_head(reader: asyncio.StreamReader) -> Tuple[int, Dict[str, str], bool]:
+        status_line = await reader.readline()
+        if not status_line:
+            raise http.client.RemoteDisconnected("connection closed before response")
+        version, status = status_line.split()[:2]
+        headers: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            k, _, v = line.decode("latin-1").partition(":")
+            headers[k.strip().lower()] = v.strip()
+        keep_alive = headers.get("connection", "").lower() != "close" and version != b"HTTP/1.0"
+        if "content-length" not in headers and headers.get("transfer-encoding", "").lower() != "chunked":
+            keep_alive = False  # body ends when the server closes the connection
+        return int(status), headers, keep_alive
+
+    @staticmethod
+    async def _iter_body(reader: asyncio.StreamReader, headers: Dict[str, str]) -> AsyncIterator[bytes]:
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    return
+                yield await reader.readexactly(size)
+                await reader.readline()
+        elif "content-length" in headers:
+            remaining = int(headers["content-length"])
+            while remaining > 0:
+                chunk = await reader.read(min(remaining, 65536))
+                if not chunk:
+                    raise asyncio.IncompleteReadError(b"", remaining)
+                remaining -= len(chunk)
+                yield chunk
+        else:
+            while True:
+                chunk = await reader.read(65536)
+                if not chunk:
+                    return
+                yield chunk
+
+    async def _read_response(self, reader: asyncio.StreamReader) -> Tuple[HTTPResponse, bool]:
+        status, headers, keep_alive = await self._read_head(reader)
+        body = b"".join([chunk async for chunk in self._iter_body(reader, headers)])
+        return HTTPResponse(status, headers, body), keep_alive
+
+    def _encode_request(self, method: str, path: str, body: bytes, headers: Optional[Dict[str, str]]) -> bytes:
+        head = [f"{method} {path} HTTP/1.1", f"Host: {self.netloc}", f"Content-Length: {len(body)}"]
+        head += [f"{k}: {v}" for k, v in (headers or {}).items()]
+        return ("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body
+
+    async def _send(self, raw: bytes, read):
+        """Write `raw` on a pooled connection and run `read(reader)`, retrying once if it was stale.
+
+        The connection stays checked out until it is handed to `_checkin`.
+        """
+        await self._slots.acquire()
+        try:
+            (reader, writer), reused = await self._get()
+            while True:
+                try:
+                    writer.write(raw)
+                    await writer.drain()
+                    return (reader, writer), await asyncio.wait_for(read(reader), self.read_timeout)
+                except STALE_CONNECTION_ERRORS:
+                    writer.close()
+                    if not reused:
+                        raise
+                    (reader, writer), reused = await self._connect(), False
+                except BaseException:
+                    writer.close()
+                    raise
+        except BaseException:
+            self._slots.release()
+            raise
+
+    async def request(self, method: str, path: str, body: bytes = b"", headers: Optional[Dict[str, str]] = None
+                      ) -> HTTPResponse:
+        raw = self._encode_request(method, path, body, headers)
+        (reader, writer), (resp, keep_alive) = await self._send(raw, self._read_response)
+        self._checkin((reader, writer), keep_alive)
+        return resp
+
+    async def stream(self, method: str, path: str, body: bytes = b"", headers: Optional[Dict[str, str]] = None
+                     ) -> "AsyncStreamingResponse":
+        """Send a request and return as soon as the response head arrives."""
+        raw = self._encode_request(method, path, body, headers)
+        (reader, writer), (status, resp_headers, keep_alive) = await self._send(raw, self._read_head)
+        return AsyncStreamingResponse(self, reader, writer, status, resp_headers, keep_alive)
+
+    async def aclose(self):
+        idle, self._idle = self._idle, []
+        for _, writer in idle:
+            writer.close()
+        for _, writer in idle:
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+
+class AsyncStreamingResponse:
+    """A response whose body is consumed incrementally with `iter_chunks()`.
+
+    The connection goes back to the pool once the body has been fully read;
+    abandoning the iteration closes it instead.
+    """
+
+    def __init__(self, pool: AsyncHTTPConnectionPool, reader, writer, status: int, headers: Dict[str, str],
+                 keep_alive: bool):
+        self.status = status
+        self.headers = headers
+        self._pool = pool
+        self._reader = reader
+        self._writer = writer
+        self._keep_alive = keep_alive
+        self._complete = False
+        self._released = False
+
+    async def iter_chunks(self) -> AsyncIterator[bytes]:
+        body = self._pool._iter_body(self._reader, self.headers)
+        try:
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(body.__anext__(), self._pool.read_timeout)
+                except StopAsyncIteration:
+                    break
+                yield chunk
+            self._complete = True
+        finally:
+            self.release()
+
+    async def read(self) -> bytes:
+        return b"".join([chunk async for chunk in self.iter_chunks()])
+
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        self._pool._checkin((self._reader, self._writer), self._complete and self._keep_alive)
@@ -2,7 +2,15 @@
 
 This module implements only the minimal interface used by the standalone
 agent: `chat(prompt_messages)` where `prompt_messages` is a list of dicts
-with `role` and `content`.
+with `role` and `content`, and its awaitable twin `achat(...)` which talks
+HTTP over asyncio streams so many conversations can share one event loop.
+
+Both reuse keep-alive connections (`http_pool.py`) and retry 429/5xx and
+connection errors with jittered exponential backoff, honouring `Retry-After`.
+`OpenAIGPT4o.stats` counts calls, retries, failures and latency, also
+exported as `llm_*` metrics (see metrics.py); the current tracing span (see
+tracing.py) gets the retries, HTTP status and the token usage the API reports.
+`astream(...)` requests a server-sent-events stream and yields deltas.
 
 It expects `OPENAI_API_KEY` in the environment. No external packages
 are required besides Python standard library.
@@ -11,64 +19,360 @@ from __future__ import annotations
 
 import os
 import json
-import urllib.request
-import urllib.error
-from typing import List, Dict
+import time
+import random
+import asyncio
+import threading
+import weakref
+import urllib.parse
+from collections import deque
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Deque, List, Dict, Optional
+
+import metrics
+from http_pool import AsyncHTTPConnectionPool, HTTPConnectionPool, HTTPResponse
+from streaming import SSEDecoder
+from tracing import current_span
+
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+_REQUESTS = metrics.counter("llm_requests_total", "LLM API calls by final HTTP status (0: no response)", ["status"])
+_SECONDS = metrics.histogram("llm_request_seconds", "LLM API call latency, retries included")
+_RETRIES = metrics.counter("llm_retries_total", "LLM API retries")
+_IN_FLIGHT = metrics.gauge("llm_requests_in_flight", "LLM API calls in progress")
+
+
+@dataclass
+class LLMStats:
+    """Latency and retry counters for `OpenAIGPT4o` calls."""
+
+    calls: int = 0
+    retries: int = 0
+    failures: int = 0
+    total_latency: float = 0.0
+    # one {"latency", "retries", "status"} dict per call, most recent last
+    recent: Deque[dict] = field(default_factory=lambda: deque(maxlen=1000))
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, latency: float, retries: int, status: Optional[int]):
+        with self._lock:
+            self.calls += 1
+            self.retries += retries
+            self.total_latency += latency
+            if status is None or status >= 400:
+                self.failures += 1
+            self.recent.append({"latency": latency, "retries": retries, "status": status})
+        _REQUESTS.labels(status or 0).inc()
+        _SECONDS.observe(latency)
+        if retries:
+            _RETRIES.inc(retries)
+
+    @property
+    def avg_latency(self) -> float:
+        return self.total_latency / self.calls if self.calls else 0.0
+
+
+def _retry_after(resp: Optional[HTTPResponse]) -> Optional[float]:
+    """Seconds requested by a `Retry-After` header (delta-seconds or HTTP date)."""
+    value = resp.headers.get("retry-after") if resp is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        from email.utils import parsedate_to_datetime
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except Exception:
+            return None
+
+
+def _stream_deltas(event: str) -> List[dict]:
+    """The `astream` deltas in one SSE `data` payload."""
+    if event == "[DONE]":
+        return []
+    try:
+        delta = json.loads(event)["choices"][0].get("delta") or {}
+    except (ValueError, KeyError, IndexError):
+        return []
+    deltas = [{"content": delta["content"]}] if delta.get("content") else []
+    calls = delta.get("tool_calls") or (
+        [{"index": 0, "function": delta["function_call"]}] if delta.get("function_call") else []
+    )
+    for tc in calls:
+        fn = tc.get("function") or {}
+        deltas.append({"tool_call": {
+            "index": tc.get("index", 0), "name": fn.get("name"), "arguments": fn.get("arguments") or ""
+        }})
+    return deltas
+
+
+_dotenv_loaded = False
+
+
+def _load_dotenv():
+    """Load `.env` once, when the first client is created rather than at import."""
+    global _dotenv_loaded
+    if _dotenv_loaded:
+        return
+    _dotenv_loaded = True
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        return
+    load_dotenv()
 
 
 class OpenAIGPT4o:
-    def __init__(self, api_key: str | None = None, model: str = "gpt-4o"):
-        self.api_key = os.getenv("OPENAI_API_KEY")
+    def __init__(
+        self,
+        api_key: str | None = None,
+        model: str = "gpt-4o",
+        base_url: str | None = None,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 60.0,
+        pool_size: int = 4,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 20.0,
+    ):
+        _load_dotenv()
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         if not self.api_key:
             raise RuntimeError("OPENAI_API_KEY environment variable is required")
         self.model = model
+        self.temperature = 0.2
+        self.max_tokens = 800
+        self.base_url = (base_url or os.getenv("OPENAI_BASE_URL") or DEFAULT_BASE_URL).rstrip("/")
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.stats = LLMStats()
+        self._pool = HTTPConnectionPool(self.base_url, pool_size, connect_timeout, read_timeout)
+        # asyncio connections belong to one event loop, so keep one pool per loop
+        self._apools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncHTTPConnectionPool]" = (
+            weakref.WeakKeyDictionary()
+        )
 
-    def chat(
+    @property
+    def url(self) -> str:
+        return f"{self.base_url}/chat/completions"
+
+    @property
+    def path(self) -> str:
+        return urllib.parse.urlsplit(self.url).path
+
+    def _backoff(self, attempt: int, resp: Optional[HTTPResponse]) -> float:
+        """Delay before retry `attempt` (1-based): `Retry-After` if sent, else full-jitter backoff.
+
+        Both are capped at `backoff_max`, so a `Retry-After: 3600` cannot stall a run for an hour.
+        """
+        retry_after = _retry_after(resp)
+        if retry_after is not None:
+            return min(self.backoff_max, retry_after)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+
+    def _apool(self) -> AsyncHTTPConnectionPool:
+        loop = asyncio.get_running_loop()
+        pool = self._apools.get(loop)
+        if pool is None:
+            pool = AsyncHTTPConnectionPool(self.base_url, self.pool_size, self.connect_timeout, self.read_timeout)
+            self._apools[loop] = pool
+        return pool
+
+    def _check(self, resp: HTTPResponse) -> dict:
+        if resp.status >= 400:
+            # include response body for easier debugging
+            raise RuntimeError(f"OpenAI API error ({resp.status}): {resp.body.decode('utf-8', 'replace')}")
+        return self._parse_response(resp.body.decode("utf-8"))
+
+    def _headers(self) -> Dict[str, str]:
+        return {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}",
+        }
+
+    def _payload(
         self,
         messages: List[Dict[str, str]],
-        functions: list | None = None,
-        function_call: str | dict | None = None
+        functions: list | None,
+        function_call: str | dict | None,
+        parallel: bool,
     ) -> dict:
-        """Call OpenAI chat completions and return a normalized dict.
-
-        Returns either {"content": str} or {"function_call": {"name": str, "arguments": str}}
-        """
         payload = {
             "model": self.model,
             "messages": messages,
-            "temperature": 0.2,
-            "max_tokens": 800,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
         }
-        if functions:
+        if functions and parallel:
+            payload["tools"] = [{"type": "function", "function": f} for f in functions]
+            payload["parallel_tool_calls"] = True
+            if isinstance(function_call, dict):
+                payload["tool_choice"] = {"type": "function", "function": function_call}
+            elif function_call is not None:
+                payload["tool_choice"] = function_call
+        elif functions:
             payload["functions"] = functions
-        if function_call is not None:
+            if function_call is not None:
+                payload["function_call"] = function_call
+        elif function_call is not None:
             payload["function_call"] = function_call
+        return payload
 
-        data = json.dumps(payload).encode("utf-8")
-        req = urllib.request.Request(
-            "https://api.openai.com/v1/chat/completions",
-            data=data,
-            headers={
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.api_key}",
-            },
-            method="POST",
-        )
-
-        try:
-            with urllib.request.urlopen(req, timeout=30) as resp:
-                body = resp.read().decode("utf-8")
-        except urllib.error.HTTPError as e:
-            # include response body for easier debugging
-            raise RuntimeError(f"OpenAI API error: {e.read().decode('utf-8')}")
-
+    @staticmethod
+    def _parse_response(body: str) -> dict:
         j = json.loads(body)
+        usage = j.get("usage")
+        if usage:
+            current_span().set(
+                prompt_tokens=usage.get("prompt_tokens"), completion_tokens=usage.get("completion_tokens")
+            )
         try:
             message = j["choices"][0]["message"]
         except Exception:
             raise RuntimeError("Unexpected response from OpenAI API")
 
+        if message.get("tool_calls"):
+            return {"function_calls": [
+                tc["function"] for tc in message["tool_calls"] if tc.get("type", "function") == "function"
+            ]}
+
         if message.get("function_call"):
             return {"function_call": message.get("function_call")}
 
         return {"content": message.get("content", "")}
+
+    def chat(
+        self,
+        messages: List[Dict[str, str]],
+        functions: list | None = None,
+        function_call: str | dict | None = None,
+        parallel: bool = False
+    ) -> dict:
+        """Call OpenAI chat completions and return a normalized dict.
+
+        Returns either {"content": str} or {"function_call": {"name": str, "arguments": str}}.
+        With `parallel=True` the functions are sent as `tools` so the model may
+        request several calls at once; those come back as
+        {"function_calls": [{"name": str, "arguments": str}, ...]}.
+        """
+        data = json.dumps(self._payload(messages, functions, function_call, parallel)).encode("utf-8")
+        started = time.monotonic()
+        attempt = 0
+        resp = None
+        _IN_FLIGHT.inc()
+        try:
+            while True:
+                try:
+                    resp = self._pool.request("POST", self.path, data, self._headers())
+                    if resp.status not in RETRY_STATUSES or attempt >= self.max_retries:
+                        break
+                except (OSError, ConnectionError):
+                    resp = None
+                    if attempt >= self.max_retries:
+                        raise
+                attempt += 1
+                time.sleep(self._backoff(attempt, resp))
+        finally:
+            self.stats.record(time.monotonic() - started, attempt, resp.status if resp else None)
+            current_span().set(retries=attempt, http_status=resp.status if resp else 0)
+            _IN_FLIGHT.dec()
+        return self._check(resp)
+
+    async def achat(
+        self,
+        messages: List[Dict[str, str]],
+        functions: list | None = None,
+        function_call: str | dict | None = None,
+        parallel: bool = False
+    ) -> dict:
+        """Async `chat`: same arguments and return value, without blocking the event loop."""
+        data = json.dumps(self._payload(messages, functions, function_call, parallel)).encode("utf-8")
+        pool = self._apool()
+        started = time.monotonic()
+        attempt = 0
+        resp = None
+        _IN_FLIGHT.inc()
+        try:
+            while True:
+                try:
+                    resp = await pool.request("POST", self.path, data, self._headers())
+                    if resp.status not in RETRY_STATUSES or attempt >= self.max_retries:
+                        break
+                except (OSError, ConnectionError, asyncio.TimeoutError):
+                    resp = None
+                    if attempt >= self.max_retries:
+                        raise
+                attempt += 1
+                await asyncio.sleep(self._backoff(attempt, resp))
+        finally:
+            self.stats.record(time.monotonic() - started, attempt, resp.status if resp else None)
+            current_span().set(retries=attempt, http_status=resp.status if resp else 0)
+            _IN_FLIGHT.dec()
+        return self._check(resp)
+
+    async def astream(
+        self,
+        messages: List[Dict[str, str]],
+        functions: list | None = None,
+        function_call: str | dict | None = None,
+        parallel: bool = False
+    ) -> AsyncIterator[dict]:
+        """Stream a completion (`stream: true`), yielding deltas as they arrive.
+
+        Yields {"content": str} for text and
+        {"tool_call": {"index": int, "name": str | None, "arguments": str}} for
+        function-call fragments. Retries happen only before the first byte.
+        """
+        payload = self._payload(messages, functions, function_call, parallel)
+        payload["stream"] = True
+        data = json.dumps(payload).encode("utf-8")
+        pool = self._apool()
+        started = time.monotonic()
+        attempt = 0
+        status = None
+        _IN_FLIGHT.inc()
+        try:
+            while True:
+                try:
+                    resp = await pool.stream("POST", self.path, data, self._headers())
+                except (OSError, ConnectionError, asyncio.TimeoutError):
+                    if attempt >= self.max_retries:
+                        raise
+                    attempt += 1
+                    await asyncio.sleep(self._backoff(attempt, None))
+                    continue
+                status = resp.status
+                if resp.status in RETRY_STATUSES and attempt < self.max_retries:
+                    await resp.read()
+                    attempt += 1
+                    await asyncio.sleep(self._backoff(attempt, HTTPResponse(resp.status, resp.headers)))
+                    continue
+                break
+            if resp.status >= 400:
+                body = await resp.read()
+                raise RuntimeError(f"OpenAI API error ({resp.status}): {body.decode('utf-8', 'replace')}")
+            decoder = SSEDecoder()
+            async for chunk in resp.iter_chunks():
+                for event in decoder.feed(chunk):
+                    for delta in _stream_deltas(event):
+                        yield delta
+            # a last event the server did not close with a blank line
+            for event in decoder.flush():
+                for delta in _stream_deltas(event):
+                    yield delta
+        finally:
+            self.stats.record(time.monotonic() - started, attempt, status)
+            current_span().set(retries=attempt, http_status=status or 0)
+            _IN_FLIGHT.dec()
+
+    async def aclose(self):
+        """Close the keep-alive connections opened on the running event loop."""
+        pool = self._apools.pop(asyncio.get_running_loop(), None)
+        if pool is not None:
+            await pool.aclose()
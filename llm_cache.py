@@ -0,0 +1,254 @@
+"""Response cache in front of the LLM client.
+
+`CachedLLM` wraps an `OpenAIGPT4o` (or anything with the same `chat` /
+`achat` / `astream` interface) and answers repeated prompts locally:
+
+- exact hits are keyed on a hash of (model, messages, functions,
+  temperature, ...), stored in an LRU backend from `tools/cache.py`
+  (in memory, or SQLite to survive restarts);
+- optionally, a first-iteration prompt (system + tools + user query, no
+  steps yet) whose query is close enough to an earlier one is served from
+  that one's plan. Similarity is cosine over hashed character n-grams, or
+  over vectors from any `embedder(text) -> list[float]`.
+
+Prompts that carry observations of time-sensitive tools (`current_time`,
+weather, Prometheus) always go to the LLM.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import inspect
+import math
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Sequence
+
+import metrics
+from tools.cache import MISSING, MemoryCacheBackend, canonical_json
+
+_LOOKUPS = metrics.counter(
+    "llm_cache_lookups_total", "LLM response cache lookups by result (exact, similar, miss, bypassed)", ["result"]
+)
+
+TIME_SENSITIVE_TOOLS = frozenset({"current_time", "weather_now", "weather_forecast", "prometheus_query"})
+
+
+def ngram_vector(text: str, n: int = 3) -> Dict[str, float]:
+    """L2-normalized character n-gram counts of `text`."""
+    text = " ".join(text.lower().split())
+    padded = f" {text} "
+    counts = Counter(padded[i:i + n] for i in range(max(1, len(padded) - n + 1)))
+    norm = math.sqrt(sum(c * c for c in counts.values())) or 1.0
+    return {g: c / norm for g, c in counts.items()}
+
+
+def _cosine(a, b) -> float:
+    if isinstance(a, dict):
+        if len(a) > len(b):
+            a, b = b, a
+        return sum(v * b.get(k, 0.0) for k, v in a.items())
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+@dataclass
+class LLMCacheStats:
+    exact_hits: int = 0
+    similar_hits: int = 0
+    misses: int = 0
+    bypassed: int = 0
+    miss_latency: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.exact_hits + self.similar_hits + self.misses
+        return (self.exact_hits + self.similar_hits) / lookups if lookups else 0.0
+
+    @property
+    def latency_saved(self) -> float:
+        """Seconds saved, estimated as hits x average latency of a miss."""
+        if not self.misses:
+            return 0.0
+        return (self.exact_hits + self.similar_hits) * self.miss_latency / self.misses
+
+
+class CachedLLM:
+    def __init__(
+        self,
+        llm: Any,
+        backend=None,
+        ttl: float = 24 * 3600.0,
+        similarity_threshold: Optional[float] = None,
+        embedder: Optional[Callable[[str], Sequence[float]]] = None,
+        max_similar_entries: int = 2000,
+        time_sensitive_tools: Sequence[str] = TIME_SENSITIVE_TOOLS,
+    ):
+        self.llm = llm
+        self.backend = backend if backend is not None else MemoryCacheBackend()
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.embedder = embedder
+        self.max_similar_entries = max_similar_entries
+        self.time_sensitive_tools = frozenset(time_sensitive_tools)
+        self.cache_stats = LLMCacheStats()
+        # context key -> OrderedDict(query -> (vector, exact key)) of first-iteration prompts
+        self._similar: Dict[str, "OrderedDict[str, tuple]"] = {}
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        # model, stats, aclose, ... come from the wrapped client
+        return getattr(self.llm, name)
+
+    # --- keys ---------------------------------------------------------------
+
+    def _key(self, messages, functions, function_call, parallel) -> str:
+        raw = canonical_json({
+            "model": getattr(self.llm, "model", None),
+            "temperature": getattr(self.llm, "temperature", None),
+            "max_tokens": getattr(self.llm, "max_tokens", None),
+            "messages": messages,
+            "functions": functions,
+            "function_call": function_call,
+            "parallel": parallel,
+        })
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _time_sensitive(self, messages: List[Dict[str, Any]]) -> bool:
+        for m in messages:
+            if m.get("role") == "system":
+                continue
+            content = m.get("content") or ""
+            if any(f'"{tool}"' in content or f"{tool}(" in content for tool in self.time_sensitive_tools):
+                return True
+        return False
+
+    def _first_iteration(self, messages, functions, function_call, parallel):
+        """(context key, query) when `messages` is system prompt(s) + one user query, else None."""
+        if not messages or messages[-1].get("role") != "user":
+            return None
+        if any(m.get("role") not in ("system",) for m in messages[:-1]):
+            return None
+        context = self._key(messages[:-1], functions, function_call, parallel)
+        return context, messages[-1].get("content") or ""
+
+    def _vector(self, text: str):
+        return self.embedder(text) if self.embedder is not None else ngram_vector(text)
+
+    # --- lookup / store -------------------------------------------------------
+
+    def _lookup(self, messages, functions, function_call, parallel):
+        """Return (cached response or MISSING, exact key or None when bypassed)."""
+        if self._time_sensitive(messages):
+            with self._lock:
+                self.cache_stats.bypassed += 1
+            _LOOKUPS.labels("bypassed").inc()
+            return MISSING, None
+        key = self._key(messages, functions, function_call, parallel)
+        cached = self.backend.get(key)
+        if cached is not MISSING:
+            with self._lock:
+                self.cache_stats.exact_hits += 1
+            _LOOKUPS.labels("exact").inc()
+            return cached, key
+        if self.similarity_threshold is not None:
+            first = self._first_iteration(messages, functions, function_call, parallel)
+            if first is not None:
+                context, query = first
+                vector = self._vector(query)
+                with self._lock:
+                    candidates = list((self._similar.get(context) or {}).values())
+                best_score, best_key = 0.0, None
+                for other_vector, other_key in candidates:
+                    score = _cosine(vector, other_vector)
+                    if score > best_score:
+                        best_score, best_key = score, other_key
+                if best_key is not None and best_score >= self.similarity_threshold:
+                    cached = self.backend.get(best_key)
+                    if cached is not MISSING:
+                        with self._lock:
+                            self.cache_stats.similar_hits += 1
+                        _LOOKUPS.labels("similar").inc()
+                        return cached, key
+        with self._lock:
+            self.cache_stats.misses += 1
+        _LOOKUPS.labels("miss").inc()
+        return MISSING, key
+
+    def _store(self, key, messages, functions, function_call, parallel, response, latency):
+        with self._lock:
+            self.cache_stats.miss_latency += latency
+        self.backend.set(key, response, self.ttl)
+        if self.similarity_threshold is None:
+            return
+        first = self._first_iteration(messages, functions, function_call, parallel)
+        if first is None:
+            return
+        context, query = first
+        vector = self._vector(query)
+        with self._lock:
+            entries = self._similar.setdefault(context, OrderedDict())
+            entries[query] = (vector, key)
+            entries.move_to_end(query)
+            while len(entries) > self.max_similar_entries:
+                entries.popitem(last=False)
+
+    # --- client interface -------------------------------------------------------
+
+    def chat(self, messages, functions=None, function_call=None, parallel=False) -> dict:
+        cached, key = self._lookup(messages, functions, function_call, parallel)
+        if cached is not MISSING:
+            return cached
+        started = time.monotonic()
+        response = self.llm.chat(messages, functions=functions, function_call=function_call, parallel=parallel)
+        if key is not None:
+            self._store(key, messages, functions, function_call, parallel, response, time.monotonic() - started)
+        return response
+
+    async def achat(self, messages, functions=None, function_call=None, parallel=False) -> dict:
+        cached, key = self._lookup(messages, functions, function_call, parallel)
+        if cached is not MISSING:
+            return cached
+        started = time.monotonic()
+        kwargs = dict(functions=functions, function_call=function_call, parallel=parallel)
+        if inspect.iscoroutinefunction(getattr(self.llm, "achat", None)):
+            response = await self.llm.achat(messages, **kwargs)
+        else:
+            loop = asyncio.get_running_loop()
+            response = await loop.run_in_executor(None, lambda: self.llm.chat(messages, **kwargs))
+        if key is not None:
+            self._store(key, messages, functions, function_call, parallel, response, time.monotonic() - started)
+        return response
+
+    async def astream(self, messages, functions=None, function_call=None, parallel=False) -> AsyncIterator[dict]:
+        """Stream from the LLM on a miss; replay a hit as a single delta."""
+        cached, key = self._lookup(messages, functions, function_call, parallel)
+        if cached is not MISSING:
+            if cached.get("content") is not None:
+                yield {"content": cached["content"]}
+            calls = cached.get("function_calls") or ([cached["function_call"]] if cached.get("function_call") else [])
+            for index, call in enumerate(calls):
+                yield {"tool_call": {"index": index, "name": call.get("name"), "arguments": call.get("arguments")}}
+            return
+        started = time.monotonic()
+        content: List[str] = []
+        calls: Dict[int, Dict[str, str]] = {}
+        async for delta in self.llm.astream(
+            messages, functions=functions, function_call=function_call, parallel=parallel
+        ):
+            if "content" in delta:
+                content.append(delta["content"])
+            elif "tool_call" in delta:
+                tc = delta["tool_call"]
+                call = calls.setdefault(tc["index"], {"name": "", "arguments": ""})
+                call["name"] += tc.get("name") or ""
+                call["arguments"] += tc.get("arguments") or ""
+            yield delta
+        if key is not None:
+            response = (
+                {"function_calls": [calls[i] for i in sorted(calls)]} if calls else {"content": "".join(content)}
+            )
+            self._store(key, messages, functions, function_call, parallel, response, time.monotonic() - started)
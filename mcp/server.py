@@ -1,16 +1,68 @@
 # MCP Server Example (MCP + demo tools)
+#
+# Development: `python server.py` (one worker, stateful sessions).
+# Production:  `python server.py --workers 4 --tool-concurrency 16` — several
+# uvicorn worker processes (stateless HTTP), sync tools on a thread pool and
+# 429 backpressure per tool; see serving.py. On SIGTERM/Ctrl+C in-flight
+# requests get --drain-timeout seconds to finish.
+# Prometheus metrics: GET /metrics (per worker process).
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 from mcp.server.fastmcp import FastMCP
+from serving import AdmissionMiddleware, OffloadingRegistrar, ServingConfig, metrics_endpoint, parse_limits
 from tools import prometheus_tools, weather_tools
 
-mcp = FastMCP("Exemplo Servidor MCP")
+config = ServingConfig.from_env()
+mcp = FastMCP("Exemplo Servidor MCP", stateless_http=config.stateless, json_response=config.stateless)
+tool_executor = ThreadPoolExecutor(max_workers=config.tool_threads, thread_name_prefix="mcp-tool")
 
 # ---- Importa e registra tools (contextos) ----
-prometheus_tools.register(mcp)
-weather_tools.register(mcp)
+registrar = OffloadingRegistrar(mcp, tool_executor, config)
+prometheus_tools.register(registrar)
+weather_tools.register(registrar)
+mcp.custom_route("/metrics", methods=["GET"])(metrics_endpoint)
 
-app = mcp.streamable_http_app()
+app = AdmissionMiddleware(mcp.streamable_http_app(), config)
 
-if __name__ == "__main__":
+
+def main(argv=None):
     import uvicorn
-    print("Iniciando FastMCP via Uvicorn em http://127.0.0.1:8000/mcp ...")
-    uvicorn.run("server:app", host="127.0.0.1", port=8000, reload=False)
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=config.workers)
+    parser.add_argument("--tool-threads", type=int, default=config.tool_threads)
+    parser.add_argument("--tool-concurrency", type=int, default=config.tool_concurrency)
+    parser.add_argument("--tool-limits", default="", help="per-tool overrides, e.g. weather_now=8,prometheus_query=4")
+    parser.add_argument("--queue-timeout", type=float, default=config.queue_timeout)
+    parser.add_argument("--drain-timeout", type=float, default=config.drain_timeout)
+    parser.add_argument("--http-429", action="store_true", help="reject with HTTP 429 instead of a JSON-RPC error")
+    args = parser.parse_args(argv)
+
+    serving = ServingConfig(
+        workers=args.workers,
+        tool_threads=args.tool_threads,
+        tool_concurrency=args.tool_concurrency,
+        tool_limits=parse_limits(args.tool_limits) or config.tool_limits,
+        queue_timeout=args.queue_timeout,
+        drain_timeout=args.drain_timeout,
+        http_429=args.http_429 or config.http_429,
+    )
+    # worker processes re-import server:app and read their settings from the environment
+    os.environ.update(serving.to_env())
+    print(f"Iniciando FastMCP via Uvicorn em http://{args.host}:{args.port}/mcp ({args.workers} worker(s)) ...")
+    uvicorn.run(
+        "server:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        reload=False,
+        timeout_graceful_shutdown=args.drain_timeout,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""Production serving helpers for the FastMCP server.
+
+- `OffloadingRegistrar` wraps the `FastMCP` instance handed to each tool
+  module's `register(mcp)`: sync tool functions are turned into coroutines
+  that run on a shared thread pool, so a slow tool never blocks the event
+  loop (resources and prompts are registered unchanged). Batch tools run
+  their items on the same pool, at most the item tool's limit at a time
+  (see tools/batching.py).
+- `AdmissionMiddleware` bounds the in-flight `tools/call` requests per tool
+  and answers 429 once a tool is saturated and no slot frees up within
+  `queue_timeout`, instead of queueing without limit.
+
+The MCP client tears its whole session down on a non-2xx HTTP status, so by
+default the 429 travels as a JSON-RPC error for that one call (code
+`OVERLOADED`, `data: {"status": 429, "retry_after": s}`, plus a
+`Retry-After` header); `MCPSessionPool` retries those after the delay.
+`http_429=True` sends a bare HTTP 429 instead, for plain HTTP clients.
+
+Every registered tool also updates the `mcp_tool_*` metrics (calls by
+outcome, latency, in-flight calls, rejections); `metrics_endpoint` serves
+them in Prometheus text format (see ../metrics.py).
+
+Both are configured from environment variables (see `ServingConfig`), so
+every uvicorn worker process builds the same setup when it imports
+`server:app`. Limits are per worker process.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import inspect
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+try:
+    import metrics
+except ImportError:
+    # run from inside mcp/: the registry module lives at the project root
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import metrics
+
+# JSON-RPC "server error" code used for rejected calls
+OVERLOADED = -32029
+
+_CALLS = metrics.counter(
+    "mcp_tool_calls_total", "MCP tool calls served, by tool and outcome (ok, error)", ["tool", "outcome"]
+)
+_SECONDS = metrics.histogram("mcp_tool_seconds", "MCP tool run time, thread pool wait included", ["tool"])
+_IN_FLIGHT = metrics.gauge("mcp_tool_calls_in_flight", "MCP tool calls running, by tool", ["tool"])
+_REJECTED = metrics.counter("mcp_tool_rejected_total", "MCP tool calls rejected with 429, by tool", ["tool"])
+
+
+def parse_limits(raw: str) -> Dict[str, int]:
+    """"weather_now=8,prometheus_query=4" -> {"weather_now": 8, "prometheus_query": 4}"""
+    limits = {}
+    for item in filter(None, (part.strip() for part in raw.split(","))):
+        name, _, value = item.partition("=")
+        limits[name.strip()] = int(value)
+    return limits
+
+
+@dataclass
+class ServingConfig:
+    # uvicorn worker processes (more than one requires stateless HTTP sessions)
+    workers: int = 1
+    # threads running sync tool functions, per worker
+    tool_threads: int = 32
+    # concurrent calls allowed per tool, per worker, unless overridden in `tool_limits`
+    tool_concurrency: int = 16
+    tool_limits: Dict[str, int] = field(default_factory=dict)
+    # seconds a call may wait for a free slot before it is rejected with 429
+    queue_timeout: float = 0.5
+    # seconds in-flight requests get to finish on shutdown
+    drain_timeout: float = 30.0
+    # reject with a bare HTTP 429 rather than a JSON-RPC error
+    http_429: bool = False
+
+    @classmethod
+    def from_env(cls) -> "ServingConfig":
+        env = os.environ
+        return cls(
+            workers=int(env.get("MCP_WORKERS", 1)),
+            tool_threads=int(env.get("MCP_TOOL_THREADS", 32)),
+            tool_concurrency=int(env.get("MCP_TOOL_CONCURRENCY", 16)),
+            tool_limits=parse_limits(env.get("MCP_TOOL_LIMITS", "")),
+            queue_timeout=float(env.get("MCP_QUEUE_TIMEOUT", 0.5)),
+            drain_timeout=float(env.get("MCP_DRAIN_TIMEOUT", 30)),
+            http_429=env.get("MCP_HTTP_429", "") == "1",
+        )
+
+    def to_env(self) -> Dict[str, str]:
+        return {
+            "MCP_WORKERS": str(self.workers),
+            "MCP_TOOL_THREADS": str(self.tool_threads),
+            "MCP_TOOL_CONCURRENCY": str(self.tool_concurrency),
+            "MCP_TOOL_LIMITS": ",".join(f"{k}={v}" for k, v in self.tool_limits.items()),
+            "MCP_QUEUE_TIMEOUT": str(self.queue_timeout),
+            "MCP_DRAIN_TIMEOUT": str(self.drain_timeout),
+            "MCP_HTTP_429": "1" if self.http_429 else "",
+        }
+
+    def limit(self, tool: str) -> int:
+        """Concurrent calls allowed for `tool`, per worker."""
+        return self.tool_limits.get(tool, self.tool_concurrency)
+
+    @property
+    def stateless(self) -> bool:
+        # sessions live in one process; with several workers any worker must serve any request
+        return self.workers > 1
+
+
+class OffloadingRegistrar:
+    """Stands in for `FastMCP` in `register(mcp)`, running sync tools on `executor`."""
+
+    def __init__(self, mcp: Any, executor: ThreadPoolExecutor, config: Optional[ServingConfig] = None):
+        self._mcp = mcp
+        self._executor = executor
+        self.config = config if config is not None else ServingConfig()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        return self._executor
+
+    def concurrency(self, tool: str) -> int:
+        """How many items of `tool` a batch tool may run at once: the tool's admission limit."""
+        return self.config.limit(tool)
+
+    def __getattr__(self, name):
+        return getattr(self._mcp, name)
+
+    def _offload(self, fn: Callable) -> Callable:
+        if inspect.iscoroutinefunction(fn):
+            return fn
+
+        # FastMCP reads the parameters and return type through `__wrapped__`
+        @functools.wraps(fn)
+        async def run_in_thread(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+        return run_in_thread
+
+    @staticmethod
+    def _measured(fn: Callable, name: str) -> Callable:
+        calls_ok, calls_error = _CALLS.labels(name, "ok"), _CALLS.labels(name, "error")
+        seconds, in_flight = _SECONDS.labels(name), _IN_FLIGHT.labels(name)
+
+        @functools.wraps(fn)
+        async def measured(*args, **kwargs):
+            started = time.perf_counter()
+            in_flight.inc()
+            try:
+                result = await fn(*args, **kwargs)
+            except BaseException:
+                calls_error.inc()
+                raise
+            finally:
+                in_flight.dec()
+                seconds.observe(time.perf_counter() - started)
+            (calls_error if isinstance(result, dict) and "error" in result else calls_ok).inc()
+            return result
+
+        return measured
+
+    def tool(self, *args, **kwargs):
+        decorator = self._mcp.tool(*args, **kwargs)
+
+        def register(fn):
+            name = kwargs.get("name") or (args[0] if args and isinstance(args[0], str) else fn.__name__)
+            decorator(self._measured(self._offload(fn), name))
+            return fn
+
+        return register
+
+
+class AdmissionMiddleware:
+    """ASGI middleware rejecting `tools/call` requests with 429 when their tool is saturated."""
+
+    def __init__(self, app: Callable, config: ServingConfig):
+        self.app = app
+        self.config = config
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+        self.rejected = 0
+
+    def _semaphore(self, tool: str) -> asyncio.Semaphore:
+        semaphore = self._slots.get(tool)
+        if semaphore is None:
+            semaphore = self._slots[tool] = asyncio.Semaphore(self.config.limit(tool))
+        return semaphore
+
+    @staticmethod
+    def _tool_call(body: bytes) -> Optional[Dict[str, Any]]:
+        try:
+            message = json.loads(body)
+        except ValueError:
+            return None
+        if isinstance(message, dict) and message.get("method") == "tools/call":
+            return message
+        return None
+
+    async def _reject(self, send, call: Dict[str, Any], tool: str):
+        self.rejected += 1
+        _REJECTED.labels(tool).inc()
+        retry_after = max(1, round(self.config.queue_timeout))
+        text = f"Too Many Requests: tool '{tool}' is saturated, retry later"
+        if self.config.http_429:
+            status, body = 429, {"error": text}
+        else:
+            status, body = 200, {
+                "jsonrpc": "2.0",
+                "id": call.get("id"),
+                "error": {"code": OVERLOADED, "message": text, "data": {"status": 429, "retry_after": retry_after}},
+            }
+        payload = json.dumps(body).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(payload)).encode()),
+                (b"retry-after", str(retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": payload})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("method") != "POST":
+            return await self.app(scope, receive, send)
+
+        # the JSON-RPC body is small; read it to find the tool, then replay it to the app
+        chunks = []
+        more = True
+        while more:
+            message = await receive()
+            if message["type"] != "http.request":
+                return await self.app(scope, receive, send)
+            chunks.append(message.get("body", b""))
+            more = message.get("more_body", False)
+        body = b"".join(chunks)
+        replayed = False
+
+        async def replay():
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        call = self._tool_call(body)
+        if call is None:
+            return await self.app(scope, replay, send)
+        tool = str((call.get("params") or {}).get("name"))
+        semaphore = self._semaphore(tool)
+        if semaphore.locked():
+            if self.config.queue_timeout <= 0:
+                return await self._reject(send, call, tool)
+            try:
+                await asyncio.wait_for(semaphore.acquire(), self.config.queue_timeout)
+            except asyncio.TimeoutError:
+                return await self._reject(send, call, tool)
+        else:
+            await semaphore.acquire()
+        try:
+            await self.app(scope, replay, send)
+        finally:
+            semaphore.release()
+
+
+async def metrics_endpoint(request) -> Any:
+    """`GET /metrics` for `FastMCP.custom_route`: this worker's metrics in Prometheus text format."""
+    from starlette.responses import Response
+
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
@@ -0,0 +1,37 @@
+"""Helpers for the batch variants of the tools (`weather_many`, `prometheus_query_batch`)."""
+import asyncio
+from typing import Any, Dict
+
+# items accepted by one batch call
+MAX_BATCH = 100
+
+
+def batch_options(mcp: Any, tool: str) -> Dict[str, Any]:
+    """`run_batch` options for items of `tool` on the server's tool thread pool.
+
+    `mcp` is what `register(mcp)` received: an `OffloadingRegistrar` (see
+    ../serving.py) gives its executor and `tool`'s admission limit, so one
+    batch call runs no more items at once than single calls of `tool` may.
+    A bare `FastMCP` gives none (asyncio's default pool, no cap).
+    """
+    if not callable(getattr(type(mcp), "concurrency", None)):
+        return {}
+    return {"executor": mcp.executor, "concurrency": mcp.concurrency(tool)}
+
+
+async def run_batch(fn, items: list, executor=None, concurrency: int = MAX_BATCH) -> list:
+    """Run `fn(item)` for every item on `executor`, `concurrency` at a time; results keep the input order.
+
+    An item that raises gets `{"error": ...}` in its slot instead of failing the batch.
+    """
+    if len(items) > MAX_BATCH:
+        raise ValueError(f"At most {MAX_BATCH} items per batch, got {len(items)}")
+    loop = asyncio.get_running_loop()
+    limit = asyncio.Semaphore(max(1, concurrency))
+
+    async def one(item):
+        async with limit:
+            return await loop.run_in_executor(executor, fn, item)
+
+    results = await asyncio.gather(*(one(item) for item in items), return_exceptions=True)
+    return [{"error": str(r) or type(r).__name__} if isinstance(r, Exception) else r for r in results]
@@ -0,0 +1,450 @@
+"""Prometheus HTTP API backend for `prometheus_query`.
+
+- `PrometheusClient` sends instant (`/api/v1/query`) and range
+  (`/api/v1/query_range`) queries over keep-alive connections.
+- Range results are cached in chunks of `chunk_points` steps, aligned to
+  multiples of the step, keyed by (query, step, chunk). A window that
+  overlaps earlier ones only fetches the chunks it has not seen; contiguous
+  missing chunks go out as one request. Chunks ending less than `settle`
+  seconds ago may still receive samples and are never cached.
+- Instant queries are cached by (query, time aligned to `instant_step`).
+- Series longer than `max_points` (at most `MAX_RETURNED_POINTS`) are
+  downsampled (`lttb` or `minmax`) before they are returned, so the caller
+  never gets 10k-point series.
+
+Only the standard library and NumPy are used.
+"""
+from __future__ import annotations
+
+import http.client
+import json
+import math
+import queue
+import re
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Prometheus refuses range queries returning more than 11000 points per series
+MAX_POINTS_PER_REQUEST = 11000
+# upper bound of `max_points`: points per series returned to the caller
+MAX_RETURNED_POINTS = 2000
+# steps one range query may span (fetched over several requests)
+MAX_RANGE_POINTS = 10 * MAX_POINTS_PER_REQUEST
+
+# auto-picked steps come from this ladder, so nearby windows share a step (and cache chunks)
+STEP_LADDER = (1, 5, 15, 30, 60, 300, 900, 1800, 3600, 3 * 3600, 6 * 3600, 12 * 3600, 86400)
+
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400, "y": 365 * 86400}
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h|d|w|y)")
+
+
+class PrometheusError(RuntimeError):
+    """The Prometheus API answered with an error (or not at all)."""
+
+
+def parse_duration(value: Any) -> float:
+    """"90" / "15s" / "1h30m" -> seconds."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip()
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    parts = _DURATION_RE.findall(text)
+    if not parts or "".join(n + u for n, u in parts) != text:
+        raise ValueError(f"Invalid duration: {value!r}")
+    return sum(float(n) * _DURATION_UNITS[u] for n, u in parts)
+
+
+def parse_time(value: Any, now: float) -> float:
+    """"" / "now" / "now-1h" / "-1h" / unix seconds / RFC 3339 -> unix seconds."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip()
+    if text in ("", "now"):
+        return now
+    if text.startswith("now"):
+        text = text[3:]
+    if text.startswith("-"):
+        return now - parse_duration(text[1:])
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    parsed = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def auto_step(start: float, end: float, target_points: int = 1000) -> float:
+    """Smallest step of `STEP_LADDER` giving at most `target_points` points."""
+    wanted = (end - start) / max(1, target_points)
+    for step in STEP_LADDER:
+        if step >= wanted:
+            return float(step)
+    return float(math.ceil(wanted / STEP_LADDER[-1]) * STEP_LADDER[-1])
+
+
+# --- downsampling --------------------------------------------------------
+
+
+def minmax_downsample(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """Indices keeping the min and max of each of `max_points // 2` buckets (plus both ends)."""
+    n = len(x)
+    if n <= max_points:
+        return np.arange(n)
+    buckets = max(1, (max_points - 2) // 2)
+    edges = np.linspace(1, n - 1, buckets + 1).astype(np.int64)
+    # pad the inner points to equal-width rows so argmin/argmax run over all buckets at once
+    width = int(np.max(np.diff(edges)))
+    rows = edges[:-1, None] + np.arange(width)[None, :]
+    valid = rows < edges[1:, None]
+    values = y[np.minimum(rows, n - 1)]
+    usable = valid & ~np.isnan(values)
+    lo = np.where(usable, values, np.inf).argmin(axis=1)
+    hi = np.where(usable, values, -np.inf).argmax(axis=1)
+    picked = np.concatenate(([0], rows[np.arange(buckets), lo], rows[np.arange(buckets), hi], [n - 1]))
+    return np.unique(picked)
+
+
+def lttb_downsample(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """Indices chosen by Largest-Triangle-Three-Buckets; the first and last points are kept."""
+    n = len(x)
+    if n <= max_points or max_points < 3:
+        return np.arange(n) if n <= max_points else np.array([0, n - 1])
+    y = np.nan_to_num(y, nan=0.0)
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    # each bucket is compared against the average of the next one
+    next_edges = np.append(edges[2:], n)
+    csum_x = np.concatenate(([0.0], np.cumsum(x)))
+    csum_y = np.concatenate(([0.0], np.cumsum(y)))
+    counts = next_edges - edges[1:]
+    avg_x = (csum_x[next_edges] - csum_x[edges[1:]]) / counts
+    avg_y = (csum_y[next_edges] - csum_y[edges[1:]]) / counts
+
+    picked = np.empty(max_points, dtype=np.int64)
+    picked[0], picked[-1] = 0, n - 1
+    a = 0
+    for i in range(max_points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # twice the triangle area (a, candidate, next bucket average), for every candidate at once
+        area = np.abs(
+            (x[a] - avg_x[i]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y[i] - y[a])
+        )
+        a = lo + int(area.argmax())
+        picked[i + 1] = a
+    return picked
+
+
+DOWNSAMPLERS = {"lttb": lttb_downsample, "minmax": minmax_downsample}
+
+
+# --- HTTP ----------------------------------------------------------------
+
+
+class PrometheusClient:
+    """Thread-safe client for the Prometheus HTTP API keeping up to `maxsize` idle connections."""
+
+    def __init__(
+        self, base_url: str, maxsize: int = 8, timeout: float = 30.0, headers: Optional[Dict[str, str]] = None
+    ):
+        parts = urllib.parse.urlsplit(base_url)
+        self.https = parts.scheme == "https"
+        self.host = parts.hostname
+        self.port = parts.port or (443 if self.https else 80)
+        self.prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self.headers = dict(headers or {})
+        self.connections_opened = 0
+        self.requests = 0
+        self._idle: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue(maxsize)
+        self._lock = threading.Lock()
+
+    def _connect(self) -> http.client.HTTPConnection:
+        cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        conn = cls(self.host, self.port, timeout=self.timeout)
+        with self._lock:
+            self.connections_opened += 1
+        return conn
+
+    def _post(self, path: str, params: Dict[str, Any]) -> Any:
+        body = urllib.parse.urlencode(params).encode()
+        headers = dict(self.headers, **{"Content-Type": "application/x-www-form-urlencoded"})
+        try:
+            conn, reused = self._idle.get_nowait(), True
+        except queue.Empty:
+            conn, reused = self._connect(), False
+        while True:
+            try:
+                conn.request("POST", self.prefix + path, body=body, headers=headers)
+                resp = conn.getresponse()
+                data = resp.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                if not reused:
+                    raise
+                # the idle connection was closed by the server; retry on a fresh one
+                conn, reused = self._connect(), False
+            except BaseException:
+                conn.close()
+                raise
+        if resp.will_close:
+            conn.close()
+        else:
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+        with self._lock:
+            self.requests += 1
+        try:
+            payload = json.loads(data)
+        except ValueError:
+            raise PrometheusError(f"HTTP {resp.status} from Prometheus: {data[:200]!r}") from None
+        if payload.get("status") != "success":
+            raise PrometheusError(f"{payload.get('errorType', 'error')}: {payload.get('error', resp.status)}")
+        return payload["data"]
+
+    def query(self, query: str, at: float) -> Dict[str, Any]:
+        return self._post("/api/v1/query", {"query": query, "time": _fmt(at)})
+
+    def query_range(self, query: str, start: float, end: float, step: float) -> Dict[str, Any]:
+        return self._post(
+            "/api/v1/query_range", {"query": query, "start": _fmt(start), "end": _fmt(end), "step": _fmt(step)}
+        )
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def _fmt(value: float) -> str:
+    return f"{value:.3f}".rstrip("0").rstrip(".")
+
+
+# --- cached backend ------------------------------------------------------
+
+# one chunk: labels key -> (labels, step indices, values)
+_Chunk = Dict[Tuple, Tuple[Dict[str, str], np.ndarray, np.ndarray]]
+
+
+def _labels_key(metric: Dict[str, str]) -> Tuple:
+    return tuple(sorted(metric.items()))
+
+
+class PrometheusBackend:
+    def __init__(
+        self,
+        client: PrometheusClient,
+        chunk_points: int = 500,
+        max_chunks: int = 4096,
+        instant_step: float = 15.0,
+        max_instant: int = 1024,
+        settle: float = 60.0,
+        clock=time.time,
+    ):
+        self.client = client
+        self.chunk_points = chunk_points
+        self.max_chunks = max_chunks
+        self.instant_step = instant_step
+        self.max_instant = max_instant
+        self.settle = settle
+        self.clock = clock
+        self._chunks: "OrderedDict[Tuple[str, float, int], _Chunk]" = OrderedDict()
+        self._instant: "OrderedDict[Tuple[str, float], Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.chunk_hits = 0
+        self.chunk_misses = 0
+
+    # instant ---------------------------------------------------------------
+
+    def instant(self, query: str, at: Optional[float] = None) -> Dict[str, Any]:
+        aligned = math.floor((self.clock() if at is None else at) / self.instant_step) * self.instant_step
+        key = (query, aligned)
+        with self._lock:
+            if key in self._instant:
+                self._instant.move_to_end(key)
+                return self._instant[key]
+        data = self.client.query(query, aligned)
+        with self._lock:
+            self._instant[key] = data
+            while len(self._instant) > self.max_instant:
+                self._instant.popitem(last=False)
+        return data
+
+    # range -----------------------------------------------------------------
+
+    def _get_chunk(self, key) -> Optional[_Chunk]:
+        with self._lock:
+            chunk = self._chunks.get(key)
+            if chunk is not None:
+                self._chunks.move_to_end(key)
+            return chunk
+
+    def _fetch(self, query: str, step: float, first: int, last: int) -> Dict[int, _Chunk]:
+        """Query chunks `first..last` (inclusive) in one request and split the result per chunk."""
+        k0, k1 = first * self.chunk_points, (last + 1) * self.chunk_points - 1
+        data = self.client.query_range(query, k0 * step, k1 * step, step)
+        chunks: Dict[int, _Chunk] = {c: {} for c in range(first, last + 1)}
+        for series in data.get("result", []):
+            values = series.get("values") or []
+            if not values:
+                continue
+            ts = np.array([float(t) for t, _ in values])
+            vs = np.array([float(v) for _, v in values])
+            idx = np.rint(ts / step).astype(np.int64)
+            bounds = np.searchsorted(idx, np.arange(first, last + 2) * self.chunk_points)
+            metric = series.get("metric", {})
+            for offset, c in enumerate(range(first, last + 1)):
+                lo, hi = bounds[offset], bounds[offset + 1]
+                if hi > lo:
+                    chunks[c][_labels_key(metric)] = (metric, idx[lo:hi], vs[lo:hi])
+        return chunks
+
+    def query_range(
+        self, query: str, start: float, end: float, step: float
+    ) -> Dict[Tuple, Tuple[Dict, np.ndarray, np.ndarray]]:
+        """Series in [start, end] on the step grid: labels key -> (labels, timestamps, values)."""
+        if not step > 0:
+            raise ValueError(f"`step` must be positive, got {step!r}")
+        k0, k1 = math.ceil(start / step), math.floor(end / step)
+        if k1 < k0:
+            return {}
+        first, last = k0 // self.chunk_points, k1 // self.chunk_points
+        # chunks ending after this are still filling up
+        settled = (math.floor((self.clock() - self.settle) / step) + 1) // self.chunk_points - 1
+        per_request = max(1, MAX_POINTS_PER_REQUEST // self.chunk_points)
+
+        found: Dict[int, _Chunk] = {}
+        missing: List[int] = []
+        for c in range(first, last + 1):
+            chunk = self._get_chunk((query, step, c)) if c <= settled else None
+            if chunk is None:
+                missing.append(c)
+            else:
+                found[c] = chunk
+        with self._lock:
+            self.chunk_hits += len(found)
+            self.chunk_misses += len(missing)
+
+        # contiguous runs of missing chunks go out as one request each
+        runs: List[List[int]] = []
+        for c in missing:
+            if runs and c == runs[-1][-1] + 1 and len(runs[-1]) < per_request:
+                runs[-1].append(c)
+            else:
+                runs.append([c])
+        for run in runs:
+            fetched = self._fetch(query, step, run[0], run[-1])
+            found.update(fetched)
+            with self._lock:
+                for c, chunk in fetched.items():
+                    if c <= settled:
+                        self._chunks[(query, step, c)] = chunk
+                while len(self._chunks) > self.max_chunks:
+                    self._chunks.popitem(last=False)
+
+        merged: Dict[Tuple, List] = {}
+        for c in range(first, last + 1):
+            for key, (metric, idx, vs) in found[c].items():
+                entry = merged.setdefault(key, [metric, [], []])
+                entry[1].append(idx)
+                entry[2].append(vs)
+        out = {}
+        for key, (metric, idx_parts, v_parts) in merged.items():
+            idx, vs = np.concatenate(idx_parts), np.concatenate(v_parts)
+            keep = (idx >= k0) & (idx <= k1)
+            if keep.any():
+                out[key] = (metric, idx[keep] * step, vs[keep])
+        return out
+
+    # tool entry point --------------------------------------------------------
+
+    def query(
+        self,
+        query: str,
+        start: Any = "",
+        end: Any = "",
+        step: Any = "",
+        max_points: int = 200,
+        method: str = "lttb",
+        max_series: int = 50,
+    ) -> Dict[str, Any]:
+        """Instant query when `start` is empty, range query otherwise, shaped for an LLM."""
+        if method not in DOWNSAMPLERS:
+            raise ValueError(f"Unknown downsampling method {method!r}, expected one of {sorted(DOWNSAMPLERS)}")
+        max_points = min(max(2, int(max_points)), MAX_RETURNED_POINTS)
+        now = self.clock()
+        if start in ("", None):
+            data = self.instant(query, parse_time(end, now) if end not in ("", None) else None)
+            result = data.get("result")
+            if data.get("resultType") == "vector":
+                result = [{"metric": s.get("metric", {}), "value": _number(s["value"][1])} for s in result[:max_series]]
+            elif data.get("resultType") == "matrix":
+                # a range selector (`foo[5m]`): its raw samples, downsampled like a range query
+                result = [
+                    _series(
+                        s.get("metric", {}),
+                        np.array([float(t) for t, _ in s.get("values") or []]),
+                        np.array([float(v) for _, v in s.get("values") or []]),
+                        max_points, DOWNSAMPLERS[method],
+                    )
+                    for s in result[:max_series]
+                ]
+            elif data.get("resultType") == "scalar":
+                result = _number(result[1])
+            elif data.get("resultType") == "string":
+                result = result[1]
+            out = {"status": "success", "resultType": data.get("resultType"), "result": result}
+            if isinstance(data.get("result"), list) and len(data["result"]) > max_series:
+                out["series_total"] = len(data["result"])
+            return out
+
+        t0, t1 = parse_time(start, now), parse_time(end, now)
+        if t1 <= t0:
+            raise ValueError("`end` must be after `start`")
+        step_s = parse_duration(step) if step not in ("", None) else auto_step(t0, t1)
+        if not step_s > 0:
+            raise ValueError(f"`step` must be positive, got {step!r}")
+        if (t1 - t0) / step_s > MAX_RANGE_POINTS:
+            raise ValueError(f"`step` {step!r} gives more than {MAX_RANGE_POINTS} points; use a larger step")
+        series = self.query_range(query, t0, t1, step_s)
+        result = [
+            _series(metric, ts, vs, max_points, DOWNSAMPLERS[method])
+            for metric, ts, vs in list(series.values())[:max_series]
+        ]
+        out = {"status": "success", "resultType": "matrix", "step": step_s, "result": result}
+        if len(series) > max_series:
+            out["series_total"] = len(series)
+        return out
+
+
+def _series(metric: Dict[str, str], ts: np.ndarray, vs: np.ndarray, max_points: int, downsample) -> Dict[str, Any]:
+    """One series of a matrix result, downsampled to `max_points`."""
+    entry: Dict[str, Any] = {"metric": metric}
+    if len(ts) > max_points:
+        keep = downsample(ts, vs, max_points)
+        entry["downsampled_from"] = len(ts)
+        ts, vs = ts[keep], vs[keep]
+    entry["values"] = [[_number(t), _number(v)] for t, v in zip(ts.tolist(), vs.tolist())]
+    return entry
+
+
+def _number(value: Any) -> Optional[float]:
+    """Prometheus sample value (a string) as a JSON-safe float; NaN/Inf become None."""
+    number = float(value)
+    if not math.isfinite(number):
+        return None
+    return int(number) if number.is_integer() and abs(number) < 2 ** 53 else number
@@ -1,4 +1,6 @@
 import os
+import threading
+from typing import Optional
 
 try:
     from dotenv import load_dotenv
@@ -9,8 +11,16 @@ except ImportError:
 from fastapi import HTTPException
 from pydantic import BaseModel
 
+from tools.batching import batch_options, run_batch
+from tools.prometheus_backend import PrometheusBackend, PrometheusClient
+
 API_KEY = os.getenv("MCP_API_KEY")
 
+# e.g. http://prometheus:9090; PROMETHEUS_TOKEN is sent as a bearer token if set. Without it the
+# tools answer with canned data (`stub_query`), like the weather tools, for the local demo and benchmarks.
+PROMETHEUS_URL = os.getenv("PROMETHEUS_URL")
+PROMETHEUS_TOKEN = os.getenv("PROMETHEUS_TOKEN")
+
 PROME_DOCS = {
     "metrics_summary": "Resumo: CPU usage alta entre 18-22h, baixe alertas!",
     "config_prev": "Prometheus configs: scrape_interval: 15s, retention: 72h",
@@ -34,14 +44,56 @@ def check_auth(token):
         raise HTTPException(status_code=401, detail="Unauthorized")
 
 
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> Optional[PrometheusBackend]:
+    """The process-wide backend (one connection pool and cache per server worker); None without PROMETHEUS_URL."""
+    global _backend
+    if _backend is None:
+        if not PROMETHEUS_URL:
+            return None
+        with _backend_lock:
+            if _backend is None:
+                headers = {"Authorization": f"Bearer {PROMETHEUS_TOKEN}"} if PROMETHEUS_TOKEN else None
+                _backend = PrometheusBackend(PrometheusClient(PROMETHEUS_URL, headers=headers))
+    return _backend
+
+
+def stub_query(query: str) -> dict:
+    return {
+        "status": "success",
+        "data": [{"metric": "cpu_usage", "value": 0.13, "q": query}]
+    }
+
+
+def run_query(query: str, **kwargs) -> dict:
+    backend = get_backend()
+    return backend.query(query, **kwargs) if backend is not None else stub_query(query)
+
+
 def register(mcp):
     @mcp.tool()
-    def prometheus_query(query: str, token: str = "") -> dict:
+    def prometheus_query(
+        query: str, start: str = "", end: str = "", step: str = "", max_points: int = 200, token: str = ""
+    ) -> dict:
+        """Run a PromQL query.
+
+        Without `start` this is an instant query at `end` (default: now). With `start`
+        it is a range query from `start` to `end` every `step` (e.g. "1m"; chosen
+        automatically when empty). Times may be "now", relative ("-1h", "now-30m"),
+        unix seconds or RFC 3339. Series longer than `max_points` (at most 2000) are downsampled.
+        """
+        check_auth(token)
+        return run_query(query, start=start, end=end, step=step, max_points=max_points)
+
+    @mcp.tool()
+    async def prometheus_query_batch(queries: list[str], token: str = "") -> dict:
+        """Run several PromQL queries in one call; `results[i]` is for `queries[i]`."""
         check_auth(token)
-        return {
-            "status": "success",
-            "data": [{"metric": "cpu_usage", "value": 0.13, "q": query}]
-        }
+        results = await run_batch(run_query, queries, **batch_options(mcp, "prometheus_query"))
+        return {"status": "success", "results": results}
 
     @mcp.resource("file://documents/{name}")
     def read_document(name: str) -> str:
@@ -8,6 +8,8 @@ except ImportError:
 
 from fastapi import HTTPException
 
+from tools.batching import batch_options, run_batch
+
 API_KEY = os.getenv("MCP_API_KEY")
 
 
@@ -16,16 +18,20 @@ def check_auth(token):
         raise HTTPException(status_code=401, detail="Unauthorized")
 
 
+def current_weather(city: str) -> dict:
+    return {
+        "status": "success",
+        "city": city,
+        "weather": "Sunny",
+        "temperature": 27
+    }
+
+
 def register(mcp):
     @mcp.tool()
     def weather_now(city: str, token: str = "") -> dict:
         check_auth(token)
-        return {
-            "status": "success",
-            "city": city,
-            "weather": "Sunny",
-            "temperature": 27
-        }
+        return current_weather(city)
 
     @mcp.tool()
     def weather_forecast(city: str, days: int = 1, token: str = "") -> dict:
@@ -37,3 +43,10 @@ def register(mcp):
                 {"day": i + 1, "weather": "Sunny"} for i in range(days)
             ]
         }
+
+    @mcp.tool()
+    async def weather_many(cities: list[str], token: str = "") -> dict:
+        """Current weather for several cities in one call; `results[i]` is for `cities[i]`."""
+        check_auth(token)
+        results = await run_batch(current_weather, cities, **batch_options(mcp, "weather_now"))
+        return {"status": "success", "results": results}
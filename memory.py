@@ -0,0 +1,329 @@
+"""Long-term memory for the agent: an embedded vector store.
+
+- `HashingEmbedder` turns text into L2-normalized float32 vectors by
+  hashing word and character n-gram features (the "hashing trick"), so it
+  needs no model and works offline. Anything with the same
+  `embed(texts) -> (n, dim) array` interface can replace it.
+- `VectorStore` keeps the vectors in one float32 file, appended to and read
+  through `np.memmap`, with the texts and payloads in SQLite. Search is
+  brute-force cosine top-k over blocks of rows, for a batch of queries at
+  once. `build_ivf()` adds an inverted-file index (spherical k-means
+  centroids, rows grouped by nearest centroid) so that only `n_probe`
+  lists are scanned; worth it from ~100k vectors. Rows added after the
+  build are scanned brute-force until the next build. Several processes
+  may share a store: appends (and dropping the vectors of a crashed one)
+  hold an exclusive `flock` on `memory.lock`.
+- `AgentMemory` stores finished runs (query, answer, tool observations) and
+  recalls the closest ones; `AgentRunner(memory=...)` saves every answered
+  query and the `memory_search` tool searches them.
+"""
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of one process are serialized
+    fcntl = None
+
+_WORD_RE = re.compile(r"\w+")
+# rows scored per matrix product in brute-force search
+SEARCH_BLOCK = 32768
+
+
+class HashingEmbedder:
+    """Signed feature hashing of words and character `ngram`s into `dim` dimensions."""
+
+    def __init__(self, dim: int = 384, ngram: int = 3):
+        self.dim = dim
+        self.ngram = ngram
+
+    def _features(self, text: str) -> List[str]:
+        words = _WORD_RE.findall(text.lower())
+        features = list(words)
+        for word in words:
+            padded = f"<{word}>"
+            features.extend(padded[i:i + self.ngram] for i in range(max(1, len(padded) - self.ngram + 1)))
+        return features
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            # crc32 is stable across processes, unlike hash()
+            hashes = np.fromiter(
+                (zlib.crc32(f.encode("utf-8")) for f in self._features(text)), dtype=np.uint64
+            )
+            if not len(hashes):
+                continue
+            signs = np.where(hashes & (1 << 31), -1.0, 1.0).astype(np.float32)
+            np.add.at(out[row], (hashes % self.dim).astype(np.int64), signs)
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.where(norms == 0, 1, norms)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def _merge_topk(scores: np.ndarray, ids: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Keep the `k` best columns of each row of `scores`, sorted best first."""
+    if scores.shape[1] > k:
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        scores = np.take_along_axis(scores, part, axis=1)
+        ids = np.take_along_axis(ids, part, axis=1)
+    order = np.argsort(-scores, axis=1)
+    return np.take_along_axis(scores, order, axis=1), np.take_along_axis(ids, order, axis=1)
+
+
+class VectorStore:
+    def __init__(self, path: str, dim: int):
+        self.path = path
+        self.dim = dim
+        os.makedirs(path, exist_ok=True)
+        self._vectors_path = os.path.join(path, "vectors.f32")
+        self._lock_path = os.path.join(path, "memory.lock")
+        self._ivf_path = os.path.join(path, "ivf.npz")
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(os.path.join(path, "memory.db"), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS items (row INTEGER PRIMARY KEY, hash TEXT UNIQUE NOT NULL, "
+            "text TEXT NOT NULL, payload TEXT, created REAL NOT NULL)"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        stored_dim = self._db.execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+        if stored_dim is None:
+            self._db.execute("INSERT INTO meta VALUES ('dim', ?)", (str(dim),))
+        elif int(stored_dim[0]) != dim:
+            raise ValueError(f"{path} holds {stored_dim[0]}-dimensional vectors, not {dim}")
+        # vectors written after the last committed row (a crash mid-add) are dropped; with the lock held,
+        # no other process is in the middle of an add
+        with self._locked():
+            self._count = self._db.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+            self._drop_uncommitted()
+        self._matrix: Optional[np.memmap] = None
+        self._ivf: Optional[Dict[str, np.ndarray]] = None
+        if os.path.exists(self._ivf_path):
+            with np.load(self._ivf_path) as data:
+                self._ivf = {key: data[key] for key in data.files}
+
+    def __len__(self) -> int:
+        return self._count
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """Exclusive across processes sharing the store, for as long as the block runs."""
+        with open(self._lock_path, "a+b") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            yield  # closing the file releases the lock
+
+    def _drop_uncommitted(self):
+        if os.path.exists(self._vectors_path) and os.path.getsize(self._vectors_path) > self._count * self.dim * 4:
+            with open(self._vectors_path, "r+b") as f:
+                f.truncate(self._count * self.dim * 4)
+
+    def _rows(self) -> np.ndarray:
+        """The stored vectors as a read-only (count, dim) memmap, remapped after growth."""
+        with self._lock:
+            if self._count == 0:
+                return np.zeros((0, self.dim), dtype=np.float32)
+            if self._matrix is None or self._matrix.shape[0] != self._count:
+                self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(self._count, self.dim))
+            return self._matrix
+
+    def add(self, texts: Sequence[str], vectors: np.ndarray, payloads: Optional[Sequence[Any]] = None) -> List[int]:
+        """Store `texts` with their vectors; returns their rows (-1 for exact duplicates, skipped)."""
+        vectors = _normalize(vectors)
+        payloads = list(payloads) if payloads is not None else [None] * len(texts)
+        rows = []
+        with self._lock, self._locked():
+            # rows other processes added since
+            self._count = self._db.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+            self._drop_uncommitted()
+            keep = []
+            self._db.execute("BEGIN")
+            try:
+                for i, text in enumerate(texts):
+                    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+                    if self._db.execute("SELECT 1 FROM items WHERE hash = ?", (digest,)).fetchone():
+                        rows.append(-1)
+                        continue
+                    row = self._count + len(keep)
+                    self._db.execute(
+                        "INSERT INTO items VALUES (?, ?, ?, ?, ?)",
+                        (row, digest, text, json.dumps(payloads[i], ensure_ascii=False, default=str), time.time()),
+                    )
+                    keep.append(i)
+                    rows.append(row)
+                if keep:
+                    with open(self._vectors_path, "ab") as f:
+                        f.write(vectors[keep].tobytes())
+                        f.flush()
+                        os.fsync(f.fileno())
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                self._drop_uncommitted()
+                raise
+            self._count += len(keep)
+        return rows
+
+    def get(self, rows: Sequence[int]) -> Dict[int, Dict[str, Any]]:
+        with self._lock:
+            found = {}
+            for row in rows:
+                item = self._db.execute(
+                    "SELECT text, payload, created FROM items WHERE row = ?", (int(row),)
+                ).fetchone()
+                if item is not None:
+                    found[int(row)] = {"text": item[0], "payload": json.loads(item[1]), "created": item[2]}
+            return found
+
+    # --- search -----------------------------------------------------------
+
+    def search(self, queries: np.ndarray, k: int = 5, n_probe: int = 8) -> Tuple[np.ndarray, np.ndarray]:
+        """Cosine top-`k` for each query row: (scores, rows), both (n_queries, k'), best first.
+
+        Uses the IVF index when one was built, brute force otherwise.
+        """
+        queries = _normalize(queries)
+        matrix = self._rows()
+        k = min(k, len(matrix))
+        if k == 0:
+            return np.zeros((len(queries), 0), dtype=np.float32), np.zeros((len(queries), 0), dtype=np.int64)
+        if self._ivf is not None:
+            return self._search_ivf(matrix, queries, k, n_probe)
+        return self._search_brute(matrix, queries, k, 0, len(matrix))
+
+    @staticmethod
+    def _search_brute(matrix, queries: np.ndarray, k: int, start: int, end: int):
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_ids = np.zeros((len(queries), 0), dtype=np.int64)
+        for lo in range(start, end, SEARCH_BLOCK):
+            hi = min(lo + SEARCH_BLOCK, end)
+            scores = queries @ np.asarray(matrix[lo:hi]).T
+            ids = np.broadcast_to(np.arange(lo, hi), scores.shape)
+            best_scores, best_ids = _merge_topk(
+                np.concatenate([best_scores, scores], axis=1), np.concatenate([best_ids, ids], axis=1), k
+            )
+        return best_scores, best_ids
+
+    def _search_ivf(self, matrix, queries: np.ndarray, k: int, n_probe: int):
+        ivf = self._ivf
+        centroids, order, offsets = ivf["centroids"], ivf["order"], ivf["offsets"]
+        indexed = int(ivf["indexed"])
+        probe = np.argsort(-(queries @ centroids.T), axis=1)[:, :n_probe]
+        all_scores, all_ids = [], []
+        for q, lists in zip(queries, probe):
+            rows = np.concatenate([order[offsets[c]:offsets[c + 1]] for c in lists] + [np.arange(indexed, len(matrix))])
+            if len(rows) == 0:
+                rows = np.arange(min(k, len(matrix)))
+            rows.sort()  # sequential reads from the memmap
+            scores = np.asarray(matrix[rows]) @ q
+            s, i = _merge_topk(scores[None, :], rows[None, :], k)
+            all_scores.append(np.pad(s[0], (0, k - s.shape[1]), constant_values=-np.inf))
+            all_ids.append(np.pad(i[0], (0, k - i.shape[1]), constant_values=-1))
+        return np.array(all_scores, dtype=np.float32), np.array(all_ids, dtype=np.int64)
+
+    def build_ivf(self, n_lists: Optional[int] = None, iterations: int = 10, sample: int = 65536, seed: int = 0):
+        """Cluster the stored vectors into `n_lists` (default ~4*sqrt(n)) lists; saved next to the vectors."""
+        matrix = self._rows()
+        n = len(matrix)
+        if n == 0:
+            return
+        n_lists = min(n, n_lists or max(1, int(4 * np.sqrt(n))))
+        rng = np.random.default_rng(seed)
+        train = np.asarray(matrix[np.sort(rng.choice(n, min(n, max(sample, n_lists * 8)), replace=False))])
+        centroids = train[rng.choice(len(train), n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assign = np.argmax(train @ centroids.T, axis=1)
+            order = np.argsort(assign, kind="stable")
+            counts = np.bincount(assign, minlength=n_lists)
+            empty = counts == 0
+            sums = np.zeros_like(centroids)
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+            sums[~empty] = np.add.reduceat(train[order], starts[~empty])
+            # an empty list restarts from a random training vector
+            sums[empty] = train[rng.choice(len(train), int(empty.sum()))]
+            centroids = _normalize(sums)
+        assign = np.concatenate([
+            np.argmax(np.asarray(matrix[lo:lo + SEARCH_BLOCK]) @ centroids.T, axis=1)
+            for lo in range(0, n, SEARCH_BLOCK)
+        ])
+        order = np.argsort(assign, kind="stable").astype(np.int64)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=n_lists))]).astype(np.int64)
+        ivf = {"centroids": centroids, "order": order, "offsets": offsets, "indexed": np.array(n)}
+        tmp = self._ivf_path + ".tmp.npz"
+        np.savez(tmp, **ivf)
+        os.replace(tmp, self._ivf_path)
+        with self._lock:
+            self._ivf = ivf
+
+    def drop_ivf(self):
+        with self._lock:
+            self._ivf = None
+            if os.path.exists(self._ivf_path):
+                os.remove(self._ivf_path)
+
+    def close(self):
+        with self._lock:
+            self._matrix = None
+            self._db.close()
+
+
+def _clip(value: Any, max_chars: int) -> str:
+    text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, default=str)
+    return text if len(text) <= max_chars else text[:max_chars] + "…"
+
+
+class AgentMemory:
+    """Past runs of the agent, recalled by similarity to a new query."""
+
+    def __init__(self, path: str, embedder: Any = None, max_observation_chars: int = 500):
+        self.embedder = embedder or HashingEmbedder()
+        self.store = VectorStore(path, self.embedder.dim)
+        self.max_observation_chars = max_observation_chars
+
+    def remember(self, query: str, answer: str, observations: Sequence[Dict[str, Any]] = ()) -> int:
+        """Store a finished run; `observations` are `{"tool", "input", "observation"}` dicts."""
+        kept = [
+            {
+                "tool": o.get("tool"),
+                "input": o.get("input"),
+                "observation": _clip(o.get("observation"), self.max_observation_chars),
+            }
+            for o in observations
+        ]
+        text = f"Q: {query}\nA: {answer}"
+        payload = {"query": query, "answer": answer, "observations": kept}
+        return self.store.add([text], self.embedder.embed([text]), [payload])[0]
+
+    def recall(self, query: str, k: int = 3, min_score: float = 0.0) -> List[Dict[str, Any]]:
+        if not len(self.store):
+            return []
+        scores, rows = self.store.search(self.embedder.embed([query]), k)
+        items = self.store.get([r for r in rows[0] if r >= 0])
+        hits = []
+        for score, row in zip(scores[0], rows[0]):
+            if row < 0 or score < min_score or int(row) not in items:
+                continue
+            item = items[int(row)]
+            hits.append(dict(item["payload"] or {}, score=round(float(score), 4), created=item["created"]))
+        return hits
+
+    def close(self):
+        self.store.close()
@@ -0,0 +1,402 @@
+"""Runtime metrics: counters, gauges and fixed-bucket histograms, in Prometheus text format.
+
+The agent, the LLM client, the MCP client and the MCP server update them on
+every call, so an update has to stay well under a microsecond (see
+benchmarks/bench_metrics.py). No update takes a lock: each thread adds to its
+own cell (a small list reached through `threading.local`), and a scrape
+sums the cells of every thread. A cell is only ever written by its thread,
+so no increment is lost; a scrape may miss the update being made at that
+instant, which the next scrape includes. Cells of threads that have
+finished (e.g. the default executor of each `asyncio.run` in
+`AgentRunner.run`) are folded into one total at the next scrape, or once
+the cells of a metric double, so long sessions do not grow them without
+bound.
+
+    REQUESTS = metrics.counter("agent_runs_total", "Agent runs", ["outcome"])
+    REQUESTS.labels("ok").inc()
+    with metrics.histogram("llm_request_seconds", "LLM latency").time():
+        ...
+
+Metrics are created once, at import time, in a `Registry` (the process-wide
+`REGISTRY` by default); creating one again returns the existing metric.
+`Registry.render()` is the text exposition, served by the MCP server at
+`/metrics` and by `serve(port)` as a sidecar for the CLI and batch runs.
+Values are per process: with several uvicorn workers, each one answers for
+itself.
+"""
+from __future__ import annotations
+
+import math
+import threading
+import time
+from bisect import bisect_left as _bisect
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# seconds; covers a cached tool call (~1 ms) up to a slow LLM completion
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class _Cells:
+    """Base of every metric child: one list of `_size` floats per thread, written only by that thread."""
+
+    __slots__ = ("_size", "_local", "_all", "_retired", "_prune_at", "_lock")
+
+    def __init__(self, size: int):
+        self._size = size
+        self._local = threading.local()
+        # (thread, its cell) for every live thread that has updated this child
+        self._all: List[Tuple[threading.Thread, List[float]]] = []
+        # what finished threads counted
+        self._retired = [0.0] * size
+        self._prune_at = 16
+        self._lock = threading.Lock()
+
+    def _new_cell(self) -> List[float]:
+        cell = self._local.cell = [0.0] * self._size
+        with self._lock:
+            self._all.append((threading.current_thread(), cell))
+            if len(self._all) >= self._prune_at:
+                self._prune()
+                self._prune_at = max(16, 2 * len(self._all))
+        return cell
+
+    def _prune(self):
+        """Fold the cells of finished threads (which never write again) into `_retired`; holds `_lock`."""
+        live = []
+        for thread, cell in self._all:
+            if thread.is_alive():
+                live.append((thread, cell))
+            else:
+                for i, value in enumerate(cell):
+                    self._retired[i] += value
+        self._all = live
+
+    def _totals(self) -> List[float]:
+        with self._lock:
+            self._prune()
+            cells = [cell for _, cell in self._all]
+            totals = list(self._retired)
+        for cell in cells:
+            for i, value in enumerate(cell):
+                totals[i] += value
+        return totals
+
+
+class _CounterChild(_Cells):
+    __slots__ = ()
+
+    def __init__(self):
+        super().__init__(1)
+
+    def inc(self, amount: float = 1.0):
+        try:
+            self._local.cell[0] += amount
+        except AttributeError:
+            self._new_cell()[0] += amount
+
+    @property
+    def value(self) -> float:
+        return self._totals()[0]
+
+
+class _GaugeChild(_Cells):
+    """`inc`/`dec` (e.g. in-flight calls, from any thread) or `set`; use one or the other per gauge."""
+
+    __slots__ = ("_set", "_function")
+
+    def __init__(self):
+        super().__init__(1)
+        self._set = 0.0
+        self._function: Optional[Callable[[], float]] = None
+
+    def inc(self, amount: float = 1.0):
+        try:
+            self._local.cell[0] += amount
+        except AttributeError:
+            self._new_cell()[0] += amount
+
+    def dec(self, amount: float = 1.0):
+        try:
+            self._local.cell[0] -= amount
+        except AttributeError:
+            self._new_cell()[0] -= amount
+
+    def set(self, value: float):
+        self._set = value
+
+    def set_function(self, function: Callable[[], float]):
+        """Read the value from `function()` at each scrape."""
+        self._function = function
+
+    @contextmanager
+    def track(self) -> Iterator[None]:
+        """+1 while the block runs."""
+        self.inc()
+        try:
+            yield
+        finally:
+            self.dec()
+
+    @property
+    def value(self) -> float:
+        if self._function is not None:
+            return float(self._function())
+        return self._set + self._totals()[0]
+
+
+class _HistogramChild(_Cells):
+    __slots__ = ("_bounds", "_sum_index")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        # one count per bucket (the last one is +Inf), then the sum
+        super().__init__(len(bounds) + 2)
+        self._bounds = bounds
+        self._sum_index = len(bounds) + 1
+
+    def observe(self, value: float):
+        try:
+            cell = self._local.cell
+        except AttributeError:
+            cell = self._new_cell()
+        cell[_bisect(self._bounds, value)] += 1
+        cell[-1] += value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def snapshot(self) -> Tuple[List[float], float]:
+        """(cumulative count per bucket including +Inf, sum)."""
+        totals = self._totals()
+        cumulative, running = [], 0.0
+        for count in totals[:self._sum_index]:
+            running += count
+            cumulative.append(running)
+        return cumulative, totals[self._sum_index]
+
+    @property
+    def count(self) -> float:
+        return self.snapshot()[0][-1]
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._children[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """The child for these label values, in `labelnames` order."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}, got {values!r}")
+            with self._lock:
+                child = self._children.setdefault(tuple(str(v) for v in values), self._new_child())
+                self._children[values] = child
+        return child
+
+    def _samples(self) -> Iterator[Tuple[str, Tuple[str, ...], object]]:
+        seen = set()
+        for values, child in list(self._children.items()):
+            if id(child) not in seen:
+                seen.add(id(child))
+                yield tuple(str(v) for v in values), child
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {_escape_help(self.documentation)}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._samples(), key=lambda s: s[0]):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values: Tuple[str, ...], child) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, values)} {_number(child.value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._default.inc(amount)
+
+    @property
+    def value(self) -> float:
+        return self._default.value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def inc(self, amount: float = 1.0):
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._default.dec(amount)
+
+    def set(self, value: float):
+        self._default.set(value)
+
+    def set_function(self, function: Callable[[], float]):
+        self._default.set_function(function)
+
+    def track(self):
+        return self._default.track()
+
+    @property
+    def value(self) -> float:
+        return self._default.value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(float(b) for b in buckets if b != float("inf")))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+    @property
+    def count(self) -> float:
+        return self._default.count
+
+    def _render_child(self, values: Tuple[str, ...], child) -> List[str]:
+        cumulative, total = child.snapshot()
+        names = self.labelnames + ("le",)
+        lines = [
+            f"{self.name}_bucket{_labels(names, values + (_le(bound),))} {_number(count)}"
+            for bound, count in zip(self.buckets + (float("inf"),), cumulative)
+        ]
+        labels = _labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_number(total)}")
+        lines.append(f"{self.name}_count{labels} {_number(cumulative[-1])}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def _le(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+def _number(value: float) -> str:
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, documentation: str, labelnames: Sequence[str], **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif type(metric) is not cls or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"metric {name} already exists as a {metric.kind} with labels {metric.labelnames}")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """The Prometheus text exposition (format 0.0.4) of every metric."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+
+
+def serve(port: int, host: str = "127.0.0.1", registry: Registry = REGISTRY) -> "ThreadingHTTPServer":
+    """Serve `GET /metrics` on `host:port` from a daemon thread; `server.shutdown()` stops it."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
@@ -0,0 +1,353 @@
+"""Record real LLM and tool traffic to a cassette file and replay it deterministically.
+
+Recording wraps the live clients:
+
+    cassette = Cassette("transcripts/weather.jsonl")
+    llm = RecordingLLM(OpenAIGPT4o(), cassette)
+    tools = record_tools(get_tools(), cassette)      # MCPProxyTools included
+
+and replaying needs neither an API key nor an MCP server:
+
+    cassette = Cassette("transcripts/weather.jsonl")
+    runner = AgentRunner(llm=ReplayLLM(cassette), tools=replay_tools(cassette))
+
+A cassette is a JSONL file with one entry per LLM call (`chat`, `achat` or
+`astream`) or tool call, holding the request, the response and how long it
+took, plus one entry with the tool specs (name, description, parameters),
+so the replayed tools produce the same prompt. Replay looks an entry up by
+a hash of the request (messages + functions for the LLM, name + input for a
+tool). Repeated identical requests get their recorded responses in order,
+and start over once they run out, so a benchmark can replay a transcript
+any number of times. A request that was never recorded raises `ReplayMiss`.
+
+Replayed calls return immediately by default (`latency_scale=0`), which
+leaves only the agent's own work to measure; `latency_scale=1` sleeps for
+the recorded latency instead.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import inspect
+import json
+import os
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from tools.cache import canonical_json
+
+
+class ReplayMiss(KeyError):
+    """The request is not in the cassette (the prompt, tools or inputs changed since recording)."""
+
+
+def _llm_key(messages, functions, function_call, parallel) -> Tuple[str, int]:
+    """(hash, size in bytes) of an LLM request; the size is what was sent as the prompt."""
+    raw = canonical_json({
+        "messages": messages, "functions": functions, "function_call": function_call, "parallel": parallel,
+    }).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest(), len(raw)
+
+
+def _tool_key(name: str, input: Any) -> str:
+    return hashlib.sha256(canonical_json({"tool": name, "input": input}).encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    def __init__(self, path: str):
+        self.path = path
+        self.tool_specs: List[Dict[str, Any]] = []
+        self._entries: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        self._next: Dict[Tuple[str, str], int] = {}
+        # time spent hashing requests and looking them up during replay (not the agent's)
+        self.lookup_seconds = 0.0
+        self._lock = threading.Lock()
+        self._file = None
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        self._index(json.loads(line))
+
+    def _index(self, entry: Dict[str, Any]):
+        if entry["kind"] == "tools":
+            self.tool_specs = entry["tools"]
+        else:
+            self._entries.setdefault((entry["kind"], entry["key"]), []).append(entry)
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+    def entries(self, kind: str) -> List[Dict[str, Any]]:
+        return [e for (k, _), entries in self._entries.items() if k == kind for e in entries]
+
+    def record(self, entry: Dict[str, Any]):
+        line = json.dumps(entry, ensure_ascii=False, default=str)
+        with self._lock:
+            if self._file is None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line + "\n")
+            self._file.flush()
+            self._index(entry)
+
+    def next(self, kind: str, key: str, what: str) -> Dict[str, Any]:
+        """The next recorded entry for this request, cycling through repeats."""
+        with self._lock:
+            entries = self._entries.get((kind, key))
+            if not entries:
+                raise ReplayMiss(f"{what} is not in cassette {self.path}")
+            i = self._next.get((kind, key), 0)
+            self._next[(kind, key)] = (i + 1) % len(entries)
+            return entries[i]
+
+    def rewind(self):
+        with self._lock:
+            self._next.clear()
+            self.lookup_seconds = 0.0
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+# --- LLM ---------------------------------------------------------------------
+
+
+class RecordingLLM:
+    """Wraps an LLM client (`chat` / `achat` / `astream`) and records every call to `cassette`."""
+
+    def __init__(self, llm: Any, cassette: Cassette):
+        self.llm = llm
+        self.cassette = cassette
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+    def _record(self, method, messages, functions, function_call, parallel, started, **result):
+        key, size = _llm_key(messages, functions, function_call, parallel)
+        self.cassette.record({
+            "kind": "llm",
+            "key": key,
+            "method": method,
+            "prompt_bytes": size,
+            "latency": time.perf_counter() - started,
+            # for reading the transcript; replay only uses the key
+            "request": messages,
+            **result,
+        })
+
+    def chat(self, messages, functions=None, function_call=None, parallel=False) -> dict:
+        started = time.perf_counter()
+        response = self.llm.chat(messages, functions=functions, function_call=function_call, parallel=parallel)
+        self._record("chat", messages, functions, function_call, parallel, started, response=response)
+        return response
+
+    async def achat(self, messages, functions=None, function_call=None, parallel=False) -> dict:
+        started = time.perf_counter()
+        kwargs = {"functions": functions, "function_call": function_call, "parallel": parallel}
+        if inspect.iscoroutinefunction(getattr(self.llm, "achat", None)):
+            response = await self.llm.achat(messages, **kwargs)
+        else:
+            loop = asyncio.get_running_loop()
+            response = await loop.run_in_executor(None, lambda: self.llm.chat(messages, **kwargs))
+        self._record("achat", messages, functions, function_call, parallel, started, response=response)
+        return response
+
+    async def astream(self, messages, functions=None, function_call=None, parallel=False) -> AsyncIterator[dict]:
+        started = time.perf_counter()
+        deltas = []
+        async for delta in self.llm.astream(
+            messages, functions=functions, function_call=function_call, parallel=parallel
+        ):
+            deltas.append(delta)
+            yield delta
+        self._record("astream", messages, functions, function_call, parallel, started, deltas=deltas)
+
+
+class ReplayLLM:
+    """Answers `chat` / `achat` / `astream` from a cassette; counts calls and prompt bytes."""
+
+    def __init__(self, cassette: Cassette, latency_scale: float = 0.0):
+        self.cassette = cassette
+        self.latency_scale = latency_scale
+        self.model = "replay"
+        self.calls = 0
+        self.prompt_bytes: List[int] = []
+
+    def _entry(self, messages, functions, function_call, parallel) -> Dict[str, Any]:
+        started = time.perf_counter()
+        key, size = _llm_key(messages, functions, function_call, parallel)
+        try:
+            entry = self.cassette.next("llm", key, f"LLM request of {len(messages)} messages")
+        finally:
+            self.cassette.lookup_seconds += time.perf_counter() - started
+        self.calls += 1
+        self.prompt_bytes.append(size)
+        return entry
+
+    @staticmethod
+    def _response(entry: Dict[str, Any]) -> dict:
+        if "response" in entry:
+            return dict(entry["response"])
+        # recorded as a stream: fold the deltas back into a `chat` response
+        content = "".join(d.get("content", "") for d in entry["deltas"])
+        calls: Dict[int, Dict[str, str]] = {}
+        for d in entry["deltas"]:
+            tc = d.get("tool_call")
+            if tc:
+                call = calls.setdefault(tc["index"], {"name": "", "arguments": ""})
+                call["name"] += tc.get("name") or ""
+                call["arguments"] += tc.get("arguments") or ""
+        if calls:
+            return {"function_calls": [calls[i] for i in sorted(calls)]}
+        return {"content": content}
+
+    def chat(self, messages, functions=None, function_call=None, parallel=False) -> dict:
+        entry = self._entry(messages, functions, function_call, parallel)
+        if self.latency_scale:
+            time.sleep(entry["latency"] * self.latency_scale)
+        return self._response(entry)
+
+    async def achat(self, messages, functions=None, function_call=None, parallel=False) -> dict:
+        entry = self._entry(messages, functions, function_call, parallel)
+        if self.latency_scale:
+            await asyncio.sleep(entry["latency"] * self.latency_scale)
+        return self._response(entry)
+
+    async def astream(self, messages, functions=None, function_call=None, parallel=False) -> AsyncIterator[dict]:
+        entry = self._entry(messages, functions, function_call, parallel)
+        deltas = entry.get("deltas")
+        if deltas is None:
+            response = self._response(entry)
+            deltas = [{"content": response["content"]}] if "content" in response else [
+                {"tool_call": {"index": i, **fc}} for i, fc in enumerate(response.get("function_calls") or [])
+            ]
+        pause = entry["latency"] * self.latency_scale / max(1, len(deltas))
+        for delta in deltas:
+            if pause:
+                await asyncio.sleep(pause)
+            yield delta
+
+
+# --- tools -------------------------------------------------------------------
+
+
+def _spec(name: str, tool: Any) -> Dict[str, Any]:
+    return {
+        "name": name,
+        "description": getattr(tool, "description", "") or "",
+        "parameters": getattr(tool, "parameters", None),
+        "cacheable": bool(getattr(tool, "cacheable", False)),
+        "cache_ttl": getattr(tool, "cache_ttl", None),
+        "speculative": bool(getattr(tool, "speculative", False)),
+    }
+
+
+class RecordingTool:
+    """Wraps a tool (local or `MCPProxyTool`) and records every call to `cassette`."""
+
+    def __init__(self, tool: Any, cassette: Cassette, name: Optional[str] = None):
+        self.tool = tool
+        self.cassette = cassette
+        self.name = name or tool.name
+
+    def __getattr__(self, name):
+        return getattr(self.tool, name)
+
+    def _record(self, input: Any, output: Any, started: float, raised: bool = False):
+        self.cassette.record({
+            "kind": "tool",
+            "key": _tool_key(self.name, input),
+            "tool": self.name,
+            "input": input,
+            "output": output,
+            "raised": raised,
+            "latency": time.perf_counter() - started,
+        })
+
+    def run(self, input: Any) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            output = self.tool.run(input)
+        except Exception as e:
+            self._record(input, str(e), started, raised=True)
+            raise
+        self._record(input, output, started)
+        return output
+
+
+class AsyncRecordingTool(RecordingTool):
+    """`RecordingTool` for tools with an async `arun` (`MCPProxyTool`), so the agent still awaits them."""
+
+    async def arun(self, input: Any) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            output = await self.tool.arun(input)
+        except Exception as e:
+            self._record(input, str(e), started, raised=True)
+            raise
+        self._record(input, output, started)
+        return output
+
+
+class ReplayTool:
+    """A tool answering from a cassette, with the recorded tool's name, description and parameters."""
+
+    def __init__(self, cassette: Cassette, spec: Dict[str, Any], latency_scale: float = 0.0):
+        self.cassette = cassette
+        self.latency_scale = latency_scale
+        self.name = spec["name"]
+        self.description = spec.get("description", "")
+        self.parameters = spec.get("parameters")
+        self.cacheable = spec.get("cacheable", False)
+        self.speculative = spec.get("speculative", False)
+        if spec.get("cache_ttl") is not None:
+            self.cache_ttl = spec["cache_ttl"]
+        # recorded latencies of every call, for reports
+        self.latencies = [e["latency"] for e in cassette.entries("tool") if e["tool"] == self.name]
+
+    def _entry(self, input: Any) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            return self.cassette.next("tool", _tool_key(self.name, input), f"tool call {self.name}({input!r:.80})")
+        finally:
+            self.cassette.lookup_seconds += time.perf_counter() - started
+
+    @staticmethod
+    def _output(entry: Dict[str, Any]) -> Any:
+        if entry.get("raised"):
+            raise RuntimeError(entry["output"])
+        return entry["output"]
+
+    def run(self, input: Any) -> Dict[str, Any]:
+        entry = self._entry(input)
+        if self.latency_scale:
+            time.sleep(entry["latency"] * self.latency_scale)
+        return self._output(entry)
+
+    async def arun(self, input: Any) -> Dict[str, Any]:
+        entry = self._entry(input)
+        if self.latency_scale:
+            await asyncio.sleep(entry["latency"] * self.latency_scale)
+        return self._output(entry)
+
+
+def record_tools(tools: Dict[str, Any], cassette: Cassette) -> Dict[str, Any]:
+    """Wrap every tool in a `RecordingTool` and store their specs in `cassette`."""
+    cassette.record({"kind": "tools", "tools": [_spec(name, tool) for name, tool in tools.items()]})
+    wrapped = {}
+    for name, tool in tools.items():
+        is_async = inspect.iscoroutinefunction(getattr(type(tool), "arun", None))
+        wrapped[name] = (AsyncRecordingTool if is_async else RecordingTool)(tool, cassette, name)
+    return wrapped
+
+
+def replay_tools(cassette: Cassette, latency_scale: float = 0.0) -> Dict[str, ReplayTool]:
+    """One `ReplayTool` per tool recorded in `cassette`, in the recorded order."""
+    return {spec["name"]: ReplayTool(cassette, spec, latency_scale) for spec in cassette.tool_specs}
@@ -0,0 +1,311 @@
+"""Speculative first tool call: run the likely first action while the LLM plans it.
+
+Many queries have an obvious first action ("que horas são?" -> `current_time`,
+"weather in Paris" -> `weather_now`, a PromQL expression -> `prometheus_query`),
+yet the agent waits for a whole LLM round trip before calling anything. With
+`AgentRunner(speculator=Speculator())`, the first action predicted from the
+query alone starts together with the first LLM call. If the plan asks for
+the same action (same tool, same input), its observation is ready at once
+(or sooner than it would be); otherwise the call is cancelled and its result
+discarded.
+
+Predictions come from
+- rules (`DEFAULT_RULES`): regexes that also build the tool input from the
+  query (the city, the PromQL expression);
+- `NGramModel`: naive Bayes over the query's word unigrams and bigrams,
+  labelled with the first action of earlier runs. The runner teaches it each
+  run's first plan as it happens; `python -m speculation train` builds one
+  from batch results (`cli.py --batch ... -o results.jsonl`).
+
+Only side-effect-free tools run speculatively: tools declaring
+`speculative = True` (`current_time`, `read_file`, `search`) and remote MCP
+tools named in `safe_tools` (they cannot carry attributes; default
+`DEFAULT_SAFE_TOOLS`). A wrong guess costs one call that nobody waits for.
+"""
+from __future__ import annotations
+
+import json
+import math
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import metrics
+from tools.cache import canonical_json
+
+# remote MCP tools served by mcp/server.py that only read
+DEFAULT_SAFE_TOOLS = frozenset({"weather_now", "weather_forecast", "prometheus_query"})
+
+_SPECULATIONS = metrics.counter(
+    "agent_speculations_total", "Speculative first tool calls by result (hit, miss)", ["result"]
+)
+_SAVED = metrics.counter(
+    "agent_speculation_saved_seconds_total", "Tool latency hidden behind the first LLM call by speculative hits"
+)
+
+_WORD = re.compile(r"\w+")
+
+
+@dataclass
+class Rule:
+    """`pattern` (searched case-insensitively) predicts `tool`, with the input `make_input(match)`."""
+
+    pattern: str
+    tool: str
+    make_input: Callable[["re.Match[str]"], Dict[str, Any]] = lambda match: {}
+
+    def __post_init__(self):
+        self._regex = re.compile(self.pattern, re.IGNORECASE)
+
+    def predict(self, query: str) -> Optional[Dict[str, Any]]:
+        match = self._regex.search(query)
+        if match is None:
+            return None
+        return {"tool": self.tool, "input": self.make_input(match)}
+
+
+# a metric name as PromQL prose rarely has one: `up`, a name with `_` or `:`, or a name before `{` / `[`
+_METRIC = r"(?:\bup\b|\b[a-zA-Z_:][\w:]*[_:][\w:]*|\b[a-zA-Z_:][\w:]*\s*[{\[])"
+# a capitalized place name ("São Paulo", "Rio de Janeiro"), matched case-sensitively
+_CITY = r"(?-i:[^\W\d_a-zß-ÿ][\w'-]*(?:\s+(?:(?:de|do|da|dos|das)\s+)?[^\W\d_a-zß-ÿ][\w'-]*)*)"
+
+DEFAULT_RULES: Tuple[Rule, ...] = (
+    # a selector (`up{job="api"}`), or an aggregation / range function call whose first argument names a metric
+    Rule(
+        r"(?P<expr>\b(?:sum|avg|min|max|count|rate|irate|increase|delta|topk|bottomk|histogram_quantile"
+        rf"|\w+_over_time)\s*\((?=[^)]*{_METRIC}).*\)|\b[a-zA-Z_:][\w:]*\{{[^{{}}]*\}}(?:\[\w+\])?)",
+        "prometheus_query",
+        lambda m: {"query": m.group("expr").strip()},
+    ),
+    Rule(
+        r"\bweather\s+(?:in|at|for)\s+"
+        r"(?P<city>[^\W\d_][\w .'-]*?)\s*(?:\b(?:today|now)\b|[?!.,;]|$)",
+        "weather_now",
+        lambda m: {"city": m.group("city")},
+    ),
+    # "tempo" alone is also "time" / "duration" ("tempo de resposta"): only "tempo em <Cidade>"
+    Rule(
+        rf"\b(?:(?:clima|temperatura)\s+(?:em|no|na|de|para)|tempo\s+(?:em|no|na))\s+(?P<city>{_CITY})",
+        "weather_now",
+        lambda m: {"city": m.group("city")},
+    ),
+    Rule(r"\b(?:what time|time is it|current time|que horas|hora atual|horário atual)\b", "current_time"),
+)
+
+
+def _features(query: str) -> List[str]:
+    words = _WORD.findall(query.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class NGramModel:
+    """Multinomial naive Bayes from query n-grams to the first action (or to no action)."""
+
+    # the label of runs whose first plan called no tool
+    NO_ACTION = ""
+
+    def __init__(self):
+        self.label_counts: Dict[str, int] = {}
+        self.feature_counts: Dict[str, Dict[str, int]] = {}
+        self.feature_totals: Dict[str, int] = {}
+        self.vocabulary: set = set()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return sum(self.label_counts.values())
+
+    def add(self, query: str, action: Optional[Dict[str, Any]]):
+        label = canonical_json({"tool": action.get("tool"), "input": action.get("input")}) if action else self.NO_ACTION
+        features = _features(query)
+        with self._lock:
+            self.label_counts[label] = self.label_counts.get(label, 0) + 1
+            counts = self.feature_counts.setdefault(label, {})
+            for f in features:
+                counts[f] = counts.get(f, 0) + 1
+            self.feature_totals[label] = self.feature_totals.get(label, 0) + len(features)
+            self.vocabulary.update(features)
+
+    def predict(self, query: str) -> Tuple[Optional[Dict[str, Any]], float, int]:
+        """(most likely first action or None, its probability, runs seen with it)."""
+        features = _features(query)
+        with self._lock:
+            if not self.label_counts:
+                return None, 0.0, 0
+            total = sum(self.label_counts.values())
+            vocabulary = len(self.vocabulary) + 1
+            scores = {}
+            for label, count in self.label_counts.items():
+                counts = self.feature_counts[label]
+                denominator = math.log(self.feature_totals[label] + vocabulary)
+                scores[label] = math.log(count / total) + sum(
+                    math.log(counts.get(f, 0) + 1) - denominator for f in features
+                )
+            best = max(scores, key=scores.get)
+            seen = self.label_counts[best]
+        top = scores[best]
+        probability = 1.0 / sum(math.exp(s - top) for s in scores.values())
+        return (json.loads(best) if best != self.NO_ACTION else None), probability, seen
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"labels": dict(self.label_counts), "features": {k: dict(v) for k, v in self.feature_counts.items()}}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "NGramModel":
+        model = cls()
+        model.label_counts = dict(data["labels"])
+        model.feature_counts = {k: dict(v) for k, v in data["features"].items()}
+        model.feature_totals = {k: sum(v.values()) for k, v in model.feature_counts.items()}
+        model.vocabulary = {f for counts in model.feature_counts.values() for f in counts}
+        return model
+
+    def save(self, path: str):
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "NGramModel":
+        """The model saved at `path`, or an empty one if there is none yet."""
+        if not os.path.exists(path):
+            return cls()
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+    def train(self, records: Iterable[Dict[str, Any]]) -> int:
+        """Learn from run records (`{"query", "tool_calls"}`, the batch results format); returns how many."""
+        n = 0
+        for record in records:
+            if record.get("status", "ok") != "ok" or not record.get("query"):
+                continue
+            calls = record.get("tool_calls") or []
+            self.add(record["query"], calls[0] if calls else None)
+            n += 1
+        return n
+
+
+@dataclass
+class SpeculationStats:
+    hits: int = 0
+    misses: int = 0
+    # tool latency that overlapped the first LLM call, summed over hits
+    saved_seconds: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        guesses = self.hits + self.misses
+        return self.hits / guesses if guesses else 0.0
+
+
+class Speculation:
+    """One speculative call: its action, and when it started and finished."""
+
+    __slots__ = ("action", "started", "finished")
+
+    def __init__(self, action: Dict[str, Any]):
+        self.action = action
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+
+    def done(self, _future=None):
+        self.finished = time.perf_counter()
+
+
+class Speculator:
+    def __init__(
+        self,
+        model: Optional[NGramModel] = None,
+        rules: Sequence[Rule] = DEFAULT_RULES,
+        safe_tools: Iterable[str] = DEFAULT_SAFE_TOOLS,
+        min_confidence: float = 0.7,
+        min_examples: int = 3,
+        learn: bool = True,
+    ):
+        """`model` predicts when no rule matches, once it has seen `min_examples` runs with that first action."""
+        self.model = model if model is not None else NGramModel()
+        self.rules = list(rules)
+        self.safe_tools = frozenset(safe_tools)
+        self.min_confidence = min_confidence
+        self.min_examples = min_examples
+        # teach the model the first plan of every run
+        self.learn = learn
+        self.stats = SpeculationStats()
+        self._lock = threading.Lock()
+
+    def is_safe(self, tool_name: str, tools: Dict[str, Any]) -> bool:
+        tool = tools.get(tool_name)
+        return tool is not None and (tool_name in self.safe_tools or bool(getattr(tool, "speculative", False)))
+
+    def predict(self, query: str, tools: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """The first action to start now, or None (no confident guess, or not a safe tool)."""
+        for rule in self.rules:
+            action = rule.predict(query)
+            if action is not None:
+                break
+        else:
+            action, probability, seen = self.model.predict(query)
+            if action is None or probability < self.min_confidence or seen < self.min_examples:
+                return None
+        return action if self.is_safe(action["tool"], tools) else None
+
+    def observe(self, query: str, actions: List[Dict[str, Any]]):
+        """The first plan of a run asked for `actions` (possibly none)."""
+        if self.learn:
+            self.model.add(query, actions[0] if actions else None)
+
+    def settle(self, speculation: Speculation, hit: bool) -> float:
+        """Count a guess once the plan is known; returns the seconds it saved."""
+        saved = 0.0
+        if hit:
+            now = time.perf_counter()
+            saved = min(now, speculation.finished or now) - speculation.started
+        with self._lock:
+            if hit:
+                self.stats.hits += 1
+                self.stats.saved_seconds += saved
+            else:
+                self.stats.misses += 1
+        _SPECULATIONS.labels("hit" if hit else "miss").inc()
+        if saved:
+            _SAVED.inc(saved)
+        return saved
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train the model that predicts the agent's first tool call.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    train = sub.add_parser("train", help="learn from batch results files ({query, tool_calls} per line)")
+    train.add_argument("results", nargs="+")
+    train.add_argument("-o", "--model", required=True, help="model file, updated if it exists")
+    predict = sub.add_parser("predict")
+    predict.add_argument("query")
+    predict.add_argument("-m", "--model")
+    args = parser.parse_args(argv)
+
+    if args.command == "train":
+        model = NGramModel.load(args.model)
+        n = 0
+        for path in args.results:
+            with open(path, "r", encoding="utf-8") as f:
+                n += model.train(json.loads(line) for line in f if line.strip())
+        model.save(args.model)
+        print(json.dumps({"trained": n, "runs": len(model), "first_actions": len(model.label_counts)}))
+    else:
+        model = NGramModel.load(args.model) if args.model else NGramModel()
+        for rule in DEFAULT_RULES:
+            action = rule.predict(args.query)
+            if action is not None:
+                print(json.dumps({"rule": rule.tool, "action": action}, ensure_ascii=False))
+                return
+        action, probability, seen = model.predict(args.query)
+        print(json.dumps({"action": action, "probability": round(probability, 3), "seen": seen}, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Incremental parsing of streamed LLM output.
+
+`SSEDecoder` turns the raw bytes of a `stream: true` chat completion into
+`data:` payloads. `PlanStreamParser` consumes the plan JSON text as it is
+generated and reports, before the object is complete:
+
+- ("action", dict) as soon as the `action` object, or each element of the
+  `actions` list, has been closed;
+- ("answer", str) with every newly decoded piece of the `answer` string.
+
+The full plan is still parsed at the end by `AgentRunner._parse_llm_plan`;
+the parser only exists to act on the stream early.
+"""
+from __future__ import annotations
+
+import codecs
+import json
+from typing import Any, List, Optional, Tuple
+
+
+class SSEDecoder:
+    def __init__(self):
+        self._buffer = ""
+        self._data: List[str] = []
+        # a network read can end in the middle of a multibyte character
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+
+    def feed(self, chunk: bytes | str) -> List[str]:
+        """Return the `data` payload of every event completed by `chunk`."""
+        if isinstance(chunk, bytes):
+            chunk = self._decoder.decode(chunk)
+        self._buffer += chunk
+        events = []
+        *lines, self._buffer = self._buffer.split("\n")
+        for line in lines:
+            line = line.rstrip("\r")
+            if not line:
+                if self._data:
+                    events.append("\n".join(self._data))
+                    self._data = []
+            elif line.startswith("data:"):
+                value = line[5:]
+                self._data.append(value[1:] if value.startswith(" ") else value)
+            # comments (":...") and other fields (event, id, retry) are ignored
+        return events
+
+    def flush(self) -> List[str]:
+        self._buffer += self._decoder.decode(b"", final=True)
+        return self.feed("\n\n") if self._buffer or self._data else []
+
+
+def _decode_partial_string(raw: str) -> Tuple[str, int]:
+    """Decode the body of a JSON string that may end mid-escape: (text, characters of `raw` used).
+
+    `raw` starts on an escape boundary; what is left unused ends in an incomplete escape, or is the
+    first half of a surrogate pair (`\\ud83d` without its `\\ude00`).
+    """
+    # `\ud83d\ude0` is the longest incomplete tail
+    for cut in range(0, min(len(raw), 11) + 1):
+        try:
+            text = json.loads(f'"{raw[:len(raw) - cut]}"', strict=False)
+        except ValueError:
+            continue
+        if text and "\ud800" <= text[-1] <= "\udbff":
+            continue
+        return text, len(raw) - cut
+    return "", 0
+
+
+class PlanStreamParser:
+    def __init__(self):
+        self.text = ""
+        self._pos = 0
+        self._depth = 0
+        self._started = False
+        self.done = False
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._reading_key = False
+        self._expect_key = False
+        self._key: Optional[str] = None
+        self._action_start: Optional[int] = None
+        self._action_depth = 0
+        self._answer_start: Optional[int] = None
+        self._answer_end: Optional[int] = None
+        # characters of the raw answer string decoded so far
+        self._answer_decoded = 0
+        self._answer_finished = False
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        self.text += chunk
+        events: List[Tuple[str, Any]] = []
+        text = self.text
+        for i in range(self._pos, len(text)):
+            c = text[i]
+            if self.done:
+                break
+            if not self._started:
+                if c == "{":
+                    self._started, self._depth, self._expect_key = True, 1, True
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._reading_key:
+                        self._reading_key = False
+                        self._key = json.loads(text[self._string_start:i + 1], strict=False)
+                    elif self._answer_start is not None and self._answer_end is None:
+                        self._answer_end = i
+                continue
+            if c == '"':
+                self._in_string, self._string_start = True, i
+                if self._depth == 1 and self._expect_key:
+                    self._reading_key, self._expect_key = True, False
+                elif self._depth == 1 and self._key == "answer" and self._answer_start is None:
+                    self._answer_start = i + 1
+            elif c == "," and self._depth == 1:
+                self._expect_key = True
+            elif c in "{[":
+                self._depth += 1
+                if c == "{" and (
+                    (self._depth == 2 and self._key == "action") or (self._depth == 3 and self._key == "actions")
+                ):
+                    self._action_start, self._action_depth = i, self._depth
+            elif c in "}]":
+                if self._action_start is not None and self._depth == self._action_depth:
+                    try:
+                        action = json.loads(text[self._action_start:i + 1])
+                    except ValueError:
+                        action = None
+                    if isinstance(action, dict) and action.get("tool"):
+                        events.append(("action", action))
+                    self._action_start = None
+                self._depth -= 1
+                if self._depth == 0:
+                    self.done = True
+        self._pos = len(text)
+        if self._answer_start is not None and not self._answer_finished:
+            end = self._answer_end if self._answer_end is not None else len(text)
+            decoded, used = _decode_partial_string(text[self._answer_start + self._answer_decoded:end])
+            if decoded:
+                events.append(("answer", decoded))
+            self._answer_decoded += used
+            self._answer_finished = self._answer_end is not None
+        return events
@@ -0,0 +1,89 @@
+import asyncio
+import contextlib
+import io
+import threading
+import unittest
+
+from agent import AgentRunner, AgentConfig
+from benchmarks._fake_llm import FakeLLMServer
+from llm import OpenAIGPT4o
+
+
+class ThreadRecordingEcho:
+    name = "echo"
+    description = "Return the input as-is"
+
+    def __init__(self):
+        self.threads = set()
+
+    def run(self, input):
+        self.threads.add(threading.current_thread().name)
+        return {"echo": input}
+
+
+class TestAgentAsync(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeLLMServer(latency=0.05).start()
+        self.llm = OpenAIGPT4o(api_key="test", base_url=self.server.base_url)
+        self.tool = ThreadRecordingEcho()
+        self.runner = AgentRunner(llm=self.llm, tools={"echo": self.tool}, config=AgentConfig())
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_concurrent_sessions_on_one_loop(self):
+        async def main():
+            try:
+                return await asyncio.gather(*(self.runner.arun(f"q{i}") for i in range(50)))
+            finally:
+                await self.llm.aclose()
+
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            answers = asyncio.run(main())
+        self.assertEqual(answers, ["ok"] * 50)
+        self.assertEqual(self.server.requests, 100)
+        # sync tools are offloaded, never run on the event loop thread
+        self.assertTrue(all(t.startswith("agent-tool") for t in self.tool.threads))
+
+    def test_sync_run_is_a_wrapper_and_refuses_running_loop(self):
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            self.assertEqual(self.runner.run("q"), "ok")
+
+        async def inside_loop():
+            self.runner.run("q")
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(inside_loop())
+
+    def test_close_stops_the_runner_threads(self):
+        class SyncLLM:
+            threads = set()
+
+            def chat(self, messages, **kwargs):
+                self.threads.add(threading.current_thread().name)
+                if messages[-1]["content"].startswith("Observation:"):
+                    return {"content": '{"final": true, "answer": "done"}'}
+                return {"content": '{"final": false, "action": {"tool": "echo", "input": {}}}'}
+
+        llm = SyncLLM()
+        with AgentRunner(llm=llm, tools={"echo": self.tool}, config=AgentConfig()) as runner:
+            with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+                self.assertEqual(runner.run("q"), "done")
+            threads = list(runner._executor._threads)
+        # a sync LLM runs on the runner's threads too, not on the loop's default executor
+        self.assertTrue(all(t.startswith("agent-tool") for t in llm.threads), llm.threads)
+        self.assertTrue(threads)
+        self.assertFalse(any(t.is_alive() for t in threads))
+
+        async def main():
+            async with AgentRunner(llm=llm, tools={"echo": self.tool}, config=AgentConfig()) as runner:
+                await runner.arun("q")
+            return list(runner._executor._threads)
+
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            threads = asyncio.run(main())
+        self.assertFalse(any(t.is_alive() for t in threads))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import json
+import threading
+import time
+import unittest
+
+from agent import AgentRunner, AgentConfig
+
+
+class SleepTool:
+    name = "sleep"
+    description = "Sleep for 'seconds' and return the input"
+
+    def __init__(self):
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def run(self, input):
+        with self.lock:
+            self.calls += 1
+        time.sleep(input.get("seconds", 0))
+        return {"slept": input.get("seconds", 0), "tag": input.get("tag")}
+
+
+class ScriptedLLM:
+    """Returns the queued responses in order and records the prompts it saw."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.prompts = []
+
+    def chat(self, messages, functions=None, **kwargs):
+        self.prompts.append(messages)
+        return self.responses.pop(0)
+
+
+def plan(**kwargs):
+    return {"content": json.dumps(kwargs)}
+
+
+class TestAgentParallel(unittest.TestCase):
+    def test_actions_run_concurrently_and_feed_one_observation(self):
+        tool = SleepTool()
+        actions = [{"tool": "sleep", "input": {"seconds": 0.2, "tag": i}} for i in range(4)]
+        llm = ScriptedLLM([
+            plan(final=False, thought="fan out", actions=actions, answer=None),
+            plan(final=True, thought="done", action=None, answer="ok"),
+        ])
+        runner = AgentRunner(llm=llm, tools={"sleep": tool}, config=AgentConfig(max_parallel_tools=4))
+        start = time.monotonic()
+        self.assertEqual(runner.run("go"), "ok")
+        self.assertLess(time.monotonic() - start, 0.6)
+        self.assertEqual(tool.calls, 4)
+        observation = json.loads(llm.prompts[1][-1]["content"][len("Observation: "):])
+        self.assertEqual([o["observation"]["tag"] for o in observation], [0, 1, 2, 3])
+
+    def test_function_calls_with_timeout(self):
+        tool = SleepTool()
+        llm = ScriptedLLM([
+            {"function_calls": [
+                {"name": "sleep", "arguments": json.dumps({"seconds": 0, "tag": "fast"})},
+                {"name": "sleep", "arguments": json.dumps({"seconds": 1, "tag": "slow"})},
+            ]},
+            plan(final=True, thought="done", action=None, answer="ok"),
+        ])
+        config = AgentConfig(max_parallel_tools=2, tool_timeout=0.2)
+        runner = AgentRunner(llm=llm, tools={"sleep": tool}, config=config)
+        self.assertEqual(runner.run("go"), "ok")
+        observation = json.loads(llm.prompts[1][-1]["content"][len("Observation: "):])
+        self.assertEqual(observation[0]["observation"]["tag"], "fast")
+        self.assertIn("timed out", observation[1]["observation"]["error"])
+
+    def test_repeated_action_detected_per_action(self):
+        tool = SleepTool()
+        same = {"tool": "sleep", "input": {"seconds": 0, "tag": "a"}}
+        other = {"tool": "sleep", "input": {"seconds": 0, "tag": "b"}}
+        llm = ScriptedLLM([
+            plan(final=False, thought="1", actions=[same], answer=None),
+            plan(final=False, thought="2", actions=[same, other], answer=None),
+            plan(final=False, thought="3", actions=[other], answer=None),
+        ])
+        runner = AgentRunner(llm=llm, tools={"sleep": tool})
+        self.assertEqual(runner.run("go"), "Agent stopped due to repeated tool loop")
+        # the repeated 'a' is skipped in iteration 2, 'b' runs once
+        self.assertEqual(tool.calls, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from agent import AgentConfig, AgentRunner
+from batch import Checkpoint, RateLimitedLLM, RateLimiter, read_queries, run_batch
+from llm_cache import CachedLLM
+
+
+class PlanLLM:
+    """Calls `echo` once, then answers with the query; fails on "boom"."""
+
+    def chat(self, messages, functions=None, function_call=None, parallel=False):
+        query = messages[2]["content"]
+        if query == "boom":
+            raise RuntimeError("LLM down")
+        if messages[-1]["content"].startswith("Observation"):
+            return {"content": json.dumps({"final": True, "answer": query.upper()})}
+        return {"content": json.dumps({"action": {"tool": "echo", "input": {"q": query}}})}
+
+
+class Echo:
+    name = "echo"
+    description = "Return the input as-is"
+
+    def run(self, input):
+        return {"echo": input}
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.runner = AgentRunner(llm=PlanLLM(), tools={"echo": Echo()}, config=AgentConfig())
+
+    def run_batch(self, lines, **kwargs):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            counts = run_batch(self.runner, read_queries(io.StringIO("\n".join(lines))), out, **kwargs)
+        return counts, [json.loads(line) for line in out.getvalue().splitlines()]
+
+    def test_read_queries_formats(self):
+        lines = io.StringIO('{"id": 7, "query": "a"}\n\n{"request_id": "r1", "body": "b"}\nplain text\n{"x": 1}\n')
+        self.assertEqual(list(read_queries(lines)), [("7", "a"), ("r1", "b"), ("4", "plain text")])
+
+    def test_results_carry_ids_and_stats(self):
+        counts, results = self.run_batch(
+            [json.dumps({"id": i, "query": f"q{i}"}) for i in range(10)] + ['{"id": "x", "query": "boom"}'],
+            workers=3,
+        )
+        self.assertEqual(counts, {"ok": 10, "error": 1, "skipped": 0})
+        by_id = {r["id"]: r for r in results}
+        self.assertEqual(by_id["3"]["answer"], "Q3")
+        self.assertEqual(by_id["3"]["iterations"], 2)
+        self.assertEqual(by_id["3"]["tool_calls"], [{"tool": "echo", "input": {"q": "q3"}, "ok": True}])
+        self.assertIn("LLM down", by_id["x"]["error"])
+        self.assertGreaterEqual(by_id["3"]["latency"], 0)
+
+    def test_checkpoint_resumes_and_retries_failures(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "done")
+            checkpoint = Checkpoint(path)
+            self.run_batch(["a", "boom"], checkpoint=checkpoint)
+            checkpoint.close()
+
+            checkpoint = Checkpoint(path)
+            counts, results = self.run_batch(["a", "boom", "c"], checkpoint=checkpoint)
+            checkpoint.close()
+        self.assertEqual(counts, {"ok": 1, "error": 1, "skipped": 1})
+        self.assertEqual(sorted(r["id"] for r in results), ["2", "3"])
+
+    def test_rate_limiter_spaces_requests(self):
+        limiter = RateLimiter(rate=50, burst=2)
+        started = time.monotonic()
+        for _ in range(6):
+            limiter.acquire()
+        # two immediate (burst), four more at 50/s
+        self.assertGreaterEqual(time.monotonic() - started, 4 / 50 - 0.01)
+
+    def test_llm_cache_hits_take_no_rate_limit_token(self):
+        llm = CachedLLM(RateLimitedLLM(PlanLLM(), RateLimiter(rate=1, burst=1)))
+        messages = [{"role": "system", "content": "s"}, {"role": "system", "content": "t"}]
+        messages.append({"role": "user", "content": "q"})
+        llm.chat(messages)
+        started = time.monotonic()
+        for _ in range(3):
+            llm.chat(messages)
+        self.assertLess(time.monotonic() - started, 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
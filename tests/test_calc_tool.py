@@ -0,0 +1,70 @@
+import time
+import unittest
+
+from tools import expression
+from tools.calc_tool import CalcTool
+from tools.expression import ExpressionError, compile_expression, evaluate
+
+
+class TestExpression(unittest.TestCase):
+    def test_scalars_and_math_functions(self):
+        self.assertEqual(evaluate("2 + 3 * 4"), 14)
+        self.assertEqual(evaluate("7 // 2 + 7 % 2 - -1"), 5)
+        self.assertAlmostEqual(evaluate("sqrt(16) + sin(pi / 2) + log(e)"), 6.0)
+        self.assertEqual(evaluate("max(1, x, 3) + round(2.567, 2)", {"x": 10}), 12.57)
+        self.assertEqual(evaluate("factorial(20)"), 2432902008176640000)
+        self.assertIs(evaluate("2 < 3"), True)
+
+    def test_vectorized_over_bindings(self):
+        self.assertEqual(evaluate("x ** 2 + y", {"x": [1, 2, 3], "y": 1}), [2.0, 5.0, 10.0])
+        self.assertEqual(evaluate("max(x, 2) * (x > 1)", {"x": [1, 5]}), [0.0, 5.0])
+        self.assertEqual(evaluate("atan2(y, x)", {"x": [1], "y": [0]}), [0.0])
+        # not finite -> None
+        self.assertEqual(evaluate("1 / x + log(x)", {"x": [0, -1, 1]}), [None, None, 1.0])
+        self.assertEqual(evaluate("pi", {"x": [1, 2]}), [3.141592653589793] * 2)
+        with self.assertRaises(ExpressionError):
+            evaluate("x + y", {"x": [1, 2], "y": [1, 2, 3]})
+        with self.assertRaises(ExpressionError):
+            evaluate("factorial(x)", {"x": [3]})
+
+    def test_rejects_unsafe_syntax(self):
+        for expr in [
+            "__import__('os')", "().__class__", "x.real", "[1, 2]", "'a' * 9", "lambda: 1",
+            "(x := 1)", "abs", "f(1)", "_pow(2, 3)", "sqrt(x=1)", "1 if 2 else 3",
+        ]:
+            with self.subTest(expr=expr), self.assertRaises(ExpressionError):
+                evaluate(expr, {"x": 1})
+
+    def test_magnitude_and_size_limits_fail_fast(self):
+        start = time.monotonic()
+        for expr in ["9**9**9", "2**5000", "10**2000 * 10**2000", "factorial(100000)", "(-8) ** (1/3)"]:
+            with self.subTest(expr=expr), self.assertRaises(ExpressionError):
+                evaluate(expr)
+        self.assertLess(time.monotonic() - start, 1.0)
+        with self.assertRaises(ExpressionError):
+            evaluate("+".join(["1"] * 200))
+        with self.assertRaises(ExpressionError):
+            evaluate("x", {"x": [[1, 2]]})
+        with self.assertRaises(ExpressionError):
+            evaluate("x + 1", {})
+
+    def test_compiled_expressions_are_cached(self):
+        expression._compiled.clear()
+        first = compile_expression("x * 2")
+        self.assertIs(compile_expression("x * 2"), first)
+        self.assertIsNot(compile_expression("x * 2", vectorized=True), first)
+
+
+class TestCalcTool(unittest.TestCase):
+    def test_run(self):
+        tool = CalcTool()
+        self.assertEqual(tool.run({"expr": "1+1"}), {"result": 2})
+        self.assertEqual(tool.run({"expr": "x * 2", "vars": {"x": [1, 2]}}), {"result": [2.0, 4.0]})
+        self.assertEqual(tool.run({"expr": "1/0"}), {"error": "division by zero"})
+        self.assertIn("too large", tool.run({"expr": "9**9**9"})["error"])
+        self.assertIn("error", tool.run({}))
+        self.assertIn("error", tool.run({"expr": "x", "vars": [1]}))
+
+
+if __name__ == "__main__":
+    unittest.main()
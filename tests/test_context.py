@@ -0,0 +1,57 @@
+import json
+import unittest
+
+from context import AgentContext
+
+HEAD = [
+    {"role": "system", "content": "You are an agent."},
+    {"role": "user", "content": "what happened?"},
+]
+
+
+def fill(context, steps, payload_chars=2000):
+    for i in range(steps):
+        action = {"tool": "read_file", "input": {"path": f"/var/log/{i}.log"}}
+        context.add_step(f"step {i}", [action], [{"lines": ["x" * payload_chars]}])
+
+
+class TestAgentContext(unittest.TestCase):
+    def test_oversized_observation_is_cut_on_add(self):
+        context = AgentContext(max_observation_tokens=100)
+        context.set_head(HEAD)
+        fill(context, 1, payload_chars=50_000)
+        last = context.messages()[-1]["content"]
+        self.assertTrue(last.startswith("Observation: "))
+        self.assertIn("truncated", last)
+        self.assertLess(len(last), 600)
+
+    def test_budget_respected_and_latest_step_verbatim(self):
+        for strategy in ("summarize", "truncate", "drop"):
+            context = AgentContext(budget=1500, strategy=strategy)
+            context.set_head(HEAD)
+            fill(context, 10)
+            prompt = context.messages()
+            self.assertLessEqual(context.prompt_tokens[-1], 1500, strategy)
+            self.assertEqual(prompt[:2], HEAD)
+            latest = json.loads(prompt[-1]["content"][len("Observation: "):])
+            self.assertEqual(len(latest["lines"][0]), 2000, strategy)
+
+    def test_steps_are_not_reserialized(self):
+        context = AgentContext(budget=10**6)
+        context.set_head(HEAD)
+        fill(context, 3, payload_chars=10)
+        first = context.messages()
+        fill(context, 1, payload_chars=10)
+        second = context.messages()
+        # earlier step messages are the very same objects, only new ones are appended
+        for a, b in zip(first[len(HEAD):], second[len(HEAD):]):
+            self.assertIs(a, b)
+        self.assertEqual(len(second), len(first) + 2)
+
+    def test_unknown_strategy(self):
+        with self.assertRaises(ValueError):
+            AgentContext(strategy="forget")
+
+
+if __name__ == "__main__":
+    unittest.main()
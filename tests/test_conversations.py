@@ -0,0 +1,121 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+from agent import AgentRunner
+from conversations import ConversationStore, summarize_turns
+
+
+class RecordingLLM:
+    """Answers "answer N" and records the prompts it saw."""
+
+    def __init__(self):
+        self.prompts = []
+
+    def chat(self, messages, functions=None, **kwargs):
+        self.prompts.append(messages)
+        return {"content": json.dumps({"final": True, "answer": f"answer {len(self.prompts)}"})}
+
+
+class TestConversationStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def store(self, **kwargs):
+        kwargs.setdefault("shards", 4)
+        return ConversationStore(self.tmp.name, **kwargs)
+
+    def test_tail_and_summary_survive_reopen(self):
+        store = self.store(tail=2, max_tail=4)
+        for i in range(10):
+            store.append("c1", f"q{i}", f"a{i}")
+        store.append("c2", "other", "x")
+        store.close()
+
+        # a fresh store reads the log, not the hot cache
+        store = self.store(tail=2, max_tail=4)
+        conversation = store.load("c1")
+        self.assertEqual(conversation.total, 10)
+        self.assertLessEqual(len(conversation.turns), 4)
+        self.assertIn("Q: q0 -> A: a0", conversation.summary)
+        messages = store.messages("c1")
+        self.assertEqual(messages[0]["role"], "system")
+        self.assertIn("q7", messages[0]["content"])
+        self.assertEqual([m["content"] for m in messages[1:]], ["q8", "a8", "q9", "a9"])
+        self.assertEqual(store.load("missing").total, 0)
+        self.assertEqual(store.messages("missing"), [])
+        store.close()
+
+    def test_segments_roll_and_torn_tail_is_dropped(self):
+        store = self.store(shards=1, segment_bytes=200)
+        for i in range(20):
+            store.append("c", f"question {i}", f"answer {i}")
+        store.close()
+        shard = os.path.join(self.tmp.name, "shard-00")
+        segments = sorted(os.listdir(shard))
+        self.assertGreater(len(segments), 2)
+        last = os.path.join(shard, segments[-1])
+        with open(last, "ab") as f:
+            f.write(b"\x01\x02\x03\x04\x00\x01\x00")  # a header cut short by a crash
+
+        store = self.store(shards=1, segment_bytes=200)
+        self.assertEqual(store.load("c").total, 20)
+        self.assertEqual(store.append("c", "q", "a"), 21)
+        store.close()
+        self.assertEqual(self.store(shards=1).load("c").turns[-1]["query"], "q")
+
+    def test_concurrent_writers_keep_every_turn_in_order(self):
+        store = self.store(tail=3, max_tail=6, hot=4)
+
+        def write(n):
+            for i in range(50):
+                store.append(f"conv-{n}", f"q{i}", f"a{i}")
+
+        threads = [threading.Thread(target=write, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        store.close()
+        store = self.store(tail=3, max_tail=6)
+        for n in range(8):
+            conversation = store.load(f"conv-{n}")
+            self.assertEqual(conversation.total, 50)
+            self.assertEqual(conversation.turns[-1]["query"], "q49")
+        store.close()
+
+    def test_summary_is_bounded(self):
+        turns = [{"query": "q" * 500, "answer": "a" * 500}] * 20
+        summary = summarize_turns("", turns, max_chars=1000)
+        self.assertLessEqual(len(summary), 1000)
+        self.assertTrue(summary.startswith("- Q: "))
+
+
+class TestAgentConversations(unittest.TestCase):
+    def test_run_resumes_conversation(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            llm = RecordingLLM()
+            runner = AgentRunner(llm=llm, tools={}, conversations=ConversationStore(tmp, shards=2))
+            self.assertEqual(runner.run("first", conversation_id="c"), "answer 1")
+            self.assertEqual(runner.run("second", conversation_id="c"), "answer 2")
+            runner.run("unrelated")
+            contents = [m["content"] for m in llm.prompts[1]]
+            self.assertEqual(contents[-3:], ["first", "answer 1", "second"])
+            self.assertEqual(llm.prompts[2][-1]["content"], "unrelated")
+            self.assertNotIn("first", [m["content"] for m in llm.prompts[2]])
+            self.assertEqual(runner.conversations.load("c").total, 2)
+            runner.conversations.close()
+
+    def test_conversation_id_needs_a_store(self):
+        runner = AgentRunner(llm=RecordingLLM(), tools={})
+        with self.assertRaises(ValueError):
+            runner.run("q", conversation_id="c")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from tools import file_tool
+from tools.file_tool import FileTool
+
+
+class TestFileTool(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "app.log")
+        with open(self.path, "w", encoding="utf-8") as f:
+            for i in range(1, 1001):
+                f.write(f"{i} {'ERROR disk full' if i % 100 == 0 else 'INFO ok'}\n")
+        self.tool = FileTool()
+        file_tool._indexes.clear()
+        # tiny index blocks so lookups cross many of them
+        patcher = mock.patch.object(file_tool, "BLOCK", 64)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_tool(self, **kwargs):
+        return self.tool.run(dict(path=self.path, **kwargs))
+
+    def test_head(self):
+        self.assertEqual(self.run_tool(lines=2), {"lines": ["1 INFO ok", "2 INFO ok"]})
+
+    def test_line_range_through_index(self):
+        out = self.run_tool(start_line=499, end_line=501)
+        self.assertEqual(out["lines"], ["499 INFO ok", "500 ERROR disk full", "501 INFO ok"])
+        self.assertEqual(out["total_lines"], 1000)
+        self.assertEqual(len(file_tool._indexes), 1)
+        self.assertEqual(self.run_tool(start_line=1000, end_line=1005)["lines"], ["1000 ERROR disk full"])
+        self.assertEqual(self.run_tool(start_line=2000)["lines"], [])
+
+    def test_tail(self):
+        self.assertEqual(self.run_tool(tail=2)["lines"], ["999 INFO ok", "1000 ERROR disk full"])
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("no newline at the end")
+        self.assertEqual(self.run_tool(tail=1)["lines"], ["no newline at the end"])
+
+    def test_byte_range(self):
+        out = self.run_tool(offset=0, length=4)
+        self.assertEqual((out["text"], out["next_offset"]), ("1 IN", 4))
+        self.assertEqual(self.run_tool(offset=-5)["text"], "full\n")
+
+    def test_grep_with_line_numbers_and_cap(self):
+        out = self.run_tool(grep=r"error", ignore_case=True, max_matches=3)
+        self.assertEqual([m["line"] for m in out["matches"]], [100, 200, 300])
+        self.assertTrue(out["truncated"])
+        rest = self.run_tool(grep="ERROR", offset=out["next_offset"])
+        self.assertEqual([m["line"] for m in rest["matches"]], [400, 500, 600, 700, 800, 900, 1000])
+        self.assertIn("invalid regex", self.run_tool(grep="(")["error"])
+
+    def test_output_is_bounded_by_bytes(self):
+        out = self.run_tool(start_line=1, end_line=1000, max_bytes=100)
+        self.assertLessEqual(sum(len(line) + 1 for line in out["lines"]), 100)
+        self.assertEqual(out["next_line"], len(out["lines"]) + 1)
+        self.assertTrue(self.run_tool(tail=100, max_bytes=50)["truncated"])
+        self.assertEqual(self.run_tool(offset=0, max_bytes=10)["length"], 10)
+
+    def test_changed_file_rebuilds_index(self):
+        self.run_tool(start_line=10, end_line=10)
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("a\nb\n")
+        self.assertEqual(self.run_tool(start_line=2, end_line=2)["lines"], ["b"])
+
+    def test_empty_file(self):
+        open(self.path, "w").close()
+        self.assertEqual(self.run_tool(tail=5), {"lines": []})
+        self.assertEqual(self.run_tool(grep="x"), {"matches": []})
+
+    @unittest.skipUnless(os.path.exists("/proc/self/status"), "needs /proc")
+    def test_pseudo_file_reports_size_zero(self):
+        self.assertEqual(os.stat("/proc/self/status").st_size, 0)
+        lines = self.tool.run({"path": "/proc/self/status", "lines": 3})["lines"]
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[0].startswith("Name:"))
+        self.assertTrue(self.tool.run({"path": "/proc/self/status", "grep": "^Pid:"})["matches"])
+
+    @unittest.skipUnless(hasattr(os, "mkfifo"), "needs FIFOs")
+    def test_pipe(self):
+        fifo = os.path.join(self.tmp.name, "fifo")
+        os.mkfifo(fifo)
+
+        def write():
+            with open(fifo, "w", encoding="utf-8") as f:
+                f.write("one\ntwo\nthree\n")
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        self.assertEqual(self.tool.run({"path": fifo, "lines": 2}), {"lines": ["one", "two"]})
+        writer.join(5)
+
+    def test_falls_back_when_mmap_fails(self):
+        with mock.patch.object(file_tool.mmap, "mmap", side_effect=OSError("no mmap")):
+            self.assertEqual(self.run_tool(lines=2)["lines"], ["1 INFO ok", "2 INFO ok"])
+            self.assertEqual(self.run_tool(tail=1)["lines"], ["1000 ERROR disk full"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from tools import graph_tool
+from tools.graph_tool import GraphTool, evict
+
+CHART = {"tipo": "barra", "dados": [3, 1, 2], "labels": ["a", "b", "c"], "titulo": "Vendas"}
+
+
+class TestGraphTool(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_renders_png_and_svg_named_by_content(self):
+        tool = GraphTool(out_dir=self.tmp.name, workers=0)
+        png = tool.run(CHART)
+        self.assertNotIn("cached", png)
+        with open(png["figure_path"], "rb") as f:
+            self.assertEqual(f.read(8), b"\x89PNG\r\n\x1a\n")
+        svg = tool.run(dict(CHART, formato="svg"))
+        self.assertTrue(svg["figure_path"].endswith(".svg"))
+        with open(svg["figure_path"], encoding="utf-8") as f:
+            self.assertIn("<svg", f.read())
+        # aliases normalize to the same chart
+        again = tool.run({"type": "bar", "data": [3, 1, 2], "labels": ["a", "b", "c"], "title": "Vendas"})
+        self.assertEqual(again["figure_path"], png["figure_path"])
+        self.assertTrue(again["cached"])
+        self.assertNotEqual(tool.run(dict(CHART, dados=[3, 1, 5]))["figure_path"], png["figure_path"])
+
+    def test_invalid_requests(self):
+        tool = GraphTool(out_dir=self.tmp.name, workers=0)
+        self.assertIn("error", tool.run({"dados": "x"}))
+        self.assertIn("não suportado", tool.run({"tipo": "radar", "dados": [1]})["error"])
+        self.assertIn("error", tool.run({"dados": [1], "formato": "gif"}))
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    def test_eviction_by_age_then_size(self):
+        now = time.time()
+        for name, size, age in [("graph_old.png", 10, 7200), ("graph_a.png", 40, 30), ("graph_b.png", 40, 20),
+                                ("graph_c.png", 40, 10), ("graph_x.png.1.tmp", 1000, 9000), ("keep.txt", 1, 9000)]:
+            path = os.path.join(self.tmp.name, name)
+            with open(path, "wb") as f:
+                f.write(b"x" * size)
+            os.utime(path, (now - age, now - age))
+        self.assertEqual(evict(self.tmp.name, max_bytes=90, max_age=3600, now=now), 2)
+        self.assertEqual(
+            sorted(os.listdir(self.tmp.name)), ["graph_b.png", "graph_c.png", "graph_x.png.1.tmp", "keep.txt"]
+        )
+
+    def test_worker_pool_shares_concurrent_identical_renders(self):
+        tool = GraphTool(out_dir=self.tmp.name, workers=1)
+        submitted = []
+        pool = graph_tool._get_pool(1)
+        real_submit = pool.submit
+
+        def submit(*args):
+            submitted.append(args[1:])
+            return real_submit(*args)
+
+        results = []
+        with mock.patch.object(pool, "submit", submit):
+            threads = [threading.Thread(target=lambda: results.append(tool.run(CHART))) for _ in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        self.assertEqual(len({r["figure_path"] for r in results}), 1)
+        self.assertTrue(os.path.exists(results[0]["figure_path"]))
+        self.assertEqual(len(submitted), 1)
+
+    def test_broken_pool_is_replaced(self):
+        tool = GraphTool(out_dir=self.tmp.name, workers=1)
+        pool = graph_tool._get_pool(1)
+        pool.submit(int).result(30)  # workers started
+        for process in list(pool._processes.values()):
+            process.kill()
+            process.join()
+        result = tool.run(CHART)
+        self.assertNotIn("error", result)
+        self.assertTrue(os.path.exists(result["figure_path"]))
+        self.assertIsNot(graph_tool._get_pool(1), pool)
+        self.assertEqual(tool._pending, {})
+
+    def test_pool_grows_for_more_workers(self):
+        small = graph_tool._get_pool(1)
+        self.assertIs(graph_tool._get_pool(1), small)
+        bigger = graph_tool._get_pool(2)
+        self.assertIsNot(bigger, small)
+        self.assertIs(graph_tool._get_pool(1), bigger)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from agent import AgentRunner
+import tools
+from tools import get_tools, specs
+from tools.cache import ToolResultCache
+from tools.lazy import LazyTool
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_fresh(code: str) -> str:
+    """Run `code` in a new interpreter (clean sys.modules) and return its stdout."""
+    proc = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, env=os.environ)
+    if proc.returncode != 0:
+        raise AssertionError(proc.stderr)
+    return proc.stdout.strip()
+
+
+class TestLazyTools(unittest.TestCase):
+    def test_heavy_modules_not_imported_until_used(self):
+        out = run_fresh(
+            "import sys, agent, tools\n"
+            "catalog = tools.get_tools()\n"
+            "catalog.functions, catalog.prompt_message\n"
+            "catalog['echo'].run({'text': 'hi'}); catalog['calc'].run({'expr': '1+1'})\n"
+            "print('matplotlib' in sys.modules, 'mcp' in sys.modules, 'tools.graph_tool' in sys.modules)\n"
+            "catalog['graph'].load()\n"
+            "print('tools.graph_tool' in sys.modules, 'matplotlib' in sys.modules)\n"
+        )
+        # charts are rendered in worker processes, so matplotlib never enters this one
+        self.assertEqual(out.splitlines(), ["False False False", "True False"])
+
+    def test_spec_snapshot_is_up_to_date(self):
+        current = [specs.describe(target) for target in specs.TARGETS]
+        self.assertEqual(specs.load(), current, "tools/specs.json is stale: run `python -m tools.specs`")
+        for tool, spec in zip(tools._specs(), current):
+            with self.subTest(tool=tool.name):
+                self.assertEqual({key: getattr(tool, key) for key in spec}, spec)
+
+    def test_runner_loads_tools_off_the_event_loop(self):
+        loaded_on = []
+
+        class Recording(LazyTool):
+            def load(self):
+                if not self.loaded:
+                    loaded_on.append((self.name, threading.current_thread() is threading.main_thread()))
+                return super().load()
+
+        tools = {
+            "calc": Recording("tools.calc_tool:CalcTool", "calc", cacheable=True),
+            "current_time": Recording("tools.current_time_tool:CurrentTimeTool", "current_time", cacheable=True,
+                                      keyed=True),
+        }
+        runner = AgentRunner(llm=None, tools=tools, cache=ToolResultCache())
+
+        async def main():
+            return [
+                await runner._arun_tool("calc", {"expr": "1+1"}),
+                await runner._arun_tool("current_time", {"timezone": "UTC"}),
+            ]
+
+        results = asyncio.run(main())
+        self.assertFalse(any("error" in r for r in results), results)
+        self.assertEqual(loaded_on, [("calc", False), ("current_time", False)])
+
+    def test_loads_once_and_delegates(self):
+        tool = LazyTool("tools.file_tool:FileTool", "read_file", keyed=True)
+        self.assertFalse(tool.loaded)
+        self.assertEqual(tool.run({"path": __file__, "lines": 1}), {"lines": ["import asyncio"]})
+        self.assertTrue(tool.loaded)
+        first = tool.load()
+        self.assertIs(tool.load(), first)
+        # the key of a keyed tool comes from the real one
+        self.assertEqual(tool.cache_key({"path": "/nonexistent"}), first.cache_key({"path": "/nonexistent"}))
+
+    def test_memory_search_only_with_a_store(self):
+        with tempfile.TemporaryDirectory() as d, mock.patch.dict(os.environ, {"AGENT_MEMORY": d}):
+            self.assertNotIn("memory_search", get_tools())
+            open(os.path.join(d, "memory.db"), "w").close()
+            self.assertIn("memory_search", get_tools())
+
+
+if __name__ == "__main__":
+    unittest.main()
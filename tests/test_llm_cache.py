@@ -0,0 +1,105 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from llm_cache import CachedLLM, ngram_vector
+from tools.cache import SQLiteCacheBackend
+
+
+class CountingLLM:
+    model = "fake"
+    temperature = 0.2
+
+    def __init__(self):
+        self.calls = 0
+
+    def chat(self, messages, functions=None, function_call=None, parallel=False):
+        self.calls += 1
+        return {"content": f"answer {self.calls}"}
+
+    async def astream(self, messages, functions=None, function_call=None, parallel=False):
+        self.calls += 1
+        yield {"tool_call": {"index": 0, "name": "calc", "arguments": ""}}
+        yield {"tool_call": {"index": 0, "name": "", "arguments": '{"expression": "1+1"}'}}
+
+
+def first_prompt(query):
+    return [{"role": "system", "content": "You are an agent"}, {"role": "user", "content": query}]
+
+
+class TestCachedLLM(unittest.TestCase):
+    def test_exact_hits(self):
+        llm = CachedLLM(CountingLLM())
+        first = llm.chat(first_prompt("what time is it"))
+        self.assertEqual(llm.chat(first_prompt("what time is it")), first)
+        llm.chat(first_prompt("what is the weather"))
+        self.assertEqual(llm.llm.calls, 2)
+        self.assertEqual((llm.cache_stats.exact_hits, llm.cache_stats.misses), (1, 2))
+        self.assertAlmostEqual(llm.cache_stats.hit_rate, 1 / 3)
+
+    def test_key_includes_functions_and_temperature(self):
+        inner = CountingLLM()
+        llm = CachedLLM(inner)
+        llm.chat(first_prompt("q"))
+        llm.chat(first_prompt("q"), functions=[{"name": "calc"}])
+        inner.temperature = 0.9
+        llm.chat(first_prompt("q"))
+        self.assertEqual(inner.calls, 3)
+
+    def test_similar_first_prompts(self):
+        llm = CachedLLM(CountingLLM(), similarity_threshold=0.8)
+        first = llm.chat(first_prompt("CPU usage last hour"))
+        self.assertEqual(llm.chat(first_prompt("cpu usage  last hour?")), first)
+        self.assertNotEqual(llm.chat(first_prompt("weather in Paris")), first)
+        self.assertEqual(llm.cache_stats.similar_hits, 1)
+        # later iterations (with steps) only ever hit exactly
+        later = first_prompt("CPU usage last hour!") + [
+            {"role": "assistant", "content": "{}"}, {"role": "user", "content": "Observation: 1"},
+        ]
+        llm.chat(later)
+        self.assertEqual(llm.cache_stats.similar_hits, 1)
+
+    def test_ngram_vector_is_normalized(self):
+        vector = ngram_vector("hello world")
+        self.assertAlmostEqual(sum(v * v for v in vector.values()), 1.0)
+
+    def test_time_sensitive_observations_bypass(self):
+        llm = CachedLLM(CountingLLM())
+        prompt = first_prompt("what time is it") + [
+            {"role": "assistant", "content": '{"action": {"tool": "current_time", "input": {}}}'},
+            {"role": "user", "content": "Observation: {\"time\": \"12:00\"}"},
+        ]
+        llm.chat(prompt)
+        llm.chat(prompt)
+        self.assertEqual(llm.llm.calls, 2)
+        self.assertEqual(llm.cache_stats.bypassed, 2)
+
+    def test_stream_hit_replays_tool_calls(self):
+        llm = CachedLLM(CountingLLM())
+
+        async def collect():
+            return [d async for d in llm.astream(first_prompt("1+1"))]
+
+        asyncio.run(collect())
+        replay = asyncio.run(collect())
+        self.assertEqual(llm.llm.calls, 1)
+        self.assertEqual(
+            replay, [{"tool_call": {"index": 0, "name": "calc", "arguments": '{"expression": "1+1"}'}}]
+        )
+
+    def test_sqlite_backend_survives_restart(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "llm.db")
+            backend = SQLiteCacheBackend(path, table="llm_cache")
+            CachedLLM(CountingLLM(), backend=backend).chat(first_prompt("q"))
+            backend.close()
+            backend = SQLiteCacheBackend(path, table="llm_cache")
+            llm = CachedLLM(CountingLLM(), backend=backend)
+            self.assertEqual(llm.chat(first_prompt("q")), {"content": "answer 1"})
+            self.assertEqual(llm.llm.calls, 0)
+            backend.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import asyncio
+import json
+import time
+import unittest
+
+from benchmarks._fake_llm import FakeLLMServer
+from llm import OpenAIGPT4o
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+class TestLLMClient(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeLLMServer().start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def make_llm(self, **kwargs):
+        kwargs.setdefault("backoff_base", 0.01)
+        return OpenAIGPT4o(api_key="test", base_url=self.server.base_url, **kwargs)
+
+    def test_keep_alive_reuses_one_connection(self):
+        llm = self.make_llm()
+        for _ in range(5):
+            self.assertIn("content", llm.chat(MESSAGES))
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(llm.stats.calls, 5)
+
+    def test_retries_429_honouring_retry_after(self):
+        llm = self.make_llm()
+        self.server.faults += [{"status": 429, "headers": {"Retry-After": "0.3"}}, {"status": 503}]
+        start = time.monotonic()
+        self.assertIn("content", llm.chat(MESSAGES))
+        self.assertGreaterEqual(time.monotonic() - start, 0.3)
+        self.assertEqual(llm.stats.retries, 2)
+        self.assertEqual(llm.stats.recent[-1]["status"], 200)
+
+    def test_retry_after_is_capped_at_backoff_max(self):
+        llm = self.make_llm(backoff_max=0.2)
+        self.server.faults.append({"status": 429, "headers": {"Retry-After": "3600"}})
+        start = time.monotonic()
+        self.assertIn("content", llm.chat(MESSAGES))
+        self.assertLess(time.monotonic() - start, 2)
+
+    def test_gives_up_after_max_retries(self):
+        llm = self.make_llm(max_retries=1)
+        self.server.faults += [{"status": 500}, {"status": 500}]
+        with self.assertRaises(RuntimeError):
+            llm.chat(MESSAGES)
+        self.assertEqual(llm.stats.failures, 1)
+        self.assertEqual(self.server.requests, 2)
+
+    def test_read_timeout_is_retried(self):
+        llm = self.make_llm(read_timeout=0.2)
+        self.server.faults.append({"delay": 1.0})
+        self.assertIn("content", llm.chat(MESSAGES))
+        self.assertEqual(llm.stats.retries, 1)
+
+    def test_async_client_retries_and_keeps_alive(self):
+        llm = self.make_llm()
+        self.server.faults.append({"status": 429, "headers": {"Retry-After": "0"}})
+
+        async def main():
+            try:
+                return [await llm.achat(MESSAGES) for _ in range(3)]
+            finally:
+                await llm.aclose()
+
+        self.assertEqual(len(asyncio.run(main())), 3)
+        self.assertEqual(llm.stats.retries, 1)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_async_pool_bounds_open_connections(self):
+        llm = self.make_llm(pool_size=2)
+        self.server.latency = 0.05
+
+        async def main():
+            try:
+                return await asyncio.gather(*(llm.achat(MESSAGES) for _ in range(10)))
+            finally:
+                await llm.aclose()
+
+        self.assertEqual(len(asyncio.run(main())), 10)
+        self.assertEqual(self.server.connections, 2)
+
+    def test_stream_keeps_an_unterminated_last_event(self):
+        llm = self.make_llm()
+        self.server.faults.append({"unterminated": True})
+
+        async def main():
+            try:
+                return [d["content"] async for d in llm.astream(MESSAGES)]
+            finally:
+                await llm.aclose()
+
+        content = "".join(asyncio.run(main()))
+        self.assertEqual(json.loads(content)["action"]["tool"], "echo")
+
+
+if __name__ == "__main__":
+    unittest.main()
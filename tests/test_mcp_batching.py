@@ -0,0 +1,174 @@
+import asyncio
+import importlib.util
+import json
+import os
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from tools.catalog import ToolCatalog
+from tools.mcp_discovery import MCPToolDiscovery
+from tools.mcp_pool import MCPSessionPool
+from tools.mcp_proxy_tool import BATCH_VARIANTS, MCPProxyTool, _split_batch_result
+
+# mcp/tools/batching.py belongs to the server (the `mcp` name is the SDK); load it by path
+_spec = importlib.util.spec_from_file_location(
+    "mcp_batching",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mcp", "tools", "batching.py"),
+)
+batching = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(batching)
+
+URL = "http://mcp.test/mcp"
+
+
+def text_result(payload):
+    return SimpleNamespace(structuredContent=None, isError=False, content=[SimpleNamespace(text=json.dumps(payload))])
+
+
+class RecordingPool(MCPSessionPool):
+    """Pool whose calls never leave the process; answers `weather_many` like the server."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = []
+
+    async def _call_tool(self, url, tool_name, args):
+        self.calls.append((tool_name, args))
+        await asyncio.sleep(0.01)
+        if tool_name != "weather_many":
+            return text_result({"city": args["city"]})
+        return text_result({"status": "success", "results": [
+            {"error": "unknown city"} if c == "Atlantis" else {"city": c} for c in args["cities"]
+        ]})
+
+
+class TestRunBatch(unittest.TestCase):
+    def test_results_keep_input_order_with_per_item_errors(self):
+        def slow_square(x):
+            if x < 0:
+                raise ValueError("negative")
+            time.sleep(0.05 if x == 1 else 0)
+            return x * x
+
+        self.assertEqual(
+            asyncio.run(batching.run_batch(slow_square, [1, -1, 3])),
+            [1, {"error": "negative"}, 9],
+        )
+        with self.assertRaises(ValueError):
+            asyncio.run(batching.run_batch(slow_square, [0] * (batching.MAX_BATCH + 1)))
+
+    def test_items_run_on_the_tool_pool_within_the_tool_limit(self):
+        running, peak, threads = 0, 0, set()
+        lock = threading.Lock()
+
+        def work(x):
+            nonlocal running, peak
+            with lock:
+                running += 1
+                peak = max(peak, running)
+                threads.add(threading.current_thread().name)
+            time.sleep(0.01)
+            with lock:
+                running -= 1
+            return x
+
+        class Registrar:
+            def __init__(self, executor):
+                self.executor = executor
+
+            def concurrency(self, tool):
+                return {"weather_now": 3}[tool]
+
+        with ThreadPoolExecutor(8, thread_name_prefix="mcp-tool") as executor:
+            options = batching.batch_options(Registrar(executor), "weather_now")
+            self.assertEqual(asyncio.run(batching.run_batch(work, list(range(20)), **options)), list(range(20)))
+        self.assertEqual(peak, 3)
+        self.assertTrue(all(name.startswith("mcp-tool") for name in threads), threads)
+        self.assertEqual(batching.batch_options(SimpleNamespace(), "weather_now"), {})
+
+
+class TestCoalescing(unittest.TestCase):
+    def setUp(self):
+        self.pool = RecordingPool()
+        self.tool = MCPProxyTool(URL, "weather_now", "", pool=self.pool, batch=BATCH_VARIANTS["weather_now"])
+        self.tool.token = "key"
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_concurrent_calls_share_one_batch_call(self):
+        async def main():
+            cities = ["Recife", "Atlantis", "Natal"]
+            return await asyncio.gather(*(self.tool.arun({"city": c}) for c in cities))
+
+        results = asyncio.run(main())
+        self.assertEqual(
+            self.pool.calls, [("weather_many", {"cities": ["Recife", "Atlantis", "Natal"], "token": "key"})]
+        )
+        self.assertEqual(json.loads(results[0]["text"]), {"city": "Recife"})
+        self.assertEqual(results[1], {"error": "unknown city"})
+        self.assertEqual(json.loads(results[2]["text"]), {"city": "Natal"})
+
+    def test_max_batch_flushes_early_and_extra_args_bypass_batching(self):
+        async def main():
+            calls = [
+                self.pool.acall_batched(URL, "weather_many", c, self.tool._batch_args, _split_batch_result, 10, 2)
+                for c in "ab"
+            ]
+            return await asyncio.wait_for(asyncio.gather(*calls), 2)
+
+        self.assertEqual(len(asyncio.run(main())), 2)  # did not wait for the 10s window
+        self.tool.run({"city": "Recife", "units": "metric"})
+        self.assertEqual([name for name, _ in self.pool.calls], ["weather_many", "weather_now"])
+
+    def test_whole_batch_failure_reaches_every_caller(self):
+        failed = SimpleNamespace(
+            structuredContent=None, isError=True, content=[SimpleNamespace(text="401: Unauthorized")]
+        )
+        self.assertEqual(_split_batch_result(failed, 2), [{"error": "401: Unauthorized"}] * 2)
+        self.assertEqual(
+            _split_batch_result(text_result({"results": [1]}), 2), [{"error": "Malformed batch result"}] * 2
+        )
+
+    def test_discovery_enables_batching_when_the_server_has_the_variant(self):
+        def remote(name):
+            return SimpleNamespace(name=name, description="", inputSchema={"type": "object", "properties": {}})
+
+        pool = SimpleNamespace(list_tools=lambda url: [remote("weather_now"), remote("prometheus_query")])
+        tools = ToolCatalog()
+        discovery = MCPToolDiscovery(URL, tools, pool=pool)
+        discovery.refresh()
+        self.assertIsNone(tools["weather_now"].batch)
+        pool.list_tools = lambda url: [remote("weather_now"), remote("weather_many"), remote("prometheus_query")]
+        discovery.refresh()
+        self.assertEqual(tools["weather_now"].batch, BATCH_VARIANTS["weather_now"])
+        self.assertIsNone(tools["prometheus_query"].batch)
+
+
+class HangingPool(MCPSessionPool):
+    async def _call_tool(self, url, tool_name, args):
+        await asyncio.sleep(10)
+
+    async def _list_tools(self, url):
+        await asyncio.sleep(10)
+
+
+class TestCallTimeout(unittest.TestCase):
+    def test_blocking_call_gives_up_after_the_pool_call_timeout(self):
+        pool = HangingPool(call_timeout=0.05)
+        try:
+            start = time.perf_counter()
+            with self.assertRaises(TimeoutError):
+                pool.call_tool(URL, "weather_now", {"city": "Recife"})
+            self.assertLess(time.perf_counter() - start, 1)
+            with self.assertRaises(TimeoutError):
+                pool.list_tools(URL, timeout=0.05)
+        finally:
+            pool.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
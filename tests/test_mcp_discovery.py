@@ -0,0 +1,112 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+
+from agent import discover_and_register_mcp_tools
+from tools.catalog import ToolCatalog
+from tools.mcp_discovery import LIST_CHANGED, MCPToolDiscovery
+
+URL = "http://mcp.test/mcp"
+
+
+def remote_tool(name, description="", properties=None):
+    schema = {"type": "object", "properties": dict(properties or {}, token={"type": "string"})}
+    return SimpleNamespace(name=name, description=description, inputSchema=schema)
+
+
+class FakePool:
+    def __init__(self, tools):
+        self.tools = tools
+        self.down = False
+        self.list_calls = 0
+        self.listeners = []
+
+    def list_tools(self, url):
+        self.list_calls += 1
+        if self.down:
+            raise ConnectionError("server down")
+        return list(self.tools)
+
+    def add_listener(self, url, listener):
+        self.listeners.append(listener)
+
+    def remove_listener(self, url, listener):
+        self.listeners.remove(listener)
+
+
+class TestMCPDiscovery(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.snapshot = os.path.join(self.tmp.name, "mcp.json")
+        self.pool = FakePool([remote_tool("weather_now", "Weather", {"city": {"type": "string"}})])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_refresh_registers_proxies_and_writes_snapshot(self):
+        tools = ToolCatalog()
+        discovery = MCPToolDiscovery(URL, tools, pool=self.pool, snapshot_path=self.snapshot)
+        self.assertTrue(discovery.refresh())
+        self.assertFalse(discovery.refresh())  # same etag: nothing swapped
+        self.assertEqual(tools["weather_now"].parameters["properties"], {"city": {"type": "string"}})
+        with open(self.snapshot, encoding="utf-8") as f:
+            data = json.load(f)
+        self.assertEqual(data["etag"], discovery.etag)
+        self.assertIn("token", data["tools"][0]["inputSchema"]["properties"])
+
+    def test_warm_start_from_snapshot_without_network(self):
+        MCPToolDiscovery(URL, ToolCatalog(), pool=self.pool, snapshot_path=self.snapshot).refresh()
+        pool = FakePool([])
+        pool.down = True
+        tools = ToolCatalog()
+        discovery = MCPToolDiscovery(URL, tools, pool=pool, snapshot_path=self.snapshot)
+        self.assertTrue(discovery.load_snapshot())
+        self.assertEqual(list(tools), ["weather_now"])
+        self.assertEqual(pool.list_calls, 0)
+
+    def test_hot_swap_adds_changes_and_removes(self):
+        tools = ToolCatalog({"echo": object()})
+        discovery = MCPToolDiscovery(URL, tools, pool=self.pool)
+        discovery.refresh()
+        version = tools.version
+        self.pool.tools = [remote_tool("weather_now", "Weather v2"), remote_tool("prometheus_query")]
+        self.assertTrue(discovery.refresh())
+        self.assertEqual(sorted(tools), ["echo", "prometheus_query", "weather_now"])
+        self.assertEqual(tools["weather_now"].description, "Weather v2")
+        self.assertGreater(tools.version, version)
+        self.pool.tools = []
+        discovery.refresh()
+        self.assertEqual(list(tools), ["echo"])
+
+    def test_list_changed_notification_triggers_refresh(self):
+        tools = ToolCatalog()
+        discovery = MCPToolDiscovery(URL, tools, pool=self.pool).start(interval=60)
+        try:
+            deadline = time.monotonic() + 2
+            while "weather_now" not in tools and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.pool.tools = [remote_tool("prometheus_query")]
+            for listener in self.pool.listeners:
+                listener(SimpleNamespace(method=LIST_CHANGED))
+            while "prometheus_query" not in tools and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            discovery.stop()
+        self.assertEqual(list(tools), ["prometheus_query"])
+        self.assertEqual(self.pool.listeners, [])
+
+    def test_server_down_does_not_break_startup(self):
+        self.pool.down = True
+        tools = ToolCatalog()
+        with self.assertLogs("agent", "WARNING"):
+            discover_and_register_mcp_tools(URL, tools, pool=self.pool, snapshot_path=self.snapshot)
+        self.assertEqual(len(tools), 0)
+        with self.assertRaises(ConnectionError):
+            discover_and_register_mcp_tools(URL, tools, pool=self.pool)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,166 @@
+import asyncio
+import importlib.util
+import inspect
+import json
+import os
+import sys
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from tools.mcp_pool import _overloaded_retry_after
+
+# mcp/serving.py is run from inside mcp/ by the server; load it by path (the `mcp` name is the SDK)
+_spec = importlib.util.spec_from_file_location(
+    "mcp_serving", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mcp", "serving.py")
+)
+serving = importlib.util.module_from_spec(_spec)
+sys.modules["mcp_serving"] = serving
+_spec.loader.exec_module(serving)
+
+
+class FakeFastMCP:
+    def __init__(self):
+        self.tools = {}
+        self.resources = []
+
+    def tool(self):
+        def decorator(fn):
+            self.tools[fn.__name__] = fn
+            return fn
+        return decorator
+
+    def resource(self, uri):
+        def decorator(fn):
+            self.resources.append(uri)
+            return fn
+        return decorator
+
+
+def tool_call(name, id=1):
+    return json.dumps({"jsonrpc": "2.0", "id": id, "method": "tools/call", "params": {"name": name}}).encode()
+
+
+async def request(app, body):
+    """Send one POST through an ASGI app; returns (status, headers, body)."""
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    await app({"type": "http", "method": "POST", "path": "/mcp"}, receive, send)
+    start = next(m for m in sent if m["type"] == "http.response.start")
+    payload = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+    return start["status"], dict(start["headers"]), payload
+
+
+class TestOffloadingRegistrar(unittest.TestCase):
+    def test_sync_tools_run_on_the_executor(self):
+        mcp = FakeFastMCP()
+        with ThreadPoolExecutor(1, thread_name_prefix="mcp-tool") as executor:
+            registrar = serving.OffloadingRegistrar(mcp, executor)
+
+            @registrar.tool()
+            def weather_now(city: str, token: str = "") -> dict:
+                return {"city": city, "thread": threading.current_thread().name}
+
+            registrar.resource("config://x")(lambda: "x")
+            wrapped = mcp.tools["weather_now"]
+            self.assertTrue(inspect.iscoroutinefunction(wrapped))
+            # FastMCP derives the input schema from the original signature
+            self.assertEqual(list(inspect.signature(wrapped).parameters), ["city", "token"])
+            result = asyncio.run(wrapped(city="Recife"))
+        self.assertEqual(result["city"], "Recife")
+        self.assertTrue(result["thread"].startswith("mcp-tool"))
+        self.assertEqual(mcp.resources, ["config://x"])
+
+    def test_tools_are_measured(self):
+        mcp = FakeFastMCP()
+        with ThreadPoolExecutor(1) as executor:
+            registrar = serving.OffloadingRegistrar(mcp, executor)
+
+            @registrar.tool()
+            def measured_tool(fail: bool = False) -> dict:
+                if fail:
+                    raise ValueError("bad")
+                return {"ok": True}
+
+            calls = serving._CALLS
+            before = calls.labels("measured_tool", "ok").value, calls.labels("measured_tool", "error").value
+            asyncio.run(mcp.tools["measured_tool"]())
+            with self.assertRaises(ValueError):
+                asyncio.run(mcp.tools["measured_tool"](fail=True))
+        after = calls.labels("measured_tool", "ok").value, calls.labels("measured_tool", "error").value
+        self.assertEqual((after[0] - before[0], after[1] - before[1]), (1, 1))
+        self.assertEqual(serving._IN_FLIGHT.labels("measured_tool").value, 0)
+        self.assertIn('mcp_tool_seconds_count{tool="measured_tool"} 2', serving.metrics.REGISTRY.render())
+
+
+class TestAdmissionMiddleware(unittest.TestCase):
+    def setUp(self):
+        self.release = None
+
+    def make_app(self, config):
+        async def app(scope, receive, send):
+            message = await receive()
+            if json.loads(message["body"]).get("params", {}).get("name") == "slow":
+                await self.release.wait()
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": message["body"]})
+
+        return serving.AdmissionMiddleware(app, config)
+
+    def test_saturated_tool_is_rejected_with_429(self):
+        async def main(config):
+            self.release = asyncio.Event()
+            app = self.make_app(config)
+            slow = [asyncio.ensure_future(request(app, tool_call("slow", i))) for i in range(2)]
+            await asyncio.sleep(0.01)
+            rejected = await request(app, tool_call("slow", 3))
+            other = await request(app, tool_call("fast", 4))  # other tools are not affected
+            self.release.set()
+            accepted = await asyncio.gather(*slow)
+            return rejected, other, accepted, app.rejected
+
+        config = serving.ServingConfig(tool_concurrency=2, queue_timeout=0.05)
+        (status, headers, body), other, accepted, count = asyncio.run(main(config))
+        self.assertEqual(status, 200)
+        error = json.loads(body)["error"]
+        self.assertEqual((json.loads(body)["id"], error["code"]), (3, serving.OVERLOADED))
+        self.assertEqual(error["data"]["status"], 429)
+        self.assertEqual(headers[b"retry-after"], b"1")
+        self.assertEqual(other[0], 200)
+        self.assertEqual([a[0] for a in accepted], [200, 200])
+        self.assertEqual(count, 1)
+
+        config = serving.ServingConfig(tool_concurrency=2, queue_timeout=0, http_429=True)
+        (status, _, _), *_ = asyncio.run(main(config))
+        self.assertEqual(status, 429)
+
+    def test_limits_from_env(self):
+        env = serving.ServingConfig(workers=3, tool_limits={"weather_now": 8}).to_env()
+        os.environ.update(env)
+        try:
+            config = serving.ServingConfig.from_env()
+        finally:
+            for key in env:
+                os.environ.pop(key)
+        self.assertEqual(config.tool_limits, {"weather_now": 8})
+        self.assertTrue(config.stateless)
+        self.assertEqual((config.limit("weather_now"), config.limit("weather_forecast")), (8, 16))
+        with ThreadPoolExecutor(1) as executor:
+            # batch tools fan out at most the item tool's limit at a time
+            self.assertEqual(serving.OffloadingRegistrar(FakeFastMCP(), executor, config).concurrency("weather_now"), 8)
+
+    def test_client_recognizes_rejection(self):
+        error = SimpleNamespace(error=SimpleNamespace(data={"status": 429, "retry_after": 2}))
+        self.assertEqual(_overloaded_retry_after(error), 2.0)
+        self.assertIsNone(_overloaded_retry_after(SimpleNamespace(error=SimpleNamespace(data=None))))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,189 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import memory
+from agent import AgentRunner
+from memory import AgentMemory, HashingEmbedder, VectorStore
+from tools.memory_tool import MemorySearchTool
+
+
+class ScriptedLLM:
+    def __init__(self, responses):
+        self.responses = list(responses)
+
+    def chat(self, messages, functions=None, **kwargs):
+        return self.responses.pop(0)
+
+
+def plan(**kwargs):
+    return {"content": json.dumps(kwargs)}
+
+
+class EchoTool:
+    name = "echo"
+    description = "Return the input"
+
+    def run(self, input):
+        return {"echo": input.get("text")}
+
+
+class TestHashingEmbedder(unittest.TestCase):
+    def test_similar_texts_are_closer_and_vectors_are_stable(self):
+        embedder = HashingEmbedder(dim=256)
+        a, b, c = embedder.embed(["postgres disk is full", "the postgres disk filled up", "weather in Lisbon"])
+        self.assertAlmostEqual(float(np.linalg.norm(a)), 1.0, places=5)
+        self.assertGreater(a @ b, a @ c)
+        # crc32, not hash(): the same vector in every process
+        self.assertTrue(np.array_equal(a, embedder.embed(["postgres disk is full"])[0]))
+        self.assertFalse(embedder.embed([""]).any())
+
+
+class TestVectorStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.rng = np.random.default_rng(0)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_brute_force_matches_exact_top_k_across_blocks(self):
+        vectors = self.rng.standard_normal((1000, 16)).astype(np.float32)
+        store = VectorStore(self.tmp.name, 16)
+        store.add([f"v{i}" for i in range(600)], vectors[:600])
+        store.add([f"v{i}" for i in range(600, 1000)], vectors[600:])
+        queries = self.rng.standard_normal((5, 16)).astype(np.float32)
+        normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        expected = np.argsort(-(queries @ normed.T), axis=1)[:, :10]
+        with mock.patch.object(memory, "SEARCH_BLOCK", 128):
+            scores, rows = store.search(queries, k=10)
+        np.testing.assert_array_equal(rows, expected)
+        self.assertTrue(np.all(np.diff(scores, axis=1) <= 0))
+        store.close()
+
+    def test_persists_skips_duplicates_and_drops_uncommitted_vectors(self):
+        store = VectorStore(self.tmp.name, 8)
+        self.assertEqual(store.add(["a", "b"], np.eye(8)[:2], [{"n": 1}, {"n": 2}]), [0, 1])
+        self.assertEqual(store.add(["a", "c"], np.eye(8)[:2]), [-1, 2])
+        store.close()
+        # a crash after writing vectors but before the catalog commit
+        with open(os.path.join(self.tmp.name, "vectors.f32"), "ab") as f:
+            f.write(np.ones(8, dtype=np.float32).tobytes())
+        store = VectorStore(self.tmp.name, 8)
+        self.assertEqual(len(store), 3)
+        self.assertEqual(os.path.getsize(os.path.join(self.tmp.name, "vectors.f32")), 3 * 8 * 4)
+        self.assertEqual(store.get([1])[1]["payload"], {"n": 2})
+        _, rows = store.search(np.eye(8)[1], k=1)
+        self.assertEqual(rows[0][0], 1)
+        store.close()
+        with self.assertRaises(ValueError):
+            VectorStore(self.tmp.name, 16)
+
+    def test_stores_sharing_a_path_append_without_losing_rows(self):
+        first, second = VectorStore(self.tmp.name, 8), VectorStore(self.tmp.name, 8)
+        self.assertEqual(first.add(["a"], np.eye(8)[:1]), [0])
+        # `second` opened before that row existed
+        self.assertEqual(second.add(["b"], np.eye(8)[1:2]), [1])
+        self.assertEqual(first.add(["c"], np.eye(8)[2:3]), [2])
+        _, rows = first.search(np.eye(8)[:3], k=1)
+        self.assertEqual(rows[:, 0].tolist(), [0, 1, 2])
+        first.close()
+        second.close()
+
+    @unittest.skipIf(memory.fcntl is None, "needs flock")
+    def test_opening_does_not_cut_an_append_in_progress(self):
+        VectorStore(self.tmp.name, 8).close()
+        vectors = os.path.join(self.tmp.name, "vectors.f32")
+        opened = []
+        with open(os.path.join(self.tmp.name, "memory.lock"), "a+b") as lock:
+            # another process: holds the lock, has written its vector, is about to commit its row
+            memory.fcntl.flock(lock.fileno(), memory.fcntl.LOCK_EX)
+            with open(vectors, "ab") as f:
+                f.write(np.eye(8, dtype=np.float32)[0].tobytes())
+            opener = threading.Thread(target=lambda: opened.append(VectorStore(self.tmp.name, 8)))
+            opener.start()
+            time.sleep(0.2)
+            self.assertEqual(opened, [])
+            db = sqlite3.connect(os.path.join(self.tmp.name, "memory.db"))
+            with db:
+                db.execute("INSERT INTO items VALUES (0, 'h', 'a', 'null', 0)")
+            db.close()
+        opener.join(5)
+        self.assertEqual(len(opened[0]), 1)
+        self.assertEqual(os.path.getsize(vectors), 8 * 4)
+        opened[0].close()
+
+    def test_ivf_recall_and_rows_added_after_build(self):
+        # clustered data, as real embeddings are
+        centers = self.rng.standard_normal((20, 32)).astype(np.float32)
+        vectors = centers[self.rng.integers(0, 20, 4000)] + 0.3 * self.rng.standard_normal((4000, 32))
+        store = VectorStore(self.tmp.name, 32)
+        store.add([f"v{i}" for i in range(4000)], vectors)
+        queries = vectors[:50] + 0.05 * self.rng.standard_normal((50, 32))
+        _, exact = store.search(queries, k=10)
+        store.build_ivf(n_lists=40)
+        _, approx = store.search(queries, k=10, n_probe=6)
+        recall = np.mean([len(set(e) & set(a)) / 10 for e, a in zip(exact, approx)])
+        self.assertGreater(recall, 0.9)
+
+        new = self.rng.standard_normal(32).astype(np.float32)
+        row = store.add(["new"], new)[0]
+        self.assertEqual(store.search(new, k=1, n_probe=1)[1][0][0], row)
+        store.close()
+        # the index is reloaded with the store
+        store = VectorStore(self.tmp.name, 32)
+        self.assertIsNotNone(store._ivf)
+        store.drop_ivf()
+        self.assertFalse(os.path.exists(os.path.join(self.tmp.name, "ivf.npz")))
+        store.close()
+
+
+class TestAgentMemory(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.memory = AgentMemory(self.tmp.name, max_observation_chars=10)
+
+    def tearDown(self):
+        self.memory.close()
+        self.tmp.cleanup()
+
+    def test_runner_remembers_answers_and_tool_recalls_them(self):
+        llm = ScriptedLLM([
+            plan(final=False, thought="t", action={"tool": "echo", "input": {"text": "x" * 50}}, answer=None),
+            plan(final=True, thought="t", action=None, answer="Vacuum and drop old WAL files"),
+            plan(final=True, thought="t", action=None, answer="Sunny"),
+        ])
+        runner = AgentRunner(llm=llm, tools={"echo": EchoTool()}, memory=self.memory)
+        runner.run("How do I fix a full postgres disk?")
+        runner.run("Weather in Lisbon?")
+        self.assertEqual(len(self.memory.store), 2)
+
+        hits = MemorySearchTool(self.memory).run({"q": "postgres disk full", "k": 2})["memories"]
+        self.assertEqual(hits[0]["query"], "How do I fix a full postgres disk?")
+        self.assertEqual(hits[0]["answer"], "Vacuum and drop old WAL files")
+        self.assertEqual(hits[0]["observations"][0]["tool"], "echo")
+        self.assertTrue(hits[0]["observations"][0]["observation"].endswith("…"))
+        self.assertGreater(hits[0]["score"], hits[1]["score"])
+
+    def test_failed_runs_are_not_remembered(self):
+        llm = ScriptedLLM([plan(final=False, thought="t", action={"tool": "echo", "input": {"text": "a"}})] * 3)
+        runner = AgentRunner(llm=llm, tools={"echo": EchoTool()}, memory=self.memory)
+        runner.config.max_iterations = 3
+        runner.run("loop forever")
+        self.assertEqual(len(self.memory.store), 0)
+
+    def test_tool_without_a_store(self):
+        tool = MemorySearchTool(path=os.path.join(self.tmp.name, "missing"))
+        self.assertEqual(tool.run({"q": "anything"}), {"memories": []})
+        self.assertIn("error", tool.run({}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+import json
+import threading
+import unittest
+import urllib.request
+
+import metrics
+from agent import AgentRunner
+from tools.cache import MemoryCacheBackend, ToolResultCache
+
+
+class EchoTool:
+    name = "echo"
+    description = "Return the input"
+    cacheable = True
+
+    def run(self, input):
+        return {"echo": input}
+
+
+class ScriptedLLM:
+    def __init__(self, responses):
+        self.responses = list(responses)
+
+    def chat(self, messages, functions=None, **kwargs):
+        return self.responses.pop(0)
+
+
+def plan(**kwargs):
+    return {"content": json.dumps(kwargs)}
+
+
+class TestRegistry(unittest.TestCase):
+    def test_counters_from_many_threads(self):
+        registry = metrics.Registry()
+        counter = registry.counter("events_total", "Events", ["kind"])
+
+        def work():
+            child = counter.labels("a")
+            for _ in range(20000):
+                child.inc()
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(counter.labels("a").value, 80000)
+        self.assertIs(registry.counter("events_total", "Events", ["kind"]), counter)
+        with self.assertRaises(ValueError):
+            registry.gauge("events_total", "Events")
+        with self.assertRaises(ValueError):
+            counter.labels("a", "b")
+
+    def test_gauge_in_flight_across_threads(self):
+        gauge = metrics.Registry().gauge("in_flight", "In flight")
+        gauge.inc()
+        # a call may end on another thread than the one it started on
+        t = threading.Thread(target=gauge.dec)
+        t.start()
+        t.join()
+        with gauge.track():
+            self.assertEqual(gauge.value, 1)
+        self.assertEqual(gauge.value, 0)
+        gauge.set_function(lambda: 7)
+        self.assertEqual(gauge.value, 7)
+
+    def test_text_exposition(self):
+        registry = metrics.Registry()
+        histogram = registry.histogram("latency_seconds", "Latency", ["tool"], buckets=(0.1, 1))
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.labels('a"b').observe(value)
+        registry.counter("calls_total", "Calls\nmade").inc(2.5)
+        self.assertEqual(registry.render(), "\n".join([
+            "# HELP calls_total Calls\\nmade",
+            "# TYPE calls_total counter",
+            "calls_total 2.5",
+            "# HELP latency_seconds Latency",
+            "# TYPE latency_seconds histogram",
+            'latency_seconds_bucket{tool="a\\"b",le="0.1"} 2',
+            'latency_seconds_bucket{tool="a\\"b",le="1.0"} 3',
+            'latency_seconds_bucket{tool="a\\"b",le="+Inf"} 4',
+            'latency_seconds_sum{tool="a\\"b"} 3.65',
+            'latency_seconds_count{tool="a\\"b"} 4',
+        ]) + "\n")
+
+    def test_nan_and_infinite_values(self):
+        registry = metrics.Registry()
+        gauge = registry.gauge("ratio", "Ratio", ["kind"])
+        gauge.labels("nan").set(float("nan"))
+        gauge.labels("neg").set(float("-inf"))
+        gauge.labels("pos").set(float("inf"))
+        registry.histogram("size", "Size", buckets=(1,)).observe(float("nan"))
+        text = registry.render()
+        self.assertIn('ratio{kind="nan"} NaN\nratio{kind="neg"} -Inf\nratio{kind="pos"} +Inf\n', text)
+        self.assertIn("size_sum NaN\n", text)
+
+    def test_cells_of_finished_threads_are_folded(self):
+        counter = metrics.Registry().counter("work_total", "Work")
+        for _ in range(100):
+            t = threading.Thread(target=counter.inc)
+            t.start()
+            t.join()
+        child = counter.labels()
+        # pruned while new threads keep arriving, not only at scrapes
+        self.assertLess(len(child._all), 20)
+        self.assertEqual(counter.value, 100)
+        self.assertEqual(child._all, [])
+
+    def test_sidecar_endpoint(self):
+        registry = metrics.Registry()
+        registry.counter("up_total", "Up").inc()
+        server = metrics.serve(0, registry=registry)
+        try:
+            base = f"http://127.0.0.1:{server.server_port}"
+            with urllib.request.urlopen(f"{base}/metrics", timeout=5) as resp:
+                self.assertEqual(resp.headers["Content-Type"], metrics.CONTENT_TYPE)
+                self.assertIn("up_total 1", resp.read().decode())
+            with self.assertRaises(urllib.error.HTTPError):
+                urllib.request.urlopen(f"{base}/other", timeout=5)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class TestAgentMetrics(unittest.TestCase):
+    def value(self, name, *labels):
+        return metrics.REGISTRY.get(name).labels(*labels).value
+
+    def test_run_and_tool_metrics(self):
+        before = {
+            "runs": self.value("agent_runs_total", "ok"),
+            "calls": self.value("agent_tool_calls_total", "echo", "ok"),
+            "unknown": self.value("agent_tool_calls_total", "(unknown)", "error"),
+            "hits": self.value("agent_tool_cache_lookups_total", "echo", "hit"),
+            "misses": self.value("agent_tool_cache_lookups_total", "echo", "miss"),
+        }
+        echo = {"tool": "echo", "input": {"x": 1}}
+        llm = ScriptedLLM([
+            plan(final=False, thought="t", actions=[echo, {"tool": "nope", "input": {}}], answer=None),
+            plan(final=True, thought="done", action=None, answer="ok"),
+        ] * 2)
+        runner = AgentRunner(llm=llm, tools={"echo": EchoTool()}, cache=ToolResultCache(MemoryCacheBackend()))
+        self.assertEqual(runner.run("go"), "ok")
+        self.assertEqual(runner.run("go"), "ok")
+        self.assertEqual(self.value("agent_runs_total", "ok") - before["runs"], 2)
+        self.assertEqual(self.value("agent_tool_calls_total", "echo", "ok") - before["calls"], 2)
+        self.assertEqual(self.value("agent_tool_calls_total", "(unknown)", "error") - before["unknown"], 2)
+        self.assertEqual(self.value("agent_tool_cache_lookups_total", "echo", "miss") - before["misses"], 1)
+        self.assertEqual(self.value("agent_tool_cache_lookups_total", "echo", "hit") - before["hits"], 1)
+        self.assertEqual(metrics.REGISTRY.get("agent_runs_in_flight").value, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,197 @@
+import importlib.util
+import json
+import math
+import os
+import threading
+import unittest
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# mcp/tools/ belongs to the server (the `mcp` name is the SDK); load the module by path
+_spec = importlib.util.spec_from_file_location(
+    "prometheus_backend",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mcp", "tools", "prometheus_backend.py"),
+)
+backend = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(backend)
+
+NOW = 1_700_000_040.0  # a whole minute
+
+
+class FakePrometheus(ThreadingHTTPServer):
+    """Answers /api/v1/query and /api/v1/query_range; `up{job}` is 1 per job, `ramp` is t / 60.
+
+    An instant query for a range selector (`ramp[10m]`) gets a matrix of 600 one-second samples.
+    """
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.requests = []
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        params = dict(urllib.parse.parse_qsl(self.rfile.read(int(self.headers["Content-Length"])).decode()))
+        self.server.requests.append((self.path, params))
+        if params["query"] == "bad(":
+            status, body = 400, {"status": "error", "errorType": "bad_data", "error": "parse error"}
+        elif self.path.endswith("/query") and params["query"].endswith("]"):
+            t = float(params["time"])
+            body = {"status": "success", "data": {"resultType": "matrix", "result": [
+                {"metric": {"__name__": "ramp"}, "values": [[t - 599 + i, str(i)] for i in range(600)]}
+            ]}}
+            status = 200
+        elif self.path.endswith("/query"):
+            t = float(params["time"])
+            body = {"status": "success", "data": {"resultType": "vector", "result": [
+                {"metric": {"job": job}, "value": [t, "1"]} for job in ("api", "db")
+            ]}}
+            status = 200
+        else:
+            start, end, step = (float(params[k]) for k in ("start", "end", "step"))
+            ts = np.arange(start, end + step / 2, step)
+            values = [[t, "NaN" if int(t / step) % 97 == 0 else str(t / 60)] for t in ts.tolist()]
+            body = {"status": "success", "data": {"resultType": "matrix", "result": [
+                {"metric": {"__name__": "ramp"}, "values": values}
+            ]}}
+            status = 200
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class TestPrometheusBackend(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FakePrometheus()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.server.requests.clear()
+        self.client = backend.PrometheusClient(self.server.url)
+        self.backend = backend.PrometheusBackend(self.client, chunk_points=100, clock=lambda: NOW)
+
+    def tearDown(self):
+        self.client.close()
+
+    def test_instant_query_is_cached_per_aligned_time(self):
+        out = self.backend.query("up")
+        self.backend.query("up", end=NOW + 1)
+        self.assertEqual(out["result"], [{"metric": {"job": "api"}, "value": 1}, {"metric": {"job": "db"}, "value": 1}])
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(float(self.server.requests[0][1]["time"]) % 15, 0)
+
+    def test_instant_range_selector_keeps_its_samples(self):
+        series = self.backend.query("ramp[10m]", end=NOW, max_points=100)["result"][0]
+        self.assertEqual(series["metric"], {"__name__": "ramp"})
+        self.assertEqual(series["downsampled_from"], 600)
+        self.assertLessEqual(len(series["values"]), 100)
+        self.assertEqual(series["values"][0], [NOW - 599, 0])
+        self.assertEqual(series["values"][-1], [NOW, 599])
+
+    def test_overlapping_windows_reuse_cached_chunks(self):
+        first = self.backend.query("ramp", start=NOW - 6 * 3600, end=NOW - 3 * 3600, step="1m", max_points=10_000)
+        values = first["result"][0]["values"]
+        self.assertEqual(len(values), 181)
+        self.assertEqual(values[0], [NOW - 6 * 3600, (NOW - 6 * 3600) / 60])
+        self.assertEqual(len(self.server.requests), 1)  # contiguous chunks in one request
+
+        self.server.requests.clear()
+        second = self.backend.query("ramp", start=NOW - 4 * 3600, end=NOW - 2 * 3600, step="1m", max_points=10_000)
+        self.assertEqual(len(second["result"][0]["values"]), 121)
+        # only the hour not seen before is fetched
+        (path, params), = self.server.requests
+        self.assertGreater(float(params["start"]), NOW - 3 * 3600 - 6000)
+        self.assertEqual(second["result"][0]["values"][:61], values[-61:])
+
+    def test_recent_chunks_are_not_cached(self):
+        self.backend.query("ramp", start="-1h", end="now", step="1m")
+        self.backend.query("ramp", start="-1h", end="now", step="1m")
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_long_series_are_downsampled(self):
+        out = self.backend.query("ramp", start=NOW - 11 * 86400, end=NOW - 86400, step="1m", max_points=200)
+        series = out["result"][0]
+        self.assertEqual(series["downsampled_from"], 10 * 1440 + 1)
+        self.assertLessEqual(len(series["values"]), 200)
+        self.assertEqual(series["values"][0][0], NOW - 11 * 86400)
+        self.assertEqual(series["values"][-1][0], NOW - 86400)
+        # ... over several requests, since one may not return more than 11000 points
+        self.assertGreater(len(self.server.requests), 1)
+
+    def test_errors_are_raised(self):
+        with self.assertRaisesRegex(backend.PrometheusError, "bad_data: parse error"):
+            self.backend.query("bad(")
+
+    def test_bad_step_and_max_points(self):
+        for step in ("0", "0s", 0, -60):
+            with self.subTest(step=step), self.assertRaisesRegex(ValueError, "`step` must be positive"):
+                self.backend.query("ramp", start=NOW - 3600, end=NOW, step=step)
+        with self.assertRaisesRegex(ValueError, "larger step"):
+            self.backend.query("ramp", start=NOW - 7 * 86400, end=NOW, step="1s")
+        self.assertEqual(self.server.requests, [])
+        out = self.backend.query("ramp", start=NOW - 11 * 86400, end=NOW - 86400, step="1m", max_points=10 ** 9)
+        self.assertEqual(len(out["result"][0]["values"]), backend.MAX_RETURNED_POINTS)
+
+    def test_connections_are_reused(self):
+        for i in range(5):
+            self.backend.query("up", end=NOW + 15 * i)
+        self.assertEqual(self.client.connections_opened, 1)
+
+
+class TestDownsampling(unittest.TestCase):
+    def setUp(self):
+        self.x = np.arange(10_000, dtype=float)
+        self.y = np.sin(self.x / 300)
+        self.y[4321] = 50.0  # a spike both methods must keep
+
+    def test_lttb_keeps_ends_and_spikes(self):
+        keep = backend.lttb_downsample(self.x, self.y, 100)
+        self.assertEqual(len(keep), 100)
+        self.assertEqual((keep[0], keep[-1]), (0, 9999))
+        self.assertIn(4321, keep)
+        self.assertTrue(np.all(np.diff(keep) > 0))
+
+    def test_minmax_keeps_extremes(self):
+        keep = backend.minmax_downsample(self.x, self.y, 100)
+        self.assertLessEqual(len(keep), 100)
+        self.assertIn(4321, keep)
+        self.assertIn(int(np.argmin(self.y)), keep)
+
+    def test_short_series_are_unchanged(self):
+        np.testing.assert_array_equal(backend.lttb_downsample(self.x[:50], self.y[:50], 100), np.arange(50))
+
+
+class TestTimeParsing(unittest.TestCase):
+    def test_relative_and_absolute_times(self):
+        self.assertEqual(backend.parse_time("now-1h30m", NOW), NOW - 5400)
+        self.assertEqual(backend.parse_time("-15m", NOW), NOW - 900)
+        self.assertEqual(backend.parse_time("2023-11-14T22:14:00Z", 0), NOW)
+        self.assertEqual(backend.parse_duration("90"), 90)
+        with self.assertRaises(ValueError):
+            backend.parse_duration("1 hour")
+        self.assertEqual(backend.auto_step(0, 86400), 300)
+        self.assertTrue(math.isclose(backend.parse_time(str(NOW), 0), NOW))
+
+
+if __name__ == "__main__":
+    unittest.main()
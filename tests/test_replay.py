@@ -0,0 +1,137 @@
+import asyncio
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from agent import AgentConfig, AgentRunner, RunStats
+from benchmarks import bench_agent_loop
+from benchmarks._fake_llm import FakeLLMServer
+from llm import OpenAIGPT4o
+from replay import Cassette, RecordingLLM, ReplayLLM, ReplayMiss, record_tools, replay_tools
+from tracing import QUIET, Console, Tracer
+
+
+def plan_responder(payload):
+    """Asks for `echo`, `fail` and `slow` at once, then answers with what it observed."""
+    messages = payload["messages"]
+    if messages[-1]["content"].startswith("Observation:"):
+        return {"role": "assistant", "content": json.dumps({"final": True, "answer": messages[-1]["content"][-40:]})}
+    query = messages[-1]["content"]
+    actions = [
+        {"tool": "echo", "input": {"text": query}},
+        {"tool": "fail", "input": {}},
+        {"tool": "slow", "input": {"n": len(query)}},
+    ]
+    return {"role": "assistant", "content": json.dumps({"final": False, "thought": "t", "actions": actions})}
+
+
+class Echo:
+    name = "echo"
+    description = "Return the input as-is"
+    parameters = {"type": "object", "properties": {"text": {"type": "string"}}}
+
+    def __init__(self):
+        self.calls = 0
+
+    def run(self, input):
+        self.calls += 1
+        return {"echo": input}
+
+
+class Fail:
+    name = "fail"
+    description = "Always raises"
+
+    def run(self, input):
+        raise ValueError("broken")
+
+
+class Slow:
+    name = "slow"
+    description = "An async tool"
+
+    async def arun(self, input):
+        await asyncio.sleep(0.01)
+        return {"n": input["n"] * 2}
+
+
+def runner(llm, tools, stream=False):
+    return AgentRunner(
+        llm=llm, tools=tools, config=AgentConfig(stream=stream), tracer=Tracer(), console=Console(QUIET)
+    )
+
+
+class TestRecordReplay(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "cassette.jsonl")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def record(self, queries, stream=False):
+        cassette = Cassette(self.path)
+        echo = Echo()
+        with FakeLLMServer(responder=plan_responder) as server:
+            llm = RecordingLLM(OpenAIGPT4o(api_key="test", base_url=server.base_url), cassette)
+            agent = runner(llm, record_tools({"echo": echo, "fail": Fail(), "slow": Slow()}, cassette), stream)
+            answers = []
+            for query in queries:
+                stats = RunStats()
+                answers.append(asyncio.run(agent.arun(query, stats=stats)))
+        cassette.close()
+        return answers, stats
+
+    def test_round_trip(self):
+        answers, recorded = self.record(["alpha", "beta"])
+        self.assertTrue(answers[1].endswith('"observation": {"n": 8}}]'))
+
+        cassette = Cassette(self.path)
+        self.assertEqual([t["name"] for t in cassette.tool_specs], ["echo", "fail", "slow"])
+        tools = replay_tools(cassette)
+        # the replayed catalog is the recorded one, so the prompt (and the lookup key) are the same
+        self.assertEqual(tools["echo"].parameters, Echo.parameters)
+        llm = ReplayLLM(cassette)
+        agent = runner(llm, tools)
+        for _ in range(2):
+            self.assertEqual(asyncio.run(agent.arun("alpha")), answers[0])
+            stats = RunStats()
+            self.assertEqual(asyncio.run(agent.arun("beta", stats=stats)), answers[1])
+            self.assertEqual(stats.tool_calls, recorded.tool_calls)
+        self.assertEqual([c["ok"] for c in stats.tool_calls], [True, False, True])
+        self.assertEqual(llm.calls, 8)
+
+        with self.assertRaises(ReplayMiss):
+            asyncio.run(agent.arun("gamma"))
+
+    def test_streamed_round_trip(self):
+        answers, _ = self.record(["streamed"], stream=True)
+        cassette = Cassette(self.path)
+        self.assertEqual({e["method"] for e in cassette.entries("llm")}, {"astream"})
+        # a streamed transcript also answers `achat`
+        self.assertEqual(asyncio.run(runner(ReplayLLM(cassette), replay_tools(cassette)).arun("streamed")), answers[0])
+        self.assertEqual(
+            asyncio.run(runner(ReplayLLM(cassette), replay_tools(cassette), stream=True).arun("streamed")), answers[0]
+        )
+
+
+class TestAgentLoopBenchmark(unittest.TestCase):
+    def test_sample_workloads_replay(self):
+        queries = bench_agent_loop.load_queries(os.path.join(bench_agent_loop.WORKLOADS, "queries.jsonl"))
+        cassette = Cassette(os.path.join(bench_agent_loop.WORKLOADS, "agent_loop.jsonl"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = asyncio.run(bench_agent_loop.measure(queries, cassette, rounds=2, concurrency=4))
+        # every recorded LLM call is replayed exactly once per round
+        self.assertEqual(results["llm_calls"], len(cassette.entries("llm")))
+        self.assertGreater(results["overhead_us_per_iteration"], 0)
+        self.assertEqual(set(results["tool_latency"]), {"calc", "current_time", "echo", "read_file"})
+        self.assertEqual(bench_agent_loop.compare(results, results, 0.25), [])
+        worse = dict(results, prompt_bytes_mean=results["prompt_bytes_mean"] * 2)
+        self.assertEqual(len(bench_agent_loop.compare(worse, results, 0.25)), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from tools.search_index import SearchIndex, tokenize
+from tools.search_tool import SearchTool
+
+RUNBOOKS = {
+    "postgres/disk.md": "# Postgres disk full\nWhen the disk is full, vacuum and remove old WAL files.",
+    "postgres/replication.md": "# Replication lag\nCheck the replica and the network. Postgres replication slots.",
+    "nginx/502.md": "# Nginx 502\nUpstream timeout; check the backend pool and the disk of the proxy.",
+    "pt/configuracao.txt": "Configuração do alerta de memória",
+}
+
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.docs = os.path.join(self.tmp.name, "runbooks")
+        self.index_dir = os.path.join(self.tmp.name, "index")
+        for name, text in RUNBOOKS.items():
+            self.write(name, text)
+        self.index = SearchIndex(self.index_dir)
+
+    def tearDown(self):
+        self.index.close()
+        self.tmp.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.docs, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        # make sure a rewrite within the same clock tick is still seen as a change
+        os.utime(path, ns=(time.time_ns(), time.time_ns() + len(text)))
+
+    def test_bm25_ranking_and_snippets(self):
+        self.index.sync_directory(self.docs)
+        hits = self.index.search("postgres disk full")
+        self.assertEqual(hits[0]["id"], "postgres/disk.md")
+        self.assertEqual(hits[0]["title"], "Postgres disk full")
+        self.assertIn("disk", hits[0]["snippet"].lower())
+        self.assertGreater(hits[0]["score"], hits[-1]["score"])
+        self.assertEqual(len(self.index.search("postgres", k=1)), 1)
+        self.assertEqual(self.index.search("kubernetes"), [])
+        self.assertEqual(self.index.search("configuracao memoria")[0]["id"], "pt/configuracao.txt")
+
+    def test_incremental_sync(self):
+        self.assertEqual(self.index.sync_directory(self.docs), {"indexed": 4, "removed": 0, "unchanged": 0})
+        self.assertEqual(self.index.sync_directory(self.docs), {"indexed": 0, "removed": 0, "unchanged": 4})
+        generation = self.index.generation
+
+        self.write("nginx/502.md", "# Nginx 502\nRestart php-fpm.")
+        os.remove(os.path.join(self.docs, "postgres/replication.md"))
+        self.assertEqual(self.index.sync_directory(self.docs), {"indexed": 1, "removed": 1, "unchanged": 2})
+        self.assertGreater(self.index.generation, generation)
+        self.assertEqual([h["id"] for h in self.index.search("upstream timeout")], [])
+        self.assertEqual([h["id"] for h in self.index.search("php")], ["nginx/502.md"])
+        self.assertEqual([h["id"] for h in self.index.search("replication")], [])
+        self.assertEqual(len(self.index), 3)
+
+    def test_segments_are_merged_and_reopened_from_disk(self):
+        index = SearchIndex(self.index_dir, max_segments=2)
+        for i in range(3):
+            index.add([(f"doc{i}", f"alert number {i} for disk")])
+        segments = lambda: [n for n in os.listdir(self.index_dir) if n.startswith("seg_")]  # noqa: E731
+        self.assertEqual(len(segments()), 1)  # the third segment triggered a merge
+        index.add([("doc0", "replaced text about memory")])
+        self.assertEqual(sorted(h["id"] for h in index.search("disk")), ["doc1", "doc2"])
+        index.merge()
+        self.assertEqual(len(segments()), 1)
+        self.assertEqual(sorted(h["id"] for h in index.search("disk")), ["doc1", "doc2"])
+        index.close()
+
+        reopened = SearchIndex(self.index_dir)
+        try:
+            self.assertEqual([h["id"] for h in reopened.search("memory")], ["doc0"])
+        finally:
+            reopened.close()
+
+    def test_reader_in_another_process_sees_segments_replaced_by_a_merge(self):
+        reader = SearchIndex(self.index_dir)
+        self.index.add([("old", "stale alert")])
+        self.assertEqual([h["id"] for h in reader.search("alert")], ["old"])
+        self.index.delete(["old"])
+        self.index.merge()  # leaves no segments
+        self.index.add([("new", "fresh alert")])
+        try:
+            self.assertEqual([h["id"] for h in reader.search("alert")], ["new"])
+            self.assertNotIn(1, reader._segments)
+        finally:
+            reader.close()
+
+    def test_uncommitted_segment_files_are_removed_by_the_next_write(self):
+        orphan = os.path.join(self.index_dir, "seg_99.bin")
+        open(orphan, "wb").close()
+        self.index.add([("a", "text")])
+        self.assertFalse(os.path.exists(orphan))
+
+    def test_tokenizer_folds_case_and_accents(self):
+        self.assertEqual(tokenize("Configuração do PostgreSQL!"), ["configuracao", "do", "postgresql"])
+
+
+class TestSearchTool(unittest.TestCase):
+    def test_uses_index_when_present(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            index = SearchIndex(tmp)
+            index.add([("runbook", "restart the worker when the queue is stuck")])
+            tool = SearchTool(index_path=tmp)
+            hits = tool.run({"q": "queue stuck"})["hits"]
+            self.assertEqual(hits[0]["id"], "runbook")
+            key = tool.cache_key({"q": "queue stuck"})
+            # unchanged index: the generation is not read again
+            with mock.patch.object(SearchIndex, "generation", new_callable=mock.PropertyMock) as generation:
+                self.assertEqual(tool.cache_key({"q": "other"}), key)
+            generation.assert_not_called()
+            index.add([("other", "queue")])
+            self.assertNotEqual(tool.cache_key({"q": "queue stuck"}), key)
+            tool._index.close()
+            index.close()
+
+    def test_falls_back_to_builtin_corpus(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            hits = SearchTool(index_path=os.path.join(tmp, "none")).run({"q": "python"})["hits"]
+        self.assertEqual([h["id"] for h in hits], ["python"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,173 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from agent import AgentRunner, RunStats
+from speculation import DEFAULT_RULES, NGramModel, Rule, Speculator
+from tracing import QUIET, Console, RingBufferExporter, Tracer
+
+
+class SlowLookup:
+    name = "lookup"
+    description = "Read-only lookup"
+    speculative = True
+
+    def __init__(self):
+        self.inputs = []
+
+    async def arun(self, input):
+        self.inputs.append(input)
+        await asyncio.sleep(0.1)
+        return {"value": input.get("key")}
+
+
+class Writer:
+    name = "write"
+    description = "Has side effects"
+
+    def __init__(self):
+        self.inputs = []
+
+    def run(self, input):
+        self.inputs.append(input)
+        return {"ok": True}
+
+
+class PlanningLLM:
+    """Takes 100 ms per plan; the first plan asks for `first`, the next one answers."""
+
+    def __init__(self, first):
+        self.first = first
+
+    async def achat(self, messages, functions=None, **kwargs):
+        await asyncio.sleep(0.1)
+        if messages[-1]["content"].startswith("Observation:") or self.first is None:
+            return {"content": json.dumps({"final": True, "answer": messages[-1]["content"]})}
+        return {"content": json.dumps({"final": False, "action": self.first})}
+
+
+def lookup(key):
+    return {"tool": "lookup", "input": {"key": key}}
+
+
+class TestPredictions(unittest.TestCase):
+    def predict(self, query):
+        for rule in DEFAULT_RULES:
+            action = rule.predict(query)
+            if action is not None:
+                return action
+
+    def test_rules(self):
+        self.assertEqual(self.predict("What time is it?"), {"tool": "current_time", "input": {}})
+        self.assertEqual(self.predict("Como está o tempo em São Paulo hoje?"), {
+            "tool": "weather_now", "input": {"city": "São Paulo"},
+        })
+        self.assertEqual(self.predict("weather in New York"), {"tool": "weather_now", "input": {"city": "New York"}})
+        self.assertEqual(self.predict('Run sum(rate(http_requests_total{job="api"}[5m])) by (code) please')["input"], {
+            "query": 'sum(rate(http_requests_total{job="api"}[5m])) by (code)',
+        })
+        self.assertEqual(self.predict('is up{job="api"} ok?')["input"], {"query": 'up{job="api"}'})
+        self.assertEqual(self.predict("Qual a temperatura no Rio de Janeiro?")["input"], {"city": "Rio de Janeiro"})
+        self.assertEqual(self.predict("avg(node_load1)")["input"], {"query": "avg(node_load1)"})
+        self.assertIsNone(self.predict("Quanto é 2 + 2?"))
+
+    def test_prose_is_not_predicted(self):
+        # each false positive would be a real remote call
+        for query in (
+            "Qual o tempo de resposta do serviço?", "quanto tempo para o deploy terminar?", "max (p99) latency",
+        ):
+            self.assertIsNone(self.predict(query), query)
+
+    def test_ngram_model(self):
+        model = NGramModel()
+        search = {"tool": "search", "input": {"q": "incidents"}}
+        records = [
+            {"query": f"how many open incidents {team}", "tool_calls": [search]}
+            for team in ("today", "for payments", "now", "in the api team")
+        ] + [
+            {"query": "hello there", "tool_calls": []},
+            {"query": "say hello", "tool_calls": []},
+            {"query": "how many open incidents", "status": "error"},
+        ]
+        self.assertEqual(model.train(records), 6)
+        action, probability, seen = model.predict("open incidents for search")
+        self.assertEqual(action, {"tool": "search", "input": {"q": "incidents"}})
+        self.assertGreater(probability, 0.7)
+        self.assertEqual(seen, 4)
+        self.assertIsNone(model.predict("hello")[0])
+
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "model.json")
+            model.save(path)
+            loaded = NGramModel.load(path)
+        self.assertEqual(loaded.predict("open incidents for search"), model.predict("open incidents for search"))
+        self.assertEqual(len(NGramModel.load(os.path.join(d, "missing.json"))), 0)
+
+    def test_only_safe_tools(self):
+        tools = {"lookup": SlowLookup(), "write": Writer(), "weather_now": object()}
+        rules = [Rule("lookup", "lookup"), Rule("write", "write"), Rule("weather", "weather_now")]
+        speculator = Speculator(rules=rules)
+        self.assertEqual(speculator.predict("lookup", tools)["tool"], "lookup")
+        self.assertIsNone(speculator.predict("write", tools))
+        # remote tools opt in by name
+        self.assertEqual(speculator.predict("weather", tools)["tool"], "weather_now")
+        self.assertIsNone(speculator.predict("weather", {}))
+
+
+class TestSpeculativeRuns(unittest.TestCase):
+    def run_agent(self, first, rules, query="go", tracer=None):
+        tool = SlowLookup()
+        speculator = Speculator(rules=[Rule(pattern, "lookup", lambda m: {"key": m.group(0)}) for pattern in rules])
+        runner = AgentRunner(
+            llm=PlanningLLM(first), tools={"lookup": tool, "write": Writer()}, speculator=speculator,
+            tracer=tracer or Tracer(), console=Console(QUIET),
+        )
+        stats = RunStats()
+        started = time.perf_counter()
+        answer = asyncio.run(runner.arun(query, stats=stats))
+        return answer, tool, speculator, stats, time.perf_counter() - started
+
+    def test_hit_runs_the_tool_once_during_the_llm_call(self):
+        exporter = RingBufferExporter()
+        answer, tool, speculator, stats, elapsed = self.run_agent(lookup("go"), ["go"], tracer=Tracer([exporter]))
+        self.assertEqual(tool.inputs, [{"key": "go"}])
+        self.assertIn('"value": "go"', answer)
+        self.assertEqual((speculator.stats.hits, speculator.stats.misses), (1, 0))
+        self.assertGreater(speculator.stats.saved_seconds, 0.08)
+        # two 100 ms plans, the 100 ms tool call hidden behind the first one
+        self.assertLess(elapsed, 0.27)
+        span = exporter.spans("agent.iteration")[0]
+        self.assertEqual(span.attributes["speculated"], "lookup")
+        self.assertTrue(span.attributes["speculation_hit"])
+
+    def test_miss_is_discarded(self):
+        answer, tool, speculator, stats, _ = self.run_agent(lookup("other"), ["go"])
+        self.assertEqual(tool.inputs[-1], {"key": "other"})
+        self.assertIn('"value": "other"', answer)
+        self.assertEqual((speculator.stats.hits, speculator.stats.misses), (0, 1))
+        self.assertEqual(stats.tool_calls, [{"tool": "lookup", "input": {"key": "other"}, "ok": True}])
+
+        # a direct answer is a miss too
+        answer, tool, speculator, stats, _ = self.run_agent(None, ["go"])
+        self.assertEqual(answer, "go")
+        self.assertEqual(speculator.stats.misses, 1)
+        self.assertEqual(stats.tool_calls, [])
+
+    def test_learns_first_actions_online(self):
+        tool = SlowLookup()
+        speculator = Speculator(rules=[], min_examples=2)
+        runner = AgentRunner(
+            llm=PlanningLLM(lookup("incidents")), tools={"lookup": tool}, speculator=speculator, tracer=Tracer(),
+            console=Console(QUIET),
+        )
+        for query in ("open incidents today", "open incidents now", "list open incidents"):
+            runner.run(query)
+        self.assertEqual((speculator.stats.hits, speculator.stats.misses), (1, 0))
+        self.assertEqual(len(speculator.model), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
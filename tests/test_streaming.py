@@ -0,0 +1,162 @@
+import asyncio
+import contextlib
+import io
+import json
+import time
+import unittest
+from unittest import mock
+
+from agent import AgentRunner, AgentConfig
+from benchmarks._fake_llm import FakeLLMServer
+from llm import OpenAIGPT4o
+from streaming import PlanStreamParser, SSEDecoder
+
+
+def sse_transcript(deltas, ensure_ascii=True):
+    events = [
+        json.dumps({"choices": [{"index": 0, "delta": d}]}, ensure_ascii=ensure_ascii) for d in deltas
+    ] + ["[DONE]"]
+    return "".join(f"data: {e}\r\n\r\n" for e in events).encode("utf-8")
+
+
+def replay(transcript: bytes, chunk_size: int):
+    """Feed a canned SSE transcript in fixed-size byte chunks; return parser events."""
+    decoder, parser, events = SSEDecoder(), PlanStreamParser(), []
+    for i in range(0, len(transcript), chunk_size):
+        for data in decoder.feed(transcript[i:i + chunk_size]):
+            if data != "[DONE]":
+                delta = json.loads(data)["choices"][0]["delta"]
+                events += parser.feed(delta.get("content", ""))
+    return events, parser
+
+
+ACTION_PLAN = json.dumps({
+    "final": False,
+    "thought": "need {two} tools",
+    "actions": [
+        {"tool": "calc", "input": {"expr": "2*{3}", "nested": {"a": [1, 2]}}},
+        {"tool": "current_time", "input": {"timezone": "UTC"}},
+    ],
+    "answer": None,
+})
+ANSWER_PLAN = json.dumps({
+    "final": True, "thought": "done", "action": None, "answer": "São 10h \"em ponto\"\n😀",
+})
+
+
+class TestPlanStreamParser(unittest.TestCase):
+    def test_actions_emitted_before_plan_completes(self):
+        deltas = [{"content": ACTION_PLAN[i:i + 5]} for i in range(0, len(ACTION_PLAN), 5)]
+        for chunk_size in (1, 7, 64, 4096):
+            events, parser = replay(sse_transcript(deltas), chunk_size)
+            actions = [v for k, v in events if k == "action"]
+            self.assertEqual([a["tool"] for a in actions], ["calc", "current_time"])
+            self.assertEqual(actions[0]["input"]["nested"], {"a": [1, 2]})
+            self.assertTrue(parser.done)
+
+    def test_first_action_available_mid_stream(self):
+        parser = PlanStreamParser()
+        cut = ACTION_PLAN.index('{"tool": "current_time"')
+        events = parser.feed(ACTION_PLAN[:cut])
+        self.assertEqual([v["tool"] for k, v in events if k == "action"], ["calc"])
+        self.assertFalse(parser.done)
+
+    def test_answer_streamed_token_by_token(self):
+        deltas = [{"content": ANSWER_PLAN[i:i + 3]} for i in range(0, len(ANSWER_PLAN), 3)]
+        events, _ = replay(sse_transcript(deltas), 11)
+        pieces = [v for k, v in events if k == "answer"]
+        self.assertGreater(len(pieces), 3)
+        self.assertEqual("".join(pieces), json.loads(ANSWER_PLAN)["answer"])
+
+    def test_multibyte_characters_split_across_reads(self):
+        answer = json.dumps({"final": True, "answer": "São Paulo, previsão: 😀"}, ensure_ascii=False)
+        deltas = [{"content": answer[i:i + 4]} for i in range(0, len(answer), 4)]
+        events, _ = replay(sse_transcript(deltas, ensure_ascii=False), 1)
+        self.assertEqual("".join(v for k, v in events if k == "answer"), "São Paulo, previsão: 😀")
+
+    def test_escapes_split_across_chunks(self):
+        answer = 'a "quoted"\nline\t\\ é 😀 end'
+        plan = json.dumps({"final": True, "answer": answer})
+        parser = PlanStreamParser()
+        pieces = [v for c in plan for k, v in parser.feed(c) if k == "answer"]
+        self.assertEqual("".join(pieces), answer)
+
+    def test_answer_decoding_is_linear(self):
+        plan = json.dumps({"final": True, "answer": "x\\y " * 5000})
+        parser = PlanStreamParser()
+        with mock.patch("streaming.json.loads", wraps=json.loads) as loads:
+            for c in plan:
+                parser.feed(c)
+        # each answer character is decoded about once, not once per later chunk
+        self.assertLess(sum(len(call.args[0]) for call in loads.call_args_list), 4 * len(plan))
+
+    def test_text_around_json_is_ignored(self):
+        events = PlanStreamParser().feed('```json\n{"action": {"tool": "echo", "input": {}}}\n```')
+        self.assertEqual(events, [("action", {"tool": "echo", "input": {}})])
+
+
+class SlowEcho:
+    name = "echo"
+    description = "Return the input as-is"
+
+    def __init__(self):
+        self.started_at = None
+
+    def run(self, input):
+        self.started_at = time.monotonic()
+        return {"echo": input}
+
+
+class TestStreamingRunner(unittest.TestCase):
+    def test_tool_dispatched_while_plan_streams_and_answer_tokens(self):
+        padding = "x" * 400  # plan keeps streaming long after the action closes
+
+        def responder(payload):
+            if any(str(m.get("content", "")).startswith("Observation:") for m in payload["messages"]):
+                plan = {"final": True, "thought": "done", "action": None, "answer": "tudo certo"}
+            else:
+                plan = {"final": False, "action": {"tool": "echo", "input": {"text": "hi"}},
+                        "thought": padding, "answer": None}
+            return {"role": "assistant", "content": json.dumps(plan)}
+
+        tool = SlowEcho()
+        tokens = []
+        with FakeLLMServer(responder=responder, stream_chunk=8, stream_delay=0.002) as server:
+            llm = OpenAIGPT4o(api_key="test", base_url=server.base_url)
+            runner = AgentRunner(llm=llm, tools={"echo": tool}, config=AgentConfig(stream=True),
+                                 on_answer_token=tokens.append)
+            first_stream_done = []
+            original = runner._astream_plan
+
+            async def timed(*args, **kwargs):
+                result = await original(*args, **kwargs)
+                first_stream_done.append(time.monotonic())
+                return result
+
+            runner._astream_plan = timed
+            with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+                answer = runner.run("q")
+        self.assertEqual(answer, "tudo certo")
+        self.assertEqual("".join(tokens), "tudo certo")
+        self.assertLess(tool.started_at, first_stream_done[0])
+
+    def test_streamed_function_calls(self):
+        def responder(payload):
+            if any(str(m.get("content", "")).startswith("Observation:") for m in payload["messages"]):
+                return {"role": "assistant", "content": json.dumps({"final": True, "answer": "ok"})}
+            return {"role": "assistant", "content": None, "tool_calls": [
+                {"type": "function", "function": {"name": "echo", "arguments": json.dumps({"text": t})}}
+                for t in ("a", "b")
+            ]}
+
+        tool = SlowEcho()
+        with FakeLLMServer(responder=responder, stream_chunk=3) as server:
+            llm = OpenAIGPT4o(api_key="test", base_url=server.base_url)
+            runner = AgentRunner(llm=llm, tools={"echo": tool}, config=AgentConfig(stream=True))
+            with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+                self.assertEqual(asyncio.run(runner._run_once("q")), "ok")
+        self.assertIsNotNone(tool.started_at)
+
+
+if __name__ == "__main__":
+    unittest.main()
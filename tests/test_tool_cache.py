@@ -0,0 +1,93 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+
+from agent import AgentRunner
+from tools.cache import MISSING, MemoryCacheBackend, SQLiteCacheBackend, ToolResultCache
+from tools.file_tool import FileTool
+
+
+class CountingTool:
+    name = "count"
+    description = "Counts its calls"
+    cacheable = True
+    cache_ttl = 60.0
+
+    def __init__(self):
+        self.calls = 0
+
+    def run(self, input):
+        self.calls += 1
+        if input.get("fail"):
+            return {"error": "boom"}
+        return {"calls": self.calls}
+
+
+class UncachedTool(CountingTool):
+    name = "uncached"
+    cacheable = False
+
+
+class TestToolResultCache(unittest.TestCase):
+    def test_memory_backend_lru_and_ttl(self):
+        backend = MemoryCacheBackend(max_entries=2)
+        backend.set("a", 1, 60)
+        backend.set("b", 2, 60)
+        backend.get("a")
+        backend.set("c", 3, 60)  # evicts "b", the least recently used
+        self.assertIs(backend.get("b"), MISSING)
+        self.assertEqual(backend.get("a"), 1)
+        backend.set("d", 4, -1)
+        self.assertIs(backend.get("d"), MISSING)
+
+    def test_sqlite_backend_survives_restart_and_evicts(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.db")
+            backend = SQLiteCacheBackend(path, max_entries=2)
+            backend.set("a", {"x": 1}, 60)
+            time.sleep(0.01)
+            backend.set("b", {"x": 2}, 60)
+            time.sleep(0.01)
+            backend.set("c", {"x": 3}, 60)
+            backend.close()
+            reopened = SQLiteCacheBackend(path)
+            self.assertIs(reopened.get("a"), MISSING)
+            self.assertEqual(reopened.get("c"), {"x": 3})
+            reopened.close()
+
+    def test_runner_serves_repeated_calls_from_cache(self):
+        cached, uncached = CountingTool(), UncachedTool()
+        cache = ToolResultCache()
+        runner = AgentRunner(llm=None, tools={"count": cached, "uncached": uncached}, cache=cache)
+
+        async def calls():
+            for _ in range(3):
+                await runner._arun_tool("count", {"b": 1, "a": 2})
+                await runner._arun_tool("count", {"a": 2, "b": 1})  # same canonical input
+                await runner._arun_tool("uncached", {})
+                await runner._arun_tool("count", {"fail": True})
+
+        asyncio.run(calls())
+        self.assertEqual(cached.calls, 1 + 3)  # errors are never cached
+        self.assertEqual(uncached.calls, 3)
+        stats = cache.stats()
+        self.assertEqual(stats["tools"]["count"]["hits"], 5)
+        self.assertNotIn("uncached", stats["tools"])
+
+    def test_file_key_changes_with_file(self):
+        tool, cache = FileTool(), ToolResultCache()
+        with tempfile.NamedTemporaryFile("w", delete=False, suffix=".txt") as f:
+            f.write("one\n")
+        try:
+            before = cache.key("read_file", tool, {"path": f.name})
+            with open(f.name, "a") as fh:
+                fh.write("two\n")
+            self.assertNotEqual(before, cache.key("read_file", tool, {"path": f.name}))
+        finally:
+            os.unlink(f.name)
+
+
+if __name__ == "__main__":
+    unittest.main()
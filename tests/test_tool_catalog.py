@@ -0,0 +1,60 @@
+import unittest
+
+from tools import get_tools
+from tools.catalog import ToolCatalog
+from tools.echo_tool import EchoTool
+
+
+class NoSchemaTool:
+    name = "bare"
+    description = "A tool without a parameters schema"
+
+    def run(self, input):
+        return {}
+
+
+class SwappingTool(NoSchemaTool):
+    """Adds a tool to its catalog while the catalog is being built, like MCP discovery on another thread."""
+
+    name = "swapping"
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+
+    @property
+    def parameters(self):
+        self.catalog.setdefault("late", NoSchemaTool())
+        return None
+
+
+class TestToolCatalog(unittest.TestCase):
+    def test_views_are_cached_until_tools_change(self):
+        catalog = get_tools()
+        functions, message = catalog.functions, catalog.prompt_message
+        self.assertIs(catalog.functions, functions)
+        self.assertIs(catalog.prompt_message, message)
+
+        version = catalog.version
+        catalog["bare"] = NoSchemaTool()
+        self.assertGreater(catalog.version, version)
+        self.assertIsNot(catalog.functions, functions)
+        self.assertIn("bare", catalog.prompt_message["content"])
+
+        del catalog["bare"]
+        self.assertNotIn("bare", [f["name"] for f in catalog.functions])
+
+    def test_functions_use_real_schemas(self):
+        catalog = ToolCatalog(echo=EchoTool(), bare=NoSchemaTool())
+        by_name = {f["name"]: f for f in catalog.functions}
+        self.assertEqual(by_name["echo"]["parameters"], EchoTool.parameters)
+        self.assertEqual(by_name["bare"]["parameters"], {"type": "object", "properties": {}})
+
+    def test_change_during_build_is_picked_up_next_time(self):
+        catalog = ToolCatalog()
+        catalog["swapping"] = SwappingTool(catalog)
+        self.assertEqual([f["name"] for f in catalog.functions], ["swapping"])
+        self.assertEqual([f["name"] for f in catalog.functions], ["swapping", "late"])
+
+
+if __name__ == "__main__":
+    unittest.main()
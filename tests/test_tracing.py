@@ -0,0 +1,160 @@
+import io
+import json
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from agent import AgentRunner
+from tracing import (
+    DEBUG, INFO, NOOP_SPAN, QUIET, Console, Json, JSONLExporter, OTLPExporter, RingBufferExporter, Tracer, to_otlp,
+)
+
+
+class EchoTool:
+    name = "echo"
+    description = "Return the input"
+
+    def run(self, input):
+        if input.get("fail"):
+            raise RuntimeError("boom")
+        return {"echo": input}
+
+
+class ScriptedLLM:
+    def __init__(self, responses):
+        self.responses = list(responses)
+
+    def chat(self, messages, functions=None, **kwargs):
+        return self.responses.pop(0)
+
+
+def plan(**kwargs):
+    return {"content": json.dumps(kwargs)}
+
+
+class TestTracer(unittest.TestCase):
+    def test_no_exporters_is_a_noop(self):
+        tracer = Tracer()
+        with tracer.span("x", a=1) as span:
+            self.assertIs(span, NOOP_SPAN)
+            self.assertFalse(span.recording)
+
+    def test_nesting_errors_and_exporters(self):
+        ring = RingBufferExporter(capacity=3)
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "trace.jsonl")
+            tracer = Tracer([ring, JSONLExporter(path)])
+            with tracer.span("outer") as outer:
+                with self.assertRaises(ValueError), tracer.span("inner", n=1):
+                    raise ValueError("bad")
+            tracer.close()
+            with open(path, encoding="utf-8") as f:
+                lines = [json.loads(line) for line in f]
+        inner, outer_span = ring.spans()
+        self.assertIs(outer_span, outer)
+        self.assertEqual((inner.parent_id, inner.trace_id), (outer.span_id, outer.trace_id))
+        self.assertEqual((inner.status, inner.error, inner.attributes), ("error", "bad", {"n": 1}))
+        self.assertGreaterEqual(outer.end_ns, inner.end_ns)
+        self.assertEqual([line["name"] for line in lines], ["inner", "outer"])
+
+        for _ in range(5):
+            with tracer.span("more"):
+                pass
+        self.assertEqual(len(ring.spans()), 3)
+
+    def test_otlp_export(self):
+        received = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                received.append((self.path, json.loads(self.rfile.read(int(self.headers["Content-Length"])))))
+                self.send_response(200)
+                self.send_header("Content-Length", "2")
+                self.end_headers()
+                self.wfile.write(b"{}")
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            exporter = OTLPExporter(f"http://127.0.0.1:{server.server_port}/v1/traces", interval=0.05)
+            tracer = Tracer([exporter])
+            with tracer.span("llm.call", prompt_tokens=12, streamed=False, ratio=0.5, tags=["a"]):
+                pass
+            exporter.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertEqual(exporter.sent, 1)
+        path, body = received[0]
+        self.assertEqual(path, "/v1/traces")
+        span = body["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+        self.assertEqual(span["name"], "llm.call")
+        self.assertEqual(len(span["traceId"]), 32)
+        attributes = {a["key"]: a["value"] for a in span["attributes"]}
+        self.assertEqual(attributes["prompt_tokens"], {"intValue": "12"})
+        self.assertEqual(attributes["streamed"], {"boolValue": False})
+        self.assertEqual(attributes["tags"], {"stringValue": '["a"]'})
+        self.assertEqual(to_otlp([])["resourceSpans"][0]["scopeSpans"][0]["spans"], [])
+
+
+class TestConsole(unittest.TestCase):
+    def test_levels_and_lazy_formatting(self):
+        class Exploding:
+            def __str__(self):
+                raise AssertionError("formatted while off")
+
+        out = io.StringIO()
+        console = Console(INFO, stream=out)
+        console.debug("raw %s", Exploding())
+        console.info("tool %s: %s", "calc", Json({"result": "x" * 50}, limit=10))
+        self.assertEqual(out.getvalue(), 'tool calc: {"result":… [54 more chars]\n')
+        Console(QUIET, stream=out).info("%s", Exploding())
+
+    def test_rate_limit_reports_suppressed_lines(self):
+        out = io.StringIO()
+        console = Console(DEBUG, max_lines_per_second=3, stream=out)
+        for i in range(10):
+            console.info("line %d", i)
+        self.assertEqual(out.getvalue().splitlines(), ["line 0", "line 1", "line 2"])
+        console._allowance = 3
+        console.info("after")
+        self.assertEqual(out.getvalue().splitlines()[3:], ["[7 console line(s) suppressed]", "after"])
+
+
+class TestAgentSpans(unittest.TestCase):
+    def test_run_iteration_llm_and_tool_spans(self):
+        ring = RingBufferExporter()
+        llm = ScriptedLLM([
+            plan(final=False, thought="t", actions=[
+                {"tool": "echo", "input": {"x": 1}}, {"tool": "echo", "input": {"fail": True}},
+            ], answer=None),
+            plan(final=True, thought="done", action=None, answer="ok"),
+        ])
+        out = io.StringIO()
+        runner = AgentRunner(llm=llm, tools={"echo": EchoTool()}, tracer=Tracer([ring]), console=Console(stream=out))
+        self.assertEqual(runner.run("go"), "ok")
+
+        (run,) = ring.spans("agent.run")
+        iterations = ring.spans("agent.iteration")
+        self.assertEqual([s.attributes["iteration"] for s in iterations], [1, 2])
+        self.assertTrue(all(s.parent_id == run.span_id for s in iterations))
+        calls = ring.spans("llm.call")
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(calls[0].parent_id, iterations[0].span_id)
+        self.assertGreater(calls[0].attributes["prompt_tokens_estimate"], 0)
+        self.assertGreater(calls[0].attributes["response_chars"], 0)
+        ok, failed = sorted(ring.spans("tool.call"), key=lambda s: s.status == "error")
+        self.assertEqual((ok.status, failed.status, failed.error), ("ok", "error", "boom"))
+        self.assertEqual(ok.parent_id, iterations[0].span_id)
+        self.assertEqual(run.attributes["answer_chars"], 2)
+        self.assertIn(">>> Invoking tool 'echo'", out.getvalue())
+        self.assertNotIn("BEGIN PLAN RAW LLM OUTPUT", out.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,14 +1,38 @@
-from tools.echo_tool import EchoTool
-from tools.calc_tool import CalcTool
-from tools.search_tool import SearchTool
-from tools.file_tool import FileTool
-from tools.current_time_tool import CurrentTimeTool
-from tools.graph_tool import GraphTool
+"""Built-in tool registry.
+
+Tools are wrapped in `LazyTool` with the metadata snapshot in
+`tools/specs.json`, so building the catalog imports no tool module; each
+module (and its dependencies, e.g. numpy for `search`) is imported the first
+time the tool runs. The snapshot is generated from the tool classes by
+`python -m tools.specs`.
+"""
+import importlib
+import os
+
+from tools import specs
+from tools.catalog import ToolCatalog
+from tools.lazy import LazyTool
+
+# class name -> "module:Class", for `from tools import GraphTool`
+_CLASSES = {target.split(":")[1]: target for target in specs.TARGETS}
+
+
+def _specs():
+    return [LazyTool(**spec) for spec in specs.load()]
+
+
+def _memory_store_exists() -> bool:
+    # where MemorySearchTool looks by default
+    return os.path.exists(os.path.join(os.getenv("AGENT_MEMORY", ".agent_memory"), "memory.db"))
 
 
 def get_tools():
-    """Return a dict of tool instances keyed by name."""
-    return {t.name: t for t in [EchoTool(), CalcTool(), SearchTool(), FileTool(), CurrentTimeTool(), GraphTool()]}
+    """Return a ToolCatalog (a dict of lazily loaded tools keyed by name).
+
+    `memory_search` is left out unless a memory store exists; `cli.py --memory` adds its own.
+    """
+    has_memory = _memory_store_exists()
+    return ToolCatalog((t.name, t) for t in _specs() if t.name != "memory_search" or has_memory)
 
 
 def get_functions():
@@ -16,11 +40,11 @@ def get_functions():
 
     Each function follows the OpenAI function schema: {name, description, parameters}.
     """
-    funcs = []
-    for t in get_tools().values():
-        params = getattr(t, "parameters", None)
-        if params is None:
-            # default: accept an object with free-form properties
-            params = {"type": "object", "properties": {}}
-        funcs.append({"name": t.name, "description": getattr(t, "description", ""), "parameters": params})
-    return funcs
+    return list(get_tools().functions)
+
+
+def __getattr__(name):
+    # `from tools import GraphTool` still works, importing only that module
+    if name in _CLASSES:
+        return getattr(importlib.import_module(_CLASSES[name].split(":")[0]), name)
+    raise AttributeError(f"module 'tools' has no attribute {name!r}")
@@ -0,0 +1,185 @@
+"""Result cache for tool calls, keyed by tool name + canonical input.
+
+Tools opt in by declaring class attributes:
+
+- `cacheable = True` and `cache_ttl = <seconds>`;
+- optionally `cache_key(input)`, returning extra data that must be part of
+  the key (e.g. a file's mtime, or the current second for `current_time`).
+
+Tools that declare nothing are never cached, and neither are results with
+an `error` key. `ToolResultCache(ttls={...})` overrides TTLs per tool name,
+which is also how remote MCP tools (that cannot carry attributes) opt in;
+a TTL of 0 disables caching for that tool.
+
+Two LRU backends are provided: `MemoryCacheBackend` and
+`SQLiteCacheBackend`, which survives restarts.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# remote MCP tools served by mcp/server.py
+DEFAULT_TTLS = {
+    "weather_now": 300.0,
+    "weather_forecast": 900.0,
+    "prometheus_query": 15.0,
+}
+
+# returned by `ToolResultCache.get` on a miss (None can be a valid result)
+MISSING = object()
+
+
+def canonical_json(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+class MemoryCacheBackend:
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return MISSING
+            expires, value = item
+            if expires < time.time():
+                del self._data[key]
+                return MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float):
+        with self._lock:
+            self._data[key] = (time.time() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteCacheBackend:
+    """On-disk LRU; values are stored as JSON, so results must be JSON-serializable."""
+
+    def __init__(self, path: str, max_entries: int = 10000, table: str = "tool_cache"):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name: {table!r}")
+        self.path = path
+        self.max_entries = max_entries
+        self.table = table
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL, used REAL NOT NULL)"
+        )
+        self._db.execute(f"CREATE INDEX IF NOT EXISTS {table}_used ON {table}(used)")
+
+    def get(self, key: str) -> Any:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(f"SELECT value, expires FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return MISSING
+            if row[1] < now:
+                self._db.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                return MISSING
+            self._db.execute(f"UPDATE {self.table} SET used = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: float):
+        try:
+            data = json.dumps(value)
+        except (TypeError, ValueError):
+            return
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires, used) VALUES (?, ?, ?, ?)",
+                (key, data, now + ttl, now),
+            )
+            (count,) = self._db.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+            if count > self.max_entries:
+                self._db.execute(
+                    f"DELETE FROM {self.table} WHERE key IN (SELECT key FROM {self.table} ORDER BY used LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+
+    def clear(self):
+        with self._lock:
+            self._db.execute(f"DELETE FROM {self.table}")
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class ToolResultCache:
+    def __init__(self, backend=None, ttls: Optional[Dict[str, float]] = None):
+        self.backend = backend if backend is not None else MemoryCacheBackend()
+        self.ttls = dict(DEFAULT_TTLS)
+        self.ttls.update(ttls or {})
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def ttl_for(self, tool_name: str, tool: Any) -> float:
+        """Seconds results of `tool` stay fresh; 0 means not cacheable."""
+        if tool_name in self.ttls:
+            return self.ttls[tool_name]
+        if getattr(tool, "cacheable", False):
+            return float(getattr(tool, "cache_ttl", 60.0))
+        return 0.0
+
+    def key(self, tool_name: str, tool: Any, input: Any) -> str:
+        extra = tool.cache_key(input) if hasattr(tool, "cache_key") else None
+        raw = canonical_json({"tool": tool_name, "input": input, "extra": extra})
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _count(self, tool_name: str, field: str):
+        with self._lock:
+            stats = self._stats.setdefault(tool_name, {"hits": 0, "misses": 0, "stores": 0})
+            stats[field] += 1
+
+    def get(self, key: str, tool_name: str) -> Any:
+        """Return the cached result or `MISSING`."""
+        value = self.backend.get(key)
+        self._count(tool_name, "misses" if value is MISSING else "hits")
+        return value
+
+    def put(self, key: str, tool_name: str, result: Any, ttl: float):
+        if isinstance(result, dict) and "error" in result:
+            return
+        self.backend.set(key, result, ttl)
+        self._count(tool_name, "stores")
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-tool hits/misses/stores plus totals and the overall hit rate."""
+        with self._lock:
+            per_tool = {name: dict(s) for name, s in self._stats.items()}
+        hits = sum(s["hits"] for s in per_tool.values())
+        misses = sum(s["misses"] for s in per_tool.values())
+        return {
+            "tools": per_tool,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+        }
@@ -1,31 +1,47 @@
-"""A small calculation tool that evaluates simple arithmetic expressions.
+"""A calculation tool for arithmetic expressions, with math functions.
 
-It is intentionally limited and uses Python's eval on a restricted namespace.
+Expressions are checked against a whitelist and compiled once (see
+tools/expression.py); nothing reaches Python's `eval` unchecked. Binding a
+variable in `vars` to a list evaluates the expression for every element in
+one vectorized call.
 """
 from __future__ import annotations
 
 from typing import Any, Dict
 
+from tools.expression import evaluate
+
 
 class CalcTool:
     name = "calc"
-    description = "Evaluate a simple arithmetic expression provided as 'expr'"
+    description = (
+        "Evaluate an arithmetic expression 'expr' (math functions like sqrt, log, sin allowed); "
+        "variables come from 'vars', and a list value evaluates the expression for each element"
+    )
     parameters = {
         "type": "object",
-        "properties": {"expr": {"type": "string", "description": "Arithmetic expression"}},
+        "properties": {
+            "expr": {"type": "string", "description": "Arithmetic expression"},
+            "vars": {
+                "type": "object",
+                "description": "Variable values: a number, or a list of numbers to evaluate element-wise",
+            },
+        },
         "required": ["expr"],
     }
+    cacheable = True
+    cache_ttl = 3600.0
 
     def run(self, input: Dict[str, Any]) -> Dict[str, Any]:
         expr = input.get("expr")
         if not expr:
             return {"error": "expr is required"}
-
-        # restricted eval
-        allowed_names = {"__builtins__": {}}
+        variables = input.get("vars") or {}
+        if not isinstance(variables, dict):
+            return {"error": "vars must be an object"}
         try:
-            result = eval(expr, allowed_names, {})
+            result = evaluate(str(expr), variables)
         except Exception as e:
-            return {"error": str(e)}
+            return {"error": str(e) or type(e).__name__}
 
         return {"result": result}
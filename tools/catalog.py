@@ -0,0 +1,109 @@
+"""Tool registry that caches what the LLM sees about the tools.
+
+`ToolCatalog` is a plain `dict` of tools keyed by name that also keeps a
+`version`, bumped whenever a tool is added, replaced or removed (e.g. after
+MCP discovery). The "Available tools" prompt message and the function-calling
+schemas are built once per version instead of on every agent iteration, and
+use each tool's real `parameters` JSON schema.
+"""
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List, Optional
+
+# used for tools that do not declare `parameters`
+FREE_FORM_PARAMETERS = {"type": "object", "properties": {}}
+
+
+def _description(tool: Any) -> str:
+    try:
+        return getattr(tool, "description", "") or ""
+    except Exception:
+        return ""
+
+
+class ToolCatalog(dict):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.version = 0
+        self._built_version: Optional[int] = None
+        self._message: Dict[str, str] = {}
+        self._functions: List[Dict[str, Any]] = []
+
+    # --- mutations invalidate the cached views --------------------------
+
+    def _changed(self):
+        self.version += 1
+
+    def __setitem__(self, name, tool):
+        super().__setitem__(name, tool)
+        self._changed()
+
+    def __delitem__(self, name):
+        super().__delitem__(name)
+        self._changed()
+
+    def pop(self, *args):
+        result = super().pop(*args)
+        self._changed()
+        return result
+
+    def popitem(self):
+        result = super().popitem()
+        self._changed()
+        return result
+
+    def setdefault(self, name, tool=None):
+        if name not in self:
+            self[name] = tool
+        return self[name]
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._changed()
+
+    def clear(self):
+        super().clear()
+        self._changed()
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    # --- cached views ----------------------------------------------------
+
+    def _build(self):
+        # read before the snapshot: a swap during the build leaves the views stale, to be rebuilt next time
+        version = self.version
+        if self._built_version == version:
+            return
+        descriptions = []
+        functions = []
+        # a snapshot, since MCP discovery may swap tools from another thread
+        for name, tool in list(self.items()):
+            desc = _description(tool)
+            descriptions.append({"name": name, "description": desc})
+            functions.append({
+                "name": name,
+                "description": desc,
+                "parameters": getattr(tool, "parameters", None) or FREE_FORM_PARAMETERS,
+            })
+        try:
+            content = f"Available tools: {json.dumps(descriptions)}"
+        except Exception:
+            content = f"Available tools: {descriptions}"
+        self._message = {"role": "system", "content": content}
+        self._functions = functions
+        self._built_version = version
+
+    @property
+    def prompt_message(self) -> Dict[str, str]:
+        """The "Available tools" system message (shared; do not mutate)."""
+        self._build()
+        return self._message
+
+    @property
+    def functions(self) -> List[Dict[str, Any]]:
+        """OpenAI function schemas {name, description, parameters} (shared; do not mutate)."""
+        self._build()
+        return self._functions
@@ -10,6 +10,7 @@ Returns a dict with a `time` key on success or `error` on failure.
 """
 from __future__ import annotations
 
+import time
 from datetime import datetime, timezone
 from typing import Any, Dict
 
@@ -30,6 +31,14 @@ class CurrentTimeTool:
         },
         "required": [],
     }
+    # the answer only changes once per second
+    cacheable = True
+    cache_ttl = 1.0
+    # read-only: may run before the LLM asks for it (see speculation.py)
+    speculative = True
+
+    def cache_key(self, input: Dict[str, Any]):
+        return int(time.time())
 
     def run(self, input: Dict[str, Any]) -> Dict[str, Any]:
         tz_name = (input or {}).get("timezone") or "UTC"
@@ -0,0 +1,242 @@
+"""Safe arithmetic expressions for `calc`: whitelisted AST, compiled once.
+
+`compile_expression(expr, vectorized)` parses `expr`, rejects every node
+that is not a number, a name, an arithmetic/comparison operator or a call
+of an allowed function, rewrites `**` and `*` into checked helpers and
+compiles the result to a code object, kept in a small LRU.
+Evaluation is then a plain `eval` of that code with no builtins.
+
+Scalars use `math`. With `vectorized=True` the names are bound to NumPy
+float64 arrays and the functions are their NumPy ufunc equivalents, so one
+call evaluates the expression for every element.
+
+Nothing can run long: the expression has at most `MAX_NODES` nodes (it has
+no loops, so that bounds the number of operations), arrays have at most
+`MAX_ELEMENTS` elements, and integer results are limited to `MAX_INT_BITS`
+bits, checked *before* `**`, `*` and `factorial` are computed (so
+`9**9**9` fails at once instead of hanging the worker).
+"""
+
+from __future__ import annotations
+
+import ast
+import math
+import threading
+from collections import OrderedDict
+from functools import reduce
+from typing import Any, Dict, Tuple
+
+MAX_EXPR_CHARS = 2000
+MAX_NODES = 200
+MAX_INT_BITS = 4096
+MAX_ELEMENTS = 1_000_000
+_CACHE_SIZE = 1024
+
+CONSTANTS = {"pi": math.pi, "e": math.e, "tau": math.tau, "inf": math.inf, "nan": math.nan}
+_BINOPS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow)
+_UNARYOPS = (ast.UAdd, ast.USub)
+_CMPOPS = (ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE)
+
+
+class ExpressionError(ValueError):
+    pass
+
+
+def _check_int(value):
+    if isinstance(value, int) and value.bit_length() > MAX_INT_BITS:
+        raise ExpressionError(f"result too large (more than {MAX_INT_BITS} bits)")
+    return value
+
+
+def _is_array(value) -> bool:
+    return hasattr(value, "shape")
+
+
+def _pow(base, exponent):
+    if _is_array(base) or _is_array(exponent):
+        import numpy as np
+
+        return np.power(np.asarray(base, dtype=np.float64), exponent)
+    if isinstance(base, int) and isinstance(exponent, int) and exponent > 0 and abs(base) > 1:
+        if exponent * math.log2(abs(base)) > MAX_INT_BITS:
+            raise ExpressionError(f"result too large (more than {MAX_INT_BITS} bits)")
+    result = base ** exponent
+    if isinstance(result, complex):
+        raise ExpressionError("complex result")
+    return _check_int(result)
+
+
+def _mul(a, b):
+    if isinstance(a, int) and isinstance(b, int) and a.bit_length() + b.bit_length() > MAX_INT_BITS + 1:
+        raise ExpressionError(f"result too large (more than {MAX_INT_BITS} bits)")
+    return a * b
+
+
+def _factorial(n):
+    if n > 1000:
+        raise ExpressionError("factorial argument too large (max 1000)")
+    return _check_int(math.factorial(n))
+
+
+def _comb(n, k):
+    if n > 10000:
+        raise ExpressionError("comb argument too large (max 10000)")
+    return _check_int(math.comb(n, k))
+
+
+_SCALAR_FUNCTIONS = {
+    name: getattr(math, name)
+    for name in (
+        "sqrt", "exp", "log", "log10", "log2", "sin", "cos", "tan", "asin", "acos", "atan", "atan2",
+        "sinh", "cosh", "tanh", "floor", "ceil", "trunc", "fabs", "hypot", "degrees", "radians", "gcd",
+    )
+}
+_SCALAR_FUNCTIONS.update(abs=abs, round=round, min=min, max=max, pow=_pow, factorial=_factorial, comb=_comb)
+_NUMPY_NAMES = {"asin": "arcsin", "acos": "arccos", "atan": "arctan", "atan2": "arctan2", "abs": "absolute"}
+FUNCTIONS = tuple(sorted(_SCALAR_FUNCTIONS))
+
+
+def _numpy_functions() -> Dict[str, Any]:
+    import numpy as np
+
+    functions = {
+        name: getattr(np, _NUMPY_NAMES.get(name, name))
+        for name in _SCALAR_FUNCTIONS
+        if name not in ("round", "min", "max", "pow", "factorial", "comb", "gcd")
+    }
+    functions.update(
+        round=np.round,
+        min=lambda *a: reduce(np.minimum, a),
+        max=lambda *a: reduce(np.maximum, a),
+        pow=_pow,
+    )
+    return functions
+
+
+class _Compiler:
+    """Validates the tree in one pass, rewriting `a ** b` / `a * b` into `_pow(a, b)` / `_mul(a, b)`."""
+
+    def __init__(self, functions):
+        self.functions = functions
+        self.variables = set()
+        self.nodes = 0
+
+    def visit(self, node, callee: bool = False):
+        self.nodes += 1
+        if self.nodes > MAX_NODES:
+            raise ExpressionError(f"expression too long (more than {MAX_NODES} nodes)")
+        if isinstance(node, ast.BinOp) and isinstance(node.op, _BINOPS):
+            node.left, node.right = self.visit(node.left), self.visit(node.right)
+            helper = {ast.Pow: "_pow", ast.Mult: "_mul"}.get(type(node.op))
+            if helper is None:
+                return node
+            func = ast.copy_location(ast.Name(id=helper, ctx=ast.Load()), node)
+            return ast.copy_location(ast.Call(func=func, args=[node.left, node.right], keywords=[]), node)
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, _UNARYOPS):
+            node.operand = self.visit(node.operand)
+            return node
+        if isinstance(node, ast.Compare) and all(isinstance(op, _CMPOPS) for op in node.ops):
+            node.left = self.visit(node.left)
+            node.comparators = [self.visit(c) for c in node.comparators]
+            return node
+        if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+            return node
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.keywords:
+                raise ExpressionError("only calls like f(x, y) of the allowed functions are supported")
+            name = node.func.id
+            if name in _SCALAR_FUNCTIONS and name not in self.functions:
+                raise ExpressionError(f"'{name}' cannot be used with list variables")
+            if name not in self.functions:
+                raise ExpressionError(f"unknown function '{name}'")
+            self.visit(node.func, callee=True)
+            node.args = [self.visit(a) for a in node.args]
+            return node
+        if isinstance(node, ast.Name):
+            if node.id.startswith("_"):
+                raise ExpressionError(f"invalid name '{node.id}'")
+            if node.id in self.functions and not callee:
+                raise ExpressionError(f"'{node.id}' is a function")
+            if node.id not in self.functions and node.id not in CONSTANTS:
+                self.variables.add(node.id)
+            return node
+        raise ExpressionError(f"unsupported syntax: {type(node).__name__}")
+
+
+class CompiledExpression:
+    def __init__(self, expr: str, vectorized: bool):
+        if len(expr) > MAX_EXPR_CHARS:
+            raise ExpressionError(f"expression too long (more than {MAX_EXPR_CHARS} characters)")
+        try:
+            tree = ast.parse(expr.strip(), mode="eval")
+        except (SyntaxError, RecursionError, MemoryError) as e:
+            raise ExpressionError(f"invalid expression: {e}") from None
+        functions = _numpy_functions() if vectorized else _SCALAR_FUNCTIONS
+        compiler = _Compiler(functions)
+        tree.body = compiler.visit(tree.body)
+        self.variables = tuple(sorted(compiler.variables))
+        self.vectorized = vectorized
+        self._code = compile(tree, "<calc>", "eval")
+        # variables are passed as locals, so this is shared by every evaluation
+        self._globals = dict(CONSTANTS, **functions, _pow=_pow, _mul=_mul, __builtins__={})
+
+    def evaluate(self, variables: Dict[str, Any]):
+        try:
+            bound = {name: variables[name] for name in self.variables}
+        except KeyError as e:
+            raise ExpressionError(f"undefined variable '{e.args[0]}'") from None
+        if not self.vectorized:
+            return _check_int(eval(self._code, self._globals, bound))
+        import numpy as np
+
+        with np.errstate(all="ignore"):
+            return eval(self._code, self._globals, bound)
+
+
+_compiled: "OrderedDict[Tuple[str, bool], CompiledExpression]" = OrderedDict()
+_compiled_lock = threading.Lock()
+
+
+def compile_expression(expr: str, vectorized: bool = False) -> CompiledExpression:
+    key = (expr, vectorized)
+    with _compiled_lock:
+        if key in _compiled:
+            _compiled.move_to_end(key)
+            return _compiled[key]
+    compiled = CompiledExpression(expr, vectorized)
+    with _compiled_lock:
+        _compiled[key] = compiled
+        while len(_compiled) > _CACHE_SIZE:
+            _compiled.popitem(last=False)
+    return compiled
+
+
+def evaluate(expr: str, variables: Dict[str, Any] = None):
+    """Evaluate `expr`; any variable bound to a list makes it an element-wise evaluation.
+
+    Returns a number (or bool), or a list with one value per element
+    (None where the value is not finite).
+    """
+    variables = variables or {}
+    if not any(isinstance(v, (list, tuple)) for v in variables.values()):
+        for name, value in variables.items():
+            if type(value) not in (int, float):
+                raise ExpressionError(f"variable '{name}' must be a number or a list of numbers")
+        return compile_expression(expr).evaluate(variables)
+
+    import numpy as np
+
+    arrays = {}
+    for name, value in variables.items():
+        try:
+            arrays[name] = np.asarray(value, dtype=np.float64)
+        except (TypeError, ValueError):
+            raise ExpressionError(f"variable '{name}' must be a number or a list of numbers") from None
+        if arrays[name].ndim > 1 or arrays[name].size > MAX_ELEMENTS:
+            raise ExpressionError(f"variable '{name}' must be a flat list of at most {MAX_ELEMENTS} numbers")
+    try:
+        shape = np.broadcast_shapes(*(a.shape for a in arrays.values()))
+    except ValueError:
+        raise ExpressionError("list variables must all have the same length") from None
+    result = np.broadcast_to(np.asarray(compile_expression(expr, True).evaluate(arrays), dtype=np.float64), shape)
+    return [float(v) if math.isfinite(v) else None for v in result.tolist()]
@@ -1,34 +1,316 @@
-"""A tiny file tool that reads a file path from input and returns first N lines."""
+"""Read files of any size through mmap, without loading them into memory.
+
+One call does one of (checked in this order):
+
+- `grep`: lines matching a regex, scanned straight from the mapping, at most
+  `max_matches` of them, with their line numbers and byte offsets;
+- `tail`: the last N lines, found by searching backwards from the end;
+- `offset` / `length`: a byte range (a negative offset counts from the end);
+- `start_line` / `end_line`: a line range, located through a newline index;
+- otherwise the first `lines` lines.
+
+Output is bounded by `max_bytes` as well as by line counts; a bounded
+result says `"truncated": true` and where to continue from.
+
+The newline index stores the number of newlines before every 1 MiB block, so
+it is ~8 KiB per GiB. It is kept per file (path, inode, size, mtime) in a
+small LRU and rebuilt when the file changes.
+
+Only regular, non-empty files are mapped. Pseudo-files that report size 0
+(`/proc/meminfo`), pipes and devices are read with buffered reads instead:
+the first lines stream, anything else reads at most `MAX_STREAM_BYTES`.
+"""
 
 from __future__ import annotations
 
-from typing import Any, Dict
+import bisect
+import mmap
+import os
+import re
+import stat
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# bytes per block of the newline index (and per slice when counting newlines)
+BLOCK = 1 << 20
+DEFAULT_MAX_BYTES = 64 * 1024
+MAX_LINES = 1000
+DEFAULT_MAX_MATCHES = 100
+# a matched line longer than this is cut (grep on minified files, binary data, ...)
+MAX_MATCH_LINE = 1000
+# what a file that cannot be mapped is read up to (it may never end: a pipe, /dev/zero)
+MAX_STREAM_BYTES = 16 << 20
+
+_INDEX_CACHE_SIZE = 8
+_indexes: "OrderedDict[Tuple, List[int]]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def _count_newlines(buf, start: int, end: int) -> int:
+    total = 0
+    for pos in range(start, end, BLOCK):
+        total += buf[pos:min(pos + BLOCK, end)].count(b"\n")
+    return total
+
+
+def _newline_index(path: str, st: os.stat_result, buf) -> List[int]:
+    """`index[i]` = newlines in `buf[:i * BLOCK]`; cached unless `st` is None (a file read into memory)."""
+    index = [0]
+    if st is None:
+        for pos in range(0, len(buf), BLOCK):
+            index.append(index[-1] + buf[pos:pos + BLOCK].count(b"\n"))
+        return index
+    key = (os.path.realpath(path), st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+    with _indexes_lock:
+        if key in _indexes:
+            _indexes.move_to_end(key)
+            return _indexes[key]
+    for pos in range(0, len(buf), BLOCK):
+        index.append(index[-1] + buf[pos:pos + BLOCK].count(b"\n"))
+    with _indexes_lock:
+        _indexes[key] = index
+        while len(_indexes) > _INDEX_CACHE_SIZE:
+            _indexes.popitem(last=False)
+    return index
+
+
+def _line_start(buf, index: List[int], line: int) -> Optional[int]:
+    """Byte offset where 1-based `line` starts, or None past the end of the file."""
+    if line <= 1:
+        return 0
+    target = line - 1  # the newline ending the previous line, 1-based
+    if target > index[-1]:
+        return None
+    block = bisect.bisect_left(index, target) - 1
+    pos, seen = block * BLOCK, index[block]
+    while True:
+        pos = buf.find(b"\n", pos) + 1
+        seen += 1
+        if seen == target:
+            return pos if pos < len(buf) else None
+
+
+def _decode(raw: bytes) -> str:
+    return raw.decode("utf-8", errors="replace")
+
+
+class _Collector:
+    """Accumulates output lines until a line or byte budget runs out."""
+
+    def __init__(self, max_lines: int, max_bytes: int):
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes
+        self.lines: List[str] = []
+        self.used = 0
+        self.truncated = False
+
+    def add(self, raw: bytes) -> bool:
+        if len(self.lines) >= self.max_lines or self.used + len(raw) + 1 > self.max_bytes:
+            self.truncated = True
+            return False
+        self.lines.append(_decode(raw.rstrip(b"\r")))
+        self.used += len(raw) + 1
+        return True
 
 
 class FileTool:
     name = "read_file"
-    description = "Read a file and return up to 'lines' lines"
+    description = (
+        "Read a file of any size: the first 'lines' lines, a line range (start_line/end_line), "
+        "the last 'tail' lines, a byte range (offset/length) or the lines matching regex 'grep'"
+    )
     parameters = {
         "type": "object",
         "properties": {
             "path": {"type": "string", "description": "Filesystem path to read"},
             "lines": {"type": "integer", "description": "Max number of lines to return"},
+            "start_line": {"type": "integer", "description": "First line to return (1-based)"},
+            "end_line": {"type": "integer", "description": "Last line to return (inclusive)"},
+            "tail": {"type": "integer", "description": "Return the last N lines"},
+            "offset": {"type": "integer", "description": "Byte offset to read from (negative: from the end)"},
+            "length": {"type": "integer", "description": "Number of bytes to read from 'offset'"},
+            "grep": {"type": "string", "description": "Regex; return the matching lines"},
+            "ignore_case": {"type": "boolean", "description": "Case-insensitive 'grep'"},
+            "max_matches": {"type": "integer", "description": "Max matching lines for 'grep' (default 100)"},
+            "max_bytes": {"type": "integer", "description": "Max bytes of output (default 65536)"},
         },
         "required": ["path"],
     }
+    cacheable = True
+    cache_ttl = 60.0
+    # read-only: may run before the LLM asks for it (see speculation.py)
+    speculative = True
+
+    def cache_key(self, input: Dict[str, Any]):
+        # a changed file gets a new cache key
+        try:
+            st = os.stat((input or {}).get("path") or "")
+        except OSError:
+            return None
+        return [st.st_mtime_ns, st.st_size]
 
     def run(self, input: Dict[str, Any]) -> Dict[str, Any]:
         path = input.get("path")
-        lines = int(input.get("lines") or 20)
         if not path:
             return {"error": "path is required"}
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                content_lines = []
-                for i, l in enumerate(f):
-                    if i >= lines:
-                        break
-                    content_lines.append(l.rstrip("\n"))
-            return {"lines": content_lines}
+            with open(path, "rb") as f:
+                st = os.fstat(f.fileno())
+                buf = None
+                if stat.S_ISREG(st.st_mode) and st.st_size > 0:
+                    try:
+                        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    except (OSError, ValueError):
+                        pass
+                if buf is None:
+                    return self._stream(path, f, input)
+                with buf:
+                    return self._read(path, st, buf, input)
         except Exception as e:
             return {"error": str(e)}
+
+    def _stream(self, path: str, f, input: Dict[str, Any]) -> Dict[str, Any]:
+        """A file that cannot be mapped: the first lines stream, the other modes read it into memory first."""
+        max_bytes = int(input.get("max_bytes") or DEFAULT_MAX_BYTES)
+        if not any(input.get(k) is not None for k in ("grep", "tail", "offset", "length", "start_line", "end_line")):
+            lines = min(int(input.get("lines") or 20), MAX_LINES)
+            out = _Collector(lines, max_bytes)
+            while len(out.lines) < lines:
+                raw = f.readline(max_bytes + 1)
+                if not raw or not out.add(raw[:-1] if raw.endswith(b"\n") else raw):
+                    break
+            result: Dict[str, Any] = {"lines": out.lines}
+            if out.truncated:
+                result.update(truncated=True, next_line=len(out.lines) + 1)
+            return result
+        data = f.read(MAX_STREAM_BYTES + 1)
+        result = self._read(path, None, data[:MAX_STREAM_BYTES], input)
+        if len(data) > MAX_STREAM_BYTES and "error" not in result:
+            result["truncated"] = True
+        return result
+
+    def _read(self, path: str, st: Optional[os.stat_result], buf, input: Dict[str, Any]) -> Dict[str, Any]:
+        max_bytes = int(input.get("max_bytes") or DEFAULT_MAX_BYTES)
+        if input.get("grep"):
+            return self._grep(buf, input, max_bytes)
+        if input.get("tail") is not None:
+            return self._tail(buf, int(input["tail"]), max_bytes)
+        if input.get("offset") is not None or input.get("length") is not None:
+            return self._bytes(buf, int(input.get("offset") or 0), input.get("length"), max_bytes)
+        if input.get("start_line") is not None or input.get("end_line") is not None:
+            return self._line_range(path, st, buf, input, max_bytes)
+        return self._head(buf, int(input.get("lines") or 20), max_bytes)
+
+    def _head(self, buf, lines: int, max_bytes: int) -> Dict[str, Any]:
+        lines = min(lines, MAX_LINES)
+        out = _Collector(lines, max_bytes)
+        pos = 0
+        while pos < len(buf) and len(out.lines) < lines:
+            end = buf.find(b"\n", pos)
+            end = len(buf) if end == -1 else end
+            if not out.add(buf[pos:end]):
+                break
+            pos = end + 1
+        result: Dict[str, Any] = {"lines": out.lines}
+        if out.truncated:
+            result.update(truncated=True, next_line=len(out.lines) + 1)
+        return result
+
+    def _line_range(self, path, st, buf, input: Dict[str, Any], max_bytes: int) -> Dict[str, Any]:
+        start = max(1, int(input.get("start_line") or 1))
+        end = input.get("end_line")
+        wanted = MAX_LINES if end is None else int(end) - start + 1
+        if wanted <= 0:
+            return {"error": "end_line must not be before start_line"}
+        out = _Collector(min(wanted, MAX_LINES), max_bytes)
+        index = _newline_index(path, st, buf)
+        total = index[-1] + (1 if len(buf) and buf[len(buf) - 1:] != b"\n" else 0)
+        pos = _line_start(buf, index, start)
+        while pos is not None and pos < len(buf) and len(out.lines) < wanted:
+            line_end = buf.find(b"\n", pos)
+            line_end = len(buf) if line_end == -1 else line_end
+            if not out.add(buf[pos:line_end]):
+                break
+            pos = line_end + 1
+        result: Dict[str, Any] = {"start_line": start, "lines": out.lines, "total_lines": total}
+        if len(out.lines) < wanted and start + len(out.lines) <= total:
+            result.update(truncated=True, next_line=start + len(out.lines))
+        return result
+
+    def _tail(self, buf, count: int, max_bytes: int) -> Dict[str, Any]:
+        count = max(0, min(count, MAX_LINES))
+        end = len(buf)
+        if end and buf[end - 1:end] == b"\n":
+            end -= 1
+        raw: List[bytes] = []
+        used = 0
+        truncated = False
+        while len(raw) < count and end > 0:
+            start = buf.rfind(b"\n", 0, end) + 1
+            if used + end - start + 1 > max_bytes:
+                truncated = True
+                break
+            raw.append(buf[start:end])
+            used += end - start + 1
+            end = start - 1
+        result: Dict[str, Any] = {"lines": [_decode(r.rstrip(b"\r")) for r in reversed(raw)]}
+        if truncated:
+            result["truncated"] = True
+        return result
+
+    def _bytes(self, buf, offset: int, length: Optional[Any], max_bytes: int) -> Dict[str, Any]:
+        size = len(buf)
+        if offset < 0:
+            offset = max(0, size + offset)
+        offset = min(offset, size)
+        wanted = size - offset if length is None else max(0, int(length))
+        n = min(wanted, max_bytes, size - offset)
+        result: Dict[str, Any] = {"offset": offset, "length": n, "size": size, "text": _decode(buf[offset:offset + n])}
+        if offset + n < size:
+            result["next_offset"] = offset + n
+        if n < wanted and offset + n < size:
+            result["truncated"] = True
+        return result
+
+    def _grep(self, buf, input: Dict[str, Any], max_bytes: int) -> Dict[str, Any]:
+        flags = re.MULTILINE | (re.IGNORECASE if input.get("ignore_case") else 0)
+        try:
+            pattern = re.compile(str(input["grep"]).encode("utf-8"), flags)
+        except re.error as e:
+            return {"error": f"invalid regex: {e}"}
+        max_matches = int(input.get("max_matches") or DEFAULT_MAX_MATCHES)
+        matches: List[Dict[str, Any]] = []
+        used = 0
+        truncated = False
+        # line numbers are counted incrementally between matches
+        line, counted_to = 1, 0
+        pos = min(max(0, int(input.get("offset") or 0)), len(buf))
+        if pos:
+            line_start = buf.rfind(b"\n", 0, pos) + 1
+            line, counted_to = 1 + _count_newlines(buf, 0, line_start), line_start
+        while True:
+            m = pattern.search(buf, pos)
+            if m is None:
+                break
+            start = buf.rfind(b"\n", 0, m.start()) + 1
+            end = buf.find(b"\n", m.start())
+            end = len(buf) if end == -1 else end
+            if len(matches) >= max_matches:
+                truncated = True
+                break
+            text = _decode(buf[start:min(end, start + MAX_MATCH_LINE)].rstrip(b"\r"))
+            if used + len(text) > max_bytes:
+                truncated = True
+                break
+            line += _count_newlines(buf, counted_to, start)
+            counted_to = start
+            matches.append({"line": line, "offset": start, "text": text})
+            used += len(text)
+            pos = end + 1  # one entry per line
+            if pos > len(buf):
+                break
+        result: Dict[str, Any] = {"matches": matches}
+        if truncated:
+            result.update(truncated=True, next_offset=start)
+        return result
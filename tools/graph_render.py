@@ -0,0 +1,58 @@
+"""Chart rendering for `GraphTool`, run in its worker processes.
+
+Uses matplotlib's object-oriented API (`Figure` + an Agg or SVG canvas)
+and never `pyplot`, so there is no global figure state and renders in
+different threads or processes cannot interfere. `warm_up` is the pool
+initializer: it imports matplotlib and draws one figure, so the import and
+font cache cost is paid when a worker starts, not by the first chart.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Any, Dict
+
+
+def _canvas(fig, formato: str):
+    if formato == "svg":
+        from matplotlib.backends.backend_svg import FigureCanvasSVG
+
+        return FigureCanvasSVG(fig)
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    return FigureCanvasAgg(fig)
+
+
+def _draw(spec: Dict[str, Any]):
+    from matplotlib.figure import Figure
+
+    fig = Figure()
+    ax = fig.subplots()
+    if spec["tipo"] == "pizza":
+        ax.pie(spec["dados"], labels=spec["labels"], autopct="%1.1f%%")
+    else:
+        if spec["tipo"] == "barra":
+            ax.bar(spec["labels"], spec["dados"])
+        else:
+            ax.plot(spec["labels"], spec["dados"], marker="o")
+        ax.set_xlabel(spec["eixo_x"])
+        ax.set_ylabel(spec["eixo_y"])
+    ax.set_title(spec["titulo"])
+    fig.tight_layout()
+    return fig
+
+
+def render(spec: Dict[str, Any], path: str) -> str:
+    """Draw the chart described by `spec` to `path`, atomically; returns `path`."""
+    fig = _draw(spec)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    canvas = _canvas(fig, spec["formato"])
+    with open(tmp, "wb") as f:
+        canvas.print_figure(f, format=spec["formato"])
+    os.replace(tmp, path)
+    return path
+
+
+def warm_up():
+    fig = _draw({"tipo": "barra", "dados": [1], "labels": ["a"], "eixo_x": "", "eixo_y": "", "titulo": ""})
+    _canvas(fig, "png").draw()
@@ -1,15 +1,138 @@
-import matplotlib.pyplot as plt
-from typing import Dict, Any
+"""Charts rendered by a pool of warm worker processes (see tools/graph_render.py).
+
+A chart is named after the hash of its normalized request, so an identical
+request returns the existing file without rendering, and concurrent
+identical requests share one render. `workers=0` renders in the calling
+thread instead (still without pyplot). If a worker dies (e.g. killed for
+memory on a huge chart), the broken pool is replaced and the render is
+tried once more.
+
+The output directory is trimmed after each new render: files older than
+`max_age` seconds go first, then the least recently used ones until the
+directory is under `max_bytes`. A cache hit refreshes the file's mtime.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import multiprocessing
 import os
-import uuid
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional, Tuple
+
+from tools import graph_render
+
+DEFAULT_MAX_BYTES = 100 * 1024 * 1024
+DEFAULT_MAX_AGE = 24 * 3600.0
+FORMATS = ("png", "svg")
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """One pool per process, shared by every GraphTool; started on first use.
+
+    It has as many workers as the largest `workers` asked for: a GraphTool
+    wanting more replaces it with a bigger one (renders already submitted finish).
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or workers > _pool_workers:
+            old = _pool
+            # spawn: forking a process that runs threads (the agent's executor) is unsafe
+            _pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn"), initializer=graph_render.warm_up
+            )
+            _pool_workers = workers
+            if old is not None:
+                old.shutdown(wait=False)
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor):
+    """Drop `pool` after one of its workers died, so the next `_get_pool` starts a new one."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is pool:
+            _pool, _pool_workers = None, 0
+    pool.shutdown(wait=False)
+
+
+def evict(directory: str, max_bytes: int, max_age: float, now: Optional[float] = None) -> int:
+    """Remove old and least recently used charts from `directory`; returns how many."""
+    now = time.time() if now is None else now
+    entries = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            # `.tmp`: a render still being written
+            if entry.is_file() and entry.name.startswith("graph_") and not entry.name.endswith(".tmp"):
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+    entries.sort()
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for mtime, size, path in entries:
+        if now - mtime <= max_age and total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+        total -= size
+    return removed
 
 
 class GraphTool:
     name = "graph"
     description = (
         "Gera gráficos (pizza, linear, barra) dados os dados, labels e eixos. "
-        "Retorna caminho da imagem PNG armazenada temporariamente."
+        "Retorna o caminho da imagem gerada (PNG ou SVG)."
     )
+    parameters = {
+        "type": "object",
+        "properties": {
+            "tipo": {"type": "string", "enum": ["pizza", "barra", "linear"], "description": "Tipo do gráfico"},
+            "dados": {"type": "array", "items": {"type": "number"}, "description": "Valores numéricos"},
+            "labels": {"type": "array", "items": {"type": "string"}, "description": "Rótulos de cada valor"},
+            "eixo_x": {"type": "string", "description": "Título do eixo X"},
+            "eixo_y": {"type": "string", "description": "Título do eixo Y"},
+            "titulo": {"type": "string", "description": "Título do gráfico"},
+            "formato": {"type": "string", "enum": ["png", "svg"], "description": "Formato da imagem (padrão png)"},
+        },
+        "required": ["dados"],
+    }
+    # seconds a render may take (also the runner's timeout for this tool)
+    timeout = 30.0
+
+    def __init__(
+        self,
+        out_dir: Optional[str] = None,
+        workers: Optional[int] = None,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_age: float = DEFAULT_MAX_AGE,
+        timeout: float = 30.0,
+    ):
+        self.out_dir = out_dir or os.path.join(os.getcwd(), "tmp_graphs")
+        if workers is None:
+            workers = int(os.getenv("GRAPH_WORKERS") or min(4, os.cpu_count() or 1))
+        self.workers = workers
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.timeout = timeout
+        # renders in progress by path (with their pool), so identical concurrent requests wait for the same one
+        self._pending: Dict[str, Tuple[ProcessPoolExecutor, Future]] = {}
+        # reentrant: a render that is already done runs its callback inside `add_done_callback`
+        self._lock = threading.RLock()
 
     def _normalize_tipo(self, tipo):
         if not isinstance(tipo, str):
@@ -23,7 +146,8 @@ class GraphTool:
             return "linear"
         return tipo
 
-    def run(self, input: Dict[str, Any]) -> Dict[str, Any]:
+    def _spec(self, input: Dict[str, Any]) -> Dict[str, Any]:
+        """The normalized chart request, or {"error": ...}."""
         tipo_raw = input.get("tipo", input.get("type", "pizza"))
         tipo = self._normalize_tipo(tipo_raw)
         dados = (
@@ -38,6 +162,11 @@ class GraphTool:
                     "para gerar o gráfico."
                 )
             }
+        if tipo not in ("pizza", "barra", "linear"):
+            return {"error": f"Tipo de gráfico '{tipo_raw}' não suportado. Use pizza, barra ou linear."}
+        formato = str(input.get("formato", input.get("format")) or "png").lower()
+        if formato not in FORMATS:
+            return {"error": f"Formato '{formato}' não suportado. Use png ou svg."}
         labels = (
             input.get("labels")
             or input.get("label")
@@ -45,51 +174,70 @@ class GraphTool:
             or input.get("rotulos")
             or [str(i) for i in range(len(dados))]
         )
-        eixo_x = input.get("eixo_x", input.get("xlabel", "Eixo X"))
-        eixo_y = input.get("eixo_y", input.get("ylabel", "Eixo Y"))
-        titulo = input.get("titulo", input.get("title", "Gráfico Gerado"))
-
+        labels = [str(label) for label in labels]
         if len(labels) < len(dados):
-            labels = list(labels) + [f"Item {i+1}" for i in range(len(labels), len(dados))]
+            labels = labels + [f"Item {i+1}" for i in range(len(labels), len(dados))]
         elif len(labels) > len(dados):
             labels = labels[:len(dados)]
+        return {
+            "tipo": tipo,
+            "dados": dados,
+            "labels": labels,
+            "eixo_x": input.get("eixo_x", input.get("xlabel", "Eixo X")),
+            "eixo_y": input.get("eixo_y", input.get("ylabel", "Eixo Y")),
+            "titulo": input.get("titulo", input.get("title", "Gráfico Gerado")),
+            "formato": formato,
+        }
 
+    def run(self, input: Dict[str, Any]) -> Dict[str, Any]:
+        spec = self._spec(input)
+        if "error" in spec:
+            return spec
+        digest = hashlib.sha256(json.dumps(spec, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+        img_path = os.path.join(self.out_dir, f"graph_{digest[:20]}.{spec['formato']}")
         try:
-            # Garante diretório temporário próprio, nunca apaga
-            base_tmp = os.path.join(os.getcwd(), "tmp_graphs")
-            os.makedirs(base_tmp, exist_ok=True)
-            unique_id = str(uuid.uuid4())[:8]
-            img_path = os.path.join(base_tmp, f"graph_{unique_id}.png")
-            fig, ax = plt.subplots()
-            if tipo == "pizza":
-                ax.pie(dados, labels=labels, autopct="%1.1f%%")
-                ax.set_title(titulo)
-            elif tipo == "barra":
-                ax.bar(labels, dados)
-                ax.set_xlabel(eixo_x)
-                ax.set_ylabel(eixo_y)
-                ax.set_title(titulo)
-            elif tipo == "linear":
-                ax.plot(labels, dados, marker='o')
-                ax.set_xlabel(eixo_x)
-                ax.set_ylabel(eixo_y)
-                ax.set_title(titulo)
-            else:
-                plt.close(fig)
-                return {
-                    "error": (
-                        f"Tipo de gráfico '{tipo_raw}' não suportado. "
-                        "Use pizza, barra ou linear."
-                    )
-                }
-            plt.tight_layout()
-            fig.savefig(img_path)
-            plt.close(fig)
-            return {
-                "figure_path": img_path,
-                "mensagem": f"Gráfico gerado em {img_path}"
-            }
+            os.utime(img_path)
+            return {"figure_path": img_path, "mensagem": f"Gráfico gerado em {img_path}", "cached": True}
+        except FileNotFoundError:
+            pass
+        try:
+            os.makedirs(self.out_dir, exist_ok=True)
+            self._render(spec, img_path)
+            evict(self.out_dir, self.max_bytes, self.max_age)
+            return {"figure_path": img_path, "mensagem": f"Gráfico gerado em {img_path}"}
         except Exception as e:
             return {
                 "error": f"Ocorreu um problema ao gerar o gráfico: {str(e)}"
             }
+
+    def _render(self, spec: Dict[str, Any], path: str):
+        if self.workers <= 0:
+            graph_render.render(spec, path)
+            return
+        pool, future = self._submit(spec, path)
+        try:
+            future.result(self.timeout)
+        except BrokenProcessPool:
+            _discard_pool(pool)
+            self._submit(spec, path)[1].result(self.timeout)
+
+    def _submit(self, spec: Dict[str, Any], path: str) -> Tuple[ProcessPoolExecutor, Future]:
+        with self._lock:
+            pending = self._pending.get(path)
+            if pending is None:
+                pool = _get_pool(self.workers)
+                try:
+                    future = pool.submit(graph_render.render, spec, path)
+                except BrokenProcessPool:
+                    _discard_pool(pool)
+                    pool = _get_pool(self.workers)
+                    future = pool.submit(graph_render.render, spec, path)
+                pending = self._pending[path] = (pool, future)
+                future.add_done_callback(lambda done: self._forget(path, done))
+        return pending
+
+    def _forget(self, path: str, future: Future):
+        with self._lock:
+            # a retry may already have replaced it
+            if self._pending.get(path, (None, None))[1] is future:
+                del self._pending[path]
@@ -0,0 +1,77 @@
+"""Tools declared by metadata and imported on first use.
+
+A `LazyTool` carries everything the catalog, the runner, the result cache
+and the speculator need before the tool ever runs (name, description,
+`parameters` schema, `timeout`, `cacheable` / `cache_ttl`, `keyed`,
+`speculative`), plus the dotted path of the real class. The module, and whatever heavy dependencies it imports
+(matplotlib for `graph`), is only loaded when the tool is first run, or when an attribute
+that is not declared here is asked for.
+"""
+from __future__ import annotations
+
+import importlib
+import threading
+from typing import Any, Dict, Optional
+
+from tools.catalog import FREE_FORM_PARAMETERS
+
+
+class LazyTool:
+    def __init__(
+        self,
+        target: str,
+        name: str,
+        description: str = "",
+        parameters: Optional[Dict[str, Any]] = None,
+        cacheable: bool = False,
+        cache_ttl: float = 60.0,
+        speculative: bool = False,
+        timeout: Optional[float] = None,
+        keyed: bool = False,
+    ):
+        """`target` is "package.module:ClassName"; the class is instantiated without arguments.
+
+        `keyed` says the class defines `cache_key(input)` (results depend on more than the input).
+        """
+        self.target = target
+        self.name = name
+        self.description = description
+        self.parameters = parameters or FREE_FORM_PARAMETERS
+        self.cacheable = cacheable
+        self.cache_ttl = cache_ttl
+        self.speculative = speculative
+        self.timeout = timeout
+        self.keyed = keyed
+        self._tool: Any = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._tool is not None
+
+    def load(self) -> Any:
+        """Import the module and create the tool (once)."""
+        if self._tool is None:
+            with self._lock:
+                if self._tool is None:
+                    module_name, class_name = self.target.split(":")
+                    cls = getattr(importlib.import_module(module_name), class_name)
+                    self._tool = cls()
+        return self._tool
+
+    def run(self, input: Any) -> Dict[str, Any]:
+        return self.load().run(input)
+
+    def cache_key(self, input: Any) -> Any:
+        # declared so the result cache can ask without importing the tool when it is not `keyed`
+        return self.load().cache_key(input) if self.keyed else None
+
+    def __getattr__(self, attr):
+        # only reached for attributes not declared above (arun, ...)
+        if attr.startswith("__") or attr in ("_tool", "_lock"):
+            raise AttributeError(attr)
+        return getattr(self.load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self.loaded else "not loaded"
+        return f"LazyTool({self.name!r}, {self.target!r}, {state})"
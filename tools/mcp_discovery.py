@@ -0,0 +1,198 @@
+"""MCP tool discovery backed by a local snapshot.
+
+`MCPToolDiscovery` registers one `MCPProxyTool` per remote tool into a tool
+dict (normally the agent's `ToolCatalog`) and keeps it current:
+
+- `load_snapshot()` registers the tools saved by the last successful
+  discovery (name, description, `inputSchema`), without any network I/O;
+- `refresh()` calls `list_tools()` and, if the result's `etag` (a hash of the
+  descriptors) changed, swaps the proxies in place (added, changed and
+  removed tools) and rewrites the snapshot;
+- `start(interval)` refreshes on a background thread every `interval`
+  seconds, and as soon as the server sends `notifications/tools/list_changed`.
+
+A server that is down only logs a warning; the tools from the snapshot stay
+registered.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from tools.cache import canonical_json
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 1
+LIST_CHANGED = "notifications/tools/list_changed"
+
+
+def _descriptor(tool: Any) -> Dict[str, Any]:
+    return {
+        "name": tool.name,
+        "description": getattr(tool, "description", "") or "",
+        "inputSchema": getattr(tool, "inputSchema", None),
+    }
+
+
+def etag(descriptors: List[Dict[str, Any]]) -> str:
+    """Version of a tool list: changes whenever a name, description or schema does."""
+    ordered = sorted(descriptors, key=lambda d: d["name"])
+    return hashlib.sha256(canonical_json(ordered).encode("utf-8")).hexdigest()[:16]
+
+
+class MCPToolDiscovery:
+    def __init__(
+        self,
+        mcp_url: str,
+        tools: Dict[str, Any],
+        pool=None,
+        snapshot_path: Optional[str] = None,
+    ):
+        self.mcp_url = mcp_url
+        self.tools = tools
+        self.snapshot_path = snapshot_path
+        self.etag: Optional[str] = None
+        self.refreshed_at: Optional[float] = None
+        self._pool = pool
+        # name -> descriptor of the proxies this discovery registered
+        self._registered: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            from tools.mcp_pool import get_default_pool
+
+            self._pool = get_default_pool()
+        return self._pool
+
+    # --- snapshot ----------------------------------------------------------
+
+    def load_snapshot(self) -> bool:
+        """Register the tools of the snapshot file; False if there is none (or it is unusable)."""
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return False
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring MCP snapshot %s: %s", self.snapshot_path, e)
+            return False
+        if data.get("format") != SNAPSHOT_FORMAT or data.get("url") != self.mcp_url:
+            return False
+        self._apply(data["tools"], data["etag"])
+        self.refreshed_at = data.get("fetched_at")
+        return True
+
+    def _save_snapshot(self, descriptors: List[Dict[str, Any]], tag: str):
+        if not self.snapshot_path:
+            return
+        data = {
+            "format": SNAPSHOT_FORMAT,
+            "url": self.mcp_url,
+            "etag": tag,
+            "fetched_at": time.time(),
+            "tools": descriptors,
+        }
+        directory = os.path.dirname(os.path.abspath(self.snapshot_path))
+        fd, tmp = tempfile.mkstemp(prefix=".mcp-snapshot-", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=1)
+            os.replace(tmp, self.snapshot_path)
+        except OSError as e:
+            logger.warning("Could not write MCP snapshot %s: %s", self.snapshot_path, e)
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+
+    # --- discovery -----------------------------------------------------------
+
+    def _apply(self, descriptors: List[Dict[str, Any]], tag: str):
+        from tools.mcp_proxy_tool import BATCH_VARIANTS, MCPProxyTool
+
+        with self._lock:
+            current = {d["name"]: d for d in descriptors}
+            batched = {name for name, variant in BATCH_VARIANTS.items() if variant[0] in current}
+            for name in list(self._registered):
+                if name not in current:
+                    self.tools.pop(name, None)
+                    del self._registered[name]
+            for name, descriptor in current.items():
+                if self._registered.get(name) == descriptor and name in self.tools:
+                    if (getattr(self.tools[name], "batch", None) is not None) == (name in batched):
+                        continue
+                self.tools[name] = MCPProxyTool(
+                    self.mcp_url, name, descriptor["description"], pool=self.pool,
+                    parameters=descriptor["inputSchema"],
+                    # concurrent calls are coalesced when the server has the batch variant
+                    batch=BATCH_VARIANTS[name] if name in batched else None,
+                )
+                self._registered[name] = descriptor
+            self.etag = tag
+
+    def refresh(self) -> bool:
+        """Fetch the remote tool list; returns True if the registered tools changed."""
+        descriptors = [_descriptor(t) for t in self.pool.list_tools(self.mcp_url)]
+        tag = etag(descriptors)
+        self.refreshed_at = time.time()
+        if tag == self.etag:
+            return False
+        self._apply(descriptors, tag)
+        self._save_snapshot(descriptors, tag)
+        logger.info("MCP tools from %s updated (etag %s): %s", self.mcp_url, tag, sorted(self._registered))
+        return True
+
+    # --- background refresh ------------------------------------------------------
+
+    def _on_notification(self, notification: Any):
+        if getattr(notification, "method", None) == LIST_CHANGED:
+            self._wake.set()
+
+    def _refresh_loop(self, interval: Optional[float], immediately: bool):
+        if not immediately:
+            self._wake.wait(interval)
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning("MCP discovery at %s failed: %s", self.mcp_url, e)
+            if interval is None:
+                return
+            self._wake.wait(interval)
+
+    def start(self, interval: Optional[float] = 300.0, immediately: bool = True) -> "MCPToolDiscovery":
+        """Refresh every `interval` seconds (and on `tools/list_changed`) on a daemon thread.
+
+        With `interval=None` the thread refreshes once and exits.
+        """
+        if self._thread is not None:
+            return self
+        self._stop.clear()
+        self.pool.add_listener(self.mcp_url, self._on_notification)
+        self._thread = threading.Thread(
+            target=self._refresh_loop, args=(interval, immediately), name="mcp-discovery", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5.0):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        self._thread = None
+        self.pool.remove_listener(self.mcp_url, self._on_notification)
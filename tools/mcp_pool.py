@@ -0,0 +1,385 @@
+"""Shared, long-lived MCP client sessions keyed by server URL.
+
+Opening a `streamablehttp_client` and running the `initialize()` handshake on
+every tool call costs a new event loop, a new TCP connection and an extra
+round trip. `MCPSessionPool` keeps one initialized `ClientSession` per
+`mcp_url` on a background event loop and lets any thread (or any other event
+loop) borrow it:
+
+- sessions are opened lazily and closed after `idle_timeout` seconds unused;
+- a transport failure drops the session and the call is retried once on a
+  fresh connection; a call the server rejected as overloaded (see
+  `mcp/serving.py`) is retried once after the `retry_after` it asked for;
+- `max_concurrency` caps the in-flight calls per server;
+- blocking calls give up after `call_timeout` seconds (unless the caller
+  passes its own `timeout`), so a hung server cannot block a caller forever;
+- `call_batched` coalesces concurrent single-item calls made within a short
+  window into one call of a batch tool (e.g. `weather_many`);
+- `add_listener(url, fn)` receives the server's notifications (e.g.
+  `notifications/tools/list_changed`) while a session to `url` is open.
+
+Each call made through the public API is an `mcp.call` span of the current
+tracer (see tracing.py), timed on the caller's side, so it includes the hop
+to the pool loop and any wait for a concurrency slot or a batch window.
+
+Use `get_default_pool()` to share a single pool across the process.
+"""
+from __future__ import annotations
+
+import asyncio
+import atexit
+import concurrent.futures
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from tracing import get_tracer
+
+if TYPE_CHECKING:
+    from mcp import ClientSession
+
+
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_IDLE_TIMEOUT = 60.0
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_CALL_TIMEOUT = 60.0
+
+
+def _overloaded_retry_after(error: Exception) -> Optional[float]:
+    """Seconds to wait if `error` is the server's 429 rejection, else None."""
+    data = getattr(getattr(error, "error", None), "data", None)
+    if isinstance(data, dict) and data.get("status") == 429:
+        return float(data.get("retry_after") or 1)
+    return None
+
+
+def _traced(span, result: Any) -> Any:
+    """Mark `span` failed if the `CallToolResult` is an error result; returns `result`."""
+    if getattr(result, "isError", False):
+        span.fail("tool returned isError")
+    return result
+
+
+@dataclass
+class _Connection:
+    url: str
+    session: Optional["ClientSession"] = None
+    ready: asyncio.Event = field(default_factory=asyncio.Event)
+    closing: asyncio.Event = field(default_factory=asyncio.Event)
+    task: Optional[asyncio.Task] = None
+    error: Optional[BaseException] = None
+    in_flight: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+
+    @property
+    def alive(self) -> bool:
+        return self.task is not None and not self.task.done() and not self.closing.is_set()
+
+
+@dataclass
+class _PendingBatch:
+    items: List[Any] = field(default_factory=list)
+    futures: List["asyncio.Future"] = field(default_factory=list)
+    timer: Optional[asyncio.TimerHandle] = None
+
+
+@dataclass
+class _Server:
+    semaphore: asyncio.Semaphore
+    conn: Optional[_Connection] = None
+
+
+class MCPSessionPool:
+    def __init__(
+        self,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        retries: int = 1,
+        call_timeout: Optional[float] = DEFAULT_CALL_TIMEOUT,
+    ):
+        self.max_concurrency = max_concurrency
+        self.idle_timeout = idle_timeout
+        self.connect_timeout = connect_timeout
+        # default for the blocking API's `timeout`; None waits forever
+        self.call_timeout = call_timeout
+        self.retries = retries
+        self._servers: Dict[str, _Server] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._reaper: Optional[asyncio.Task] = None
+        self._listeners: Dict[str, List[Callable[[Any], None]]] = {}
+        self._batches: Dict[Tuple[str, str], _PendingBatch] = {}
+
+    # --- background loop -------------------------------------------------
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="mcp-session-pool", daemon=True)
+                thread.start()
+                self._loop, self._thread = loop, thread
+                asyncio.run_coroutine_threadsafe(self._start_reaper(), loop).result()
+            return self._loop
+
+    async def _start_reaper(self):
+        self._reaper = asyncio.get_running_loop().create_task(self._reap_idle())
+
+    async def _reap_idle(self):
+        interval = max(0.5, min(self.idle_timeout / 2, 5.0))
+        while True:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            for server in self._servers.values():
+                conn = server.conn
+                if conn and conn.alive and conn.in_flight == 0 and now - conn.last_used > self.idle_timeout:
+                    conn.closing.set()
+
+    def _submit(self, coro: Awaitable) -> "asyncio.Future":
+        loop = self._ensure_loop()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            coro.close()
+            raise RuntimeError("MCPSessionPool sync API called from its own event loop; use the async API")
+        return asyncio.run_coroutine_threadsafe(coro, loop)
+
+    def _wait(self, future: "concurrent.futures.Future", timeout: Optional[float]) -> Any:
+        """The result of `future`, cancelling the call if it takes longer than `timeout` (default `call_timeout`)."""
+        try:
+            return future.result(self.call_timeout if timeout is None else timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    # --- connection management (runs on the pool loop) --------------------
+
+    async def _on_message(self, url: str, message: Any):
+        # requests/exceptions are handled by ClientSession itself; only forward notifications
+        notification = getattr(message, "root", None)
+        if getattr(notification, "method", None) is None:
+            return
+        for listener in list(self._listeners.get(url, ())):
+            try:
+                listener(notification)
+            except Exception:
+                pass
+
+    async def _hold(self, conn: _Connection):
+        """Keep one session open until it is asked to close or the transport dies."""
+        # the MCP client stack is imported on the pool thread, on first use
+        from mcp import ClientSession
+        from mcp.client.streamable_http import streamablehttp_client
+
+        async def message_handler(message):
+            await self._on_message(conn.url, message)
+
+        try:
+            async with streamablehttp_client(conn.url) as (read, write, _):
+                async with ClientSession(read, write, message_handler=message_handler) as session:
+                    await session.initialize()
+                    conn.session = session
+                    conn.ready.set()
+                    await conn.closing.wait()
+        except Exception as e:
+            conn.error = e
+        finally:
+            conn.session = None
+            conn.closing.set()
+            conn.ready.set()
+
+    def _server(self, url: str) -> _Server:
+        server = self._servers.get(url)
+        if server is None:
+            server = _Server(semaphore=asyncio.Semaphore(self.max_concurrency))
+            self._servers[url] = server
+        return server
+
+    async def _acquire(self, url: str, server: _Server) -> _Connection:
+        conn = server.conn
+        if conn is None or not conn.alive:
+            conn = _Connection(url)
+            conn.task = asyncio.get_running_loop().create_task(self._hold(conn))
+            server.conn = conn
+        await asyncio.wait_for(conn.ready.wait(), self.connect_timeout)
+        if conn.session is None:
+            raise ConnectionError(f"Could not open MCP session to {url}: {conn.error}")
+        return conn
+
+    async def _with_session(self, url: str, fn: Callable[["ClientSession"], Awaitable[Any]]) -> Any:
+        from mcp.shared.exceptions import McpError
+
+        server = self._server(url)
+        async with server.semaphore:
+            attempt = 0
+            while True:
+                conn = await self._acquire(url, server)
+                conn.in_flight += 1
+                try:
+                    return await fn(conn.session)
+                except McpError as e:
+                    # protocol-level error: the session itself is still healthy
+                    delay = _overloaded_retry_after(e)
+                    if delay is None or attempt >= self.retries:
+                        raise
+                    attempt += 1
+                    await asyncio.sleep(delay)
+                except Exception:
+                    # transport failure: drop the session and reconnect
+                    conn.closing.set()
+                    if attempt >= self.retries:
+                        raise
+                    attempt += 1
+                finally:
+                    conn.in_flight -= 1
+                    conn.last_used = time.monotonic()
+
+    async def _close_all(self):
+        tasks = []
+        for server in self._servers.values():
+            if server.conn is not None:
+                server.conn.closing.set()
+                if server.conn.task is not None:
+                    tasks.append(server.conn.task)
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        if self._reaper is not None:
+            self._reaper.cancel()
+        self._servers.clear()
+
+    # --- call coalescing (runs on the pool loop) ---------------------------
+
+    async def _call_batched(self, url: str, tool_name: str, item: Any, make_args, split, window, max_batch):
+        key = (url, tool_name)
+        batch = self._batches.get(key)
+        if batch is None:
+            batch = self._batches[key] = _PendingBatch()
+            batch.timer = asyncio.get_running_loop().call_later(window, self._flush, url, tool_name, make_args, split)
+        future = asyncio.get_running_loop().create_future()
+        batch.items.append(item)
+        batch.futures.append(future)
+        if len(batch.items) >= max_batch:
+            self._flush(url, tool_name, make_args, split)
+        return await future
+
+    def _flush(self, url: str, tool_name: str, make_args, split):
+        batch = self._batches.pop((url, tool_name), None)
+        if batch is None:
+            return
+        batch.timer.cancel()
+        asyncio.get_running_loop().create_task(self._send_batch(url, tool_name, batch, make_args, split))
+
+    async def _send_batch(self, url: str, tool_name: str, batch: _PendingBatch, make_args, split):
+        try:
+            result = await self._call_tool(url, tool_name, make_args(batch.items))
+            results = split(result, len(batch.items))
+        except Exception as e:
+            results = [e] * len(batch.items)
+        for future, result in zip(batch.futures, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    # --- public API -------------------------------------------------------
+
+    async def _call_tool(self, url: str, tool_name: str, args: Dict[str, Any]):
+        return await self._with_session(url, lambda s: s.call_tool(tool_name, args))
+
+    async def _list_tools(self, url: str):
+        result = await self._with_session(url, lambda s: s.list_tools())
+        return result.tools
+
+    def call_tool(self, url: str, tool_name: str, args: Dict[str, Any], timeout: Optional[float] = None):
+        """Call a remote tool and return the raw `CallToolResult`."""
+        with get_tracer().span("mcp.call", server=url, tool=tool_name) as span:
+            return _traced(span, self._wait(self._submit(self._call_tool(url, tool_name, args)), timeout))
+
+    def list_tools(self, url: str, timeout: Optional[float] = None):
+        """Return the list of remote tool descriptors exposed by `url`."""
+        return self._wait(self._submit(self._list_tools(url)), timeout)
+
+    async def acall_tool(self, url: str, tool_name: str, args: Dict[str, Any]):
+        """Awaitable `call_tool` usable from any event loop."""
+        with get_tracer().span("mcp.call", server=url, tool=tool_name) as span:
+            return _traced(span, await asyncio.wrap_future(self._submit(self._call_tool(url, tool_name, args))))
+
+    async def alist_tools(self, url: str):
+        """Awaitable `list_tools` usable from any event loop."""
+        return await asyncio.wrap_future(self._submit(self._list_tools(url)))
+
+    def call_batched(
+        self,
+        url: str,
+        tool_name: str,
+        item: Any,
+        make_args: Callable[[List[Any]], Dict[str, Any]],
+        split: Callable[[Any, int], List[Any]],
+        window: float = 0.005,
+        max_batch: int = 50,
+        timeout: Optional[float] = None,
+    ):
+        """Queue `item` for the next call of batch tool `tool_name` and return its own result.
+
+        Items queued for the same (url, tool) within `window` seconds (or until
+        `max_batch` are waiting) go out as one call with `make_args(items)`;
+        `split(raw_result, len(items))` must return one result per item.
+        """
+        with get_tracer().span("mcp.call", server=url, tool=tool_name, batched=True):
+            coro = self._call_batched(url, tool_name, item, make_args, split, window, max_batch)
+            return self._wait(self._submit(coro), timeout)
+
+    async def acall_batched(self, url, tool_name, item, make_args, split, window=0.005, max_batch=50):
+        """Awaitable `call_batched` usable from any event loop."""
+        with get_tracer().span("mcp.call", server=url, tool=tool_name, batched=True):
+            coro = self._call_batched(url, tool_name, item, make_args, split, window, max_batch)
+            return await asyncio.wrap_future(self._submit(coro))
+
+    def add_listener(self, url: str, listener: Callable[[Any], None]):
+        """Call `listener(notification)` for each notification from `url`, on the pool thread.
+
+        Notifications only arrive while a session is open (sessions close when idle).
+        """
+        self._listeners.setdefault(url, []).append(listener)
+
+    def remove_listener(self, url: str, listener: Callable[[Any], None]):
+        listeners = self._listeners.get(url, [])
+        if listener in listeners:
+            listeners.remove(listener)
+
+    def close(self, timeout: float = 5.0):
+        """Close every open session and stop the background loop."""
+        with self._start_lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None or loop.is_closed():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._close_all(), loop).result(timeout)
+        except Exception:
+            pass
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join(timeout)
+        loop.close()
+
+
+_default_pool: Optional[MCPSessionPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def get_default_pool() -> MCPSessionPool:
+    """Return the process-wide pool shared by every `MCPProxyTool`."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = MCPSessionPool()
+            atexit.register(_default_pool.close)
+        return _default_pool
@@ -1,34 +1,148 @@
-from typing import Any, Dict
-import asyncio
-from mcp import ClientSession
-from mcp.client.streamable_http import streamablehttp_client
+from typing import Any, Dict, List, Optional, Tuple
+import json
 import os
+import time
+
+import metrics
+from tools.mcp_pool import MCPSessionPool, get_default_pool
 try:
     from dotenv import load_dotenv
     load_dotenv()
 except ImportError:
     pass
 
+_CALLS = metrics.counter(
+    "mcp_client_calls_total", "MCP tool calls by tool and outcome (ok, error)", ["tool", "outcome"]
+)
+_SECONDS = metrics.histogram("mcp_client_call_seconds", "MCP tool call latency, as seen by the agent", ["tool"])
+_IN_FLIGHT = metrics.gauge("mcp_client_calls_in_flight", "MCP tool calls in progress")
+
+
+def _normalize_result(result) -> Dict[str, Any]:
+    if hasattr(result, "structuredContent") and result.structuredContent:
+        return result.structuredContent
+    elif hasattr(result, "content") and result.content:
+        return {"text": getattr(result.content[0], "text", "")}
+    return {"error": "No result returned"}
+
+
+# single-item tool -> (batch tool, its list argument, the single tool's item argument)
+BATCH_VARIANTS: Dict[str, Tuple[str, str, str]] = {
+    "weather_now": ("weather_many", "cities", "city"),
+    "prometheus_query": ("prometheus_query_batch", "queries", "query"),
+}
+
+
+def _split_batch_result(result, n: int) -> List[Dict[str, Any]]:
+    """One normalized result per item of a batch call (the whole-call error repeated if it failed)."""
+    if getattr(result, "isError", False):
+        text = getattr(result.content[0], "text", "") if getattr(result, "content", None) else ""
+        return [{"error": text or "Batch call failed"}] * n
+    normalized = _normalize_result(result)
+    as_text = "text" in normalized
+    if as_text:
+        # without structured output the payload is JSON text; each item is handed
+        # back the way a single call would have returned it
+        try:
+            normalized = json.loads(normalized["text"])
+        except ValueError:
+            pass
+    results = normalized.get("results") if isinstance(normalized, dict) else None
+    if not isinstance(results, list) or len(results) != n:
+        error = normalized.get("error") if isinstance(normalized, dict) else None
+        return [{"error": error or "Malformed batch result"}] * n
+    if as_text:
+        return [r if isinstance(r, dict) and "error" in r else {"text": json.dumps(r, indent=2)} for r in results]
+    return results
+
+
+def _public_schema(schema: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """The remote inputSchema minus `token`, which the proxy injects itself."""
+    if not schema:
+        return None
+    schema = dict(schema)
+    schema["properties"] = {k: v for k, v in (schema.get("properties") or {}).items() if k != "token"}
+    if "required" in schema:
+        schema["required"] = [k for k in schema["required"] if k != "token"]
+    return schema
+
 
 class MCPProxyTool:
-    def __init__(self, mcp_url: str, tool_name: str, description: str = ""):
+    def __init__(
+        self,
+        mcp_url: str,
+        tool_name: str,
+        description: str = "",
+        pool: Optional[MCPSessionPool] = None,
+        parameters: Optional[Dict[str, Any]] = None,
+        batch: Optional[Tuple[str, str, str]] = None,
+        coalesce_window: float = 0.005,
+    ):
+        """`batch` (see `BATCH_VARIANTS`) lets concurrent calls be sent as one batch call."""
         self.mcp_url = mcp_url
         self.tool_name = tool_name
         self.name = tool_name
         self.description = description or f"Remote {tool_name} via MCP"
+        self.parameters = _public_schema(parameters)
         self.token = os.getenv("MCP_API_KEY")  # None se não definido
+        # sessões MCP compartilhadas entre todas as instâncias (ver tools/mcp_pool.py)
+        self.pool = pool or get_default_pool()
+        self.batch = batch
+        self.coalesce_window = coalesce_window
+
+    def _args(self, input: Any) -> Dict[str, Any]:
+        args = dict(input or {})
+        args["token"] = self.token
+        return args
+
+    def _batch_item(self, input: Any):
+        """The item to coalesce, or None when `input` has anything besides the item argument."""
+        if self.batch is None or not isinstance(input, dict) or set(input) != {self.batch[2]}:
+            return None
+        return input[self.batch[2]]
+
+    def _batch_args(self, items: List[Any]) -> Dict[str, Any]:
+        return {self.batch[1]: items, "token": self.token}
+
+    def _record(self, started: float, result: Any):
+        failed = not isinstance(result, dict) or "error" in result
+        _CALLS.labels(self.tool_name, "error" if failed else "ok").inc()
+        _SECONDS.labels(self.tool_name).observe(time.perf_counter() - started)
 
     def run(self, input: Any) -> Dict[str, Any]:
-        async def _call():
-            args = dict(input)
-            args["token"] = self.token
-            async with streamablehttp_client(self.mcp_url) as (read, write, _):
-                async with ClientSession(read, write) as session:
-                    await session.initialize()
-                    result = await session.call_tool(self.tool_name, args)
-                    if hasattr(result, "structuredContent") and result.structuredContent:
-                        return result.structuredContent
-                    elif hasattr(result, "content") and result.content:
-                        return {"text": getattr(result.content[0], "text", "")}
-                    return {"error": "No result returned"}
-        return asyncio.run(_call())
+        started, result = time.perf_counter(), None
+        _IN_FLIGHT.inc()
+        try:
+            result = self._run(input)
+            return result
+        finally:
+            _IN_FLIGHT.dec()
+            self._record(started, result)
+
+    async def arun(self, input: Any) -> Dict[str, Any]:
+        started, result = time.perf_counter(), None
+        _IN_FLIGHT.inc()
+        try:
+            result = await self._arun(input)
+            return result
+        finally:
+            _IN_FLIGHT.dec()
+            self._record(started, result)
+
+    def _run(self, input: Any) -> Dict[str, Any]:
+        item = self._batch_item(input)
+        if item is not None:
+            return self.pool.call_batched(
+                self.mcp_url, self.batch[0], item, self._batch_args, _split_batch_result, self.coalesce_window
+            )
+        result = self.pool.call_tool(self.mcp_url, self.tool_name, self._args(input))
+        return _normalize_result(result)
+
+    async def _arun(self, input: Any) -> Dict[str, Any]:
+        item = self._batch_item(input)
+        if item is not None:
+            return await self.pool.acall_batched(
+                self.mcp_url, self.batch[0], item, self._batch_args, _split_batch_result, self.coalesce_window
+            )
+        result = await self.pool.acall_tool(self.mcp_url, self.tool_name, self._args(input))
+        return _normalize_result(result)
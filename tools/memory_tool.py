@@ -0,0 +1,48 @@
+"""memory_search tool: recall earlier runs of the agent (see memory.py).
+
+Reads the store in `$AGENT_MEMORY` (default `.agent_memory`), which
+`AgentRunner(memory=...)` fills; the CLI passes its own `AgentMemory` so
+the tool sees the runs of the current session too.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from typing import Any, Dict, Optional
+
+
+class MemorySearchTool:
+    name = "memory_search"
+    description = "Recall earlier questions similar to 'q', with the answers and tool results they got"
+    parameters = {
+        "type": "object",
+        "properties": {
+            "q": {"type": "string", "description": "What to recall"},
+            "k": {"type": "integer", "description": "Number of memories (default 3)"},
+        },
+        "required": ["q"],
+    }
+
+    def __init__(self, memory: Any = None, path: Optional[str] = None):
+        self.path = path or os.getenv("AGENT_MEMORY", ".agent_memory")
+        self._memory = memory
+        self._lock = threading.Lock()
+
+    def _get_memory(self):
+        if self._memory is None and os.path.exists(os.path.join(self.path, "memory.db")):
+            with self._lock:
+                if self._memory is None:
+                    from memory import AgentMemory
+
+                    self._memory = AgentMemory(self.path)
+        return self._memory
+
+    def run(self, input: Dict[str, Any]) -> Dict[str, Any]:
+        q = input.get("q")
+        if not q:
+            return {"error": "q is required"}
+        memory = self._get_memory()
+        if memory is None:
+            return {"memories": []}
+        return {"memories": memory.recall(q, int(input.get("k") or 3))}
@@ -0,0 +1,470 @@
+"""On-disk inverted index with BM25 ranking, used by `SearchTool`.
+
+Layout of an index directory:
+
+- `catalog.db` (SQLite) maps each document id to its segment and local
+  number, with the source file's mtime/size for incremental syncs, and
+  lists the segments with their document/token counts. Every change is one
+  transaction, so a crash mid-write leaves the previous state.
+- `seg_<n>.bin` files are immutable segments, numbered from a counter in
+  the catalog so that no number is ever reused. Each holds a sorted term
+  dictionary, postings (doc numbers + term frequencies as uint32 arrays),
+  document lengths and the stored text for snippets. Segments are
+  memory-mapped and read through NumPy views: opening an index reads no
+  postings, and a query only touches the pages of the terms it asks for.
+
+Adding or updating documents writes one new segment; the old version of an
+updated document is dropped from the catalog and ignored from then on.
+Once there are more than `max_segments` segments they are merged into one,
+which also reclaims the space of dropped documents.
+
+    index = SearchIndex(".search_index")
+    index.sync_directory("runbooks/")       # only new/changed/removed files
+    index.search("disk full on postgres", k=5)
+"""
+from __future__ import annotations
+
+import fnmatch
+import math
+import mmap
+import os
+import re
+import sqlite3
+import struct
+import threading
+import unicodedata
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+_MAGIC = b"BM25SEG1"
+# magic, terms, docs, postings, term bytes, stored text bytes
+_HEADER = struct.Struct("<8sQQQQQ")
+_TOKEN_RE = re.compile(r"\w+")
+_MARKS_RE = re.compile("[\u0300-\u036f]")  # combining accents split off by NFKD
+
+DEFAULT_PATTERNS = ("*.md", "*.txt", "*.rst")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased, accent-folded word tokens ("Configuração" -> "configuracao")."""
+    folded = _MARKS_RE.sub("", unicodedata.normalize("NFKD", text.lower()))
+    return _TOKEN_RE.findall(folded)
+
+
+def _pad(n: int) -> int:
+    return (8 - n % 8) % 8
+
+
+def write_segment(path: str, docs: Sequence[Tuple[str, str]]) -> Tuple[int, int]:
+    """Write `[(doc_id, text), ...]` as a segment; returns (documents, tokens)."""
+    postings: Dict[str, List[Tuple[int, int]]] = {}
+    lengths = np.zeros(len(docs), dtype=np.uint32)
+    for local, (_, text) in enumerate(docs):
+        counts = Counter(tokenize(text))
+        lengths[local] = sum(counts.values())
+        for term, tf in counts.items():
+            postings.setdefault(term, []).append((local, tf))
+
+    terms = sorted(postings)
+    encoded = [t.encode("utf-8") for t in terms]
+    term_offsets = np.zeros(len(terms) + 1, dtype=np.uint64)
+    term_offsets[1:] = np.cumsum([len(t) for t in encoded])
+    post_offsets = np.zeros(len(terms) + 1, dtype=np.uint64)
+    post_offsets[1:] = np.cumsum([len(postings[t]) for t in terms])
+    flat = [p for t in terms for p in postings[t]]
+    doc_ids = np.fromiter((p[0] for p in flat), dtype=np.uint32, count=len(flat))
+    tfs = np.fromiter((p[1] for p in flat), dtype=np.uint32, count=len(flat))
+    stored = [text.encode("utf-8") for _, text in docs]
+    store_offsets = np.zeros(len(docs) + 1, dtype=np.uint64)
+    store_offsets[1:] = np.cumsum([len(s) for s in stored])
+    term_bytes, store_bytes = b"".join(encoded), b"".join(stored)
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, len(terms), len(docs), len(flat), len(term_bytes), len(store_bytes)))
+        for array in (term_offsets, post_offsets, doc_ids, tfs, lengths, store_offsets):
+            data = array.tobytes()
+            f.write(data + b"\0" * _pad(len(data)))
+        f.write(term_bytes)
+        f.write(store_bytes)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return len(docs), int(lengths.sum())
+
+
+class Segment:
+    """Read-only, memory-mapped view of a segment file."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, n_terms, n_docs, n_postings, term_len, store_len = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a search index segment")
+        self.n_terms, self.n_docs = n_terms, n_docs
+        pos = _HEADER.size
+
+        def view(dtype, count):
+            nonlocal pos
+            array = np.frombuffer(self._mm, dtype=dtype, count=count, offset=pos)
+            pos += array.nbytes + _pad(array.nbytes)
+            return array
+
+        self.term_offsets = view(np.uint64, n_terms + 1)
+        self.post_offsets = view(np.uint64, n_terms + 1)
+        self.doc_ids = view(np.uint32, n_postings)
+        self.tfs = view(np.uint32, n_postings)
+        self.lengths = view(np.uint32, n_docs)
+        self.store_offsets = view(np.uint64, n_docs + 1)
+        self._terms_at = pos
+        self._store_at = pos + term_len
+
+    def _term(self, i: int) -> bytes:
+        return self._mm[self._terms_at + int(self.term_offsets[i]):self._terms_at + int(self.term_offsets[i + 1])]
+
+    def find(self, term: str) -> Optional[int]:
+        """Position of `term` in the (sorted) dictionary, by binary search."""
+        key = term.encode("utf-8")
+        lo, hi = 0, self.n_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < self.n_terms and self._term(lo) == key else None
+
+    def postings(self, i: int) -> Tuple[np.ndarray, np.ndarray]:
+        start, end = int(self.post_offsets[i]), int(self.post_offsets[i + 1])
+        return self.doc_ids[start:end], self.tfs[start:end]
+
+    def text(self, local: int) -> str:
+        start = self._store_at + int(self.store_offsets[local])
+        end = self._store_at + int(self.store_offsets[local + 1])
+        return self._mm[start:end].decode("utf-8", errors="replace")
+
+    def close(self):
+        # NumPy views keep the buffer exported; dropping them lets the map close
+        self.term_offsets = self.post_offsets = self.doc_ids = self.tfs = None
+        self.lengths = self.store_offsets = None
+        try:
+            self._mm.close()
+        except BufferError:
+            pass
+
+
+def snippet(text: str, terms: Iterable[str], width: int = 200) -> str:
+    """About `width` characters of `text` around the first occurrence of any query term."""
+    folded = [t for t in terms if t]
+    start = 0
+    if folded:
+        pattern = re.compile("|".join(re.escape(t) for t in sorted(folded, key=len, reverse=True)), re.IGNORECASE)
+        # match accent-insensitively; dropping the marks NFKD splits off keeps offsets aligned with `text`
+        match = pattern.search(_MARKS_RE.sub("", unicodedata.normalize("NFKD", text)))
+        if match:
+            start = max(0, match.start() - width // 4)
+            if start:
+                # start on a word boundary
+                start = min(match.start(), text.find(" ", start) + 1 or start)
+    piece = " ".join(text[start:start + width].split())
+    return ("…" if start else "") + piece + ("…" if start + width < len(text) else "")
+
+
+class SearchIndex:
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75, max_segments: int = 8):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.max_segments = max_segments
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(os.path.join(path, "catalog.db"), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS segments ("
+            "id INTEGER PRIMARY KEY, docs INTEGER NOT NULL, tokens INTEGER NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS docs (doc_id TEXT PRIMARY KEY, segment INTEGER NOT NULL, "
+            "local INTEGER NOT NULL, title TEXT, mtime_ns INTEGER, size INTEGER)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS docs_segment ON docs(segment, local)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._db.execute("INSERT OR IGNORE INTO meta VALUES ('generation', 0)")
+        # segment ids are never reused: a reader in another process may still map a merged-away segment by id
+        self._db.execute(
+            "INSERT OR IGNORE INTO meta SELECT 'next_segment', COALESCE(MAX(id), 0) + 1 FROM segments"
+        )
+        self._segments: Dict[int, Segment] = {}
+        self._live: Dict[int, np.ndarray] = {}
+        self._live_generation = -1
+
+    # --- catalog --------------------------------------------------------
+
+    def _segment_path(self, seg_id: int) -> str:
+        return os.path.join(self.path, f"seg_{seg_id}.bin")
+
+    def _remove_orphans(self):
+        """Delete segment files no committed transaction refers to (left by a crash).
+
+        Called by the writing methods only: there is a single writer, and a
+        reader must not delete the segment a writer is about to commit.
+        """
+        known = {self._segment_path(s) for (s,) in self._db.execute("SELECT id FROM segments")}
+        for name in os.listdir(self.path):
+            full = os.path.join(self.path, name)
+            if name.startswith("seg_") and full not in known:
+                os.remove(full)
+
+    def _segment(self, seg_id: int) -> Segment:
+        segment = self._segments.get(seg_id)
+        if segment is None:
+            segment = self._segments[seg_id] = Segment(self._segment_path(seg_id))
+        return segment
+
+    def _live_mask(self, seg_id: int, n_docs: int) -> np.ndarray:
+        mask = self._live.get(seg_id)
+        if mask is None:
+            mask = np.zeros(n_docs, dtype=bool)
+            rows = self._db.execute("SELECT local FROM docs WHERE segment = ?", (seg_id,)).fetchall()
+            mask[np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))] = True
+            self._live[seg_id] = mask
+        return mask
+
+    def _new_segment_id(self) -> int:
+        self._db.execute("UPDATE meta SET value = value + 1 WHERE key = 'next_segment'")
+        return self._db.execute("SELECT value - 1 FROM meta WHERE key = 'next_segment'").fetchone()[0]
+
+    def _bump(self):
+        self._db.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+
+    @property
+    def generation(self) -> int:
+        """Increases with every change, so results can be cached per generation."""
+        with self._lock:
+            return self._db.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def sources(self) -> Dict[str, Tuple[Optional[int], Optional[int]]]:
+        """doc id -> (mtime_ns, size) of the file it was indexed from."""
+        with self._lock:
+            return {d: (m, s) for d, m, s in self._db.execute("SELECT doc_id, mtime_ns, size FROM docs")}
+
+    # --- writing ----------------------------------------------------------
+
+    def add(self, docs: Iterable[Tuple[str, str]], meta: Optional[Dict[str, Tuple[int, int]]] = None) -> int:
+        """Add or replace documents `[(doc_id, text), ...]` in one new segment."""
+        docs = list({doc_id: text for doc_id, text in docs}.items())  # last version of a repeated id wins
+        if not docs:
+            return 0
+        meta = meta or {}
+        with self._lock:
+            self._remove_orphans()
+            seg_id = self._new_segment_id()
+            n_docs, n_tokens = write_segment(self._segment_path(seg_id), docs)
+            rows = [
+                (doc_id, seg_id, local, _title(text, doc_id), *meta.get(doc_id, (None, None)))
+                for local, (doc_id, text) in enumerate(docs)
+            ]
+            self._db.execute("BEGIN")
+            try:
+                self._db.execute("INSERT INTO segments (id, docs, tokens) VALUES (?, ?, ?)", (seg_id, n_docs, n_tokens))
+                self._db.executemany("INSERT OR REPLACE INTO docs VALUES (?, ?, ?, ?, ?, ?)", rows)
+                self._bump()
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                os.remove(self._segment_path(seg_id))
+                raise
+            self._live.clear()
+            if self._db.execute("SELECT COUNT(*) FROM segments").fetchone()[0] > self.max_segments:
+                self.merge()
+        return len(docs)
+
+    def delete(self, doc_ids: Iterable[str]) -> int:
+        doc_ids = list(doc_ids)
+        if not doc_ids:
+            return 0
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                deleted = self._db.executemany("DELETE FROM docs WHERE doc_id = ?", [(d,) for d in doc_ids]).rowcount
+                self._bump()
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._live.clear()
+            return deleted
+
+    def merge(self):
+        """Rewrite all live documents into a single segment and drop the old ones."""
+        with self._lock:
+            self._remove_orphans()
+            old = [s for (s,) in self._db.execute("SELECT id FROM segments ORDER BY id")]
+            rows = self._db.execute("SELECT doc_id, segment, local, mtime_ns, size FROM docs ORDER BY segment, local")
+            rows = rows.fetchall()
+            docs = [(doc_id, self._segment(seg).text(local)) for doc_id, seg, local, _, _ in rows]
+            meta = {doc_id: (m, s) for doc_id, _, _, m, s in rows}
+            seg_id = self._new_segment_id()
+            n_docs, n_tokens = write_segment(self._segment_path(seg_id), docs) if docs else (0, 0)
+            self._db.execute("BEGIN")
+            try:
+                self._db.execute("DELETE FROM segments")
+                self._db.execute("DELETE FROM docs")
+                if docs:
+                    self._db.execute("INSERT INTO segments VALUES (?, ?, ?)", (seg_id, n_docs, n_tokens))
+                    self._db.executemany(
+                        "INSERT INTO docs VALUES (?, ?, ?, ?, ?, ?)",
+                        [(d, seg_id, i, _title(t, d), *meta[d]) for i, (d, t) in enumerate(docs)],
+                    )
+                self._bump()
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            for seg in old:
+                # a search still holding the old mapping keeps it until it finishes
+                self._segments.pop(seg, None)
+                os.remove(self._segment_path(seg))
+            self._live.clear()
+
+    def sync_directory(self, root: str, patterns: Sequence[str] = DEFAULT_PATTERNS) -> Dict[str, int]:
+        """Index new and changed files under `root` and drop removed ones; ids are paths relative to `root`."""
+        known = self.sources()
+        seen = set()
+        changed: List[Tuple[str, str]] = []
+        meta: Dict[str, Tuple[int, int]] = {}
+        for dirpath, _, files in os.walk(root):
+            for name in files:
+                if not any(fnmatch.fnmatch(name, p) for p in patterns):
+                    continue
+                full = os.path.join(dirpath, name)
+                doc_id = os.path.relpath(full, root).replace(os.sep, "/")
+                st = os.stat(full)
+                seen.add(doc_id)
+                if known.get(doc_id) == (st.st_mtime_ns, st.st_size):
+                    continue
+                with open(full, encoding="utf-8", errors="replace") as f:
+                    changed.append((doc_id, f.read()))
+                meta[doc_id] = (st.st_mtime_ns, st.st_size)
+        removed = [d for d, (mtime, _) in known.items() if d not in seen and mtime is not None]
+        with self._lock:
+            self.delete(removed)
+            self.add(changed, meta)
+        return {"indexed": len(changed), "removed": len(removed), "unchanged": len(seen) - len(changed)}
+
+    # --- searching --------------------------------------------------------
+
+    def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+        """Top `k` documents for `query` by BM25: `[{id, title, score, snippet}, ...]`."""
+        terms = Counter(tokenize(query))
+        if not terms:
+            return []
+        with self._lock:
+            generation = self.generation
+            rows = self._db.execute("SELECT id, docs, tokens FROM segments ORDER BY id").fetchall()
+            if generation != self._live_generation:
+                # another process may have replaced documents, or merged segments away
+                self._live.clear()
+                for seg_id in set(self._segments) - {r[0] for r in rows}:
+                    self._segments.pop(seg_id)
+                self._live_generation = generation
+            segments = [(seg_id, self._segment(seg_id), self._live_mask(seg_id, n)) for seg_id, n, _ in rows]
+        total_docs = sum(r[1] for r in rows)
+        if not total_docs:
+            return []
+        avgdl = sum(r[2] for r in rows) / total_docs
+
+        # document frequencies over all segments (replaced documents included, as Lucene does)
+        found = [{t: seg.find(t) for t in terms} for _, seg, _ in segments]
+        df = Counter()
+        for (_, seg, _), positions in zip(segments, found):
+            for term, i in positions.items():
+                if i is not None:
+                    df[term] += int(seg.post_offsets[i + 1] - seg.post_offsets[i])
+
+        candidates: List[Tuple[float, int, int]] = []
+        for (seg_id, seg, live), positions in zip(segments, found):
+            scores = np.zeros(seg.n_docs, dtype=np.float64)
+            for term, qtf in terms.items():
+                if positions[term] is None:
+                    continue
+                idf = math.log(1 + (total_docs - df[term] + 0.5) / (df[term] + 0.5))
+                ids, tfs = seg.postings(positions[term])
+                tf = tfs.astype(np.float64)
+                norm = self.k1 * (1 - self.b + self.b * seg.lengths[ids] / avgdl)
+                # a term occurs once per document in its postings, so plain fancy-index += is safe
+                scores[ids] += qtf * idf * tf * (self.k1 + 1) / (tf + norm)
+            scores[~live] = 0
+            hits = np.flatnonzero(scores)
+            if len(hits) > k:
+                hits = hits[np.argpartition(scores[hits], -k)[-k:]]
+            candidates.extend((float(scores[h]), seg_id, int(h)) for h in hits)
+
+        segments_by_id = {seg_id: seg for seg_id, seg, _ in segments}
+        results = []
+        for score, seg_id, local in sorted(candidates, reverse=True)[:k]:
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT doc_id, title FROM docs WHERE segment = ? AND local = ?", (seg_id, local)
+                ).fetchone()
+            if row is None:  # replaced or deleted meanwhile
+                continue
+            text = segments_by_id[seg_id].text(local)
+            results.append({"id": row[0], "title": row[1], "score": round(score, 4), "snippet": snippet(text, terms)})
+        return results
+
+    def close(self):
+        with self._lock:
+            for segment in self._segments.values():
+                segment.close()
+            self._segments.clear()
+            self._db.close()
+
+
+def _title(text: str, doc_id: str) -> str:
+    """First non-empty line (without Markdown heading marks), or the id."""
+    for line in text.splitlines():
+        line = line.strip().lstrip("#").strip()
+        if line:
+            return line[:120]
+    return doc_id
+
+
+def main(argv=None):
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Build or query the search index used by the `search` tool.")
+    parser.add_argument("--index", default=os.getenv("SEARCH_INDEX", ".search_index"))
+    sub = parser.add_subparsers(dest="command", required=True)
+    sync = sub.add_parser("sync", help="index new/changed files of a directory, drop removed ones")
+    sync.add_argument("directory")
+    sync.add_argument("--pattern", action="append", help=f"file glob (default: {' '.join(DEFAULT_PATTERNS)})")
+    query = sub.add_parser("query")
+    query.add_argument("q")
+    query.add_argument("-k", type=int, default=5)
+    sub.add_parser("merge", help="merge all segments into one")
+    args = parser.parse_args(argv)
+
+    index = SearchIndex(args.index)
+    try:
+        if args.command == "sync":
+            print(json.dumps(index.sync_directory(args.directory, args.pattern or DEFAULT_PATTERNS)))
+        elif args.command == "query":
+            print(json.dumps(index.search(args.q, args.k), ensure_ascii=False, indent=2))
+        else:
+            index.merge()
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,32 @@
-"""A toy search tool that looks up keywords in a small in-memory corpus."""
+"""Search tool: BM25 over the on-disk index built by `tools.search_index`.
+
+The index lives in `$SEARCH_INDEX` (default `.search_index`); build or
+update it with `python -m tools.search_index sync <directory>`. Without an
+index the tool falls back to a keyword scan of the small built-in `CORPUS`.
+"""
 
 from __future__ import annotations
 
-from typing import Any, Dict
+import os
+import threading
+from typing import Any, Dict, Optional
 
 
 class SearchTool:
     name = "search"
-    description = "Search a small corpus for a keyword 'q'"
+    description = "Search the document index for 'q'; returns the 'k' best matches with snippets"
     parameters = {
         "type": "object",
-        "properties": {"q": {"type": "string", "description": "Query keyword"}},
+        "properties": {
+            "q": {"type": "string", "description": "Search query"},
+            "k": {"type": "integer", "description": "Number of results (default 5)"},
+        },
         "required": ["q"],
     }
+    cacheable = True
+    cache_ttl = 300.0
+    # read-only: may run before the LLM asks for it (see speculation.py)
+    speculative = True
 
     CORPUS = {
         "agent": "This is an example agent that calls tools and reasons.",
@@ -20,9 +34,58 @@ class SearchTool:
         "openai": "OpenAI provides LLM models like gpt-4o.",
     }
 
+    def __init__(self, index_path: Optional[str] = None):
+        self.index_path = index_path or os.getenv("SEARCH_INDEX", ".search_index")
+        self._index = None
+        self._lock = threading.Lock()
+        # (catalog files state, index generation) of the last cache_key
+        self._generation: Optional[tuple] = None
+
+    def _get_index(self):
+        if self._index is None and os.path.exists(os.path.join(self.index_path, "catalog.db")):
+            with self._lock:
+                if self._index is None:
+                    from tools.search_index import SearchIndex
+
+                    self._index = SearchIndex(self.index_path)
+        return self._index
+
+    def _catalog_state(self) -> tuple:
+        """Size and mtime of the catalog and its write-ahead log, which every index commit changes."""
+        state = []
+        for name in ("catalog.db", "catalog.db-wal"):
+            try:
+                st = os.stat(os.path.join(self.index_path, name))
+            except OSError:
+                state.append(None)
+            else:
+                state.append((st.st_mtime_ns, st.st_size))
+        return tuple(state)
+
+    def cache_key(self, input: Dict[str, Any]):
+        # results change whenever the index does; two stats tell whether the generation needs reading again
+        state = self._catalog_state()
+        if state[0] is None:
+            return None
+        cached = self._generation
+        if cached is not None and cached[0] == state:
+            return cached[1]
+        index = self._get_index()
+        generation = None if index is None else index.generation
+        self._generation = (state, generation)
+        return generation
+
     def run(self, input: Dict[str, Any]) -> Dict[str, Any]:
         q = input.get("q")
         if not q:
             return {"error": "q is required"}
-        results = {k: v for k, v in self.CORPUS.items() if q.lower() in k.lower() or q.lower() in v.lower()}
-        return {"hits": results}
+        k = int(input.get("k") or 5)
+        index = self._get_index()
+        if index is not None:
+            return {"hits": index.search(q, k)}
+        hits = [
+            {"id": key, "snippet": text}
+            for key, text in self.CORPUS.items()
+            if q.lower() in key.lower() or q.lower() in text.lower()
+        ]
+        return {"hits": hits[:k]}
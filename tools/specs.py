@@ -0,0 +1,67 @@
+"""Snapshot of the built-in tools' metadata, so the catalog can be built without importing them.
+
+`tools/specs.json` holds, for every class in `TARGETS`, what `LazyTool`
+needs before the tool runs (name, description, parameters, timeout,
+cacheable / cache_ttl, keyed, speculative). It is generated from the
+classes themselves; after adding a tool or changing one of those
+attributes, regenerate it with
+
+    python -m tools.specs
+
+(tests/test_lazy_tools.py fails while it is out of date).
+"""
+from __future__ import annotations
+
+import importlib
+import json
+import os
+from typing import Any, Dict, List
+
+from tools.catalog import FREE_FORM_PARAMETERS
+
+# in catalog (and prompt) order
+TARGETS = [
+    "tools.echo_tool:EchoTool",
+    "tools.calc_tool:CalcTool",
+    "tools.search_tool:SearchTool",
+    "tools.memory_tool:MemorySearchTool",
+    "tools.file_tool:FileTool",
+    "tools.current_time_tool:CurrentTimeTool",
+    "tools.graph_tool:GraphTool",
+]
+
+PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "specs.json")
+
+
+def describe(target: str) -> Dict[str, Any]:
+    """The `LazyTool` arguments for the class at `target` ("package.module:ClassName"); imports it."""
+    module_name, class_name = target.split(":")
+    cls = getattr(importlib.import_module(module_name), class_name)
+    return {
+        "target": target,
+        "name": cls.name,
+        "description": getattr(cls, "description", ""),
+        "parameters": getattr(cls, "parameters", FREE_FORM_PARAMETERS),
+        "cacheable": getattr(cls, "cacheable", False),
+        "cache_ttl": getattr(cls, "cache_ttl", 60.0),
+        "speculative": getattr(cls, "speculative", False),
+        "timeout": getattr(cls, "timeout", None),
+        "keyed": hasattr(cls, "cache_key"),
+    }
+
+
+def load() -> List[Dict[str, Any]]:
+    with open(PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    specs = [describe(target) for target in TARGETS]
+    with open(PATH, "w", encoding="utf-8") as f:
+        json.dump(specs, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+    print(f"wrote {len(specs)} tool specs to {PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+"""Tracing and console output for the agent.
+
+Spans
+    `tracer.span(name, **attributes)` is a context manager timing one unit
+    of work: a run, an iteration, an LLM call, a tool call, an MCP round
+    trip. The current span lives in a `contextvars.ContextVar`, so spans
+    opened in asyncio tasks (parallel tool calls) get the right parent. A
+    finished span is handed to every exporter:
+
+    - `RingBufferExporter`: the last N spans in memory (tests, debugging);
+    - `JSONLExporter`: one JSON object per span, appended to a file;
+    - `OTLPExporter`: OTLP/HTTP JSON for a local OpenTelemetry collector,
+      batched and sent from a background thread.
+
+    A tracer without exporters hands out one shared no-op span: tracing
+    that is off costs a method call per span and nothing else. Attributes
+    that are expensive to compute should be guarded by `span.recording`.
+
+Console
+    `Console` replaces the agent's prints: messages have a level (quiet,
+    info, debug), are formatted only when that level is on (pass arguments,
+    not f-strings; `Json(obj)` defers `json.dumps`), and are rate-limited
+    to `max_lines_per_second`, with a note of how many were dropped.
+"""
+from __future__ import annotations
+
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, IO, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start_ns: int
+    end_ns: int = 0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    # "ok" or "error"
+    status: str = "ok"
+    error: Optional[str] = None
+    recording = True
+
+    _tracer: Optional["Tracer"] = field(default=None, repr=False)
+    _t0: int = field(default=0, repr=False)
+    _token: Any = field(default=None, repr=False)
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def set(self, **attributes: Any) -> "Span":
+        self.attributes.update(attributes)
+        return self
+
+    def fail(self, error: Any):
+        self.status = "error"
+        self.error = str(error)
+
+    def __enter__(self) -> "Span":
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = self.start_ns + time.perf_counter_ns() - self._t0
+        _current.reset(self._token)
+        if exc is not None and self.status == "ok":
+            self.fail(exc if str(exc) else exc_type.__name__)
+        self._tracer._finish(self)
+        return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    recording = False
+    attributes: Dict[str, Any] = {}
+
+    def set(self, **attributes: Any) -> "_NoopSpan":
+        return self
+
+    def fail(self, error: Any):
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    def __init__(self, exporters: Optional[List[Any]] = None):
+        self.exporters: List[Any] = list(exporters or [])
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.exporters)
+
+    def span(self, name: str, **attributes: Any):
+        if not self.exporters:
+            return NOOP_SPAN
+        parent = _current.get()
+        return Span(
+            name=name,
+            trace_id=parent.trace_id if parent is not None else f"{random.getrandbits(128):032x}",
+            span_id=f"{random.getrandbits(64):016x}",
+            parent_id=parent.span_id if parent is not None else None,
+            start_ns=time.time_ns(),
+            attributes=attributes,
+            _tracer=self,
+            _t0=time.perf_counter_ns(),
+        )
+
+    def _finish(self, span: Span):
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception as e:  # an exporter must never break the agent
+                logger.debug("Span exporter %r failed: %s", exporter, e)
+
+    def close(self):
+        for exporter in self.exporters:
+            close = getattr(exporter, "close", None)
+            if close is not None:
+                close()
+
+
+def current_span():
+    """The innermost open span (a no-op span outside any)."""
+    return _current.get() or NOOP_SPAN
+
+
+# --- exporters ------------------------------------------------------------
+
+
+class RingBufferExporter:
+    def __init__(self, capacity: int = 10000):
+        self._spans: "deque[Span]" = deque(maxlen=capacity)
+
+    def export(self, span: Span):
+        self._spans.append(span)
+
+    def spans(self, name: Optional[str] = None) -> List[Span]:
+        return [s for s in list(self._spans) if name is None or s.name == name]
+
+    def clear(self):
+        self._spans.clear()
+
+
+class JSONLExporter:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file: IO[str] = open(path, "a", encoding="utf-8")
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            # one write per trace, not per span: a run's spans reach the file when the run ends
+            if span.parent_id is None:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, str):
+        return {"stringValue": value}
+    return {"stringValue": json.dumps(value, ensure_ascii=False, default=str)}
+
+
+def to_otlp(spans: List[Span], service_name: str = "me-agent") -> Dict[str, Any]:
+    """An OTLP/JSON `ExportTraceServiceRequest` body for `spans`."""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+            "scopeSpans": [{
+                "scope": {"name": "me-agent.tracing"},
+                "spans": [
+                    {
+                        "traceId": s.trace_id,
+                        "spanId": s.span_id,
+                        "parentSpanId": s.parent_id or "",
+                        "name": s.name,
+                        "kind": 1,  # SPAN_KIND_INTERNAL
+                        "startTimeUnixNano": str(s.start_ns),
+                        "endTimeUnixNano": str(s.end_ns),
+                        "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+                        # STATUS_CODE_OK / STATUS_CODE_ERROR
+                        "status": {"code": 2, "message": s.error or ""} if s.status == "error" else {"code": 1},
+                    }
+                    for s in spans
+                ],
+            }],
+        }]
+    }
+
+
+class OTLPExporter:
+    """Sends spans to an OTLP/HTTP collector (`POST /v1/traces`, JSON) from a background thread.
+
+    Spans are sent in batches of up to `max_batch`, at least every
+    `interval` seconds; when the queue is full (collector down) new spans
+    are dropped and counted in `dropped`.
+    """
+
+    def __init__(
+        self,
+        endpoint: str = "http://localhost:4318/v1/traces",
+        service_name: str = "me-agent",
+        interval: float = 2.0,
+        max_batch: int = 512,
+        max_queue: int = 10000,
+    ):
+        import urllib.parse
+
+        from http_pool import HTTPConnectionPool
+
+        parts = urllib.parse.urlsplit(endpoint)
+        self.path = parts.path or "/v1/traces"
+        self.service_name = service_name
+        self.interval = interval
+        self.max_batch = max_batch
+        self.dropped = 0
+        self.sent = 0
+        self._pool = HTTPConnectionPool(f"{parts.scheme}://{parts.netloc}", maxsize=1, read_timeout=10.0)
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(max_queue)
+        self._thread = threading.Thread(target=self._run, name="otlp-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        closing = False
+        while not closing:
+            batch: List[Span] = []
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.max_batch:
+                try:
+                    span = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if span is None:
+                    closing = True
+                    break
+                batch.append(span)
+            if batch:
+                self._send(batch)
+
+    def _send(self, batch: List[Span]):
+        body = json.dumps(to_otlp(batch, self.service_name)).encode("utf-8")
+        try:
+            resp = self._pool.request("POST", self.path, body, {"Content-Type": "application/json"})
+            if resp.status >= 300:
+                raise RuntimeError(f"HTTP {resp.status}")
+            self.sent += len(batch)
+        except Exception as e:
+            self.dropped += len(batch)
+            logger.debug("OTLP export of %d spans failed: %s", len(batch), e)
+
+    def close(self, timeout: float = 5.0):
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._pool.close()
+
+
+# --- console ----------------------------------------------------------------
+
+QUIET, INFO, DEBUG = 0, 1, 2
+LEVELS = {"quiet": QUIET, "info": INFO, "debug": DEBUG}
+
+
+class Json:
+    """Defers `json.dumps(value)` (cut to `limit` characters) until the message is printed."""
+
+    __slots__ = ("value", "limit")
+
+    def __init__(self, value: Any, limit: Optional[int] = None):
+        self.value = value
+        self.limit = limit
+
+    def __str__(self) -> str:
+        text = json.dumps(self.value, ensure_ascii=False, default=str)
+        if self.limit is not None and len(text) > self.limit:
+            return f"{text[:self.limit]}… [{len(text) - self.limit} more chars]"
+        return text
+
+
+class Console:
+    def __init__(
+        self, level: int = INFO, max_lines_per_second: Optional[float] = 50.0, stream: Optional[IO[str]] = None
+    ):
+        self.level = level
+        # None or 0: no limit
+        self.rate = max_lines_per_second
+        # None: sys.stdout at the time of writing, so contextlib.redirect_stdout applies
+        self.stream = stream
+        self.suppressed = 0
+        self._allowance = max_lines_per_second or 0.0
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def enabled(self, level: int) -> bool:
+        return level <= self.level
+
+    def info(self, message: str, *args: Any):
+        if self.level >= INFO:
+            self._emit(message, args, None)
+
+    def debug(self, message: str, *args: Any):
+        """Details (raw LLM output), written to stderr unless the console has its own stream."""
+        if self.level >= DEBUG:
+            self._emit(message, args, sys.stderr)
+
+    def _emit(self, message: str, args, stream):
+        if not self.rate:
+            dropped = 0
+        else:
+            dropped = self._admit()
+            if dropped < 0:
+                return
+        out = self.stream or stream or sys.stdout
+        if dropped:
+            print(f"[{dropped} console line(s) suppressed]", file=out)
+        print(message % args if args else message, file=out)
+
+    def _admit(self) -> int:
+        """Token bucket: -1 if this line is over the rate, else the number of lines dropped before it."""
+        with self._lock:
+            now = time.monotonic()
+            self._allowance = min(self.rate, self._allowance + (now - self._last) * self.rate)
+            self._last = now
+            if self._allowance < 1:
+                self.suppressed += 1
+                return -1
+            self._allowance -= 1
+            dropped, self.suppressed = self.suppressed, 0
+            return dropped
+
+
+_tracer = Tracer()
+_console = Console(LEVELS.get(os.getenv("AGENT_LOG_LEVEL", "info").lower(), INFO))
+
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+
+def set_tracer(tracer: Tracer):
+    """Make `tracer` the default of every component created afterwards (and of the MCP pool)."""
+    global _tracer
+    _tracer = tracer
+
+
+def get_console() -> Console:
+    return _console
+
+
+def set_console(console: Console):
+    global _console
+    _console = console